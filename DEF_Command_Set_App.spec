@@ -17,7 +17,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['matplotlib.backends.backend_tkagg', 'openpyxl', 'win32com.client', 'pythoncom', 'PIL', 'PIL.Image', 'PIL.ImageGrab', 'PIL.ImageTk'],
+    hiddenimports=['matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_agg', 'openpyxl', 'win32com.client', 'pythoncom', 'PIL', 'PIL.Image', 'PIL.ImageGrab', 'PIL.ImageTk'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,4 +1,24 @@
-import pyvisa
+import time
+import warnings
+
+from utils import metrics, settings_store, tracer
+
+# サービスリクエスト (SRQ) による完了待ち
+EVENT_SERVICE_REQ = 0x3FFF200B   # VI_EVENT_SERVICE_REQ
+EVENT_QUEUE = 1                  # VI_QUEUE
+EVENT_MODES = ("auto", "srq", "poll", "off")
+STB_ESB = 0x20                   # 標準イベントステータス (3499B: *ESE 1 で *OPC の完了)
+STB_DATA_AVAILABLE = 0x80        # 3458A: 読み取り値が出力バッファにある
+POLL_INTERVAL = 0.005            # シリアルポールの間隔 (秒)
+# 機器ごとの SRQ 有効化・解除コマンド
+EVENT_ENABLE = {
+    "3499B": ["*CLS", "*ESE 1", "*SRE 32"],   # *OPC の完了 → ESB → SRQ
+    "3458A": ["RQS 128"],                     # Data Available → SRQ
+}
+EVENT_DISABLE = {
+    "3499B": ["*SRE 0", "*ESE 0"],
+    "3458A": ["RQS 0"],
+}
 
 class GPIBController:
     """GPIB通信制御クラス"""
@@ -9,15 +29,29 @@ class GPIBController:
         self.instrument = None
         self.connected = False
         self.current_resource = None
+        self.device_type = None
         self.timeout = 5000
+        self.event_mode = None   # None (従来の待ち方) / "srq" / "poll"
         
     def initialize(self):
-        """VISAリソースマネージャーの初期化"""
+        """VISAリソースマネージャーの初期化
+
+        app_settings.json の "simulation" が有効なら、シミュレーター (SIM::3458A::INSTR・SIM::3499B::INSTR) を
+        実機のリソースに加える (VISA がなくてもシミュレーターだけで動作)。
+        """
+        sim = settings_store.app_settings().section("simulation")
         try:
+            import pyvisa  # 起動時間短縮のため初回初期化時に読み込み
             self.rm = pyvisa.ResourceManager()
-            return True, "VISA初期化成功"
         except Exception as e:
-            return False, f"VISA初期化失敗: {str(e)}"
+            if not sim.get("enabled"):
+                return False, f"VISA初期化失敗: {str(e)}"
+            self.rm = None
+        if sim.get("enabled"):
+            from utils import sim_visa
+            self.rm = sim_visa.SimResourceManager(self.rm, dmm_signal=sim.get("dmm_signal", "dc"))
+            return True, "VISA初期化成功 (シミュレーター有効)"
+        return True, "VISA初期化成功"
     
     def list_resources(self):
         """接続可能なGPIB機器のリストを取得"""
@@ -77,11 +111,8 @@ class GPIBController:
                 test_result = response.strip()
                 successful_command = cmd
                 break  # 成功したらループを抜ける
-            except pyvisa.errors.VisaIOError as e:
-                # タイムアウトや通信エラーの場合は次のコマンドを試す
-                continue
             except Exception as e:
-                # その他のエラーも次のコマンドを試す
+                # タイムアウト・通信エラー (VisaIOError) などは次のコマンドを試す
                 continue
         
         # タイムアウトを元に戻す
@@ -121,6 +152,8 @@ class GPIBController:
             self.instrument.timeout = timeout
             self.timeout = timeout
             self.current_resource = resource_name
+            self.device_type = device_type
+            self.event_mode = None
             
             # 機器タイプに応じたターミネーション設定
             if device_type == "3458A":
@@ -182,6 +215,7 @@ class GPIBController:
                         print(f"ローカルモード復帰警告: {str(e)}")
                 
                 self.instrument.close()
+                self.event_mode = None
                 self.connected = False
                 self.current_resource = None
             return True, "切断成功（ローカルモードに復帰）"
@@ -193,33 +227,45 @@ class GPIBController:
         if not self.connected:
             return False, "機器が接続されていません"
         
-        try:
-            self.instrument.write(command)
-            return True, f"送信成功: {command}"
-        except Exception as e:
-            return False, f"送信失敗: {str(e)}"
+        with metrics.op_timer(self.device_type, "write") as mt, \
+                tracer.span("gpib.write", "gpib", res=self.current_resource, cmd=command) as sp:
+            try:
+                self.instrument.write(command)
+                return True, f"送信成功: {command}"
+            except Exception as e:
+                mt.fail()
+                sp.set(error=str(e))
+                return False, f"送信失敗: {str(e)}"
     
     def query(self, command):
         """GPIB機器にクエリを送信して応答を取得"""
         if not self.connected:
             return False, "機器が接続されていません"
         
-        try:
-            response = self.instrument.query(command)
-            return True, response.strip()
-        except Exception as e:
-            return False, f"クエリ失敗: {str(e)}"
+        with metrics.op_timer(self.device_type, "query") as mt, \
+                tracer.span("gpib.query", "gpib", res=self.current_resource, cmd=command) as sp:
+            try:
+                response = self.instrument.query(command)
+                return True, response.strip()
+            except Exception as e:
+                mt.fail()
+                sp.set(error=str(e))
+                return False, f"クエリ失敗: {str(e)}"
     
     def read(self):
         """GPIB機器からデータを読み取り"""
         if not self.connected:
             return False, "機器が接続されていません"
         
-        try:
-            data = self.instrument.read()
-            return True, data.strip()
-        except Exception as e:
-            return False, f"読み取り失敗: {str(e)}"
+        with metrics.op_timer(self.device_type, "read") as mt, \
+                tracer.span("gpib.read", "gpib", res=self.current_resource) as sp:
+            try:
+                data = self.instrument.read()
+                return True, data.strip()
+            except Exception as e:
+                mt.fail()
+                sp.set(error=str(e))
+                return False, f"読み取り失敗: {str(e)}"
     
     def read_raw(self):
         """GPIB機器からバイナリデータを読み取り"""
@@ -232,6 +278,20 @@ class GPIBController:
         except Exception as e:
             return False, f"読み取り失敗: {str(e)}"
     
+    def read_bytes(self, count):
+        """GPIB機器から count バイトのバイナリデータを読み取り (SINT/DINT のメモリ転送など)"""
+        if not self.connected:
+            return False, "機器が接続されていません"
+
+        with metrics.op_timer(self.device_type, "read_bytes") as mt, \
+                tracer.span("gpib.read_bytes", "gpib", res=self.current_resource, count=count) as sp:
+            try:
+                return True, self.instrument.read_bytes(count)
+            except Exception as e:
+                mt.fail()
+                sp.set(error=str(e))
+                return False, f"読み取り失敗: {str(e)}"
+
     def query_binary_values(self, command, datatype='f', container=list):
         """バイナリ値を取得"""
         if not self.connected:
@@ -247,6 +307,163 @@ class GPIBController:
         except Exception as e:
             return False, f"バイナリ取得失敗: {str(e)}"
     
+    # ==================== イベント (SRQ) による完了待ち ====================
+    def enable_events(self, mode=None):
+        """サービスリクエストによる完了待ちを有効化
+
+        3499B は *OPC の完了、3458A は読み取り値の出力 (Data Available) で SRQ を出すよう設定し、
+        VISA の SRQ イベントで待つ。イベントが使えなければシリアルポール (*STB) の繰り返しで待つ。
+
+        Args:
+            mode: "auto" (SRQ イベント → 使えなければシリアルポール) / "srq" / "poll" /
+                  "off" (従来の *OPC? ・クエリで待つ)。省略時は app_settings "gpib_events" の mode
+
+        Returns:
+            (success, message) 失敗時は従来の待ち方のまま
+        """
+        self.disable_events(send=False)
+        if not self.connected:
+            return False, "機器が接続されていません"
+        if mode is None:
+            mode = settings_store.app_settings().section("gpib_events").get("mode", "auto")
+        if mode not in EVENT_MODES:
+            return False, f"不明なイベント待ちモード: {mode}"
+        if mode == "off":
+            return True, "イベント待ち無効 (*OPC? ・クエリで待つ)"
+        commands = EVENT_ENABLE.get(self.device_type)
+        if commands is None:
+            return False, f"イベント待ちに対応していない機器です: {self.device_type}"
+        for command in commands:
+            success, message = self.write(command)
+            if not success:
+                return False, f"SRQ 設定失敗: {message}"
+
+        if mode in ("auto", "srq"):
+            try:
+                self.instrument.enable_event(EVENT_SERVICE_REQ, EVENT_QUEUE)
+                self.event_mode = "srq"
+                return True, "SRQ イベント待ち有効"
+            except Exception as e:
+                if mode == "srq":
+                    return False, f"SRQ イベント有効化失敗: {str(e)}"
+        try:
+            self.instrument.read_stb()
+        except Exception as e:
+            return False, f"シリアルポール失敗: {str(e)}"
+        self.event_mode = "poll"
+        return True, "シリアルポール待ち有効"
+
+    def disable_events(self, send=True):
+        """イベント待ちを解除して従来の待ち方に戻す (send: 機器の SRQ 設定も解除)"""
+        mode, self.event_mode = self.event_mode, None
+        if mode is None or not self.connected:
+            return True, "OK"
+        if mode == "srq":
+            try:
+                self.instrument.disable_event(EVENT_SERVICE_REQ, EVENT_QUEUE)
+            except Exception:
+                pass
+        if send:
+            for command in EVENT_DISABLE.get(self.device_type, []):
+                success, message = self.write(command)
+                if not success:
+                    return False, message
+        return True, "OK"
+
+    def wait_stb(self, mask, timeout):
+        """ステータスバイトの mask のビットが立つまで待つ (SRQ イベントまたはシリアルポール)
+
+        Args:
+            timeout: 待ち時間の上限 (秒)
+
+        Returns:
+            (success, ステータスバイト または エラーメッセージ)
+        """
+        deadline = time.monotonic() + timeout
+        with metrics.op_timer(self.device_type, "wait") as mt, \
+                tracer.span("gpib.wait", "gpib", res=self.current_resource, mask=mask) as sp:
+            while True:
+                try:
+                    stb = self.instrument.read_stb()
+                except Exception as e:
+                    mt.fail()
+                    sp.set(error=str(e))
+                    return False, f"シリアルポール失敗: {str(e)}"
+                if stb & mask:
+                    return True, stb
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    mt.fail()
+                    sp.set(error="timeout")
+                    return False, f"完了待ちタイムアウト ({timeout:.1f}秒, STB={stb})"
+                if self.event_mode == "srq":
+                    try:
+                        self.instrument.wait_on_event(EVENT_SERVICE_REQ, max(1, int(remaining * 1000)))
+                        continue
+                    except Exception:
+                        pass    # タイムアウト (または他機器の SRQ) → もう一度ポールして判定
+                time.sleep(min(POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    def wait_complete(self, timeout=5.0):
+        """送信済みコマンドの動作完了を待つ (3499B のリレー切り替えなど)
+
+        イベント待ちが有効なら *OPC → SRQ (ESB) を待って *ESR? でクリア、
+        無効なら *OPC? の応答 (完了までブロック) を待つ。
+
+        Returns:
+            (success, message)
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")   # pyvisa の終端文字警告を抑制
+            if self.event_mode is None:
+                orig_timeout = self.instrument.timeout
+                self.instrument.timeout = max(orig_timeout, int(timeout * 1000))
+                try:
+                    return self.query("*OPC?")
+                finally:
+                    self.instrument.timeout = orig_timeout
+            success, message = self.write("*OPC")
+            if not success:
+                return False, message
+            success, stb = self.wait_stb(STB_ESB, timeout)
+            if not success:
+                return False, stb
+            self.query("*ESR?")   # ESB (OPC ビット) をクリア
+            return True, "完了"
+
+    def write_wait_complete(self, command, timeout=5.0):
+        """コマンドを送信して動作完了まで待つ (wait_complete)"""
+        success, message = self.write(command)
+        if not success:
+            return False, message
+        return self.wait_complete(timeout)
+
+    def trigger_read(self, command="TRIG SGL", timeout=3.0):
+        """トリガーして 1 回分の応答を読む (3458A の TRIG SGL など)
+
+        イベント待ちが有効なら Data Available の SRQ を待ってから読む
+        (待っている間は読み取りで GPIB バスを占有しない)。
+        無効ならタイムアウトを一時的に timeout にしてクエリする。
+
+        Returns:
+            (success, 応答 または エラーメッセージ)
+        """
+        if self.event_mode is None:
+            orig_timeout = self.instrument.timeout
+            self.instrument.timeout = int(timeout * 1000)
+            try:
+                return self.query(command)
+            finally:
+                self.instrument.timeout = orig_timeout
+        success, message = self.write(command)
+        if not success:
+            return False, message
+        success, stb = self.wait_stb(STB_DATA_AVAILABLE, timeout)
+        if not success:
+            self.clear()    # 遅れて届く読み取り値が次の読み取りに残らないようにする
+            return False, stb
+        return self.read()
+
     def set_timeout(self, timeout):
         """タイムアウト値を設定"""
         if not self.connected:
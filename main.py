@@ -1,27 +1,46 @@
-import matplotlib
-matplotlib.use('TkAgg')
+import time
+_T0 = time.perf_counter()  # 起動時間計測の基準 (最初のインポートより前)
 
+import json
+import multiprocessing
+import sys
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog, messagebox
+from tkinter.scrolledtext import ScrolledText
 from tabs.communication_tab import CommunicationTab
 from tabs.test_tab import TestTab
-from tabs.graph_tab import GraphTab
-from tabs.dac_tab import DACTab
-from tabs.datagen_tab import DataGenTab
-from tabs.file_tab import FileTab
-from tabs.scanner_tab import ScannerTab
-from tabs.linearity_tab import LinearityTab
-from tabs.dc_char_tab import DCCharTab
 from gpib_controller import GPIBController
-from tabs.dmm3458a_tab import DMM3458ATab
 from serial_manager import SerialManager
 from about_dialog import show_about_dialog
 from two_row_notebook import TwoRowNotebook
 from version import __version__
+from utils import metrics, prewarm, settings_store, tracer
+
+# 起動時点で読み込まれていないことを確認する重いモジュール (--startup-bench で出力)
+HEAVY_MODULES = ("matplotlib", "numpy", "openpyxl", "pyvisa", "win32com")
+
+
+def _lazy_tab(key):
+    """遅延生成タブを参照時に生成して返すプロパティ"""
+    return property(lambda self: self._lazy_tabs[key].get(),
+                    doc=f"{key} タブ (初回参照時に生成)")
+
 
 class MainApplication(tk.Tk):
-    def __init__(self):
+    # 初回選択 (または参照) 時に生成するタブ
+    file_tab = _lazy_tab("file")
+    graph_tab = _lazy_tab("graph")
+    linearity_tab = _lazy_tab("linearity")
+    dc_char_tab = _lazy_tab("dc_char")
+    dac_tab = _lazy_tab("dac")
+    datagen_tab = _lazy_tab("datagen")
+    dmm3458a_tab = _lazy_tab("dmm3458a")
+    scanner_tab = _lazy_tab("scanner")
+
+    def __init__(self, startup_bench=False):
+        self._init_start = time.perf_counter()
         super().__init__()
+        self._startup_bench = startup_bench
 
         self.title(f"DEF Command Set App v{__version__}")
         self.geometry("900x780")
@@ -50,50 +69,124 @@ class MainApplication(tk.Tk):
         # コンテンツ領域を各タブの親にする
         content = self.notebook.content
 
-        # 各タブの作成(2台のコントローラーとシリアルマネージャーを渡す)
+        # タブ間で共有する状態はアプリ側で保持 (タブの生成順・生成有無に依存しない)
+        # DEF選択状態: DEF操作タブと Pattern Test で共有
+        self.def_vars = [tk.BooleanVar(value=(i == 0)) for i in range(6)]
+        # 保存先: Linearity / DC特性 とファイル保存タブで共有
+        app_settings = settings_store.app_settings()
+        self.save_dir_vars = {
+            "linearity": tk.StringVar(value=app_settings.section("linearity").get(
+                "save_dir", "linearity_data")),
+            "dc_char": tk.StringVar(value=app_settings.section("dc_char").get(
+                "save_dir", "dc_char_data")),
+        }
+
+        # 起動時に生成するタブ (最初に表示する通信設定と、他タブ・計測から参照される Pattern Test)
         self.comm_tab = CommunicationTab(content, self.gpib_3458a, self.gpib_3499b, self.serial_manager,
                                           datagen_manager=self.datagen_manager, datagen_manager2=self.datagen_manager2)
         self.test_tab = TestTab(content, self.serial_manager)
-        self.graph_tab = GraphTab(content, self.gpib_3458a)
-        self.dac_tab = DACTab(content, self.gpib_3499b, self.serial_manager)
-        self.datagen_tab = DataGenTab(content, self.datagen_manager, self.datagen_manager2)
-        self.dmm3458a_tab = DMM3458ATab(content, self.gpib_3458a)
-        self.scanner_tab = ScannerTab(content, self.gpib_3499b)
-        self.linearity_tab = LinearityTab(content, self.gpib_3458a, self.gpib_3499b,
-                                           self.datagen_manager, self.test_tab)
-        self.dc_char_tab = DCCharTab(content, self.gpib_3458a, self.gpib_3499b,
-                                      self.datagen_manager, self.serial_manager, self.test_tab)
-        # FileTab は Linearity/DC特性 の save_dir を共有するため最後に生成
-        self.file_tab = FileTab(content,
-                                linearity_tab=self.linearity_tab,
-                                dc_char_tab=self.dc_char_tab,
-                                test_tab=self.test_tab)
-
-        # TestタブにDACタブのDEF選択状態を共有
-        self.test_tab.set_def_vars(self.dac_tab.def_vars)
+        self.test_tab.set_def_vars(self.def_vars)
 
         # タブのスタイル設定（色分け・パディング）
         self._setup_tab_styles()
 
-        # 1段目: メイン機能タブ
+        # 1段目: メイン機能タブ (通信設定・Pattern Test 以外は初回選択時に生成)
+        lazy = self._lazy_tabs = {}
         self.notebook.add(self.comm_tab, text="  通信設定  ", row=1)
-        self.notebook.add(self.file_tab, text="  ファイル保存  ", row=1)
+        lazy["file"] = self.notebook.add_lazy(self._create_file_tab, text="  ファイル保存  ", row=1)
         # Pattern Test + グラフ描画をグループ枠で囲む
         test_group = self.notebook.create_group(row=1, label="温特&パターン")
         self.notebook.add(self.test_tab, text="  Pattern Test  ", row=1, group=test_group)
-        self.notebook.add(self.graph_tab, text="  グラフ描画  ", row=1, group=test_group)
-        self.notebook.add(self.linearity_tab, text="  Linearity  ", row=1)
-        self.notebook.add(self.dc_char_tab, text="  DC特性  ", row=1)
+        lazy["graph"] = self.notebook.add_lazy(self._create_graph_tab, text="  グラフ描画  ",
+                                               row=1, group=test_group)
+        lazy["linearity"] = self.notebook.add_lazy(self._create_linearity_tab, text="  Linearity  ", row=1)
+        lazy["dc_char"] = self.notebook.add_lazy(self._create_dc_char_tab, text="  DC特性  ", row=1)
 
         # 2段目: 機器操作タブ
-        self.notebook.add(self.dac_tab, text="  DEF操作  ", row=2)
-        self.notebook.add(self.datagen_tab, text="  DataGen  ", row=2)
-        self.notebook.add(self.dmm3458a_tab, text="  DMM3458A  ", row=2)
-        self.notebook.add(self.scanner_tab, text="  スキャナー  ", row=2)
+        lazy["dac"] = self.notebook.add_lazy(self._create_dac_tab, text="  DEF操作  ", row=2)
+        lazy["datagen"] = self.notebook.add_lazy(self._create_datagen_tab, text="  DataGen  ", row=2)
+        lazy["dmm3458a"] = self.notebook.add_lazy(self._create_dmm3458a_tab, text="  DMM3458A  ", row=2)
+        lazy["scanner"] = self.notebook.add_lazy(self._create_scanner_tab, text="  スキャナー  ", row=2)
 
         # ステータスバーの作成
         self.create_statusbar()
-    
+
+        # メトリクス公開 (TestTab の状態は scrape 時に取得)
+        metrics.register_gauge_callback(
+            "ontoku_pattern_index", "Pattern Test の実行中パターン番号 (停止中は -1)",
+            self.test_tab.get_current_pattern_index)
+        metrics.register_gauge_callback(
+            "ontoku_pattern_remaining_seconds", "実行中パターンの残り秒数",
+            self.test_tab.get_pattern_remaining_seconds)
+        if self._load_metrics_config().get('enabled', False):
+            self.metrics_enabled_var.set(True)
+            self._on_metrics_toggle()
+
+        # 初回表示の計測と、表示後の事前インポート
+        self.after_idle(self._on_first_paint)
+
+    # ==================== 遅延生成タブ ====================
+    # 各タブのモジュールは生成時にインポート (matplotlib / openpyxl / numpy を起動時に読まない)
+    def _create_file_tab(self, parent):
+        from tabs.file_tab import FileTab
+        return FileTab(parent,
+                       linearity_tab=self._lazy_tabs["linearity"],
+                       dc_char_tab=self._lazy_tabs["dc_char"],
+                       test_tab=self.test_tab,
+                       save_dir_vars=self.save_dir_vars)
+
+    def _create_graph_tab(self, parent):
+        from tabs.graph_tab import GraphTab
+        return GraphTab(parent, self.gpib_3458a)
+
+    def _create_linearity_tab(self, parent):
+        from tabs.linearity_tab import LinearityTab
+        return LinearityTab(parent, self.gpib_3458a, self.gpib_3499b,
+                            self.datagen_manager, self.test_tab,
+                            save_dir_var=self.save_dir_vars["linearity"])
+
+    def _create_dc_char_tab(self, parent):
+        from tabs.dc_char_tab import DCCharTab
+        return DCCharTab(parent, self.gpib_3458a, self.gpib_3499b,
+                         self.datagen_manager, self.serial_manager, self.test_tab,
+                         save_dir_var=self.save_dir_vars["dc_char"])
+
+    def _create_dac_tab(self, parent):
+        from tabs.dac_tab import DACTab
+        return DACTab(parent, self.gpib_3499b, self.serial_manager, def_vars=self.def_vars)
+
+    def _create_datagen_tab(self, parent):
+        from tabs.datagen_tab import DataGenTab
+        return DataGenTab(parent, self.datagen_manager, self.datagen_manager2, self.gpib_3458a)
+
+    def _create_dmm3458a_tab(self, parent):
+        from tabs.dmm3458a_tab import DMM3458ATab
+        return DMM3458ATab(parent, self.gpib_3458a)
+
+    def _create_scanner_tab(self, parent):
+        from tabs.scanner_tab import ScannerTab
+        return ScannerTab(parent, self.gpib_3499b)
+
+    # ==================== 起動時間 ====================
+    def _on_first_paint(self):
+        """初回表示完了時の処理 (起動時間の記録・事前インポート開始)"""
+        self.update_idletasks()
+        now = time.perf_counter()
+        self.startup_times = {
+            "imports_ms": round((self._init_start - _T0) * 1000, 1),
+            "init_ms": round((now - self._init_start) * 1000, 1),
+            "first_paint_ms": round((now - _T0) * 1000, 1),
+            "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in sys.modules],
+        }
+        tracer.complete("startup.first_paint", "startup", _T0, now - _T0)
+        metrics.STARTUP_SECONDS.set(now - _T0)
+
+        if self._startup_bench:
+            print(json.dumps(self.startup_times), flush=True)
+            self.destroy()
+            return
+        prewarm.start()
+
     def _setup_tab_styles(self):
         """タブのスタイルを設定（色分け・パディング）"""
         style = ttk.Style()
@@ -224,6 +317,20 @@ class MainApplication(tk.Tk):
         connect_menu.add_command(label="機器検索", command=self.search_devices)
         connect_menu.add_separator()
         connect_menu.add_command(label="全機器接続解除", command=self.disconnect_device)
+
+        # ツールメニュー (トレース計測)
+        tool_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="ツール", menu=tool_menu)
+        self.trace_enabled_var = tk.BooleanVar(value=tracer.is_enabled())
+        tool_menu.add_checkbutton(label="トレース記録", variable=self.trace_enabled_var,
+                                  command=self._on_trace_toggle)
+        tool_menu.add_command(label="トレース出力 (Chrome JSON)...", command=self._export_trace)
+        tool_menu.add_command(label="レイテンシ集計を表示", command=self._show_latency_summary)
+        tool_menu.add_command(label="トレースクリア", command=tracer.clear)
+        tool_menu.add_separator()
+        self.metrics_enabled_var = tk.BooleanVar(value=False)
+        tool_menu.add_checkbutton(label="メトリクス公開 (localhost)", variable=self.metrics_enabled_var,
+                                  command=self._on_metrics_toggle)
         
         # ヘルプメニュー
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -309,6 +416,68 @@ class MainApplication(tk.Tk):
         
         self.update_connection_status()
     
+    def _on_trace_toggle(self):
+        """トレース記録のON/OFF切替"""
+        if self.trace_enabled_var.get():
+            tracer.enable()
+            self.update_status(f"トレース記録開始 (最大 {tracer.capacity()} イベント)")
+        else:
+            tracer.disable()
+            self.update_status(f"トレース記録停止 ({tracer.event_count()} イベント)")
+
+    def _export_trace(self):
+        """記録済みトレースを Chrome trace JSON で保存"""
+        if tracer.event_count() == 0:
+            messagebox.showinfo("トレース出力", "トレースイベントがありません")
+            return
+        path = filedialog.asksaveasfilename(
+            title="トレース出力",
+            defaultextension=".json",
+            initialfile=f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json",
+            filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")])
+        if not path:
+            return
+        success, message = tracer.export_chrome_trace(path)
+        self.update_status(message)
+        if not success:
+            messagebox.showerror("トレース出力", message)
+
+    def _show_latency_summary(self):
+        """操作別レイテンシ集計をウィンドウ表示"""
+        win = tk.Toplevel(self)
+        win.title("レイテンシ集計")
+        win.geometry("900x400")
+        text = ScrolledText(win, font=("Consolas", 9), wrap="none")
+        text.pack(fill=tk.BOTH, expand=True)
+        text.insert(tk.END, tracer.format_latency_summary())
+        text.config(state=tk.DISABLED)
+
+    def _load_metrics_config(self):
+        """app_settings.json の metrics 設定を読み込み"""
+        return settings_store.app_settings().section('metrics')
+
+    def _save_metrics_config(self, enabled):
+        """metrics 設定を app_settings.json に保存"""
+        try:
+            store = settings_store.app_settings()
+            port = store.section('metrics').get('port', metrics.DEFAULT_PORT)
+            store.update('metrics', enabled=enabled, port=port)
+        except Exception as e:
+            print(f"設定ファイル保存エラー: {e}")
+
+    def _on_metrics_toggle(self):
+        """メトリクス HTTP 公開の ON/OFF 切替"""
+        if self.metrics_enabled_var.get():
+            port = self._load_metrics_config().get('port', metrics.DEFAULT_PORT)
+            success, message = metrics.start_server(port)
+            if not success:
+                self.metrics_enabled_var.set(False)
+        else:
+            metrics.stop_server()
+            message = "メトリクス公開停止"
+        self._save_metrics_config(self.metrics_enabled_var.get())
+        self.update_status(message)
+
     def show_about(self):
         """バージョン情報を表示"""
         show_about_dialog(self)
@@ -328,11 +497,22 @@ class MainApplication(tk.Tk):
             self.datagen_manager.disconnect()
         if self.datagen_manager2.is_connected():
             self.datagen_manager2.disconnect()
-        # Matplotlibのグラフウィンドウを全て閉じる
-        import matplotlib.pyplot as plt
-        plt.close('all')
+        # メトリクス公開を停止
+        metrics.stop_server()
+        # 未保存の設定を書き込み
+        settings_store.flush_all()
+        # 出力パイプラインを停止 (使用した場合のみ、書き込み中の XLSX/PNG は完了を待つ)
+        pipeline = sys.modules.get('utils.export_pipeline')
+        if pipeline is not None:
+            pipeline.shutdown_shared(wait=True)
+        # Matplotlibのグラフウィンドウを全て閉じる (読み込み済みの場合のみ)
+        plt = sys.modules.get('matplotlib.pyplot')
+        if plt is not None:
+            plt.close('all')
         self.destroy()
 
 if __name__ == "__main__":
-    app = MainApplication()
+    # PyInstaller 版でプロセスプール (グラフ描画) の子プロセスを起動するため
+    multiprocessing.freeze_support()
+    app = MainApplication(startup_bench="--startup-bench" in sys.argv)
     app.mainloop()
\ No newline at end of file
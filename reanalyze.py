@@ -0,0 +1,494 @@
+"""計測結果の一括再解析・レポート再生成 (GUI 不要)
+
+Linearity・DC特性の生データサイドカー (.npz) と温特の計測 CSV をフォルダ単位で読み込み、
+GUI と同じ解析・出力コード (utils.linearity_records / linearity_xlsx / linearity_charts /
+dc_char_report / temp_coef / graph_plotter) で判定し直して XLSX・PNG を再生成し、
+全ファイルの OK/NG 一覧を表示する。規格変更後に過去の計測を再判定する用途。
+
+- ファイルごとの処理は multiprocessing のプールで並列実行 (既定はコア数)
+- 入力ファイルの内容と解析パラメータが前回と同じファイルはスキップ
+  (出力先の .reanalysis_cache.json にハッシュと判定結果を記録。--force で全件再実行)
+- Tk は読み込まない
+
+入力:
+    *.npz   LinearityTab / DCCharTab が保存する生データサイドカー
+            (Linearity は同じ計測の POS/NEG を1つの XLSX に統合)
+    *.csv   温特の計測 CSV (列: Timestamp, Code, DataSet, {S/N}_POS, {S/N}_NEG)
+            区間平均 → 温度係数を判定 (GraphTab の「区間平均・温度係数」と同じ計算)
+
+判定基準は省略時、Linearity は計測時の値 (サイドカーの thresholds / criteria)、
+DC特性は現在の dc_char_definitions、温度係数は 1.9 ppm/℃。
+
+使い方:
+    python reanalyze.py D:/data/linearity D:/data/dc_char
+    python reanalyze.py results/ --th-error 0.8 --inl 1.0 --dnl 0.9 -j 8
+    python reanalyze.py results/ temp.csv --spec 2.0 --out reanalysis --no-png --force
+
+終了コード: 0 = 全件 OK、1 = NG あり、2 = 処理エラーあり
+"""
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import unicodedata
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+CACHE_FILE = '.reanalysis_cache.json'
+POLES = ('POS', 'NEG')
+
+# 種類ごとに結果・出力に影響するパラメータ (キャッシュのハッシュに含める)
+PARAM_KEYS = {
+    'linearity': ('xlsx', 'png', 'th_gain', 'th_offset', 'th_error', 'inl', 'dnl',
+                  'stream', 'values_only'),
+    'dc_char': ('xlsx', 'png'),
+    'temp_coef': ('xlsx', 'png', 'spec', 'bits', 'pos_full', 'neg_full',
+                  'skip_after_change', 'skip_first_data', 'skip_before_change'),
+}
+# 入力ファイル以外で判定に影響するファイル (DC特性の期待値・許容誤差)
+DEPENDENCIES = {
+    'dc_char': (os.path.join(HERE, 'dc_char_definitions.py'),),
+}
+
+
+def _software_version():
+    try:
+        from version import __version__
+        return __version__
+    except ImportError:
+        return None
+
+
+# ==================== 入力の収集 ====================
+def _walk(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def collect_jobs(paths, out_dir):
+    """入力パスからジョブ [(kind, key, inputs), ...] を作成
+
+    Linearity のサイドカーは計測ごと (POS/NEG の組) に1ジョブ。出力先のファイルは除く。
+    """
+    from utils import raw_sidecar
+
+    out_dir = os.path.abspath(out_dir)
+    linearity_groups = {}
+    jobs = []
+    for path in _walk(paths):
+        path = os.path.abspath(path)
+        if path.startswith(out_dir + os.sep):
+            continue
+        name = os.path.basename(path)
+        if name.endswith(raw_sidecar.SUFFIX):
+            try:
+                meta = raw_sidecar.load_meta(path)
+            except (OSError, ValueError) as e:
+                print(f"[スキップ] {path}: {e}")
+                continue
+            if meta.get('kind') == 'linearity':
+                stem = name[:-len(raw_sidecar.SUFFIX)]
+                pole = meta.get('pole')
+                if pole in POLES and stem.endswith('_' + pole):
+                    stem = stem[:-len(pole) - 1]
+                key = os.path.join(os.path.dirname(path), stem)
+                linearity_groups.setdefault(key, {})[pole] = path
+            elif meta.get('kind') == 'dc_char':
+                jobs.append(('dc_char', path, [path]))
+        elif name.lower().endswith('.csv') and _is_measurement_csv(path):
+            jobs.append(('temp_coef', path, [path]))
+
+    for key, poles in linearity_groups.items():
+        jobs.append(('linearity', key, [poles[p] for p in POLES if p in poles]))
+    return sorted(jobs, key=lambda job: job[1])
+
+
+def _is_measurement_csv(path):
+    """温特の計測 CSV (Code 列と {S/N}_POS / {S/N}_NEG 列がある) か"""
+    try:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            headers = next(csv.reader(f), [])
+    except (OSError, UnicodeDecodeError):
+        return False
+    return 'Code' in headers and any(h.endswith(('_POS', '_NEG')) for h in headers)
+
+
+# ==================== キャッシュ ====================
+def content_hash(inputs, params):
+    """入力ファイルの内容・解析パラメータ・ソフトウェアバージョンのハッシュ"""
+    h = hashlib.sha256()
+    h.update(json.dumps([params, _software_version()], sort_keys=True,
+                        ensure_ascii=False).encode('utf-8'))
+    for path in inputs:
+        h.update(os.path.basename(path).encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def load_cache(out_dir):
+    try:
+        with open(os.path.join(out_dir, CACHE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(out_dir, cache):
+    path = os.path.join(out_dir, CACHE_FILE)
+    part = path + '.part'
+    with open(part, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1)
+    os.replace(part, path)
+
+
+# ==================== 解析 (ワーカープロセス) ====================
+def _row(source, serial, target, judge, detail):
+    return {'source': source, 'serial': serial, 'target': target, 'judge': judge,
+            'detail': detail}
+
+
+def _linearity_pole(meta, arrays, filepath, params):
+    """Linearity 1極分: 判定と XLSX レコード・グラフ PNG のデータ (LinearityTab と同じ処理)
+
+    Returns:
+        (row, writer, record, kind, chart_data)
+    """
+    from utils import linearity_records
+
+    serial, dac, pole, bits = meta['serial_no'], meta['dac'], meta['pole'], meta['bits']
+    source = f"{dac} {pole}"
+    x_vals = arrays['codes'].tolist()
+    y_vals = arrays['volts'].tolist()
+    if len(x_vals) < 2:
+        return _row(None, serial, source, '-', "計測点不足"), None, None, None, None
+
+    if meta['mode'] == 'Ship':
+        criteria = dict(meta['criteria'])
+        criteria.update({k: params[k] for k in ('inl', 'dnl') if params.get(k) is not None})
+        x_vals, y_vals, summary = linearity_records.ship_analysis(
+            x_vals, y_vals, bits, dac, criteria)
+        table_png = (linearity_records.ship_table_png_path(filepath, pole)
+                     if params['png'] else None)
+        record = linearity_records.ship_record(
+            y_vals, dac, pole, serial, bits, filepath,
+            linearity_records.template_path(dac), table_png)
+        detail = (f"INL {summary['inl_min']:+.4f}~{summary['inl_max']:+.4f} / "
+                  f"DNL {summary['dnl_min']:+.4f}~{summary['dnl_max']:+.4f} LSB "
+                  f"(基準 \u00b1{criteria['inl']}/\u00b1{criteria['dnl']})")
+        chart_data = {'ship_results': summary['ship_results'], 'bits': bits, 'pole': pole,
+                      'serial_no': serial, 'dac_name': dac}
+        return (_row(None, serial, source, summary['judge'], detail),
+                'write_ship', record, 'ship', chart_data)
+
+    thresholds = dict(meta['thresholds'])
+    thresholds.update({k: params['th_' + k] for k in ('gain', 'offset', 'error')
+                       if params.get('th_' + k) is not None})
+    mode = linearity_records.mode_name(meta['mode'])
+    if dac == 'LBC':
+        writer = 'write_lbc_random'
+        record, results = linearity_records.lbc_random_record(
+            x_vals, y_vals, pole, serial, bits, meta['span'], filepath, thresholds, mode,
+            linearity_records.template_path('lbc_random'),
+            pattern_file=meta.get('pattern_file'), pattern_params=meta.get('pattern_params'),
+            stream=params['stream'], values_only=params['values_only'])
+    else:
+        writer = 'write_linear'
+        record, results = linearity_records.linear_record(
+            x_vals, y_vals, dac, pole, serial, bits, meta['span'], filepath, thresholds, mode,
+            linearity_records.template_path('linear'),
+            pattern_file=meta.get('pattern_file'), pattern_params=meta.get('pattern_params'),
+            stream=params['stream'])
+    detail = (f"Gain={results['gain']:.6f} Offset={results['offset']:.3f} LSB "
+              f"MaxErr={results['max_error']:.3f} LSB")
+    if results['ng_detail']:
+        detail += f" ({', '.join(results['ng_detail'])})"
+    return (_row(None, serial, source, results['judge'], detail),
+            writer, record, 'linear', {'results': results, 'dac_name': dac})
+
+
+def analyze_linearity(key, inputs, params, out_dir):
+    """Linearity 1計測分 (POS/NEG) を再解析して XLSX・PNG を再生成"""
+    from utils import linearity_charts, linearity_records, linearity_xlsx, raw_sidecar, xlsx_merge
+
+    base = os.path.join(out_dir, os.path.basename(key))
+    rows, outputs, written = [], [], {}
+    is_ship = False
+    for path in inputs:
+        meta, arrays = raw_sidecar.load(path)
+        pole = meta['pole']
+        is_ship = meta['mode'] == 'Ship'
+        # POS と統合する NEG は一時ファイル (GUI と同じ)
+        filepath = base + ('_tmp.xlsx' if pole == 'NEG' and 'POS' in written else '.xlsx')
+        row, writer, record, kind, chart_data = _linearity_pole(meta, arrays, filepath, params)
+        row['source'] = os.path.basename(path)
+        rows.append(row)
+        if writer is None:
+            continue
+        if params['xlsx'] and record is not None:
+            result = getattr(linearity_xlsx, writer)(record)
+            written[pole] = result['xlsx']
+            if result.get('table_png'):
+                outputs.append(result['table_png'])
+        if params['png']:
+            payload = linearity_records.chart_payload(kind, chart_data)
+            if payload is not None:
+                outputs.append(linearity_charts.render_png(
+                    kind, payload, linearity_records.chart_png_path(filepath, pole)))
+
+    if len(written) == 2:
+        # Ship は NEG の1枚目 (表) のみ、それ以外は NEG の全シートを POS へ
+        xlsx_merge.merge_pos_neg(written['POS'], written['NEG'], [0] if is_ship else None)
+        outputs.append(written['POS'])
+    else:
+        outputs += list(written.values())
+    return rows, outputs
+
+
+def analyze_dc_char(key, inputs, params, out_dir):
+    """DC特性1回分を現在の dc_char_definitions で再判定して表 XLSX・PNG を再生成"""
+    from utils import dc_char_report, raw_sidecar
+
+    path = inputs[0]
+    meta, arrays = raw_sidecar.load(path)
+    sheet_key = meta['sheet_key']
+    slots_data = [(sn, dc_char_report.rejudge(sheet_key, rows))
+                  for sn, rows in raw_sidecar.dc_char_slots(meta, arrays)]
+
+    rows = []
+    for serial, data in slots_data:
+        judges = [r.get('judge') for r in data if r.get('judge')]
+        ng = sum(1 for j in judges if j != 'OK')
+        rows.append(_row(os.path.basename(path), serial,
+                         f"DC特性 {dc_char_report.SHEET_TITLES.get(sheet_key, sheet_key)}",
+                         'NG' if ng else ('OK' if judges else '-'),
+                         f"NG {ng}/{len(judges)}点"))
+
+    outputs = []
+    if params['xlsx'] or params['png']:
+        base = os.path.join(out_dir, os.path.basename(path)[:-len(raw_sidecar.SUFFIX)])
+        result = dc_char_report.export_tables(
+            sheet_key, slots_data, base + '.xlsx', base + '.png' if params['png'] else None)
+        outputs.append(result['xlsx'])
+        if result['png']:
+            outputs.append(result['png'])
+    return rows, outputs
+
+
+def analyze_temp_coef(key, inputs, params, out_dir):
+    """温特 CSV の区間平均から温度係数を判定して温度係数表 XLSX・PNG を再生成"""
+    from utils import temp_coef
+    from utils.graph_plotter import LSBGraphPlotter
+
+    path = inputs[0]
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        csv_data = list(reader)
+        headers = reader.fieldnames or []
+
+    # GraphTab._show_section_averages と同じ設定
+    plotter = LSBGraphPlotter(params['bits'], params['pos_full'], params['neg_full'], 2,
+                              "first_avg", "auto", None, None, params['skip_after_change'],
+                              params['skip_first_data'], params['skip_before_change'])
+    serial_data = {}
+    for header in headers:
+        if not header.endswith(('_POS', '_NEG')):
+            continue
+        serial, pole = header.rsplit('_', 1)
+        serial_data.setdefault(serial, {'POS': None, 'NEG': None})[pole] = \
+            plotter.extract_section_averages(csv_data, serial, pole, header, last_minutes=10)
+
+    spec = params['spec']
+    rows = []
+    for serial, poles in serial_data.items():
+        for pole in POLES:
+            if poles[pole] is None:
+                continue
+            result = temp_coef.summary(poles[pole], spec)
+            detail = (f"最大 {result['tc_worst']:+.2f} ppm/℃ (スペック \u00b1{spec})"
+                      if result['tc_worst'] is not None else "温度係数を計算できる区間なし")
+            rows.append(_row(os.path.basename(path), serial, f"温度係数 {pole}",
+                             result['judge'] or '-', detail))
+
+    outputs = []
+    if serial_data and (params['xlsx'] or params['png']):
+        from openpyxl import Workbook
+
+        base = os.path.join(out_dir, f"{os.path.splitext(os.path.basename(path))[0]}_温度係数")
+        wb = Workbook()
+        wb.remove(wb.active)
+        ranges = {}
+        for serial in sorted(serial_data):
+            ws = wb.create_sheet(title=serial)
+            last_row, _ = temp_coef.write_sheet(
+                ws, serial_data[serial]['POS'], serial_data[serial]['NEG'], serial, spec)
+            ranges[serial] = (ws, f"A1:I{last_row}")
+        if params['xlsx']:
+            wb.save(base + '.xlsx')
+            outputs.append(base + '.xlsx')
+        if params['png']:
+            from utils import sheet_raster
+            for serial, (ws, cell_range) in ranges.items():
+                outputs.append(sheet_raster.render_range_png(
+                    ws, f"{base}_{serial}.png", cell_range))
+        wb.close()
+    return rows, outputs
+
+
+ANALYZERS = {
+    'linearity': analyze_linearity,
+    'dc_char': analyze_dc_char,
+    'temp_coef': analyze_temp_coef,
+}
+
+
+def run_job(job):
+    """1ジョブを実行 (プールのワーカー)
+
+    入力と解析パラメータのハッシュがキャッシュと同じで出力が揃っていれば解析しない。
+    Returns:
+        (key, cache エントリ {"hash", "rows", "outputs"}, キャッシュから返したか, 経過時間, エラー)
+    """
+    kind, key, inputs, params, out_dir, cached = job
+    start = time.perf_counter()
+    try:
+        digest = content_hash(list(inputs) + list(DEPENDENCIES.get(kind, ())),
+                              {k: params[k] for k in PARAM_KEYS[kind]})
+        if (cached and cached.get('hash') == digest
+                and all(os.path.exists(p) for p in cached.get('outputs', []))):
+            return key, cached, True, time.perf_counter() - start, None
+        rows, outputs = ANALYZERS[kind](key, inputs, params, out_dir)
+        entry = {'hash': digest, 'rows': rows, 'outputs': outputs}
+        return key, entry, False, time.perf_counter() - start, None
+    except Exception as e:
+        import traceback
+        rows = [_row(os.path.basename(inputs[0]), '', kind, 'ERROR', f"{type(e).__name__}: {e}")]
+        return (key, {'hash': None, 'rows': rows, 'outputs': []}, False,
+                time.perf_counter() - start, traceback.format_exc())
+
+
+# ==================== 一覧表示 ====================
+def _width(text):
+    return sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+
+
+def _pad(text, width):
+    return text + ' ' * max(width - _width(text), 0)
+
+
+def print_table(rows):
+    headers = ('判定', 'S/N', '対象', '詳細', '入力')
+    table = [(r['judge'], r['serial'], r['target'], r['detail'],
+              r['source'] + (' (前回結果)' if r.get('cached') else '')) for r in rows]
+    widths = [max([_width(h)] + [_width(str(t[i])) for t in table])
+              for i, h in enumerate(headers)]
+    print('  '.join(_pad(h, w) for h, w in zip(headers, widths)))
+    print('  '.join('-' * w for w in widths))
+    for t in table:
+        print('  '.join(_pad(str(v), w) for v, w in zip(t, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="計測結果の一括再解析・レポート再生成")
+    parser.add_argument("inputs", nargs="+", help="フォルダ・.npz・.csv")
+    parser.add_argument("--out", default="reanalysis", help="出力先フォルダ")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="並列プロセス数 (既定: コア数)")
+    parser.add_argument("--th-gain", type=float, help="Linearity Gain の NG 閾値")
+    parser.add_argument("--th-offset", type=float, help="Linearity Offset の NG 閾値 (LSB)")
+    parser.add_argument("--th-error", type=float, help="Linearity 誤差の NG 閾値 (LSB)")
+    parser.add_argument("--inl", type=float, help="出荷Sequence の INL 基準 (LSB、全 DAC 共通)")
+    parser.add_argument("--dnl", type=float, help="出荷Sequence の DNL 基準 (LSB、全 DAC 共通)")
+    parser.add_argument("--spec", type=float, help="温度係数のスペック (ppm/℃、既定 1.9)")
+    parser.add_argument("--bits", type=int, help="温特 CSV の bit 精度 (既定: graph_settings.json)")
+    parser.add_argument("--no-xlsx", action="store_true", help="XLSX を出力しない")
+    parser.add_argument("--no-png", action="store_true", help="PNG を出力しない")
+    parser.add_argument("--force", action="store_true", help="キャッシュを使わず全件再解析")
+    args = parser.parse_args()
+
+    from utils import settings_store, temp_coef
+
+    xlsx_cfg = settings_store.app_settings().section('xlsx_export')
+    graph_cfg = settings_store.graph_settings().data()
+    params = {
+        'xlsx': not args.no_xlsx,
+        'png': not args.no_png,
+        # Linearity (省略時は計測時の閾値・基準)
+        'th_gain': args.th_gain, 'th_offset': args.th_offset, 'th_error': args.th_error,
+        'inl': args.inl, 'dnl': args.dnl,
+        'stream': xlsx_cfg.get('stream'),
+        'values_only': bool(xlsx_cfg.get('values_only', False)),
+        # 温特 CSV (GraphTab の設定)
+        'spec': temp_coef.DEFAULT_SPEC if args.spec is None else args.spec,
+        'bits': args.bits or int(graph_cfg.get('bit_precision', '24')),
+        'pos_full': float(graph_cfg.get('pos_full_voltage', '10.0')),
+        'neg_full': float(graph_cfg.get('neg_full_voltage', '-10.0')),
+        'skip_after_change': int(graph_cfg.get('skip_after_change', '0')),
+        'skip_first_data': bool(graph_cfg.get('skip_first_data', False)),
+        'skip_before_change': bool(graph_cfg.get('skip_before_change', False)),
+    }
+
+    out_dir = os.path.abspath(args.out)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = collect_jobs(args.inputs, out_dir)
+    if not jobs:
+        print("再解析する入力ファイルがありません")
+        return 0
+
+    cache = {} if args.force else load_cache(out_dir)
+    tasks = [(kind, key, inputs, params, out_dir, cache.get(key)) for kind, key, inputs in jobs]
+    processes = max(1, min(args.jobs, len(tasks)))
+    print(f"{len(tasks)}件を再解析 ({processes}プロセス) → {out_dir}")
+
+    start = time.perf_counter()
+    results = {}
+    if processes == 1:
+        completed = map(run_job, tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        completed = pool.imap_unordered(run_job, tasks)
+    try:
+        for key, entry, from_cache, elapsed, error in completed:
+            results[key] = (entry, from_cache)
+            state = "前回結果" if from_cache else ("エラー" if error else f"{elapsed:.2f}s")
+            print(f"  [{len(results)}/{len(tasks)}] {os.path.basename(key)}: {state}")
+            if error:
+                print(error)
+    finally:
+        if processes > 1:
+            pool.close()
+            pool.join()
+
+    new_cache = dict(cache)
+    new_cache.update({key: entry for key, (entry, _) in results.items() if entry['hash']})
+    save_cache(out_dir, new_cache)
+
+    rows = []
+    for _, key, _ in jobs:
+        entry, from_cache = results[key]
+        rows += [dict(r, cached=from_cache) for r in entry['rows']]
+    print()
+    print_table(rows)
+
+    judges = [r['judge'] for r in rows]
+    skipped = sum(1 for _, from_cache in results.values() if from_cache)
+    print(f"\nOK {judges.count('OK')} / NG {judges.count('NG')} / エラー {judges.count('ERROR')}"
+          f" (前回結果 {skipped}件、{time.perf_counter() - start:.1f}s)")
+    if 'ERROR' in judges:
+        return 2
+    return 1 if 'NG' in judges else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,8 @@ import serial
 import threading
 import time
 
+from utils import metrics, tracer
+
 class SerialManager:
     def __init__(self, baudrate=38400, timeout=1):
         self.baudrate = baudrate
@@ -33,7 +35,9 @@ class SerialManager:
         """バイナリで送信（例：b'test\r'）"""
         with self.lock:
             if self.is_connected():
-                self.ser.write(data)
+                with metrics.op_timer(self.ser.port, "write"), \
+                        tracer.span("serial.write", "serial", port=self.ser.port, nbytes=len(data)):
+                    self.ser.write(data)
 
     def write_line(self, text, end="\r"):
         """文字列で送信し、終端記号付き（デフォルト: CR）"""
@@ -43,10 +47,14 @@ class SerialManager:
         """改行までのレスポンスを受信（strで返す）"""
         with self.lock:
             if self.is_connected():
-                try:
-                    return self.ser.readline().decode("utf-8", errors="ignore").strip()
-                except Exception:
-                    return ""
+                with metrics.op_timer(self.ser.port, "read_line") as mt, \
+                        tracer.span("serial.read_line", "serial", port=self.ser.port) as sp:
+                    try:
+                        return self.ser.readline().decode("utf-8", errors="ignore").strip()
+                    except Exception as e:
+                        mt.fail()
+                        sp.set(error=str(e))
+                        return ""
             return ""
 
     def read_all(self):
@@ -81,14 +89,18 @@ class SerialManager:
         """コマンド送信（終端CR付き、バッファクリア後に送信）"""
         with self.lock:
             if self.is_connected():
-                try:
-                    self.ser.reset_input_buffer()
-                    self.ser.write((cmd + '\r').encode('utf-8'))
-                    self.ser.flush()
-                    return True
-                except Exception as e:
-                    print(f"[ERROR] send_command() failed: {e}")
-                    return False
+                with metrics.op_timer(self.ser.port, "send_command") as mt, \
+                        tracer.span("serial.send_command", "serial", port=self.ser.port, cmd=cmd) as sp:
+                    try:
+                        self.ser.reset_input_buffer()
+                        self.ser.write((cmd + '\r').encode('utf-8'))
+                        self.ser.flush()
+                        return True
+                    except Exception as e:
+                        mt.fail()
+                        sp.set(error=str(e))
+                        print(f"[ERROR] send_command() failed: {e}")
+                        return False
             return False
 
     def send_command_with_response(self, cmd, wait_sec=0.001, read_timeout=0.015, prompt=">"):
@@ -96,29 +108,34 @@ class SerialManager:
         with self.lock:
             if not self.is_connected():
                 return None
-            try:
-                self.ser.reset_input_buffer()
-                self.ser.write((cmd + '\r').encode('utf-8'))
-                self.ser.flush()
-                time.sleep(wait_sec)
+            with metrics.op_timer(self.ser.port, "send_command_with_response") as mt, \
+                    tracer.span("serial.send_command_with_response", "serial",
+                                port=self.ser.port, cmd=cmd) as sp:
+                try:
+                    self.ser.reset_input_buffer()
+                    self.ser.write((cmd + '\r').encode('utf-8'))
+                    self.ser.flush()
+                    time.sleep(wait_sec)
 
-                old_timeout = self.ser.timeout
-                self.ser.timeout = read_timeout
-                response_lines = []
-                while True:
-                    line = self.ser.readline().decode('utf-8', errors='ignore').strip()
-                    if not line:
-                        break
-                    if prompt and line == prompt:
-                        break
-                    response_lines.append(line)
-                self.ser.timeout = old_timeout
+                    old_timeout = self.ser.timeout
+                    self.ser.timeout = read_timeout
+                    response_lines = []
+                    while True:
+                        line = self.ser.readline().decode('utf-8', errors='ignore').strip()
+                        if not line:
+                            break
+                        if prompt and line == prompt:
+                            break
+                        response_lines.append(line)
+                    self.ser.timeout = old_timeout
 
-                result = '\n'.join(response_lines) if response_lines else ""
-                if prompt:
-                    result = result.rstrip(prompt).rstrip('\r')
-                result = result.replace('\r', '\n')
-                return result
-            except Exception as e:
-                print(f"[ERROR] send_command_with_response() failed: {e}")
-                return None
\ No newline at end of file
+                    result = '\n'.join(response_lines) if response_lines else ""
+                    if prompt:
+                        result = result.rstrip(prompt).rstrip('\r')
+                    result = result.replace('\r', '\n')
+                    return result
+                except Exception as e:
+                    mt.fail()
+                    sp.set(error=str(e))
+                    print(f"[ERROR] send_command_with_response() failed: {e}")
+                    return None
\ No newline at end of file
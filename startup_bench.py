@@ -0,0 +1,83 @@
+"""起動時間ベンチマークスクリプト
+
+main.py を --startup-bench 付きで複数回起動し、初回表示までの時間を集計する。
+あわせて python -X importtime で main のインポート時間を計測し、
+トップレベルパッケージごとの内訳 (累積時間の大きい順) を表示する。
+
+使い方:
+    python startup_bench.py            # 5回起動
+    python startup_bench.py -n 10 --top 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_first_paint(runs):
+    """main.py --startup-bench を runs 回実行して結果 (dict) のリストを返す"""
+    results = []
+    for i in range(runs):
+        proc = subprocess.run(
+            [sys.executable, os.path.join(HERE, "main.py"), "--startup-bench"],
+            cwd=HERE, capture_output=True, text=True, encoding="utf-8")
+        line = next((l for l in reversed(proc.stdout.splitlines()) if l.startswith("{")), None)
+        if proc.returncode != 0 or line is None:
+            print(f"起動失敗 (run {i + 1}): {proc.stderr.strip()[-500:]}")
+            continue
+        results.append(json.loads(line))
+    return results
+
+
+def import_breakdown(top):
+    """python -X importtime -c "import main" の結果をトップレベルパッケージ別に集計
+
+    Returns:
+        [(パッケージ名, 累積時間 [ms]), ...] (大きい順に top 件)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=HERE, capture_output=True, text=True, encoding="utf-8")
+    totals = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, self_us, _cumulative, name = [p.strip() for p in
+                                             line.replace("import time:", "|", 1).split("|")]
+            package = name.strip().split(".")[0]
+            totals[package] = totals.get(package, 0) + int(self_us)
+        except ValueError:
+            continue
+    ranked = sorted(totals.items(), key=lambda kv: -kv[1])[:top]
+    return [(name, us / 1000.0) for name, us in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="起動時間ベンチマーク")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="起動回数")
+    parser.add_argument("--top", type=int, default=15, help="インポート内訳の表示件数")
+    args = parser.parse_args()
+
+    results = run_first_paint(args.runs)
+    if results:
+        print(f"初回表示まで ({len(results)} 回)")
+        for key in ("imports_ms", "init_ms", "first_paint_ms"):
+            values = [r[key] for r in results]
+            print(f"  {key:<16} median {statistics.median(values):8.1f} ms"
+                  f"  min {min(values):8.1f}  max {max(values):8.1f}")
+        loaded = sorted({m for r in results for m in r.get("heavy_modules_loaded", [])})
+        print(f"  起動時に読み込まれた重いモジュール: {', '.join(loaded) or 'なし'}")
+
+    print("\nインポート時間の内訳 (import main、パッケージ別 self 時間の合計)")
+    for name, ms in import_breakdown(args.top):
+        print(f"  {name:<28}{ms:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
-from .communication_tab import CommunicationTab
-from .test_tab import TestTab
-from .graph_tab import GraphTab
-from .dac_tab import DACTab
-from .file_tab import FileTab
-from .dmm3458a_tab import DMM3458ATab
+# 各タブは初回参照時にインポート (matplotlib / openpyxl などの読み込みを起動時に行わない)
+_TAB_MODULES = {
+    'CommunicationTab': '.communication_tab',
+    'TestTab': '.test_tab',
+    'GraphTab': '.graph_tab',
+    'DACTab': '.dac_tab',
+    'FileTab': '.file_tab',
+    'DMM3458ATab': '.dmm3458a_tab',
+}
 
 __all__ = [
     'CommunicationTab',
@@ -12,4 +15,11 @@ __all__ = [
     'DACTab',
     'FileTab',
     'DMM3458ATab'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    if name in _TAB_MODULES:
+        import importlib
+        return getattr(importlib.import_module(_TAB_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
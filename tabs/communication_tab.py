@@ -2,8 +2,7 @@ import tkinter as tk
 from tkinter import ttk
 import serial.tools.list_ports
 from utils import LoggerWidget, validate_integer
-import json
-import os
+from utils import settings_store
 
 class CommunicationTab(ttk.Frame):
     def __init__(self, parent, gpib_3458a, gpib_3499b, serial_manager,
@@ -15,8 +14,8 @@ class CommunicationTab(ttk.Frame):
         self.datagen_mgr = datagen_manager      # DataGen1用
         self.datagen_mgr2 = datagen_manager2    # DataGen2用
         
-        # 汎用設定ファイルのパス
-        self.config_file = "app_settings.json"
+        # 汎用設定 (app_settings.json)
+        self._settings = settings_store.app_settings()
         
         self.create_widgets()
         
@@ -235,46 +234,32 @@ class CommunicationTab(ttk.Frame):
         self.rescan_ports()
     
     def save_config(self):
-        """接続設定を保存(既存の設定を保持しながら更新)"""
-        # 既存の設定ファイルを読み込む
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except:
-                config = {}
-        else:
-            config = {}
-        
-        # GPIB設定セクションを更新
-        config["gpib"] = {
-            "3458a_resource": self.resource_3458a_entry.get().strip(),
-            "3499b_resource": self.resource_3499b_entry.get().strip()
-        }
-
-        # シリアルポート設定を更新
-        config["serial_ports"] = {
-            "def_port": self.port_var.get(),
-            "dg1_port": self.dg1_port_var.get(),
-            "dg2_port": self.dg2_port_var.get()
-        }
-        
+        """接続設定を保存(他の設定は保持、ファイル書き込みは設定ストアが遅延実行)"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            # GPIB設定セクションを更新
+            self._settings.set("gpib", {
+                "3458a_resource": self.resource_3458a_entry.get().strip(),
+                "3499b_resource": self.resource_3499b_entry.get().strip()
+            })
+
+            # シリアルポート設定を更新
+            self._settings.set("serial_ports", {
+                "def_port": self.port_var.get(),
+                "dg1_port": self.dg1_port_var.get(),
+                "dg2_port": self.dg2_port_var.get()
+            })
             self.logger.log("接続設定を保存しました", "SUCCESS")
         except Exception as e:
             self.logger.log(f"設定保存失敗: {str(e)}", "ERROR")
     
     def load_config(self):
         """接続設定を読み込み"""
-        if not os.path.exists(self.config_file):
+        config = self._settings.data()
+        if not config:
             self.logger.log("設定ファイルが見つかりません(初回起動)", "INFO")
             return
         
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
             
             # GPIB設定セクションから読み込み
             if "gpib" in config:
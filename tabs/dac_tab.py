@@ -1,11 +1,11 @@
 import tkinter as tk
 import time
 import threading
-import queue
 from tkinter import ttk
-from tkinter.scrolledtext import ScrolledText
 from tkinter import messagebox
 
+from utils.log_console import LogBuffer, LogConsole
+
 # DACプリセット値
 DAC_PRESETS = {
     "full":   {"P": "FFFFF", "L": "FFFF"},
@@ -15,14 +15,16 @@ DAC_PRESETS = {
 
 
 class DACTab(ttk.Frame):
-    def __init__(self, parent, gpib_controller, serial_manager):
+    def __init__(self, parent, gpib_controller, serial_manager, def_vars=None):
         super().__init__(parent)
         self.gpib = gpib_controller
         self.serial_mgr = serial_manager  # DEFシリアル用SerialManager
         self.show_response = True  # レスポンス表示ON/OFF
+        # DEF選択状態 (Pattern Test と共有するためアプリ側から渡される。既定はDEF0のみON)
+        self.def_vars = def_vars or [tk.BooleanVar(value=(i == 0)) for i in range(6)]
 
-        # 常駐リーダー用
-        self._text_queue = queue.Queue()
+        # 常駐リーダー用 (レスポンス表示ログ: 容量固定、どのスレッドからでも追記可)
+        self._response_log = LogBuffer(capacity=5000, name="def_console")
         self._reader_running = False
         self._need_recv_header = False
 
@@ -38,7 +40,6 @@ class DACTab(ttk.Frame):
         # 常駐リーダースレッド起動
         self._reader_running = True
         threading.Thread(target=self._reader_loop, daemon=True).start()
-        self._poll_text_queue()
 
     def create_widgets(self):
         # メインコンテナ
@@ -80,7 +81,6 @@ class DACTab(ttk.Frame):
         def_box = ttk.LabelFrame(col1_frame, text="DEF選択", padding=8)
         def_box.pack(anchor="w", pady=(0, 8), fill="x")
 
-        self.def_vars = [tk.BooleanVar(value=(i == 0)) for i in range(6)]  # 既定はDEF0のみON
         for i in range(6):
             r, c = divmod(i, 2)
             ttk.Checkbutton(def_box, text=f"DEF{i}", variable=self.def_vars[i]).grid(
@@ -177,8 +177,9 @@ class DACTab(ttk.Frame):
         ttk.Label(col3_frame, text="レスポンス表示(DEFシリアル)").pack(anchor="w", pady=(0, 4))
 
         # テキストエリア
-        self.response_area = ScrolledText(
-            col3_frame, height=32, width=40, font=("Consolas", 10), wrap="none"
+        self.response_area = LogConsole(
+            col3_frame, buffer=self._response_log,
+            height=32, width=40, font=("Consolas", 10), wrap="none"
         )
         self.response_area.pack(fill="both", expand=True, pady=(0, 6))
 
@@ -255,13 +256,13 @@ class DACTab(ttk.Frame):
                 # 応答完了検出用の時刻をリセット
                 self._last_prompt_time = 0.0
                 self._prompt_event.clear()
-                self._text_queue.put(f"[SEND] {cmd}")
+                self._response_log.append(f"[SEND] {cmd}")
                 try:
                     self._need_recv_header = True
                     self.serial_mgr.flush_input()
                     self.serial_mgr.write(raw)
                 except Exception as e:
-                    self._text_queue.put(f"[ERROR] write failed: {e}")
+                    self._response_log.append(f"[ERROR] write failed: {e}")
                     continue
                 # 応答完了 (プロンプト後 idle_sec 秒無音) を待つ
                 self._wait_for_prompt_idle(
@@ -371,9 +372,9 @@ class DACTab(ttk.Frame):
                     if line_buffer.strip():
                         if self.show_response:
                             if self._need_recv_header:
-                                self._text_queue.put("[RECV]")
+                                self._response_log.append("[RECV]")
                                 self._need_recv_header = False
-                            self._text_queue.put(line_buffer)
+                            self._response_log.append(line_buffer)
                         self._last_data_time = time.time()
                     line_buffer = ""
                     skip_space = False
@@ -423,26 +424,11 @@ class DACTab(ttk.Frame):
                         return ""
         return ""
 
-    def _poll_text_queue(self):
-        """メインスレッドでキューからテキストを表示"""
-        try:
-            for _ in range(200):
-                message = self._text_queue.get_nowait()
-                self.response_area.insert(tk.END, message + "\n")
-                self.response_area.see(tk.END)
-        except queue.Empty:
-            pass
-        self.after(16, self._poll_text_queue)
-
     # ---------- ユーティリティ ----------
     def _append_text(self, message: str):
-        """スレッドセーフにレスポンスエリアへテキスト挿入"""
-        if threading.current_thread() is threading.main_thread():
-            self.response_area.insert(tk.END, message + "\n")
-            self.response_area.see(tk.END)
-        else:
-            self._text_queue.put(message)
+        """スレッドセーフにレスポンスエリアへテキスト追加 (描画は次フレーム)"""
+        self._response_log.append(message)
 
     def _clear_response(self):
         """レスポンス表示をクリア"""
-        self.response_area.delete(1.0, tk.END)
+        self.response_area.clear()
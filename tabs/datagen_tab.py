@@ -1,12 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from tkinter.scrolledtext import ScrolledText
 import time
 import re
 import threading
-import queue
 from utils.config_handler import load_config, update_config_value
 from utils.browse_helpers import pick_file
+from utils.log_console import LogBuffer, LogConsole
+from utils import tracer
 
 
 class DataGenTab(ttk.Frame):
@@ -15,7 +15,7 @@ class DataGenTab(ttk.Frame):
     内部でDataGen1/DataGen2を切り替え可能
     """
 
-    def __init__(self, parent, datagen_manager, datagen_manager2=None):
+    def __init__(self, parent, datagen_manager, datagen_manager2=None, gpib_3458a=None):
         super().__init__(parent)
         self.datagen1 = datagen_manager
         self.datagen2 = datagen_manager2
@@ -28,9 +28,12 @@ class DataGenTab(ttk.Frame):
         self._glitch_thread = None
         self._glitch_running = False
         self._glitch_paused = False
+        self.gpib_3458a = gpib_3458a  # グリッチ波形の取得用 (なければ取得しない)
 
         # 常駐リーダー用
-        self._text_queue = queue.Queue()
+        # レスポンス表示用ログ (DataGenごと、容量固定。どのスレッドからでも追記可)
+        self.response_logs = {1: LogBuffer(capacity=5000, name="datagen1"),
+                              2: LogBuffer(capacity=5000, name="datagen2")}
         self._reader_running = False
         self._reader_enabled = True        # Falseでリーダー一時停止
         self._need_recv_header = False     # 送信後、最初の受信行前に[RECV]挿入
@@ -254,6 +257,11 @@ class DataGenTab(ttk.Frame):
         self.btn_glitch_pause.grid(row=0, column=0, padx=0)
         self.btn_glitch_resume.grid(row=0, column=1, padx=0)
         self.btn_glitch_stop.grid(row=0, column=2, padx=(2, 0))
+        self.var_glitch_capture = tk.BooleanVar(value=False)
+        self.chk_glitch_capture = ttk.Checkbutton(glitch_btn_frame, text="3458Aで波形取得",
+                                                  variable=self.var_glitch_capture)
+        self.chk_glitch_capture.grid(row=0, column=3, padx=(8, 0))
+        if self.gpib_3458a is None: self.chk_glitch_capture.config(state="disabled")
 
         # ボタン行
         btn_frame = ttk.Frame(pattern_frame)
@@ -618,9 +626,9 @@ class DataGenTab(ttk.Frame):
         tk.Frame(bc, bg=border_color, width=4).grid(row=1, column=2, sticky="ns")
         tk.Frame(bc, bg=border_color, height=4).grid(row=2, column=0, columnspan=3, sticky="ew")
         inner = ttk.Frame(bc); inner.grid(row=1, column=1, sticky="nsew", padx=5, pady=5)
-        response_area = ScrolledText(inner, font=("Consolas", 10), wrap="none"); response_area.pack(fill="both", expand=True)
+        response_area = LogConsole(inner, buffer=self.response_logs[dg], font=("Consolas", 10), wrap="none"); response_area.pack(fill="both", expand=True)
         bf = ttk.Frame(inner); bf.pack(fill="x", pady=(5, 0))
-        ttk.Button(bf, text="クリア", command=lambda ra=response_area: ra.delete(1.0, tk.END)).pack(side="right")
+        ttk.Button(bf, text="クリア", command=response_area.clear).pack(side="right")
         self.response_windows[dg] = win; self.response_areas[dg] = response_area
         def on_close(d=dg):
             self.response_windows[d] = None; self.response_areas[d] = None; win.destroy()
@@ -631,7 +639,6 @@ class DataGenTab(ttk.Frame):
         if self._reader_running: return
         self._reader_running = True
         self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True); self._reader_thread.start()
-        self._poll_text_queue()
 
     def _stop_reader(self):
         self._reader_running = False
@@ -670,20 +677,7 @@ class DataGenTab(ttk.Frame):
         return ""
 
     def _append_text(self, message):
-        if threading.current_thread() is threading.main_thread():
-            ra = self.response_areas.get(self.current_dg)
-            if ra: ra.insert(tk.END, message.rstrip() + "\n"); ra.see(tk.END)
-        else:
-            self._text_queue.put(message)
-
-    def _poll_text_queue(self):
-        try:
-            for _ in range(200):
-                msg = self._text_queue.get_nowait()
-                ra = self.response_areas.get(self.current_dg)
-                if ra: ra.insert(tk.END, msg.rstrip() + "\n"); ra.see(tk.END)
-        except queue.Empty: pass
-        self.after(16, self._poll_text_queue)
+        self.response_logs[self.current_dg].append(message.rstrip())
 
     def _sync_command(self, cmd, wait_sec=0.05, read_timeout=0.05):
         self._reader_enabled = False; time.sleep(0.02)
@@ -695,12 +689,9 @@ class DataGenTab(ttk.Frame):
 
     # ========== ログ ==========
     def _append_log(self, text):
-        if threading.current_thread() is threading.main_thread():
-            ra = self.response_areas.get(self.current_dg)
-            if ra: ra.insert(tk.END, text.rstrip() + "\n"); ra.see(tk.END)
-        else:
-            self._text_queue.put(text)
+        self.response_logs[self.current_dg].append(text.rstrip())
 
+    @tracer.traced("datagen.send", "datagen")
     def _send_and_log(self, cmd, sleep_sec=0.05, add_blank=False):
         if add_blank: self._append_log("")
         self._append_log(f"SEND: {cmd}")
@@ -710,6 +701,7 @@ class DataGenTab(ttk.Frame):
         else:
             self.datagen.write(f"{cmd}\r".encode("utf-8")); time.sleep(sleep_sec)
 
+    @tracer.traced("datagen.send", "datagen")
     def _send_and_log_thread(self, cmd, sleep_sec=0.05):
         show_recv = self.var_show_recv.get()
         if show_recv:
@@ -1090,6 +1082,15 @@ class DataGenTab(ttk.Frame):
 
     def _glitch_worker(self, direction, polarity, interval_sec):
         glitch_patterns = self._get_glitch_patterns()
+        capture = self._glitch_capture_begin() if self.var_glitch_capture.get() else None
+        try:
+            self._glitch_loop(glitch_patterns, direction, polarity, interval_sec, capture)
+        finally:
+            if capture: self._glitch_capture_end(capture, direction, polarity)
+        self._glitch_phase = "idle"; self._glitch_running = False; self._glitch_paused = False
+        self.var_glitch_status.set("GLITCH 完了"); self._update_glitch_buttons_async(); self._append_log("[GLITCH] 完了")
+
+    def _glitch_loop(self, glitch_patterns, direction, polarity, interval_sec, capture):
         for idx in range(len(glitch_patterns)):
             if not self._glitch_running: break
             self._glitch_index = idx; self._glitch_remaining = interval_sec; self._glitch_phase = "sending"
@@ -1104,6 +1105,7 @@ class DataGenTab(ttk.Frame):
             except Exception as e:
                 self._append_log(f"[GLITCH][ERROR] {e}"); self._glitch_running = False; break
             if not self._glitch_running: break
+            if capture: self._glitch_capture_step(capture, idx)
             self._glitch_phase = "countdown"; self._refresh_glitch_status(); self._update_glitch_buttons_async()
             elapsed, step = 0.0, 0.1
             while self._glitch_running and elapsed < interval_sec:
@@ -1112,8 +1114,65 @@ class DataGenTab(ttk.Frame):
                 if not self._glitch_running: break
                 time.sleep(step); elapsed += step
                 self._glitch_remaining = max(0.0, interval_sec - elapsed); self._refresh_glitch_status()
-        self._glitch_phase = "idle"; self._glitch_running = False; self._glitch_paused = False
-        self.var_glitch_status.set("GLITCH 完了"); self._update_glitch_buttons_async(); self._append_log("[GLITCH] 完了")
+
+    # ========== グリッチ波形取得 (3458A) ==========
+    def _glitch_capture_begin(self):
+        """3458A を高速サンプリングに設定 (取得しないときは None)"""
+        gpib = self.gpib_3458a
+        if gpib is None or not gpib.connected:
+            self._append_log("[GLITCH][CAPTURE] 3458A未接続のため波形取得なし"); return None
+        from utils import glitch_capture, noise_analysis, settings_store  # numpy は使うときに読み込み
+        settings = settings_store.app_settings().section("glitch_capture")
+        cfg = glitch_capture.config_from(settings)
+        state = glitch_capture.save_state(gpib)
+        success, iscale = glitch_capture.configure(gpib, cfg)
+        if not success:
+            self._append_log(f"[GLITCH][CAPTURE][ERROR] {iscale}"); glitch_capture.restore(gpib, state); return None
+        self._append_log(f"[GLITCH][CAPTURE] {cfg['nrdgs']}点 × {cfg['interval'] * 1e6:.0f}µs ({cfg['format']})")
+        return {"cfg": cfg, "iscale": iscale, "state": state, "steps": [],
+                "lsb": noise_analysis.lsb_voltage_from_settings(),
+                "save_dir": settings.get("save_dir", "glitch_capture")}
+
+    def _glitch_capture_step(self, capture, idx):
+        from utils import glitch_capture
+        cfg = capture["cfg"]
+        success, result = glitch_capture.capture(self.gpib_3458a, cfg, capture["iscale"])
+        if not success:
+            self._append_log(f"[GLITCH][CAPTURE][ERROR] {idx+1}/{self._glitch_total}: {result}"); return
+        times, volts = result
+        transitions = glitch_capture.analyze(times, volts, capture["lsb"], cfg['settle_band_lsb'],
+                                             cfg['threshold_sigma'], cfg['merge_samples'])
+        capture["steps"].append({"label": f"{idx+1}/{self._glitch_total}", "times": times,
+                                 "volts": volts, "transitions": transitions})
+        sm = glitch_capture.summarize(transitions)
+        if not sm['count']:
+            self._append_log(f"[GLITCH][CAPTURE] {idx+1}/{self._glitch_total}: 遷移なし"); return
+        settling = f"{sm['settling_us']:.1f}µs" if sm['settling_us'] is not None else "未整定"
+        self._append_log(f"[GLITCH][CAPTURE] {idx+1}/{self._glitch_total}: 遷移{sm['count']} "
+                         f"ピーク{sm['peak_lsb']:+.1f}LSB 面積{sm['area_nvs']:+.3g}nV·s 整定{settling}")
+
+    def _glitch_capture_end(self, capture, direction, polarity):
+        """3458A を元の設定に戻し、取得波形をサイドカーに保存して結果ウィンドウを開く"""
+        import os
+        from datetime import datetime
+        from utils import glitch_capture
+        success, message = glitch_capture.restore(self.gpib_3458a, capture["state"])
+        if not success: self._append_log(f"[GLITCH][CAPTURE][ERROR] 3458A復帰失敗: {message}")
+        if not capture["steps"]: return
+        path = os.path.join(capture["save_dir"],
+                            f"glitch_{direction}_{polarity}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.npz")
+        try:
+            os.makedirs(capture["save_dir"], exist_ok=True)
+            glitch_capture.save_sidecar(path, capture["steps"], {
+                "cfg": capture["cfg"], "lsb": capture["lsb"], "direction": direction, "polarity": polarity})
+            self._append_log(f"[GLITCH][CAPTURE] 保存: {path}")
+        except Exception as e:
+            self._append_log(f"[GLITCH][CAPTURE][ERROR] 保存失敗: {e}"); path = None
+        self.after(0, self._open_glitch_window, capture["steps"], capture["lsb"], path)
+
+    def _open_glitch_window(self, steps, lsb, path):
+        from tabs.glitch_window import GlitchWindow
+        GlitchWindow(self, steps, lsb, path)
 
     def _get_glitch_patterns(self):
         return [
@@ -1,29 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
-import queue
 import time
 import os
-import json
 import copy
 from datetime import datetime
 
-import openpyxl
-from openpyxl.styles import Font, Border, Side, Alignment, PatternFill
 from dc_char_definitions import (
     POSITION_TEST_POINTS, POSITION_DISPLAY_ORDER,
     LBC_TEST_POINTS,
     MONI_TEST_POINTS, MONI_DISPLAY_ORDER,
 )
 from utils.browse_helpers import pick_directory
+from utils.log_console import LogConsole
+from utils import (dc_char_report, dmm_average, dmm_profiles, metrics, raw_sidecar, scanner_driver,
+                   settings_store, tracer, ui_bus)
+from utils.dc_char_report import export_tables
 
 
 class DCCharTab(ttk.Frame):
     """DC特性タブ: POSTION/LBC/moni の自動計測・XLSX保存・PNG出力"""
 
     SETTINGS_KEY = "dc_char"
+    SHEET_TITLES = dc_char_report.SHEET_TITLES
+    TABLE_RANGES = dc_char_report.TABLE_RANGES
 
-    def __init__(self, parent, gpib_3458a, gpib_3499b, datagen_manager, serial_manager, test_tab):
+    def __init__(self, parent, gpib_3458a, gpib_3499b, datagen_manager, serial_manager, test_tab,
+                 save_dir_var=None):
+        """save_dir_var: ファイル保存タブと共有する保存先 StringVar (None なら自前で作成)"""
         super().__init__(parent)
         self.gpib_dmm = gpib_3458a
         self.gpib_scanner = gpib_3499b
@@ -31,18 +35,28 @@ class DCCharTab(ttk.Frame):
         self.serial_mgr = serial_manager  # DEFシリアル通信（CAL用）
         self.test_tab = test_tab
         self.scanner_slot = "1"
+        self._settings = settings_store.app_settings()
 
         # Threading
         self.is_running = False
         self._stop_event = threading.Event()
         self._worker_thread = None
-        self._update_queue = queue.Queue()
+        # ワーカー→UI 更新 (進捗は最新値のみ、ログ・行は一括で反映)
+        self._ui = ui_bus.channel(
+            self,
+            states={'progress': self._on_progress},
+            appends={'log': self._on_logs, 'row': self._on_rows},
+            events={'done': self._on_done, 'error': self._on_error})
 
         # Settings
-        self.save_dir = tk.StringVar(value='dc_char_data')
+        self.save_dir = save_dir_var or tk.StringVar(value='dc_char_data')
         self.settle_time_var = tk.DoubleVar(value=0.3)
         self.switch_delay_sec = tk.DoubleVar(value=1.0)  # Pattern Testと共有
         self.test_type = tk.StringVar(value='Position')  # Position / LBC / moni
+        # DMM取得プロファイル (ベンチごとに保存、従来設定 = NPLC 10)
+        self.dmm_profile = tk.StringVar(value=dmm_profiles.label_of(dmm_profiles.selected('dc_char')))
+        self._dmm_profile_name = None   # 計測中のプロファイル (サイドカー記録用)
+        self._dmm_nplc = 10             # 計測中の NPLC (読み取り待ちの上限・サイドカー記録用)
 
         # Results
         self._results = {}  # {def_index: {'position': [...], 'lbc': [...], 'moni': [...]}}
@@ -53,39 +67,40 @@ class DCCharTab(ttk.Frame):
         # Auto-save settings on change
         for var in [self.save_dir, self.settle_time_var]:
             var.trace_add("write", lambda *_: self._save_settings())
+        self.dmm_profile.trace_add(
+            "write", lambda *_: dmm_profiles.select('dc_char', dmm_profiles.name_of(self.dmm_profile.get())))
+        # スキャナ切替時間は計測ウィンドウでの変更に追従
+        self._settings.subscribe("measurement_window", self._on_measurement_window_settings)
 
     # ==================== Settings ====================
     def _load_settings(self):
         try:
-            with open('app_settings.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            s = config.get(self.SETTINGS_KEY, {})
+            s = self._settings.section(self.SETTINGS_KEY)
             if 'save_dir' in s:
                 self.save_dir.set(s['save_dir'])
             if 'settle_time' in s:
                 self.settle_time_var.set(s['settle_time'])
             # スキャナ切替時間はPattern Testと共有（measurement_window.switch_delay_sec）
-            sw = config.get("measurement_window", {}).get("switch_delay_sec", 1.0)
+            sw = self._settings.section("measurement_window").get("switch_delay_sec", 1.0)
             self.switch_delay_sec.set(max(0.4, sw))
         except Exception:
             pass
 
     def _save_settings(self):
         try:
-            try:
-                with open('app_settings.json', 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except Exception:
-                config = {}
-            config[self.SETTINGS_KEY] = {
+            self._settings.set(self.SETTINGS_KEY, {
                 'save_dir': self.save_dir.get(),
                 'settle_time': self.settle_time_var.get(),
-            }
-            with open('app_settings.json', 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
+            })
         except Exception:
             pass
 
+    def _on_measurement_window_settings(self, _key, section):
+        """計測ウィンドウの設定変更通知 (変更元スレッドから呼ばれるため UI バス経由で反映)"""
+        sw = (section or {}).get("switch_delay_sec")
+        if sw is not None:
+            ui_bus.get_bus(self).post(self, self.switch_delay_sec.set, max(0.4, sw))
+
     # ==================== UI ====================
     def _create_widgets(self):
         # 左右分割
@@ -125,6 +140,12 @@ class DCCharTab(ttk.Frame):
                   font=("Arial", 9, "bold")).pack(side="left", padx=(5, 2))
         ttk.Label(row2, text="sec (Pattern Test共有)").pack(side="left")
 
+        row3 = ttk.Frame(settings_frame)
+        row3.pack(fill="x", pady=2)
+        ttk.Label(row3, text="DMMプロファイル:").pack(side="left")
+        ttk.Combobox(row3, textvariable=self.dmm_profile, state="readonly", width=10,
+                     values=dmm_profiles.labels()).pack(side="left", padx=(5, 2))
+
         # DEF選択 & スキャナCH (test_tabの変数を共有)
         def_frame = ttk.LabelFrame(left, text="DEF選択 & スキャナCH", padding=5)
         def_frame.pack(fill="x", padx=5, pady=2)
@@ -144,7 +165,6 @@ class DCCharTab(ttk.Frame):
                              values=ch_values, width=5, state="readonly").pack(side="left", padx=2)
 
         # ログ表示（DEF/DataGen操作ログ）
-        from tkinter.scrolledtext import ScrolledText
         log_header = ttk.Frame(left)
         log_header.pack(fill="x", padx=5, pady=(2, 0))
         ttk.Label(log_header, text="操作ログ").pack(side="left")
@@ -152,10 +172,9 @@ class DCCharTab(ttk.Frame):
                    command=self._clear_log).pack(side="right")
         log_frame = ttk.Frame(left, padding=3)
         log_frame.pack(fill="both", expand=True, padx=5, pady=(0, 2))
-        self.log_area = ScrolledText(log_frame, font=("Consolas", 8), wrap="none",
-                                      height=8, width=38)
+        self.log_area = LogConsole(log_frame, capacity=5000, font=("Consolas", 8), wrap="none",
+                                   height=8, width=38)
         self.log_area.pack(fill="both", expand=True)
-        self.log_area.config(state="disabled")
 
         # === 右パネル ===
         # 実行制御（右上に配置、保存先パスを広く表示）
@@ -228,16 +247,11 @@ class DCCharTab(ttk.Frame):
             self.save_dir.set(d)
 
     def _clear_log(self):
-        self.log_area.config(state="normal")
-        self.log_area.delete("1.0", "end")
-        self.log_area.config(state="disabled")
+        self.log_area.clear()
 
     def _append_log(self, text):
-        """操作ログにテキスト追加"""
-        self.log_area.config(state="normal")
-        self.log_area.insert("end", text.rstrip() + "\n")
-        self.log_area.see("end")
-        self.log_area.config(state="disabled")
+        """操作ログにテキスト追加（描画は次フレームでまとめて反映）"""
+        self.log_area.log(text.rstrip())
 
     # ==================== 計測制御 ====================
     def _start_measurement(self):
@@ -269,42 +283,40 @@ class DCCharTab(ttk.Frame):
             target=self._measurement_worker, args=(selected,), daemon=True
         )
         self._worker_thread.start()
-        self._poll_updates()
 
     def _stop_measurement(self):
         self._stop_event.set()
 
-    def _poll_updates(self):
-        try:
-            for _ in range(50):
-                msg_type, data = self._update_queue.get_nowait()
-                if msg_type == 'progress':
-                    self.var_progress_label.set(data)
-                elif msg_type == 'log':
-                    self._append_log(data)
-                elif msg_type == 'row':
-                    tag = 'ok' if data[-1] == 'OK' else 'ng'
-                    self.tree.insert('', 'end', values=data, tags=(tag,))
-                    self.tree.see(self.tree.get_children()[-1])
-                elif msg_type == 'done':
-                    self.var_progress_label.set("完了")
-                    self.is_running = False
-                    self.btn_start.config(state="normal")
-                    self.btn_stop.config(state="disabled")
-                    if data:
-                        messagebox.showinfo("完了", data)
-                    return
-                elif msg_type == 'error':
-                    self.var_progress_label.set("エラー")
-                    self.is_running = False
-                    self.btn_start.config(state="normal")
-                    self.btn_stop.config(state="disabled")
-                    messagebox.showerror("エラー", str(data))
-                    return
-        except queue.Empty:
-            pass
-        if self.is_running:
-            self.after(100, self._poll_updates)
+    # ==================== UI 更新 (UI バスから呼ばれる) ====================
+    def _on_progress(self, text):
+        self.var_progress_label.set(text)
+
+    def _on_logs(self, items):
+        for text in items:
+            self._append_log(text)
+
+    def _on_rows(self, rows):
+        for row in rows:
+            tag = 'ok' if row[-1] == 'OK' else 'ng'
+            self.tree.insert('', 'end', values=row, tags=(tag,))
+        self.tree.see(self.tree.get_children()[-1])
+
+    def _on_done(self, message):
+        self.var_progress_label.set("完了")
+        self._end_running()
+        if message:
+            # ダイアログ表示中も UI バスの他の更新を止めないよう別イベントで表示
+            self.after_idle(lambda: messagebox.showinfo("完了", message))
+
+    def _on_error(self, error):
+        self.var_progress_label.set("エラー")
+        self._end_running()
+        self.after_idle(lambda: messagebox.showerror("エラー", str(error)))
+
+    def _end_running(self):
+        self.is_running = False
+        self.btn_start.config(state="normal")
+        self.btn_stop.config(state="disabled")
 
     # ==================== DEF選択 ====================
     def _get_selected_defs(self):
@@ -326,62 +338,51 @@ class DCCharTab(ttk.Frame):
 
     def _get_serial_number(self, def_index):
         try:
-            with open('app_settings.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            sn = config.get('comm_profiles', {}).get('1', {}).get('serial_numbers', {})
+            sn = self._settings.section('comm_profiles').get('1', {}).get('serial_numbers', {})
             return sn.get(f'DEF{def_index}_sn', f'DEF{def_index}')
         except Exception:
             return f'DEF{def_index}'
 
     # ==================== ハードウェア操作 ====================
+    def _scanner(self):
+        """スキャナーのリレー状態を持つドライバー (Pattern Test・Linearity と共有)"""
+        return scanner_driver.get_driver(self.gpib_scanner, self.scanner_slot)
+
     def _scanner_cpon(self):
         """スキャナー全チャンネルOPEN (cpon)"""
-        orig_timeout = self.gpib_scanner.instrument.timeout
-        self.gpib_scanner.instrument.timeout = 5000
-        try:
-            self.gpib_scanner.write(f":system:cpon {self.scanner_slot}")
-        finally:
-            self.gpib_scanner.instrument.timeout = orig_timeout
+        success, message = self._scanner().reset()
+        if not success:
+            self._ui.put(('log', f"[警告] Scanner cpon: {message}"))
 
     def _switch_scanner(self, channel_addr, switch_delay):
-        """スキャナCH切替（Pattern Testと同じcpon方式）
-        cpon → sleep(delay/2) → *OPC? → CLOSE → sleep(delay/2)
+        """スキャナCH切替（前のCHを OPEN → 対象CHを CLOSE の差分切り替え、エラー時は cpon方式）
+        リレー安定待ち delay/2 は CLOSE 送信からの最小時間として確保 (完了待ちと重ねる)
         """
-        orig_timeout = self.gpib_scanner.instrument.timeout
-        self.gpib_scanner.instrument.timeout = 5000
-        try:
-            self._update_queue.put(('log', f"[Scanner] cpon → CLOSE ({channel_addr})"))
-            self.gpib_scanner.write(f":system:cpon {self.scanner_slot}")
-            time.sleep(switch_delay / 2)
-            import warnings
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                self.gpib_scanner.query("*OPC?")
-            self.gpib_scanner.write(f"CLOSE ({channel_addr})")
-            time.sleep(switch_delay / 2)
-        finally:
-            self.gpib_scanner.instrument.timeout = orig_timeout
+        success, info = self._scanner().switch(channel_addr, settle=switch_delay / 2)
+        opened = ",".join(info['open']) or "なし"
+        self._ui.put(('log', f"[Scanner] {info['mode']}: OPEN {opened} → CLOSE ({channel_addr})"))
+        for line in info['detail']:
+            self._ui.put(('log', f"[Scanner] {line}" if success else f"[警告] Scanner {line}"))
 
     def _measure_voltage(self):
-        orig_timeout = self.gpib_dmm.instrument.timeout
-        self.gpib_dmm.instrument.timeout = 3000
         try:
-            success, response = self.gpib_dmm.query("TRIG SGL")
+            success, response = self.gpib_dmm.trigger_read(
+                "TRIG SGL", timeout=max(3.0, dmm_average.read_timeout(1, self._dmm_nplc)))
             if success and response:
                 val = float(response.strip())
-                self._update_queue.put(('log', f"[DMM] TRIG SGL → {val}"))
+                metrics.record_reading("dc_char")
+                self._ui.put(('log', f"[DMM] TRIG SGL → {val}"))
                 return val
         except Exception:
             pass
-        finally:
-            self.gpib_dmm.instrument.timeout = orig_timeout
-        self._update_queue.put(('log', "[DMM] TRIG SGL → 計測失敗"))
+        self._ui.put(('log', "[DMM] TRIG SGL → 計測失敗"))
         return None
 
     def _datagen_send(self, cmd):
-        self._update_queue.put(('log', f"[DG] SEND: {cmd}"))
-        self.datagen.send_command(cmd)
-        time.sleep(0.05)
+        self._ui.put(('log', f"[DG] SEND: {cmd}"))
+        with tracer.span("datagen.send", "datagen", cmd=cmd):
+            self.datagen.send_command(cmd)
+            time.sleep(0.05)
 
     def _ch_addr(self, ch_str):
         """CH番号文字列からスキャナアドレスを生成 (例: 'CH01' → '@101')"""
@@ -399,26 +400,38 @@ class DCCharTab(ttk.Frame):
             if self.serial_mgr and self.serial_mgr.is_connected():
                 for def_info in selected_defs:
                     cmd = f"DEF {def_info['index']} remote"
-                    self._update_queue.put(('log', f"[DEF] SEND: {cmd}"))
+                    self._ui.put(('log', f"[DEF] SEND: {cmd}"))
                     response = self.serial_mgr.send_command_with_response(
                         cmd, wait_sec=0.1, read_timeout=0.5
                     )
                     if response:
-                        self._update_queue.put(('log', f"[DEF] RECV: {response}"))
+                        self._ui.put(('log', f"[DEF] RECV: {response}"))
 
             # 初期化
             self._scanner_cpon()
+            # GPIB の完了待ちをサービスリクエスト (SRQ) で行う (使えなければシリアルポール)
+            for gpib in (self.gpib_scanner, self.gpib_dmm):
+                success, message = gpib.enable_events()
+                self._ui.put(('log', f"[{gpib.device_type}] {message}" if success
+                              else f"[警告] {gpib.device_type} {message}"))
             self._datagen_send("gen stop")
             self._datagen_send("func alt")
             self._datagen_send("alt s sa")
 
-            # DMM設定: NPLC 10 + レンジ設定
-            self.gpib_dmm.write("NPLC 10")
-            time.sleep(0.1)
-            if test_type == "Position":
-                self.gpib_dmm.write("DCV 1000")
+            # DMM設定: プロファイル (NPLC・AZERO・ARANGE・DISP) + レンジ、従来設定は NPLC 10 + レンジ
+            # (従来設定でも前回のプロファイルの AZERO OFF 等が残らないよう既定値に戻す)
+            dmm_range = "1000" if test_type == "Position" else "AUTO"
+            self._dmm_profile_name = dmm_profiles.name_of(self.dmm_profile.get())
+            if self._dmm_profile_name:
+                self._dmm_nplc = dmm_profiles.PROFILES[self._dmm_profile_name]['nplc']
+                success, message = dmm_profiles.apply(
+                    self.gpib_dmm, self._dmm_profile_name, "DCV", dmm_range)
+                self._ui.put(('log', f"[DMM] {message}" if success else f"[警告] DMM {message}"))
             else:
-                self.gpib_dmm.write("DCV AUTO")
+                self._dmm_nplc = 10
+                success, message = dmm_profiles.apply_conventional(
+                    self.gpib_dmm, self._dmm_nplc, "DCV", dmm_range)
+                self._ui.put(('log', f"[DMM] {message}" if success else f"[警告] DMM {message}"))
             time.sleep(0.1)
 
             self._datagen_send("gen start")
@@ -452,26 +465,25 @@ class DCCharTab(ttk.Frame):
             if test_type == "LBC" and self.serial_mgr and self.serial_mgr.is_connected():
                 for def_info in selected_defs:
                     latt_cmd = f"DEF {def_info['index']} LATT 2"
-                    self._update_queue.put(('log', f"[DEF] SEND: {latt_cmd}"))
+                    self._ui.put(('log', f"[DEF] SEND: {latt_cmd}"))
                     response = self.serial_mgr.send_command_with_response(
                         latt_cmd, wait_sec=0.1, read_timeout=0.5
                     )
                     if response:
-                        self._update_queue.put(('log', f"[DEF] RECV: {response}"))
+                        self._ui.put(('log', f"[DEF] RECV: {response}"))
 
             if self._stop_event.is_set():
-                self._update_queue.put(('done', "計測を中断しました"))
+                self._ui.put(('done', "計測を中断しました"))
                 return
 
             # 保存（チェックON時のみ）
             if not self.var_save_enabled.get():
-                self._update_queue.put(('done', "計測完了（保存なし）"))
+                self._ui.put(('done', "計測完了（保存なし）"))
                 return
 
             save_dir = self.save_dir.get()
             os.makedirs(save_dir, exist_ok=True)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            saved_files = []
 
             sheet_key = test_type.lower()
             # 選択 DEF を 1 ファイルに集約するため slots_data を先に作る
@@ -498,28 +510,25 @@ class DCCharTab(ttk.Frame):
 
             # テンプレートは 4 枠固定。それ以上は載らないので警告
             if len(slots_data) > 4:
-                self._update_queue.put((
+                self._ui.put((
                     'log',
                     f"[警告] 選択 DEF が {len(slots_data)} 本。"
                     f"テンプレートは 4 枠まで。5 本目以降は記述されません。"))
                 slots_data = slots_data[:4]
 
             if slots_data:
-                # XLSX 1 ファイル
-                xlsx_path = self._save_xlsx_single(
-                    sheet_key, slots_data, save_dir, timestamp)
-                saved_files.append(xlsx_path)
-
-                # PNG 1 ファイル (Excel COM でスクリーンショット)
-                png_path = self._generate_table_png(
-                    sheet_key, slots_data, save_dir, timestamp)
-                saved_files.append(png_path)
-
-            msg = "保存完了:\n" + "\n".join(saved_files)
-            self._update_queue.put(('done', msg))
+                self._save_sidecar(sheet_key, slots_data, save_dir, timestamp, settle, switch_delay)
+                # XLSX + PNG 1 ファイルずつ (出力パイプラインで保存、完了時にダイアログ表示)
+                self._ui.put(('done', None))
+                self._submit_table_export(sheet_key, slots_data, save_dir, timestamp)
+            else:
+                self._ui.put(('done', "計測完了（保存対象なし）"))
 
         except Exception as e:
-            self._update_queue.put(('error', str(e)))
+            self._ui.put(('error', str(e)))
+        finally:
+            for gpib in (self.gpib_scanner, self.gpib_dmm):
+                gpib.disable_events()
 
     def _run_position_test(self, def_info, settle, switch_delay):
         """POSTION計測"""
@@ -529,11 +538,11 @@ class DCCharTab(ttk.Frame):
         for pi, tp in enumerate(POSITION_TEST_POINTS):
             if self._stop_event.is_set():
                 break
-            self._update_queue.put(('progress', f"{def_name} / POSTION / {tp.part} {tp.display_code}"))
+            self._ui.put(('progress', f"{def_name} / POSTION / {tp.part} {tp.display_code}"))
 
             pole = "p" if tp.part == "POS" else "n"
             self._datagen_send(f"alt a {tp.address_code} ci {pole}")
-            time.sleep(settle)
+            tracer.sleep(settle, "settle", code=tp.address_code)
 
             if tp.part != current_pole:
                 ch = def_info['pos_channel'] if tp.part == "POS" else def_info['neg_channel']
@@ -553,13 +562,14 @@ class DCCharTab(ttk.Frame):
                 'part': tp.part, 'code': tp.display_code,
                 'voltage': voltage, 'expected_str': tp.expected_str,
                 'error': error, 'error_pct': error_pct, 'judge': judge,
+                'time': time.time(),
             })
 
             v_str = f"{voltage:.3f}" if voltage is not None else "---"
             e_str = f"{error:.3f}" if error is not None else "---"
             is_center = '80000' in tp.display_code
             ep_str = "" if is_center else (f"{error_pct:.3f}" if error_pct is not None else "---")
-            self._update_queue.put(('row', (
+            self._ui.put(('row', (
                 def_name, tp.part, tp.display_code, v_str,
                 tp.expected_str, e_str, ep_str, judge
             )))
@@ -575,7 +585,7 @@ class DCCharTab(ttk.Frame):
           - 全 DEF 完了時の総所要秒
         """
         if not self.serial_mgr or not self.serial_mgr.is_connected():
-            self._update_queue.put(('log', "[CAL] シリアル未接続"))
+            self._ui.put(('log', "[CAL] シリアル未接続"))
             return False
 
         def _now():
@@ -583,7 +593,8 @@ class DCCharTab(ttk.Frame):
             return time.strftime("%H:%M:%S") + f".{ms:03d}"
 
         def _dbg(msg):
-            self._update_queue.put(('log', f"[DBG] cal {_now()} {msg}"))
+            tracer.instant("cal", "def", step=msg)
+            self._ui.put(('log', f"[DBG] cal {_now()} {msg}"))
 
         t_start = time.time()
         _dbg(f"BEGIN _cal_all_defs DEFs={[d['index'] for d in selected_defs]}")
@@ -596,12 +607,12 @@ class DCCharTab(ttk.Frame):
             di = def_info['index']
             r_cmd = f"DEF {di} r"
             _dbg(f"SEND DEF{di}: {r_cmd}")
-            self._update_queue.put(('log', f"[DEF] SEND: {r_cmd}"))
+            self._ui.put(('log', f"[DEF] SEND: {r_cmd}"))
             r_resp = self.serial_mgr.send_command_with_response(
                 r_cmd, wait_sec=0.1, read_timeout=0.5)
             _dbg(f"RECV DEF{di}: {r_resp!r}")
             if r_resp:
-                self._update_queue.put(('log', f"[DEF] RECV: {r_resp}"))
+                self._ui.put(('log', f"[DEF] RECV: {r_resp}"))
 
         # 0. 開始前の sticky 状態を確認
         # CAL 送信前に cal s が complete を返してきたら、装置側に
@@ -623,7 +634,7 @@ class DCCharTab(ttk.Frame):
             di = def_info['index']
             cmd = f"DEF {di} cal"
             _dbg(f"SEND DEF{di}: {cmd}")
-            self._update_queue.put(('log', f"[DEF] SEND: {cmd}"))
+            self._ui.put(('log', f"[DEF] SEND: {cmd}"))
             self.serial_mgr.send_command(cmd)
             time.sleep(0.3)
             pending[di] = time.time()
@@ -654,21 +665,21 @@ class DCCharTab(ttk.Frame):
                     status_cmd, wait_sec=0.1, read_timeout=1.0
                 )
                 _dbg(f"RECV DEF{di}: {response!r}")
-                self._update_queue.put(('log', f"[DEF] SEND: {status_cmd}"))
+                self._ui.put(('log', f"[DEF] SEND: {status_cmd}"))
                 if response:
-                    self._update_queue.put(('log', f"[DEF] RECV: {response}"))
+                    self._ui.put(('log', f"[DEF] RECV: {response}"))
                     resp_lower = response.lower()
                     if "complete" in resp_lower:
                         dt = time.time() - pending[di]
                         _dbg(f"DEF{di} matched 'complete' in {dt:.2f}s")
-                        self._update_queue.put((
+                        self._ui.put((
                             'log', f"[CAL] DEF{di} → 完了 (OK, {dt:.1f}s)"))
                         del pending[di]
                     elif "failed" in resp_lower or "error" in resp_lower:
                         _dbg(f"DEF{di} matched failed/error")
-                        self._update_queue.put((
+                        self._ui.put((
                             'log', f"[CAL] DEF{di} → 失敗 (NG)"))
-                        self._update_queue.put(('progress', f"CAL DEF{di} NG"))
+                        self._ui.put(('progress', f"CAL DEF{di} NG"))
                         return False
                     elif ("in excution" in resp_lower
                           or "executing" in resp_lower):
@@ -681,23 +692,23 @@ class DCCharTab(ttk.Frame):
             # 進捗表示
             done = len(selected_defs) - len(pending)
             names = [f"DEF{di}" for di in pending]
-            self._update_queue.put(('progress',
+            self._ui.put(('progress',
                 f"CAL {done}/{len(selected_defs)}完了 "
                 f"待機中:{','.join(names)} ({elapsed}s/{max_wait}s)"))
 
         if pending:
             for di in pending:
                 _dbg(f"DEF{di} TIMEOUT after {max_wait}s")
-                self._update_queue.put((
+                self._ui.put((
                     'log', f"[CAL] DEF{di} → タイムアウト ({max_wait}s)"))
-            self._update_queue.put(('progress', f"CAL タイムアウト"))
+            self._ui.put(('progress', f"CAL タイムアウト"))
             return False
 
         total = time.time() - t_start
         _dbg(f"END _cal_all_defs OK total={total:.2f}s")
-        self._update_queue.put((
+        self._ui.put((
             'log', f"[CAL] 全DEF完了 (OK, total {total:.1f}s)"))
-        self._update_queue.put(('progress', f"CAL 全DEF完了"))
+        self._ui.put(('progress', f"CAL 全DEF完了"))
         return True
 
     def _run_lbc_all(self, selected_defs, settle, switch_delay):
@@ -721,14 +732,15 @@ class DCCharTab(ttk.Frame):
             latt_val = att_map.get(att, '1')
 
             # ===== 1. LATT変更 =====
-            self._update_queue.put(('log', f""))
-            self._update_queue.put(('log', f"===== LBC ATT {att} ====="))
-            self._update_queue.put(('progress', f"LBC ATT {att} に切替"))
+            self._ui.put(('log', f""))
+            self._ui.put(('log', f"===== LBC ATT {att} ====="))
+            self._ui.put(('progress', f"LBC ATT {att} に切替"))
 
             def _latt_dbg(msg):
+                tracer.instant("latt", "def", att=att, step=msg)
                 ms = int(time.time() * 1000) % 1000
                 ts = time.strftime("%H:%M:%S") + f".{ms:03d}"
-                self._update_queue.put((
+                self._ui.put((
                     'log', f"[DBG] latt {ts} {msg}"))
 
             _latt_dbg(f"BEGIN ATT={att} latt_val={latt_val}")
@@ -738,13 +750,13 @@ class DCCharTab(ttk.Frame):
                     di = def_info['index']
                     latt_cmd = f"DEF {di} LATT {latt_val}"
                     _latt_dbg(f"SEND DEF{di}: {latt_cmd}")
-                    self._update_queue.put(('log', f"[DEF] SEND: {latt_cmd}"))
+                    self._ui.put(('log', f"[DEF] SEND: {latt_cmd}"))
                     response = self.serial_mgr.send_command_with_response(
                         latt_cmd, wait_sec=0.1, read_timeout=0.5
                     )
                     _latt_dbg(f"RECV DEF{di}: {response!r}")
                     if response:
-                        self._update_queue.put((
+                        self._ui.put((
                             'log', f"[DEF] RECV: {response}"))
             _latt_dbg("sleep 0.2 before CAL")
             time.sleep(0.2)
@@ -754,10 +766,10 @@ class DCCharTab(ttk.Frame):
             cal_failed = False
             if self.var_cal_enabled.get():
                 if not self._cal_all_defs(selected_defs):
-                    self._update_queue.put(('log', f"[CAL] ATT{att} CAL失敗"))
+                    self._ui.put(('log', f"[CAL] ATT{att} CAL失敗"))
                     cal_failed = True
                     # CAL NG結果を全DEF・全ポイントに記録
-                    self._update_queue.put(('row', ("", f"ATT{att}", "", "", "", "", "", "")))
+                    self._ui.put(('row', ("", f"ATT{att}", "", "", "", "", "", "")))
                     for def_info in selected_defs:
                         for tp in points:
                             self._results[def_info['index']]['lbc'].append({
@@ -765,14 +777,15 @@ class DCCharTab(ttk.Frame):
                                 'voltage_pos': None, 'voltage_neg': None,
                                 'expected_str': tp.expected_str,
                                 'error_pos': None, 'error_neg': None, 'judge': 'CAL NG',
+                                'time': time.time(),
                             })
-                            self._update_queue.put(('row', (
+                            self._ui.put(('row', (
                                 def_info['name'], "", tp.display_code, "CAL NG",
                                 tp.expected_str, "", "", "NG"
                             )))
                     continue  # 次のATTへ
             else:
-                self._update_queue.put(('log', f"[CAL] スキップ"))
+                self._ui.put(('log', f"[CAL] スキップ"))
 
             if self._stop_event.is_set():
                 break
@@ -780,7 +793,7 @@ class DCCharTab(ttk.Frame):
             _latt_dbg(f"CAL phase done, entering MEASURE phase ATT={att}")
 
             # ATT区切り行をサマリーに表示
-            self._update_queue.put(('row', (
+            self._ui.put(('row', (
                 "", f"ATT{att}", "", "", "", "", "", ""
             )))
 
@@ -794,11 +807,11 @@ class DCCharTab(ttk.Frame):
                 for tp in points:
                     if self._stop_event.is_set():
                         break
-                    self._update_queue.put(('progress',
+                    self._ui.put(('progress',
                         f"{def_name} / LBC ATT{att} {tp.display_code}"))
 
                     self._datagen_send(f"alt a {tp.address_code} cii p")
-                    time.sleep(settle)
+                    tracer.sleep(settle, "settle", code=tp.address_code)
 
                     # POS計測
                     self._switch_scanner(self._ch_addr(def_info['pos_channel']), switch_delay)
@@ -823,19 +836,20 @@ class DCCharTab(ttk.Frame):
                         'voltage_pos': voltage_pos, 'voltage_neg': voltage_neg,
                         'expected_str': tp.expected_str,
                         'error_pos': error_pos, 'error_neg': error_neg, 'judge': judge,
+                        'time': time.time(),
                     })
 
                     # POS行
                     vp = f"{voltage_pos:.3f}" if voltage_pos is not None else "---"
                     ep = f"{error_pos:.3f}" if error_pos is not None else "---"
-                    self._update_queue.put(('row', (
+                    self._ui.put(('row', (
                         def_name, "POS", tp.display_code, vp,
                         tp.expected_str, ep, "", judge_pos
                     )))
                     # NEG行
                     vn = f"{voltage_neg:.3f}" if voltage_neg is not None else "---"
                     en = f"{error_neg:.3f}" if error_neg is not None else "---"
-                    self._update_queue.put(('row', (
+                    self._ui.put(('row', (
                         "", "NEG", tp.display_code, vn,
                         "", en, "", judge_neg
                     )))
@@ -848,11 +862,11 @@ class DCCharTab(ttk.Frame):
         for mi, tp in enumerate(MONI_TEST_POINTS):
             if self._stop_event.is_set():
                 break
-            self._update_queue.put(('progress', f"{def_name} / moni / {tp.part} {tp.display_code}"))
+            self._ui.put(('progress', f"{def_name} / moni / {tp.part} {tp.display_code}"))
 
             pole = "p" if tp.part == "POS" else "n"
             self._datagen_send(f"alt a {tp.address_code} ci {pole}")
-            time.sleep(settle)
+            tracer.sleep(settle, "settle", code=tp.address_code)
 
             if tp.part != current_pole:
                 ch = def_info['pos_channel'] if tp.part == "POS" else def_info['neg_channel']
@@ -872,12 +886,13 @@ class DCCharTab(ttk.Frame):
                 'part': tp.part, 'code': tp.display_code,
                 'voltage': voltage, 'expected_str': tp.expected_str,
                 'error': error, 'error_pct': error_pct, 'judge': judge,
+                'time': time.time(),
             })
 
             v_str = f"{voltage:.2f}" if voltage is not None else "---"
             e_str = f"{error:.2f}" if error is not None else "---"
             ep_str = f"{error_pct:.2f}" if error_pct is not None else "---"
-            self._update_queue.put(('row', (
+            self._ui.put(('row', (
                 def_name, tp.part, tp.display_code, v_str,
                 tp.expected_str, e_str, ep_str, judge
             )))
@@ -887,32 +902,79 @@ class DCCharTab(ttk.Frame):
         """計測順の結果リストをExcel表示順に並べ替え"""
         return [data[i] for i in order]
 
-    # ==================== XLSX保存 ====================
-    def _save_xlsx_single(self, sheet_key, slots_data, save_dir, timestamp):
-        """XLSX保存 (選択 DEF 全てを 1 ファイルに)
+    # ==================== XLSX/PNG保存 ====================
+    def _table_base_path(self, sheet_key, slots_data, save_dir, timestamp):
+        """保存ファイルのパス (拡張子なし)。S/N は選択 DEF の全てを `_` で連結"""
+        sheet_title = self.SHEET_TITLES.get(sheet_key, sheet_key)
+        return os.path.join(
+            save_dir, f"{self._join_sns(slots_data)}_DC特性_{sheet_title}_{timestamp}")
+
+    def _save_sidecar(self, sheet_key, slots_data, save_dir, timestamp, settle, switch_delay):
+        """計測生データのサイドカー (.npz) を XLSX と同じ名前で保存 (再解析用)"""
+        base = self._table_base_path(sheet_key, slots_data, save_dir, timestamp)
+        meta = {
+            'kind': 'dc_char',
+            'sheet_key': sheet_key,
+            'serial_nos': [sn for sn, _ in slots_data],
+            'dmm': {'function': 'DCV', 'range': '1000' if sheet_key == 'position' else 'AUTO',
+                    'nplc': self._dmm_nplc,
+                    'profile': self._dmm_profile_name},
+            'settle_time': settle,
+            'switch_delay': switch_delay,
+        }
+        try:
+            raw_sidecar.save(base + raw_sidecar.SUFFIX, meta, raw_sidecar.dc_char_arrays(slots_data))
+        except OSError as e:
+            self._ui.put(('log', f"[警告] 生データ保存エラー: {e}"))
+
+    def _submit_table_export(self, sheet_key, slots_data, save_dir, timestamp):
+        """XLSX 保存 + 表PNG 描画を出力パイプライン (プロセスプール) に投入
 
         slots_data: [(serial_no, display_data), ...] 最大 4 枠
-        ファイル名は選択 DEF の S/N を全て `_` で連結する。
+        app_settings.json の png_export.renderer が "excel" のとき、または
+        直接描画に失敗したときは XLSX 保存後に Excel COM で PNG を出力する。
         """
-        sheet_titles = {'position': 'POSTION', 'lbc': 'LBC', 'moni': 'moni'}
-        sheet_title = sheet_titles.get(sheet_key, sheet_key)
-        sn_joined = self._join_sns(slots_data)
-        filepath = os.path.join(
-            save_dir, f"{sn_joined}_DC特性_{sheet_title}_{timestamp}.xlsx")
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = sheet_title
-
-        if sheet_key == 'position':
-            self._write_position_sheet(ws, slots_data)
-        elif sheet_key == 'lbc':
-            self._write_lbc_sheet(ws, slots_data)
-        else:
-            self._write_moni_sheet(ws, slots_data)
-
-        wb.save(filepath)
-        return filepath
+        from utils import export_pipeline
+        cfg = self._settings.section('png_export')
+        base = self._table_base_path(sheet_key, slots_data, save_dir, timestamp)
+        png_path = base + '.png' if cfg.get('renderer', 'agg') != 'excel' else None
+        bus = ui_bus.get_bus(self)
+        export_pipeline.shared(int(cfg.get('processes', 2))).submit(
+            export_tables, sheet_key, slots_data, base + '.xlsx', png_path,
+            label=f"DC特性 {self.SHEET_TITLES.get(sheet_key, sheet_key)}",
+            tag=('tables', (sheet_key, slots_data, save_dir, timestamp)),
+            on_status=lambda job: bus.post(self, self._on_export_job, job))
+
+    def _on_export_job(self, job):
+        """出力ジョブの状態変化 (メインスレッド)"""
+        from utils import export_pipeline
+        what, args = job.tag
+        if job.status == export_pipeline.RUNNING and what == 'tables':
+            self.var_progress_label.set("保存中...")
+        elif job.status == export_pipeline.RETRYING:
+            self._append_log(f"[DC特性] {job.label}: 再試行 ({job.error})")
+        elif job.status in (export_pipeline.FAILED, export_pipeline.SKIPPED):
+            self.var_progress_label.set("保存エラー")
+            self.after_idle(lambda: messagebox.showerror(
+                "エラー", f"保存に失敗しました: {job.error}"))
+        elif job.status == export_pipeline.DONE:
+            if what == 'tables':
+                for warning in job.result['warnings']:
+                    self._append_log(f"[DC特性] {warning}")
+                if job.result['png'] is None:
+                    # Excel COM で PNG 出力 (パイプラインのスレッドで実行)
+                    export_pipeline.shared().submit(
+                        self._generate_table_png_com, *args, in_process=False,
+                        label="DC特性 PNG(Excel)", tag=('png_com', job.result['xlsx']),
+                        on_status=lambda j, bus=ui_bus.get_bus(self): bus.post(
+                            self, self._on_export_job, j))
+                    return
+                files = [job.result['xlsx'], job.result['png']]
+            else:
+                files = [args, job.result]
+            self.var_progress_label.set("保存完了")
+            self.after_idle(lambda: messagebox.showinfo(
+                "完了", "保存完了:\n" + "\n".join(files)))
 
     @staticmethod
     def _join_sns(slots_data):
@@ -921,333 +983,10 @@ class DCCharTab(ttk.Frame):
             return "unknown"
         return "_".join(sn for sn, _ in slots_data)
 
-    def _write_position_sheet(self, ws, slots_data):
-        """Position XLSX書き込み（docx仕様: 4DEF固定枠、セル結合、右寄せ、数式埋込）
-
-        slots_data: [(serial_no, display_data), ...] 最大 4 枠
-        """
-        thin = Side(style='thin')
-        thick = Side(style='medium')
-        border_all = Border(top=thin, left=thin, right=thin, bottom=thin)
-        border_top_thick = Border(top=thick, left=thin, right=thin, bottom=thin)
-        dat_font = Font(name='MS Pゴシック', size=10)
-        center = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        right_align = Alignment(horizontal='right', vertical='center')
-        gray_fill = PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid')
-
-        # ヘッダー（太字なし）
-        headers = ['ﾕﾆｯﾄ No.', '極', '入力ｺｰﾄﾞ', '測定電圧(V)', '許容誤差(V)(<0.1%)', '誤差(V)', '誤差(%)', '判定']
-        for c, h in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=c, value=h)
-            cell.font = dat_font; cell.alignment = center; cell.border = border_all
-
-        expected_strs = [
-            "160.000±0.160", "0.000±0.100", "-160.000±0.160",
-            "160.000±0.160", "0.000±0.100", "-160.000±0.160",
-        ]
-        # 期待値数値（数式用）
-        expected_vals = [160.0, 0.0, -160.0, 160.0, 0.0, -160.0]
-        code_strs = ["FFFFF H", "80000 H", "00000 H", "00000 H", "80000 H", "FFFFF H"]
-
-        for slot in range(4):
-            base = 2 + slot * 6
-            if slot < len(slots_data):
-                sn_slot, slot_data = slots_data[slot]
-                unit_label = f"1PB397MK2\n{sn_slot}"
-            else:
-                slot_data = None
-                unit_label = ""
-
-            for ri in range(6):
-                r = base + ri
-                is_center = (ri == 1 or ri == 4)
-                bdr = border_top_thick if ri == 0 else border_all
-
-                if slot_data and ri < len(slot_data):
-                    d = slot_data[ri]
-                    v = d['voltage'] if d['voltage'] is not None else ''
-                    judge = d['judge']
-                else:
-                    v, judge = '', ''
-
-                # 入力ｺｰﾄﾞ（右寄せ）
-                c3 = ws.cell(row=r, column=3, value=code_strs[ri])
-                c3.font = dat_font; c3.alignment = right_align; c3.border = bdr
-                # 測定電圧（右寄せ）
-                c4 = ws.cell(row=r, column=4, value=v)
-                c4.font = dat_font; c4.alignment = right_align; c4.border = bdr
-                if v != '': c4.number_format = '0.000'
-                # 許容誤差（右寄せ）
-                c5 = ws.cell(row=r, column=5, value=expected_strs[ri])
-                c5.font = dat_font; c5.alignment = right_align; c5.border = bdr
-                # 誤差V = 測定電圧 - 期待値（数式）
-                exp_v = expected_vals[ri]
-                if v != '':
-                    c6 = ws.cell(row=r, column=6, value=f'=D{r}-({exp_v})')
-                else:
-                    c6 = ws.cell(row=r, column=6, value='')
-                c6.font = dat_font; c6.alignment = right_align; c6.border = bdr
-                c6.number_format = '0.000'
-                # 誤差% = 誤差V / 期待値 * 100（数式、centerはグレー空欄）
-                c7 = ws.cell(row=r, column=7)
-                if is_center:
-                    c7.value = ''
-                    c7.fill = gray_fill
-                elif v != '' and exp_v != 0:
-                    c7.value = f'=F{r}/{exp_v}*100'
-                    c7.number_format = '0.000'
-                else:
-                    c7.value = ''
-                c7.font = dat_font; c7.alignment = right_align; c7.border = bdr
-                # 判定（中央）
-                c8 = ws.cell(row=r, column=8, value=judge)
-                c8.font = dat_font; c8.alignment = center; c8.border = bdr
-
-            # ﾕﾆｯﾄNo: 6行結合
-            ws.merge_cells(start_row=base, start_column=1, end_row=base + 5, end_column=1)
-            c1 = ws.cell(row=base, column=1, value=unit_label)
-            c1.font = dat_font; c1.alignment = center
-            for ri in range(6):
-                ws.cell(row=base + ri, column=1).border = border_top_thick if ri == 0 else border_all
-
-            # 極POS: 3行結合
-            ws.merge_cells(start_row=base, start_column=2, end_row=base + 2, end_column=2)
-            ws.cell(row=base, column=2, value='POS').font = dat_font
-            ws.cell(row=base, column=2).alignment = center
-            for ri in range(3):
-                ws.cell(row=base + ri, column=2).border = border_top_thick if ri == 0 else border_all
-
-            # 極NEG: 3行結合
-            ws.merge_cells(start_row=base + 3, start_column=2, end_row=base + 5, end_column=2)
-            ws.cell(row=base + 3, column=2, value='NEG').font = dat_font
-            ws.cell(row=base + 3, column=2).alignment = center
-            for ri in range(3, 6):
-                ws.cell(row=base + ri, column=2).border = border_all
-
-        for r in range(1, 26 + 1):
-            ws.row_dimensions[r].height = 16
-        for c, w in {1: 14, 2: 6, 3: 12, 4: 14, 5: 22, 6: 10, 7: 10, 8: 6}.items():
-            ws.column_dimensions[openpyxl.utils.get_column_letter(c)].width = w
-
-    def _write_lbc_sheet(self, ws, slots_data):
-        """LBC XLSX書き込み（docx仕様: 9列、4DEF固定枠、セル結合、数式埋込、小数3桁）
-
-        slots_data: [(serial_no, display_data), ...] 最大 4 枠
-        """
-        thin = Side(style='thin')
-        thick = Side(style='medium')
-        border_all = Border(top=thin, left=thin, right=thin, bottom=thin)
-        border_top_thick = Border(top=thick, left=thin, right=thin, bottom=thin)
-        dat_font = Font(name='MS Pゴシック', size=10)
-        center = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        right_align = Alignment(horizontal='right', vertical='center')
-
-        headers = ['ﾕﾆｯﾄ No.', 'LBC\nATT', '入力ｺｰﾄﾞ', 'POS 出力電圧(V)', 'NEG 出力電圧(V)',
-                   '許容差(V)', 'POS 誤差\n(V)', 'NEG 誤差\n(V)', '判定']
-        for c, h in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=c, value=h)
-            cell.font = dat_font; cell.alignment = center; cell.border = border_all
-
-        # 期待値数値（POS/NEG）: ATT 1/1, 1/2, 1/4 の FFFF/0000
-        expected_pos = [6.180, -6.180, 3.090, -3.090, 1.545, -1.545]
-        expected_neg = [-6.180, 6.180, -3.090, 3.090, -1.545, 1.545]
-        expected_strs = ['±6.180±0.062', '', '±3.090±0.031', '', '±1.545±0.015', '']
-        code_strs = ['FFFF H', '0000 H', 'FFFF H', '0000 H', 'FFFF H', '0000 H']
-
-        for slot in range(4):
-            base = 2 + slot * 6
-            if slot < len(slots_data):
-                sn_slot, slot_data = slots_data[slot]
-                unit_label = f"1PB397MK2\n{sn_slot}"
-            else:
-                slot_data = None
-                unit_label = ""
-
-            for ri in range(6):
-                r = base + ri
-                bdr = border_top_thick if ri == 0 else border_all
-
-                if slot_data and ri < len(slot_data):
-                    d = slot_data[ri]
-                    is_cal_ng = (d['judge'] == 'CAL NG')
-                    vp = d['voltage_pos'] if d['voltage_pos'] is not None else ''
-                    vn = d['voltage_neg'] if d['voltage_neg'] is not None else ''
-                    judge = d['judge']
-                else:
-                    is_cal_ng = False
-                    vp, vn, judge = '', '', ''
-
-                c3 = ws.cell(row=r, column=3, value=code_strs[ri])
-                c3.font = dat_font; c3.alignment = right_align; c3.border = bdr
-
-                if is_cal_ng:
-                    # CAL NG: 電圧欄に"CAL NG"、誤差・判定も"CAL NG"
-                    c4 = ws.cell(row=r, column=4, value='CAL NG')
-                    c4.font = dat_font; c4.alignment = center; c4.border = bdr
-                    c5 = ws.cell(row=r, column=5, value='CAL NG')
-                    c5.font = dat_font; c5.alignment = center; c5.border = bdr
-                    c7 = ws.cell(row=r, column=7, value='')
-                    c7.font = dat_font; c7.alignment = right_align; c7.border = bdr
-                    c8 = ws.cell(row=r, column=8, value='')
-                    c8.font = dat_font; c8.alignment = right_align; c8.border = bdr
-                    c9 = ws.cell(row=r, column=9, value='CAL NG')
-                    c9.font = dat_font; c9.alignment = center; c9.border = bdr
-                else:
-                    # POS電圧
-                    c4 = ws.cell(row=r, column=4, value=vp)
-                    c4.font = dat_font; c4.alignment = right_align; c4.border = bdr
-                    if vp != '': c4.number_format = '0.000'
-                    # NEG電圧
-                    c5 = ws.cell(row=r, column=5, value=vn)
-                    c5.font = dat_font; c5.alignment = right_align; c5.border = bdr
-                    if vn != '': c5.number_format = '0.000'
-                    # POS誤差 = POS電圧 - 期待値（数式）
-                    if vp != '':
-                        c7 = ws.cell(row=r, column=7, value=f'=D{r}-({expected_pos[ri]})')
-                    else:
-                        c7 = ws.cell(row=r, column=7, value='')
-                    c7.font = dat_font; c7.alignment = right_align; c7.border = bdr
-                    c7.number_format = '0.000'
-                    # NEG誤差 = NEG電圧 - 期待値（数式）
-                    if vn != '':
-                        c8 = ws.cell(row=r, column=8, value=f'=E{r}-({expected_neg[ri]})')
-                    else:
-                        c8 = ws.cell(row=r, column=8, value='')
-                    c8.font = dat_font; c8.alignment = right_align; c8.border = bdr
-                    c8.number_format = '0.000'
-                    # 判定
-                    c9 = ws.cell(row=r, column=9, value=judge)
-                    c9.font = dat_font; c9.alignment = center; c9.border = bdr
-
-            # ﾕﾆｯﾄNo: 6行結合
-            ws.merge_cells(start_row=base, start_column=1, end_row=base + 5, end_column=1)
-            ws.cell(row=base, column=1, value=unit_label).font = dat_font
-            ws.cell(row=base, column=1).alignment = center
-            for ri in range(6):
-                ws.cell(row=base + ri, column=1).border = border_top_thick if ri == 0 else border_all
-
-            # ATT: 各2行結合
-            for ai, att_val in enumerate(['1/1', '1/2', '1/4']):
-                sr = base + ai * 2
-                ws.merge_cells(start_row=sr, start_column=2, end_row=sr + 1, end_column=2)
-                ws.cell(row=sr, column=2, value=att_val).font = dat_font
-                ws.cell(row=sr, column=2).alignment = center
-                for ri in range(2):
-                    ws.cell(row=sr + ri, column=2).border = border_top_thick if (ai == 0 and ri == 0) else border_all
-
-            # 許容差: 各2行結合
-            for ai, exp_val in enumerate(['±6.180±0.062', '±3.090±0.031', '±1.545±0.015']):
-                sr = base + ai * 2
-                ws.merge_cells(start_row=sr, start_column=6, end_row=sr + 1, end_column=6)
-                ws.cell(row=sr, column=6, value=exp_val).font = dat_font
-                ws.cell(row=sr, column=6).alignment = right_align
-                for ri in range(2):
-                    ws.cell(row=sr + ri, column=6).border = border_top_thick if (ai == 0 and ri == 0) else border_all
-
-        ws.row_dimensions[1].height = 32
-        for r in range(2, 26):
-            ws.row_dimensions[r].height = 16
-        for c, w in {1: 14, 2: 6, 3: 12, 4: 14, 5: 14, 6: 18, 7: 10, 8: 10, 9: 6}.items():
-            ws.column_dimensions[openpyxl.utils.get_column_letter(c)].width = w
-
-    def _write_moni_sheet(self, ws, slots_data):
-        """moni XLSX書き込み（docx仕様: 4DEF固定枠、セル結合、右寄せ、数式埋込、小数2桁）
-
-        slots_data: [(serial_no, display_data), ...] 最大 4 枠
-        """
-        thin = Side(style='thin')
-        thick = Side(style='medium')
-        border_all = Border(top=thin, left=thin, right=thin, bottom=thin)
-        border_top_thick = Border(top=thick, left=thin, right=thin, bottom=thin)
-        dat_font = Font(name='MS Pゴシック', size=10)
-        center = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        right_align = Alignment(horizontal='right', vertical='center')
-
-        headers = ['ﾕﾆｯﾄ No.', '極', '入力ｺｰﾄﾞ', '測定電圧(V)', '許容誤差(V)(<1%)', '誤差(V)', '誤差(%)', '判定']
-        for c, h in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=c, value=h)
-            cell.font = dat_font; cell.alignment = center; cell.border = border_all
-
-        # 表示順: POS FFFFF, POS 00000, NEG 00000, NEG FFFFF
-        expected_strs = ['+5.00±0.05', '-5.00±0.05', '+5.00±0.05', '-5.00±0.05']
-        expected_vals = [5.0, -5.0, 5.0, -5.0]
-        code_strs = ['FFFFF H', '00000 H', '00000 H', 'FFFFF H']
-
-        for slot in range(4):
-            base = 2 + slot * 4
-            if slot < len(slots_data):
-                sn_slot, slot_data = slots_data[slot]
-                unit_label = f"1PB397MK2\n{sn_slot}"
-            else:
-                slot_data = None
-                unit_label = ""
-
-            for ri in range(4):
-                r = base + ri
-                bdr = border_top_thick if ri == 0 else border_all
-
-                if slot_data and ri < len(slot_data):
-                    d = slot_data[ri]
-                    v = d['voltage'] if d['voltage'] is not None else ''
-                    judge = d['judge']
-                else:
-                    v, judge = '', ''
-
-                c3 = ws.cell(row=r, column=3, value=code_strs[ri])
-                c3.font = dat_font; c3.alignment = right_align; c3.border = bdr
-                c4 = ws.cell(row=r, column=4, value=v)
-                c4.font = dat_font; c4.alignment = right_align; c4.border = bdr
-                if v != '': c4.number_format = '0.00'
-                c5 = ws.cell(row=r, column=5, value=expected_strs[ri])
-                c5.font = dat_font; c5.alignment = right_align; c5.border = bdr
-                # 誤差V = 測定電圧 - 期待値（数式）
-                exp_v = expected_vals[ri]
-                if v != '':
-                    c6 = ws.cell(row=r, column=6, value=f'=D{r}-({exp_v})')
-                else:
-                    c6 = ws.cell(row=r, column=6, value='')
-                c6.font = dat_font; c6.alignment = right_align; c6.border = bdr
-                c6.number_format = '0.00'
-                # 誤差% = 誤差V / 期待値 * 100
-                c7 = ws.cell(row=r, column=7)
-                if v != '' and exp_v != 0:
-                    c7.value = f'=F{r}/{exp_v}*100'
-                    c7.number_format = '0.00'
-                else:
-                    c7.value = ''
-                c7.font = dat_font; c7.alignment = right_align; c7.border = bdr
-                c8 = ws.cell(row=r, column=8, value=judge)
-                c8.font = dat_font; c8.alignment = center; c8.border = bdr
-
-            # ﾕﾆｯﾄNo: 4行結合
-            ws.merge_cells(start_row=base, start_column=1, end_row=base + 3, end_column=1)
-            c1 = ws.cell(row=base, column=1, value=unit_label)
-            c1.font = dat_font; c1.alignment = center
-            for ri in range(4):
-                ws.cell(row=base + ri, column=1).border = border_top_thick if ri == 0 else border_all
-
-            # 極POS: 2行結合
-            ws.merge_cells(start_row=base, start_column=2, end_row=base + 1, end_column=2)
-            ws.cell(row=base, column=2, value='POS').font = dat_font
-            ws.cell(row=base, column=2).alignment = center
-            for ri in range(2):
-                ws.cell(row=base + ri, column=2).border = border_top_thick if ri == 0 else border_all
-
-            # 極NEG: 2行結合
-            ws.merge_cells(start_row=base + 2, start_column=2, end_row=base + 3, end_column=2)
-            ws.cell(row=base + 2, column=2, value='NEG').font = dat_font
-            ws.cell(row=base + 2, column=2).alignment = center
-            for ri in range(2, 4):
-                ws.cell(row=base + ri, column=2).border = border_all
-
-        for r in range(1, 18):
-            ws.row_dimensions[r].height = 16
-        for c, w in {1: 14, 2: 6, 3: 12, 4: 14, 5: 20, 6: 10, 7: 10, 8: 6}.items():
-            ws.column_dimensions[openpyxl.utils.get_column_letter(c)].width = w
-
-    # ==================== PNG生成（Excel COM経由スクリーンショット） ====================
-    def _generate_table_png(self, sheet_name, slots_data, save_dir, timestamp):
-        """XLSXを開いて表範囲をCopyPicture→PNG保存
+    # ==================== PNG生成 (Excel COM) ====================
+    @tracer.traced("png.dc_char_com", "export")
+    def _generate_table_png_com(self, sheet_name, slots_data, save_dir, timestamp):
+        """XLSXを開いて表範囲をCopyPicture→PNG保存 (Excel COM経由スクリーンショット)
 
         slots_data: [(serial_no, display_data), ...]
         ファイル名は選択 DEF の S/N を全て `_` 連結 (XLSX と揃える)。
@@ -1258,8 +997,7 @@ class DCCharTab(ttk.Frame):
         - クリップボード取得は短いリトライ (CopyPicture の遅延吸収)
         - 各 Excel COM ステップを [DBG] ログで出力
         """
-        sheet_titles = {'position': 'POSTION', 'lbc': 'LBC', 'moni': 'moni'}
-        sheet_title = sheet_titles.get(sheet_name, sheet_name)
+        sheet_title = self.SHEET_TITLES.get(sheet_name, sheet_name)
         sn_joined = self._join_sns(slots_data)
 
         xlsx_path = os.path.join(
@@ -1271,7 +1009,8 @@ class DCCharTab(ttk.Frame):
             return png_path
 
         def _dbg(msg):
-            self._update_queue.put((
+            tracer.instant("dc_png", "export", sheet=sheet_title, step=msg)
+            self._ui.put((
                 'log', f"[DBG] dc_png({sn_joined}/{sheet_title}): {msg}"))
 
         try:
@@ -1291,19 +1030,9 @@ class DCCharTab(ttk.Frame):
                     wb = excel.Workbooks.Open(os.path.abspath(xlsx_path))
                     ws = wb.Sheets(1)
 
-                    # 表範囲
-                    if sheet_name == 'position':
-                        last_row = 25   # 1 header + 24 data
-                        last_col = 'H'  # 8列
-                    elif sheet_name == 'moni':
-                        last_row = 17   # 1 header + 16 data
-                        last_col = 'H'  # 8列
-                    else:  # lbc
-                        last_row = 25   # 1 header + 24 data
-                        last_col = 'I'  # 9列
-
-                    _dbg(f"CopyPicture A1:{last_col}{last_row}")
-                    rng = ws.Range(f"A1:{last_col}{last_row}")
+                    cell_range = self.TABLE_RANGES.get(sheet_name, "A1:I25")
+                    _dbg(f"CopyPicture {cell_range}")
+                    rng = ws.Range(cell_range)
                     rng.CopyPicture(Appearance=1, Format=2)  # xlScreen, xlBitmap
 
                     # クリップボード取得（低性能 PC 対策: 0.1s × 最大 20 回）
@@ -1326,10 +1055,10 @@ class DCCharTab(ttk.Frame):
                         _dbg("img.save done")
                     else:
                         _dbg("grabclipboard None after retries")
-                        self._update_queue.put((
+                        self._ui.put((
                             'log',
                             f"[DC特性] PNG: クリップボード取得失敗 "
-                            f"({serial_no}/{sheet_title})"))
+                            f"({sn_joined}/{sheet_title})"))
 
                     _dbg("wb.Close")
                     wb.Close(False)
@@ -1345,7 +1074,7 @@ class DCCharTab(ttk.Frame):
                 pythoncom.CoUninitialize()
                 _dbg("CoUninitialize done")
         except Exception as e:
-            self._update_queue.put((
+            self._ui.put((
                 'log', f"[DC特性] PNG生成エラー: {e}"))
 
         return png_path
@@ -1,23 +1,35 @@
 import tkinter as tk
-from tkinter import ttk
-import time
+from tkinter import ttk, filedialog
 import threading
 import queue
 from utils import LoggerWidget, validate_command
+from utils import dmm_profiles, dmm_stream, metrics, noise_analysis, settings_store, ui_bus
+from utils.strip_chart import StripChart
+
+STREAM_FRAME_MS = 33        # ストリップチャート・統計の更新間隔 (約30fps)
+STREAM_CAPACITY = 100000    # リングバッファの点数 (app_settings "dmm_stream" の capacity で上書き)
+STREAM_CHART_POINTS = 5000  # チャートに表示する直近の点数 (同 chart_points)
+STREAM_MODES = {"連続 (TRIG AUTO)": "auto", "バースト (NRDGS)": "burst"}
 
 class DMM3458ATab(ttk.Frame):
     def __init__(self, parent, gpib_controller):
         super().__init__(parent)
         self.gpib = gpib_controller
 
-        self.continuous_running = False
-        self.continuous_error_count = 0
-
-        # スレッド化用: 測定結果キューとスレッド管理
+        # スレッド化用: 測定結果キューと GPIB の排他
         self.measurement_queue = queue.Queue()
-        self.measurement_thread = None
         self.measurement_lock = threading.Lock()
 
+        # 連続測定 (ストリーム): 常駐の読み取りスレッド → リングバッファ
+        self._settings = settings_store.app_settings()
+        self._bus = ui_bus.get_bus(self)
+        self.stream_reader = None
+        self.stream_buffer = None
+        self._stream_timer = None
+        self.noise_analyzer = None  # 連続測定のノイズ解析 (Allan 偏差・PSD)
+        self.noise_window = None
+        self.benchmark_thread = None
+
         self.create_widgets()
     
     def create_widgets(self):
@@ -87,6 +99,35 @@ class DMM3458ATab(ttk.Frame):
         self.current_nplc_label = ttk.Label(row2_frame, text="---", 
                                              foreground="blue", font=("", 9, "bold"), width=12)  # ★8→12に拡大
         self.current_nplc_label.pack(side=tk.LEFT, padx=2)
+
+        # 3行目：取得プロファイル (NPLC・AZERO・ARANGE・DISP・MATH の組み合わせ) とベンチマーク
+        row3_frame = ttk.Frame(config_frame)
+        row3_frame.pack(fill=tk.X, pady=2)
+
+        ttk.Label(row3_frame, text="プロファイル:").pack(side=tk.LEFT, padx=(5, 2))
+        self.profile_var = tk.StringVar(value=dmm_profiles.label_of("balanced"))
+        ttk.Combobox(row3_frame, textvariable=self.profile_var,
+                     values=dmm_profiles.labels()[1:], width=10,
+                     state="readonly").pack(side=tk.LEFT, padx=2)
+        ttk.Button(row3_frame, text="プロファイル適用",
+                   command=self.apply_profile, width=15).pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Button(row3_frame, text="ベンチマーク",
+                   command=self.run_benchmark, width=12).pack(side=tk.LEFT, padx=5)
+        ttk.Label(row3_frame, text=f"ベンチ: {dmm_profiles.bench_id()}",
+                  foreground="gray").pack(side=tk.LEFT, padx=(10, 2))
+
+        # ベンチマーク結果 (このベンチで前回測定した値)
+        self.benchmark_labels = {}
+        bench_frame = ttk.Frame(config_frame)
+        bench_frame.pack(fill=tk.X, pady=2)
+        results = dmm_profiles.benchmarks()
+        for i, (name, profile) in enumerate(dmm_profiles.PROFILES.items()):
+            ttk.Label(bench_frame, text=f"{profile['label']}:").grid(
+                row=i, column=0, padx=(5, 2), sticky=tk.E)
+            label = ttk.Label(bench_frame, text=dmm_profiles.format_result(results.get(name)),
+                              foreground="blue")
+            label.grid(row=i, column=1, sticky=tk.W)
+            self.benchmark_labels[name] = label
         
         # 測定実行フレーム
         measure_frame = ttk.LabelFrame(self, text="測定実行", padding=10)
@@ -98,7 +139,23 @@ class DMM3458ATab(ttk.Frame):
                    command=self.start_continuous).pack(side=tk.LEFT, padx=5)
         ttk.Button(measure_frame, text="停止", 
                    command=self.stop_continuous).pack(side=tk.LEFT, padx=5)
-        
+
+        stream_cfg = self._settings.section("dmm_stream")
+        ttk.Label(measure_frame, text="連続方式:").pack(side=tk.LEFT, padx=(15, 2))
+        mode_names = {v: k for k, v in STREAM_MODES.items()}
+        self.stream_mode_var = tk.StringVar(
+            value=mode_names.get(stream_cfg.get("mode"), "連続 (TRIG AUTO)"))
+        ttk.Combobox(measure_frame, textvariable=self.stream_mode_var,
+                     values=list(STREAM_MODES), width=16,
+                     state="readonly").pack(side=tk.LEFT, padx=2)
+        ttk.Label(measure_frame, text="NRDGS:").pack(side=tk.LEFT, padx=(10, 2))
+        self.nrdgs_var = tk.StringVar(value=str(stream_cfg.get("nrdgs", 100)))
+        ttk.Entry(measure_frame, textvariable=self.nrdgs_var, width=6).pack(side=tk.LEFT, padx=2)
+        ttk.Button(measure_frame, text="バッファ保存",
+                   command=self.export_stream).pack(side=tk.LEFT, padx=(15, 5))
+        ttk.Button(measure_frame, text="ノイズ解析",
+                   command=self.open_noise_window).pack(side=tk.LEFT, padx=5)
+
         # 測定値表示フレーム
         result_frame = ttk.LabelFrame(self, text="測定結果", padding=10)
         result_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -116,7 +173,25 @@ class DMM3458ATab(ttk.Frame):
                                       font=("", 16, "bold"), 
                                       foreground="green")
         self.panel_label.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
-        
+
+        # ストリーム (連続測定) の統計とストリップチャート
+        stream_frame = ttk.LabelFrame(self, text="連続測定 (ストリーム)", padding=10)
+        stream_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        stats_frame = ttk.Frame(stream_frame)
+        stats_frame.pack(fill=tk.X)
+        self.stream_stat_labels = {}
+        for col, (key, text) in enumerate([
+                ("count", "件数"), ("rate", "rdg/s"), ("mean", "平均"), ("std", "標準偏差"),
+                ("min", "最小"), ("max", "最大"), ("pp", "p-p")]):
+            ttk.Label(stats_frame, text=f"{text}:").grid(row=0, column=col * 2, padx=(8, 2), sticky=tk.E)
+            label = ttk.Label(stats_frame, text="--", foreground="blue", width=14)
+            label.grid(row=0, column=col * 2 + 1, sticky=tk.W)
+            self.stream_stat_labels[key] = label
+
+        self.stream_chart = StripChart(stream_frame, height=160)
+        self.stream_chart.pack(fill=tk.X, pady=(5, 0))
+
         # デバッグフレーム
         debug_frame = ttk.LabelFrame(self, text="デバッグ", padding=10)
         debug_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -143,18 +218,6 @@ class DMM3458ATab(ttk.Frame):
         self.logger.log("【注意】3458Aは古い機器のため、SCPI標準コマンド(*IDN?等)は非対応です", "INFO")
         self.logger.log("使用可能: DCV, ACV, DCI, ACI, OHM, OHMF, NPLC, RANGE, TRIG SGL等", "INFO")
     
-    def calculate_measurement_interval(self):
-        """NPLCから測定間隔を計算（ミリ秒）"""
-        try:
-            nplc = float(self.nplc_var.get())
-            # 50Hz電源の場合: 1 PLC = 20ms
-            # 余裕を持たせて1.1倍
-            interval_ms = int(nplc * 20 * 1.1)
-            # 最小10ms
-            return max(10, interval_ms)
-        except ValueError:
-            return 100
-    
     def reset_and_initialize(self):
         """機器をリセットして初期化"""
         if not self.gpib.connected:
@@ -286,11 +349,70 @@ class DMM3458ATab(ttk.Frame):
             self.logger.log(f"NPLC設定失敗: {command}", "ERROR")
             return
         
-        # 測定間隔を更新
-        interval = self.calculate_measurement_interval()
-        
         self.logger.log(f"設定完了: {mode} {range_val}, NPLC {nplc}", "SUCCESS")
     
+    def _profile_range(self):
+        """プロファイル適用・ベンチマークで使うレンジ (レンジ欄の値)"""
+        range_val = self.range_var.get().strip()
+        return range_val or "10"
+
+    def apply_profile(self):
+        """選択したプロファイルを現在のモード・レンジで適用"""
+        if not self.gpib.connected:
+            self.logger.log("機器が接続されていません", "ERROR")
+            return
+        name = dmm_profiles.name_of(self.profile_var.get())
+        with self.measurement_lock:
+            success, message = dmm_profiles.apply(self.gpib, name, self.mode_var.get(), self._profile_range())
+        self.logger.log(message, "SUCCESS" if success else "ERROR")
+        if success:
+            self.nplc_var.set(str(dmm_profiles.PROFILES[name]["nplc"]))
+            self.after(500, self.show_current_settings)
+
+    def run_benchmark(self):
+        """全プロファイルのベンチマーク (rdg/s・ノイズ LSB) を実行し、選択中のプロファイルに戻す
+
+        入力は安定した電圧 (DAC 固定出力やショート) にしておくこと。
+        """
+        if not self.gpib.connected:
+            self.logger.log("機器が接続されていません", "ERROR")
+            return
+        if self.stream_reader is not None and self.stream_reader.running:
+            self.logger.log("連続測定中はベンチマークできません", "ERROR")
+            return
+        if self.benchmark_thread is not None and self.benchmark_thread.is_alive():
+            self.logger.log("ベンチマーク実行中です", "ERROR")
+            return
+
+        range_val = self._profile_range()
+        selected = dmm_profiles.name_of(self.profile_var.get())
+        lsb = noise_analysis.lsb_voltage_from_settings()
+        self.logger.log(f"ベンチマーク開始 (DCV {range_val}, 1LSB = {lsb:.3E} V)", "INFO")
+        for label in self.benchmark_labels.values():
+            label.config(text="待機中...")
+
+        def worker():
+            with self.measurement_lock:
+                for name in dmm_profiles.PROFILES:
+                    self._bus.post(self, self.benchmark_labels[name].config, text="測定中...")
+                    success, result = dmm_profiles.benchmark(self.gpib, name, range_val, lsb)
+                    if success:
+                        dmm_profiles.record_benchmark(result)
+                        text = dmm_profiles.format_result(result)
+                        self._bus.post(self, self.logger.log,
+                                       f"{dmm_profiles.label_of(name)}: {text}", "SUCCESS")
+                    else:
+                        text = "失敗"
+                        self._bus.post(self, self.logger.log,
+                                       f"{dmm_profiles.label_of(name)}: ベンチマーク失敗 {result}", "ERROR")
+                    self._bus.post(self, self.benchmark_labels[name].config, text=text)
+                success, message = dmm_profiles.apply(self.gpib, selected, "DCV", range_val)
+            self._bus.post(self, self.logger.log, f"ベンチマーク完了、{message}",
+                           "SUCCESS" if success else "ERROR")
+
+        self.benchmark_thread = threading.Thread(target=worker, daemon=True)
+        self.benchmark_thread.start()
+
     def format_panel_value(self, value_str):
         """パネル表示形式にフォーマット（符号付き8桁）"""
         try:
@@ -334,6 +456,10 @@ class DMM3458ATab(ttk.Frame):
             self.logger.log("機器が接続されていません", "ERROR")
             return
 
+        if self.stream_reader is not None and self.stream_reader.running:
+            self.logger.log("連続測定中は単発測定できません", "ERROR")
+            return
+
         # 測定中表示
         self.result_label.config(text="測定中...")
         self.panel_label.config(text="--")
@@ -364,6 +490,7 @@ class DMM3458ATab(ttk.Frame):
                     if success:
                         result['success'] = True
                         result['response'] = response
+                        metrics.record_reading("dmm_tab")
                     else:
                         result['error'] = 'read_failed'
                 else:
@@ -404,136 +531,149 @@ class DMM3458ATab(ttk.Frame):
             self.after(20, self._check_single_result)
     
     def start_continuous(self):
-        """連続測定を開始"""
+        """連続測定 (ストリーム) を開始
+
+        常駐スレッドが TRIG AUTO (またはNRDGSバースト) で途切れなくトリガーして
+        リングバッファに取り込み、表示は UI バスの定期処理でフレーム単位に更新する。
+        """
         if not self.gpib.connected:
             self.logger.log("機器が接続されていません", "ERROR")
             return
-        
-        if self.continuous_running:
+
+        if self.stream_reader is not None and self.stream_reader.running:
             self.logger.log("既に連続測定中です", "ERROR")
             return
-        
-        # エラーカウントをリセット
-        self.continuous_error_count = 0
-        
-        # 測定間隔を計算して表示
-        interval = self.calculate_measurement_interval()
-        
-        self.continuous_running = True
-        self.logger.log(f"連続測定開始（間隔: {interval}ms）", "INFO")
-        
-        # 最初の測定をスケジュール
-        self.after(10, self.continuous_measure)
-    
-    def stop_continuous(self):
-        """連続測定を停止"""
-        self.continuous_running = False
 
-        # キューをクリア（残っている結果を破棄）
-        while not self.measurement_queue.empty():
-            try:
-                self.measurement_queue.get_nowait()
-            except queue.Empty:
-                break
-
-        self.logger.log(f"連続測定停止（総エラー数: {self.continuous_error_count}）", "INFO")
-    
-    def continuous_measure(self):
-        """連続測定のループ（非同期版）
-
-        メインスレッドから呼ばれ、別スレッドで測定を実行。
-        UIをブロックしないため、NPLC大でもラグなし。
-        """
-        if not self.continuous_running:
+        mode = STREAM_MODES.get(self.stream_mode_var.get(), "auto")
+        try:
+            nrdgs = int(self.nrdgs_var.get())
+            if nrdgs < 1:
+                raise ValueError
+        except ValueError:
+            self.logger.log(f"NRDGSが不正です: {self.nrdgs_var.get()}", "ERROR")
             return
+        self._settings.update("dmm_stream", mode=mode, nrdgs=nrdgs)
 
-        # 前回のスレッドがまだ実行中なら結果待ちへスキップ
-        if self.measurement_thread and self.measurement_thread.is_alive():
-            self.after(50, self._check_measurement_result)
+        cfg = self._settings.section("dmm_stream")
+        capacity = int(cfg.get("capacity", STREAM_CAPACITY))
+        if self.stream_buffer is None or self.stream_buffer.capacity != capacity:
+            self.stream_buffer = dmm_stream.RingBuffer(capacity)
+        else:
+            self.stream_buffer.clear()
+
+        def on_stopped(error):
+            self._bus.post(self, self._on_stream_stopped, reader, error)
+
+        reader = dmm_stream.StreamReader(
+            self.gpib, self.stream_buffer, lock=self.measurement_lock,
+            mode=mode, nrdgs=nrdgs, on_stopped=on_stopped)
+        self.stream_reader = reader
+        self.noise_analyzer = noise_analysis.NoiseAnalyzer(noise_analysis.lsb_voltage_from_settings())
+        reader.add_listener(self.noise_analyzer.update)
+        success, message = reader.start()
+        if not success:
+            self.logger.log(message, "ERROR")
             return
 
-        # 別スレッドで測定を実行
-        self.measurement_thread = threading.Thread(
-            target=self._measure_thread_worker,
-            daemon=True
-        )
-        self.measurement_thread.start()
+        self.stream_chart.clear()
+        self._stream_timer = self._bus.every(self, STREAM_FRAME_MS, self._refresh_stream)
+        limit = dmm_stream.max_rate(self.nplc_var.get())
+        self.logger.log(f"連続測定開始（{self.stream_mode_var.get()}, NPLC {self.nplc_var.get()}: "
+                        f"上限 約{limit:.0f} rdg/s, バッファ {capacity} 点）", "INFO")
 
-        # 結果のポーリング開始（短い間隔でUIを更新可能に保つ）
-        self.after(10, self._check_measurement_result)
+    def stop_continuous(self):
+        """連続測定を停止 (実行中の読み取りが終わってから TRIG HOLD)"""
+        if self.stream_reader is None or not self.stream_reader.running:
+            return
+        self.stream_reader.stop()
+        self.logger.log("連続測定 停止中...", "INFO")
+
+    def _on_stream_stopped(self, reader, error):
+        """読み取りスレッド終了後の処理 (メインスレッド)"""
+        if reader is self.stream_reader:
+            if self._stream_timer is not None:
+                self._stream_timer.cancel()
+                self._stream_timer = None
+            self._refresh_stream()
+
+        stats = reader.stats_snapshot()
+        if error:
+            self.logger.log(f"連続測定エラー: {error}", "ERROR")
+            self.check_error()
+        self.logger.log(f"連続測定停止（{stats['count']} 点, 総エラー数: {reader.errors}）", "INFO")
+
+    def _refresh_stream(self):
+        """ストリップチャート・統計・最新値の表示を更新 (UI バスの定期処理)"""
+        reader, buffer = self.stream_reader, self.stream_buffer
+        if reader is None or buffer is None:
+            return
+        unit = self.get_unit(self.mode_var.get())
+
+        chart_points = self._settings.section("dmm_stream").get("chart_points", STREAM_CHART_POINTS)
+        times, values = buffer.snapshot(last=chart_points)
+        self.stream_chart.plot(times, values, unit)
+
+        latest = reader.latest
+        if latest is not None:
+            raw_value = latest.strip()
+            self.result_label.config(text=f"{raw_value} {unit}")
+            self.panel_label.config(text=f"{self.format_panel_value(raw_value)} {unit}")
+
+        stats = reader.stats_snapshot()
+        labels = self.stream_stat_labels
+        labels["count"].config(text=str(stats["count"]))
+        labels["rate"].config(text=f"{reader.rate():.1f}")
+        for key in ("mean", "std", "min", "max", "pp"):
+            value = stats[key]
+            labels[key].config(text="--" if value is None or not stats["count"] else f"{value:.8g}")
+
+    def export_stream(self):
+        """リングバッファの内容を保存 (CSV / .npz)"""
+        buffer = self.stream_buffer
+        if buffer is None or len(buffer) == 0:
+            self.logger.log("保存するデータがありません", "ERROR")
+            return
 
-    def _measure_thread_worker(self):
-        """別スレッドで実行されるGPIB測定ワーカー
+        path = filedialog.asksaveasfilename(
+            title="連続測定データの保存",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("NumPy (.npz)", "*.npz")])
+        if not path:
+            return
 
-        GPIB通信（TRIG SGL → read）を実行し、結果をキューに入れる。
-        このメソッドはUIをブロックしない。
-        """
-        result = {
-            'success': False,
-            'response': None,
-            'error': None
+        meta = {
+            'dmm': {'function': self.mode_var.get(), 'range': self.range_var.get(),
+                    'nplc': self.nplc_var.get()},
+            'stream_mode': STREAM_MODES.get(self.stream_mode_var.get(), "auto"),
+            'stats': self.stream_reader.stats_snapshot() if self.stream_reader else None,
         }
 
-        try:
-            with self.measurement_lock:
-                # TRIG SGL でトリガー
-                success, _ = self.gpib.write("TRIG SGL")
-                if success:
-                    # 測定値読み取り（ここでNPLC分待機するが別スレッドなのでOK）
-                    success, response = self.gpib.read()
-                    if success:
-                        result['success'] = True
-                        result['response'] = response
-                    else:
-                        result['error'] = 'read_failed'
-                else:
-                    result['error'] = 'write_failed'
-        except Exception as e:
-            result['error'] = str(e)
-
-        # 結果をキューに入れる（メインスレッドで処理）
-        self.measurement_queue.put(result)
+        def worker():
+            success, message = dmm_stream.export(path, buffer, meta)
+            self._bus.post(self, self.logger.log, message, "SUCCESS" if success else "ERROR")
 
-    def _check_measurement_result(self):
-        """メインスレッドで測定結果をチェック・UI更新
+        threading.Thread(target=worker, daemon=True).start()
 
-        キューから結果を取得し、UIを更新。
-        結果がなければ再度ポーリングをスケジュール。
-        """
-        if not self.continuous_running:
+    def open_noise_window(self):
+        """連続測定のノイズ解析ウィンドウ (Allan 偏差・振幅スペクトル密度, LSB) を開く"""
+        if self.noise_window is not None and self.noise_window.winfo_exists():
+            self.noise_window.lift()
             return
+        from tabs.noise_window import NoiseWindow
 
-        try:
-            # キューから結果を取得（ノンブロッキング）
-            result = self.measurement_queue.get_nowait()
+        def sources():
+            if self.noise_analyzer is None:
+                return {}
+            return {"3458A 連続測定": self.noise_analyzer}
 
-            if result['success']:
-                try:
-                    # 生値表示
-                    raw_value = result['response'].strip()
-                    unit = self.get_unit(self.mode_var.get())
-                    self.result_label.config(text=f"{raw_value} {unit}")
-
-                    # パネル形式表示
-                    panel_value = self.format_panel_value(result['response'])
-                    self.panel_label.config(text=f"{panel_value} {unit}")
-                except ValueError:
-                    self.continuous_error_count += 1
-            else:
-                self.continuous_error_count += 1
-                # 10回に1回だけログ出力
-                if self.continuous_error_count % 10 == 0:
-                    error_msg = result.get('error', 'unknown')
-                    self.logger.log(f"読み取りエラー継続中（累計: {self.continuous_error_count}回, {error_msg}）", "ERROR")
+        self.noise_window = NoiseWindow(self.winfo_toplevel(), sources,
+                                        title="ノイズ解析 (DMM3458A 連続測定)")
 
-            # 次の測定をスケジュール
-            interval = self.calculate_measurement_interval()
-            self.after(interval, self.continuous_measure)
+    def destroy(self):
+        if self.stream_reader is not None:
+            self.stream_reader.stop()
+        super().destroy()
 
-        except queue.Empty:
-            # まだ結果がない → 短い間隔で再チェック（UIは応答可能）
-            self.after(20, self._check_measurement_result)
-    
     def check_error(self):
         """エラー内容を確認"""
         if not self.gpib.connected:
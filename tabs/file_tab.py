@@ -1,9 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, filedialog
 import os
-import json
 import re
 
+from utils import settings_store
+
 
 class FileTab(ttk.Frame):
     """
@@ -12,6 +13,8 @@ class FileTab(ttk.Frame):
     - 保存先を 3 種類（Pattern Test(温特) / Linearity / DC特性）まとめて表示
     - Linearity / DC特性 の StringVar は個別タブと共有するため、
       どちらの画面で変更しても相互に同期される
+    - 個別タブは遅延生成 (LazyTab) のため、参照は peek() で生成済みの場合のみ行い、
+      未生成時は設定ストアの値を使う
     - DEFシリアル番号・CSVファイル名はこのタブで保持（app_settings.json）
     """
 
@@ -31,48 +34,60 @@ class FileTab(ttk.Frame):
     # フォント
     HEADING_FONT = ("", 13, "bold")
 
-    def __init__(self, parent, linearity_tab=None, dc_char_tab=None, test_tab=None):
+    def __init__(self, parent, linearity_tab=None, dc_char_tab=None, test_tab=None,
+                 save_dir_vars=None):
+        """
+        Args:
+            linearity_tab / dc_char_tab / test_tab: タブまたは LazyTab ハンドル
+            save_dir_vars: {"linearity": StringVar, "dc_char": StringVar}
+                個別タブと共有する保存先 (タブ未生成でも共有できるようアプリ側で保持)
+        """
         super().__init__(parent)
         self.linearity_tab = linearity_tab
         self.dc_char_tab = dc_char_tab
         self.test_tab = test_tab
+        self.save_dir_vars = save_dir_vars or {}
 
-        self.config_file = "app_settings.json"
+        self._settings = settings_store.app_settings()
         self.config = self._load_config()
         self._apply_jobs = {}
 
         self._create_widgets()
 
+    @staticmethod
+    def _peer(tab_ref):
+        """タブ参照を解決 (LazyTab なら生成済みの場合のみタブを返す)"""
+        if tab_ref is not None and hasattr(tab_ref, "peek"):
+            return tab_ref.peek()
+        return tab_ref
+
+    def _shared_dir_var(self, section, tab_ref, default):
+        """個別タブと共有する保存先 StringVar を返す"""
+        var = self.save_dir_vars.get(section)
+        if var is None:
+            tab = self._peer(tab_ref)
+            if tab is not None and hasattr(tab, "save_dir"):
+                return tab.save_dir
+            var = tk.StringVar(value=self.config.get(section, {}).get("save_dir", default))
+        # 個別タブが未生成でも保存されるよう FileTab 側でも保存
+        var.trace_add("write", lambda *_: self._save_section_dir(section, var))
+        return var
+
     # ==================== 設定ファイル I/O ====================
     def _load_config(self):
-        """設定ファイル読み込み"""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"設定ファイル読み込みエラー: {e}")
-        return {}
+        """設定読み込み (設定ストアのコピー)"""
+        return self._settings.data()
 
     def _save_config(self):
         """
-        設定ファイル保存。
-        他タブ(linearity / dc_char など)の書き込みを上書きしないよう、
-        毎回ディスクを読み直して FileTab 所有セクションのみ差し替える。
+        設定保存。
+        他タブ(linearity / dc_char など)の変更を上書きしないよう、
+        FileTab 所有セクションのみ設定ストアへ反映する。
         """
-        try:
-            fresh: dict = {}
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    fresh = json.load(f)
-            for key in ("save_config", "comm_profiles", "serial_numbers"):
-                if key in self.config:
-                    fresh[key] = self.config[key]
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(fresh, f, indent=4, ensure_ascii=False)
-            self.config = fresh
-        except Exception as e:
-            print(f"設定ファイル保存エラー: {e}")
+        for key in ("save_config", "comm_profiles", "serial_numbers"):
+            if key in self.config:
+                self._settings.set(key, self.config[key])
+        self.config = self._settings.data()
 
     # ==================== ウィジェット構築 ====================
     def _create_widgets(self):
@@ -109,15 +124,8 @@ class FileTab(ttk.Frame):
         self._build_hint_row(folder_lf, self.pattern_hint_var)
 
         # --- Linearity: 個別タブの StringVar を共有（両方向同期） ---
-        if self.linearity_tab is not None and hasattr(self.linearity_tab, "save_dir"):
-            self.linearity_dir_var = self.linearity_tab.save_dir
-        else:
-            self.linearity_dir_var = tk.StringVar(
-                value=self.config.get("linearity", {}).get("save_dir", "linearity_data")
-            )
-            self.linearity_dir_var.trace_add(
-                "write", lambda *_: self._save_section_dir("linearity", self.linearity_dir_var)
-            )
+        self.linearity_dir_var = self._shared_dir_var(
+            "linearity", self.linearity_tab, "linearity_data")
         self._build_dir_row(
             folder_lf, "Linearity",
             self.linearity_dir_var,
@@ -127,15 +135,8 @@ class FileTab(ttk.Frame):
         self._build_hint_row(folder_lf, self.linearity_hint_var)
 
         # --- DC特性: 個別タブの StringVar を共有（両方向同期） ---
-        if self.dc_char_tab is not None and hasattr(self.dc_char_tab, "save_dir"):
-            self.dc_dir_var = self.dc_char_tab.save_dir
-        else:
-            self.dc_dir_var = tk.StringVar(
-                value=self.config.get("dc_char", {}).get("save_dir", "dc_char_data")
-            )
-            self.dc_dir_var.trace_add(
-                "write", lambda *_: self._save_section_dir("dc_char", self.dc_dir_var)
-            )
+        self.dc_dir_var = self._shared_dir_var(
+            "dc_char", self.dc_char_tab, "dc_char_data")
         self._build_dir_row(
             folder_lf, "DC特性",
             self.dc_dir_var,
@@ -434,9 +435,10 @@ class FileTab(ttk.Frame):
 
         # DEF 選択順を決定: Pattern Test のチェック状態を優先
         indices = list(range(6))
-        if self.test_tab is not None and hasattr(self.test_tab, "def_check_vars"):
+        test_tab = self._peer(self.test_tab)
+        if test_tab is not None and hasattr(test_tab, "def_check_vars"):
             checked = [
-                i for i, v in enumerate(self.test_tab.def_check_vars) if v.get()
+                i for i, v in enumerate(test_tab.def_check_vars) if v.get()
             ]
             if checked:
                 indices = checked
@@ -478,20 +480,26 @@ class FileTab(ttk.Frame):
     def _format_linearity_hint(self):
         """Linearity タブの設定から保存ファイル名サンプルを生成"""
         sn = self._sn_token()
-        lt = self.linearity_tab
-        if lt is None or not hasattr(lt, "dac_var"):
-            return f"例: {sn}_Position_linearity_出荷Sequence_YYYYMMDD_HHMMSS.xlsx / .png"
-        dac = lt.dac_var.get() or "Position"
-        raw_mode = (lt.pattern_mode.get() or "Ship").lower()
+        lt = self._peer(self.linearity_tab)
+        if lt is not None and hasattr(lt, "dac_var"):
+            dac = lt.dac_var.get() or "Position"
+            raw_mode = (lt.pattern_mode.get() or "Ship").lower()
+            pts = (lt.num_points.get() or "").strip()
+            pole = lt.pole_select.get() or "両極"
+        else:
+            # タブ未生成: 保存済み設定から生成
+            lin = self._settings.section("linearity")
+            dac = lin.get("dac_type") or "Position"
+            raw_mode = (lin.get("pattern_mode") or "Ship").lower()
+            pts = str(lin.get("num_points") or "").strip()
+            pole = lin.get("pole_select") or "両極"
         if raw_mode == "ship":
             mode = "出荷Sequence"
         elif raw_mode == "linear":
             mode = "sequential"
         else:
             mode = raw_mode
-        pts = (lt.num_points.get() or "").strip()
         pts_str = f"_{pts}pts" if raw_mode in ("random", "linear") and pts else ""
-        pole = lt.pole_select.get() or "両極"
         if pole in ("POS", "NEG"):
             return (
                 f"例: {sn}_{dac}_{pole}_linearity_{mode}{pts_str}"
@@ -505,7 +513,7 @@ class FileTab(ttk.Frame):
     def _format_dc_hint(self):
         """DC特性 タブの設定から保存ファイル名サンプルを生成"""
         sn = self._sn_token()
-        dt = self.dc_char_tab
+        dt = self._peer(self.dc_char_tab)
         if dt is None or not hasattr(dt, "test_type"):
             return f"例: {sn}_DC特性_POSTION_YYYYMMDD_HHMMSS.xlsx / .png"
         test_type = (dt.test_type.get() or "Position").lower()
@@ -514,20 +522,8 @@ class FileTab(ttk.Frame):
         return f"例: {sn}_DC特性_{title}_YYYYMMDD_HHMMSS.xlsx / .png"
 
     def _save_section_dir(self, section, var):
-        """
-        linearity_tab / dc_char_tab が未連携のときのフォールバック。
-        (通常は個別タブの StringVar を共有しているので呼ばれない)
-        """
+        """保存先を設定ストアへ保存 (個別タブ未生成でも反映されるよう FileTab 側で保存)"""
         path = (var.get() or "").strip()
         if not path:
             return
-        try:
-            fresh: dict = {}
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    fresh = json.load(f)
-            fresh.setdefault(section, {})["save_dir"] = path
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(fresh, f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            print(f"設定ファイル保存エラー: {e}")
+        self._settings.update(section, save_dir=path)
@@ -0,0 +1,106 @@
+import tkinter as tk
+from tkinter import ttk
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from utils import glitch_capture
+
+
+class GlitchWindow(tk.Toplevel):
+    """グリッチシーケンスで取得した 3458A 波形と解析結果のウィンドウ
+
+    Args:
+        steps: [{"label", "times", "volts", "transitions"}] (glitch_capture.save_sidecar と同じ形式)
+        lsb: 1LSB 電圧 (V)
+        path: 保存したサイドカーのパス (表示のみ、なければ None)
+    """
+
+    COLUMNS = (
+        ("step", "ステップ", 70),
+        ("count", "遷移数", 60),
+        ("peak", "最大ピーク [LSB]", 120),
+        ("area", "最大面積 [nV·s]", 120),
+        ("settling", "最大整定 [µs]", 110),
+    )
+
+    def __init__(self, parent, steps, lsb, path=None, title="グリッチ波形"):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("900x760")
+        self.steps = steps
+        self.lsb = lsb
+
+        self.create_widgets(path)
+        self.fill_table()
+        if steps:
+            self.tree.selection_set(self.tree.get_children()[0])
+
+    def create_widgets(self, path):
+        ttk.Label(self, text=f"保存先: {path}" if path else "保存なし", padding=(10, 5)).pack(fill=tk.X)
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in self.COLUMNS], show="headings", height=7)
+        for key, text, width in self.COLUMNS:
+            self.tree.heading(key, text=text)
+            self.tree.column(key, width=width, anchor=tk.E)
+        self.tree.pack(fill=tk.X, padx=10)
+        self.tree.bind("<<TreeviewSelect>>", lambda e: self.plot_selected())
+
+        self.figure = Figure(figsize=(8.5, 5.6), dpi=100)
+        self.ax_wave = self.figure.add_subplot(211)
+        self.ax_dev = self.figure.add_subplot(212)
+        self.figure.subplots_adjust(hspace=0.35)
+        self.canvas = FigureCanvasTkAgg(self.figure, self)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    def fill_table(self):
+        for i, step in enumerate(self.steps):
+            sm = glitch_capture.summarize(step['transitions'])
+            settling = "---" if sm['settling_us'] is None else f"{sm['settling_us']:.1f}"
+            if sm['unsettled']:
+                settling += f" (未整定 {sm['unsettled']})"
+            self.tree.insert("", tk.END, iid=str(i), values=(
+                step['label'], sm['count'],
+                "---" if sm['peak_lsb'] is None else f"{sm['peak_lsb']:+.1f}",
+                "---" if sm['area_nvs'] is None else f"{sm['area_nvs']:+.3g}",
+                settling))
+
+    def plot_selected(self):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        step = self.steps[int(selection[0])]
+        times_ms = step['times'] * 1e3
+        volts = step['volts']
+        transitions = step['transitions']
+
+        # 波形全体 (最初の整定値を 0 LSB とする) と遷移位置
+        ax = self.ax_wave
+        ax.clear()
+        base = transitions[0]['pre'] if transitions else float(volts[0])
+        ax.plot(times_ms, (volts - base) / self.lsb, lw=0.7)
+        for tr in transitions:
+            ax.axvline(tr['time'] * 1e3, color='red', lw=0.6, alpha=0.5)
+        ax.set_xlabel('Time [ms]')
+        ax.set_ylabel('Output [LSB]')
+        ax.set_title(f"ステップ {step['label']}")
+        ax.grid(True, alpha=0.3)
+
+        # 遷移ごとの整定値からの偏差を切り替え時刻で重ね描き
+        ax = self.ax_dev
+        ax.clear()
+        dt = float(step['times'][1] - step['times'][0]) if len(step['times']) > 1 else 1.0
+        for k, tr in enumerate(transitions):
+            end = transitions[k + 1]['index'] if k + 1 < len(transitions) else len(volts)
+            seg = slice(tr['index'] - 1, end)
+            t_us = (step['times'][seg] - tr['time']) * 1e6
+            ax.plot(t_us, (volts[seg] - tr['post']) / self.lsb, lw=0.7,
+                    color='tab:blue' if tr['step_lsb'] >= 0 else 'tab:orange')
+        settled = [tr['settling_s'] for tr in transitions if tr['settling_s'] is not None]
+        if settled:
+            ax.set_xlim(-2 * dt * 1e6, max(settled) * 3e6)
+        ax.set_xlabel('Time from transition [µs]')
+        ax.set_ylabel('Deviation [LSB]')
+        ax.grid(True, alpha=0.3)
+
+        self.canvas.draw_idle()
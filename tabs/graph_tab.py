@@ -1,9 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import csv
-import json
 import os
-from utils.graph_plotter import LSBGraphPlotter
+from utils import settings_store, temp_coef
+from utils.graph_plotter import LSBGraphPlotter, pyplot
 from utils.browse_helpers import pick_file
 
 
@@ -265,11 +265,9 @@ class GraphTab(ttk.Frame):
     
     def load_settings(self):
         """設定を読み込み"""
-        if os.path.exists(self.SETTINGS_FILE):
+        settings = settings_store.get_store(self.SETTINGS_FILE).data()
+        if settings:
             try:
-                with open(self.SETTINGS_FILE, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                
                 self.bit_precision_var.set(settings.get('bit_precision', '24'))
                 self.pos_full_var.set(settings.get('pos_full_voltage', '10.0'))
                 self.neg_full_var.set(settings.get('neg_full_voltage', '-10.0'))
@@ -325,10 +323,9 @@ class GraphTab(ttk.Frame):
                 'show_temp_arrows': self._show_temp_arrows,
                 'temp_zone_divs': [list(d) for d in self._temp_zone_divs]
             }
-            
-            with open(self.SETTINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, indent=4)
-            
+            # 変数トレースごとに呼ばれるため、書き込みは設定ストアで集約・遅延実行
+            settings_store.get_store(self.SETTINGS_FILE).set_many(settings)
+
         except Exception as e:
             print(f"設定の保存に失敗しました: {e}")
     
@@ -727,7 +724,7 @@ class GraphTab(ttk.Frame):
 
     def _apply_yaxis_to_temp_graph(self):
         """縦軸更新ボタン: 共通設定の値でグラフを再描画（位置保持）"""
-        import matplotlib.pyplot as plt
+        plt = pyplot()
 
         # 既存のグラフウィンドウの位置を保存
         graph_positions = []
@@ -944,7 +941,7 @@ class GraphTab(ttk.Frame):
 
     def _redraw_temp_graph(self):
         """温特グラフを再描画"""
-        import matplotlib.pyplot as plt
+        plt = pyplot()
         # 既存のグラフを閉じる
         plt.close('all')
         # 再描画
@@ -975,7 +972,7 @@ class GraphTab(ttk.Frame):
 
     def _redraw_temp_graph_preserve_position(self):
         """温特グラフを位置を保持して再描画"""
-        import matplotlib.pyplot as plt
+        plt = pyplot()
 
         # 既存のグラフウィンドウの位置を保存
         graph_positions = []
@@ -1071,7 +1068,7 @@ class GraphTab(ttk.Frame):
 
     def _close_all_temp_graphs(self):
         """表示している温特グラフを全て閉じる"""
-        import matplotlib.pyplot as plt
+        plt = pyplot()
 
         if hasattr(self, 'temp_graph_all_info') and self.temp_graph_all_info:
             for calc_info in self.temp_graph_all_info.values():
@@ -1249,13 +1246,10 @@ class GraphTab(ttk.Frame):
             from openpyxl import Workbook
             from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
             from openpyxl.utils import get_column_letter
-            import win32com.client
-            from PIL import Image
-            import io
         except ImportError as e:
             messagebox.showerror("エラー",
                 f"必要なライブラリがありません: {e}\n\n"
-                "pip install openpyxl pywin32 pillow")
+                "pip install openpyxl")
             return
 
         if not hasattr(self, 'temp_coef_serial_data') or not self.temp_coef_serial_data:
@@ -1275,7 +1269,7 @@ class GraphTab(ttk.Frame):
 
         saved_files = []
         errors = []
-        sheet_info = {}  # {serial: (last_row, last_col)}
+        sheet_info = {}  # {serial: (ws, last_row, last_col)}
 
         # 1つのワークブックに全シリアルのシートを作成
         wb = Workbook()
@@ -1293,7 +1287,7 @@ class GraphTab(ttk.Frame):
                 # テーブルデータをExcelに書き込み
                 last_row, last_col = self._write_excel_table(
                     ws, pos_sections, neg_sections, serial, spec_value)
-                sheet_info[serial] = (last_row, last_col)
+                sheet_info[serial] = (ws, last_row, last_col)
 
             except Exception as e:
                 errors.append(f"{serial}: {str(e)}")
@@ -1315,7 +1309,7 @@ class GraphTab(ttk.Frame):
         saved_files.append(excel_filename)
 
         # 各シートをPNGとして保存
-        for serial, (last_row, last_col) in sheet_info.items():
+        for serial, (ws, last_row, last_col) in sheet_info.items():
             try:
                 base_filename = f"温度係数_{serial}"
                 filename = f"{base_filename}.png"
@@ -1327,8 +1321,8 @@ class GraphTab(ttk.Frame):
                     filepath = os.path.join(folder_path, filename)
                     index += 1
 
-                # Excel COMでセル範囲を画像として保存
-                self._excel_range_to_png(excel_path, serial, f"A1:{get_column_letter(last_col)}{last_row}", filepath)
+                cell_range = f"A1:{get_column_letter(last_col)}{last_row}"
+                self._table_range_to_png(ws, excel_path, serial, cell_range, filepath)
                 saved_files.append(filename)
 
             except Exception as e:
@@ -1345,6 +1339,18 @@ class GraphTab(ttk.Frame):
         else:
             messagebox.showerror("エラー", "保存に失敗しました:\n" + "\n".join(errors))
 
+    def _table_range_to_png(self, ws, excel_path, sheet_name, cell_range, output_path):
+        """セル範囲をPNG保存 (ワークシートから直接描画、失敗時・renderer=excel は Excel COM)"""
+        renderer = settings_store.app_settings().section('png_export').get('renderer', 'agg')
+        if renderer != 'excel':
+            try:
+                from utils import sheet_raster
+                sheet_raster.render_range_png(ws, output_path, cell_range)
+                return
+            except Exception as e:
+                print(f"[温度係数] PNG直接描画エラー ({e})、Excel で再試行します")
+        self._excel_range_to_png(excel_path, sheet_name, cell_range, output_path)
+
     def _excel_range_to_png(self, excel_path, sheet_name, cell_range, output_path):
         """ExcelのセルをPNG画像として保存"""
         import win32com.client
@@ -1389,221 +1395,7 @@ class GraphTab(ttk.Frame):
 
     def _write_excel_table(self, ws, pos_sections, neg_sections, serial, spec_value):
         """Excelシートにテーブルを書き込み"""
-        from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-        from openpyxl.utils import get_column_letter
-
-        # スタイル定義
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        # 斜線ボーダー（左上から右下）
-        diagonal_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin'),
-            diagonal=Side(style='thin'),
-            diagonalDown=True
-        )
-        header_fill = PatternFill(start_color='D0D0D0', end_color='D0D0D0', fill_type='solid')
-        ng_fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
-        center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        right_align = Alignment(horizontal='right', vertical='center')
-
-        # ヘッダー
-        headers = ['ユニットNo.', '入力コード', '温度\n(℃)', '測定電圧\n(V)', 'ΔT\n(℃)',
-                   'ΔV\n(V)', '温度係数\n(ppm/℃)', 'スペック\n(ppm/℃)', '判定']
-        col_widths = [14, 10, 6, 12, 6, 12, 11, 10, 6]
-
-        for col, (header, width) in enumerate(zip(headers, col_widths), 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True, size=9)
-            cell.fill = header_fill
-            cell.border = thin_border
-            cell.alignment = center_align
-            ws.column_dimensions[get_column_letter(col)].width = width
-
-        # データ行
-        row_idx = 2
-        total_data_rows = 0
-
-        for sections, pole in [(pos_sections, "POS"), (neg_sections, "NEG")]:
-            if not sections:
-                continue
-
-            code_data = self._organize_sections_by_code(sections)
-            # DFH重複防止: serialが既にDFHで始まる場合はそのまま使用
-            if serial.upper().startswith('DFH'):
-                unit_name = f"1PB397MK2\n{serial}\n{pole}"
-            else:
-                unit_name = f"1PB397MK2\nDFH_{serial}\n{pole}"
-            unit_start_row = row_idx
-
-            # フルスケール計算
-            fffff_23 = code_data.get('FFFFF', {}).get(23, {}).get('voltage')
-            zero_23 = code_data.get('00000', {}).get(23, {}).get('voltage')
-            full_scale_23 = (fffff_23 - zero_23) if (fffff_23 is not None and zero_23 is not None) else None
-
-            for code in ['FFFFF', '80000', '00000']:
-                if code not in code_data:
-                    continue
-
-                temps_data = code_data[code]
-                code_start_row = row_idx
-
-                # 温度係数計算
-                tc_28 = dv_28 = tc_18 = dv_18 = None
-                if 28 in temps_data and 23 in temps_data:
-                    dv_28 = temps_data[28]['voltage'] - temps_data[23]['voltage']
-                    if full_scale_23:
-                        tc_28 = (dv_28 / full_scale_23) * 1e6 / 5.0
-
-                if 23 in temps_data and 18 in temps_data:
-                    dv_18 = temps_data[18]['voltage'] - temps_data[23]['voltage']
-                    if full_scale_23:
-                        tc_18 = (dv_18 / full_scale_23) * 1e6 / (-5.0)
-
-                jdg_28 = "OK" if tc_28 is not None and abs(tc_28) <= spec_value else ("NG" if tc_28 is not None else "")
-                jdg_18 = "OK" if tc_18 is not None and abs(tc_18) <= spec_value else ("NG" if tc_18 is not None else "")
-
-                # 6行作成（各温度2行）
-                for temp_idx, temp in enumerate([28, 23, 18]):
-                    voltage = temps_data.get(temp, {}).get('voltage')
-                    temp_start_row = row_idx
-
-                    for sub_row in range(2):
-                        # 温度セル（2行結合、最初のみ）
-                        if sub_row == 0:
-                            ws.cell(row=row_idx, column=3, value=temp).alignment = center_align
-                            ws.cell(row=row_idx, column=3).border = thin_border
-
-                        # 測定電圧（2行結合、最初のみ）
-                        if sub_row == 0 and voltage is not None:
-                            cell = ws.cell(row=row_idx, column=4, value=voltage)
-                            cell.alignment = right_align
-                            cell.number_format = '0.000000'
-                            cell.border = thin_border
-
-                        # ΔT, ΔV, 温度係数, 判定
-                        if temp_idx == 0 and sub_row == 1:  # 28→23
-                            c = ws.cell(row=row_idx, column=5, value=5.0)
-                            c.alignment = center_align
-                            c.number_format = '0.0'
-                            if dv_28 is not None:
-                                c = ws.cell(row=row_idx, column=6, value=dv_28)
-                                c.alignment = right_align
-                                c.number_format = '0.000000'
-                            if tc_28 is not None:
-                                c = ws.cell(row=row_idx, column=7, value=tc_28)
-                                c.alignment = center_align
-                                c.number_format = '0.0'
-                                if jdg_28 == "NG":
-                                    c.fill = ng_fill
-                            c = ws.cell(row=row_idx, column=9, value=jdg_28)
-                            c.alignment = center_align
-                            if jdg_28 == "NG":
-                                c.fill = ng_fill
-                        elif temp_idx == 1 and sub_row == 1:  # 23→18
-                            c = ws.cell(row=row_idx, column=5, value=-5.0)
-                            c.alignment = center_align
-                            c.number_format = '0.0'
-                            if dv_18 is not None:
-                                c = ws.cell(row=row_idx, column=6, value=dv_18)
-                                c.alignment = right_align
-                                c.number_format = '0.000000'
-                            if tc_18 is not None:
-                                c = ws.cell(row=row_idx, column=7, value=tc_18)
-                                c.alignment = center_align
-                                c.number_format = '0.0'
-                                if jdg_18 == "NG":
-                                    c.fill = ng_fill
-                            c = ws.cell(row=row_idx, column=9, value=jdg_18)
-                            c.alignment = center_align
-                            if jdg_18 == "NG":
-                                c.fill = ng_fill
-                        else:
-                            # 空セルに斜線（左上から右下への斜線）
-                            for col in [5, 6, 7, 9]:
-                                cell = ws.cell(row=row_idx, column=col)
-                                cell.border = diagonal_border
-
-                        # 全セルにボーダー適用（斜線セル以外）
-                        diagonal_cols = [5, 6, 7, 9] if not (temp_idx == 0 and sub_row == 1) and not (temp_idx == 1 and sub_row == 1) else []
-                        for col in range(1, 10):
-                            if col not in diagonal_cols:
-                                ws.cell(row=row_idx, column=col).border = thin_border
-
-                        row_idx += 1
-                        total_data_rows += 1
-
-                    # 温度・電圧セルの結合
-                    if temp_start_row < row_idx - 1:
-                        ws.merge_cells(start_row=temp_start_row, start_column=3,
-                                      end_row=row_idx - 1, end_column=3)
-                        ws.merge_cells(start_row=temp_start_row, start_column=4,
-                                      end_row=row_idx - 1, end_column=4)
-
-                # 入力コードセル結合（6行）
-                ws.cell(row=code_start_row, column=2, value=f"{code} H").alignment = center_align
-                if code_start_row < row_idx - 1:
-                    ws.merge_cells(start_row=code_start_row, start_column=2,
-                                  end_row=row_idx - 1, end_column=2)
-
-                # ΔT/ΔV/温度係数/判定の結合（28→23: row 2-3, 23→18: row 4-5）
-                for merge_row, cols in [
-                    (code_start_row + 1, [5, 6, 7, 9]),  # 28→23
-                    (code_start_row + 3, [5, 6, 7, 9])   # 23→18
-                ]:
-                    for col in cols:
-                        ws.merge_cells(start_row=merge_row, start_column=col,
-                                      end_row=merge_row + 1, end_column=col)
-
-            # ユニットNo.セル結合（18行）
-            ws.cell(row=unit_start_row, column=1, value=unit_name).alignment = center_align
-            if unit_start_row < row_idx - 1:
-                ws.merge_cells(start_row=unit_start_row, start_column=1,
-                              end_row=row_idx - 1, end_column=1)
-
-        # スペックセル結合（全データ行）
-        if total_data_rows > 0:
-            c = ws.cell(row=2, column=8, value=spec_value)
-            c.alignment = center_align
-            c.number_format = '0.0'
-            ws.merge_cells(start_row=2, start_column=8, end_row=row_idx - 1, end_column=8)
-
-        # 行の高さ設定
-        ws.row_dimensions[1].height = 28  # ヘッダー行
-        for r in range(2, row_idx):
-            ws.row_dimensions[r].height = 15
-
-        # 大外枠を太字に設定
-        last_row = row_idx - 1
-        last_col = 9
-        thick_side = Side(style='medium')
-        thin_side = Side(style='thin')
-
-        for row in range(1, last_row + 1):
-            for col in range(1, last_col + 1):
-                cell = ws.cell(row=row, column=col)
-                # 既存ボーダーを取得（斜線を保持）
-                existing = cell.border
-                new_left = thick_side if col == 1 else (existing.left or thin_side)
-                new_right = thick_side if col == last_col else (existing.right or thin_side)
-                new_top = thick_side if row == 1 else (existing.top or thin_side)
-                new_bottom = thick_side if row == last_row else (existing.bottom or thin_side)
-
-                cell.border = Border(
-                    left=new_left, right=new_right,
-                    top=new_top, bottom=new_bottom,
-                    diagonal=existing.diagonal,
-                    diagonalDown=existing.diagonalDown,
-                    diagonalUp=existing.diagonalUp
-                )
-
-        return row_idx - 1, 9  # 最終行、最終列
+        return temp_coef.write_sheet(ws, pos_sections, neg_sections, serial, spec_value)
 
     def _generate_html_table(self, pos_sections, neg_sections, serial, spec_value):
         """PNG保存用のHTMLテーブルを生成"""
@@ -2068,47 +1860,7 @@ class GraphTab(ttk.Frame):
 
     def _organize_sections_by_code(self, sections):
         """区間データをコードと温度で整理"""
-        # 温特パターン: FFFFF→00000→80000 を繰り返し
-        # 温度順: 23℃(1), 28℃, 18℃, 23℃(2), 23℃戻し
-        temp_mapping = {
-            0: 23,   # 23℃(1) - 基準値として使用
-            1: 28,   # 28℃
-            2: 18,   # 18℃
-            3: 23,   # 23℃(2)
-            4: 23,   # 23℃戻し - 参考値
-        }
-
-        code_data = {}  # {code: {temp: {'voltage': v, 'temp_set': idx}}}
-        codes_per_temp = 3
-
-        for i, section in enumerate(sections):
-            temp_set_idx = i // codes_per_temp
-            code = section['code']
-
-            if temp_set_idx not in temp_mapping:
-                continue
-
-            temp = temp_mapping[temp_set_idx]
-
-            if code not in code_data:
-                code_data[code] = {}
-
-            # 23℃は最初の値（temp_set_idx=0）を基準として使用
-            # 28℃、18℃はそれぞれ1回のみ
-            if temp == 23:
-                # 23℃(1)のデータを基準として使用（temp_set_idx=0）
-                if temp_set_idx == 0:
-                    code_data[code][temp] = {
-                        'voltage': section['avg_voltage'],
-                        'temp_set': temp_set_idx
-                    }
-            else:
-                code_data[code][temp] = {
-                    'voltage': section['avg_voltage'],
-                    'temp_set': temp_set_idx
-                }
-
-        return code_data
+        return temp_coef.organize_sections_by_code(sections)
 
     def _format_minutes(self, minutes):
         """分を時:分形式にフォーマット"""
@@ -1,18 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from tkinter.scrolledtext import ScrolledText
 import threading
-import queue
 import time
 import os
-import sys
-import json
-import random
 import numpy as np
-import openpyxl
-from openpyxl.styles import Font
 
 from utils.browse_helpers import pick_directory, pick_file
+from utils.log_console import LogBuffer, LogConsole
+from utils import (dmm_average, dmm_profiles, linearity_model, linearity_records, metrics, pattern_gen,
+                   raw_sidecar, run_journal, scanner_driver, settings_store, tracer, ui_bus)
 
 
 class LinearityTab(ttk.Frame):
@@ -30,45 +26,72 @@ class LinearityTab(ttk.Frame):
         'LBC':      {'inl': 0.50, 'dnl': 0.25},
     }
 
-    def __init__(self, parent, gpib_3458a, gpib_3499b, datagen_manager, test_tab):
+    def __init__(self, parent, gpib_3458a, gpib_3499b, datagen_manager, test_tab,
+                 save_dir_var=None):
+        """save_dir_var: ファイル保存タブと共有する保存先 StringVar (None なら自前で作成)"""
         super().__init__(parent)
         self.gpib_dmm = gpib_3458a
         self.gpib_scanner = gpib_3499b
         self.datagen = datagen_manager
         self.test_tab = test_tab
         self.scanner_slot = "1"
+        self._settings = settings_store.app_settings()
 
         self.is_running = False
         self._stop_event = threading.Event()
         self._worker_thread = None
-        self._update_queue = queue.Queue()
+        self._journal = None          # 計測中の極のジャーナル (途中再開用)
+        self._resume_paths = set()    # 開始時に再開を選んだジャーナル
+        self._resume_seeds = {}       # 再開する Random パターンのシード {(シリアル, 極): seed}
+        # ワーカー→UI 更新 (状態は最新値のみ、ログは一括で反映)
+        self._ui = ui_bus.channel(
+            self,
+            states={'target': self._on_target, 'voltage': self._on_voltage,
+                    'progress': self._on_progress},
+            appends={'log': self._on_logs},
+            events={'linear_pole_done': self._on_linear_pole_done,
+                    'ship_pole_done': self._on_ship_pole_done,
+                    'done': self._on_done})
         self._log_window = None
+        # 実行ログ (容量固定。ウィンドウを閉じていても直近分を保持)
+        self._log_buffer = LogBuffer(capacity=20000, name="linearity")
 
-        # Excel COM 排他制御: PNG 出力と merge が同一ファイルへ同時アクセスしないよう
-        # bg スレッド間・bg⇔UI の順序を強制する（低性能 PC での競合対策）
+        # Excel COM 排他制御: 出力パイプラインの COM ジョブ (PNG 出力・merge) を
+        # 同時に実行しない (低性能 PC での競合対策)。順序はジョブの依存関係で保証
         self._excel_lock = threading.Lock()
-        self._png_threads = []  # 未完了の PNG 出力スレッド追跡
 
         # 設定変数
         self.pattern_mode = tk.StringVar(value='Ship')
         self.num_points = tk.StringVar(value='64')
         self.pattern_file = tk.StringVar(value='')
+        self.random_seed = tk.StringVar(value='')   # Random のシード (空欄なら毎回新しく決める)
+        self._pattern_params = None   # 直前に生成した Random パターンの生成パラメータ (XLSX 記録用)
         self.dac_var = tk.StringVar(value='Position')
         self.pole_select = tk.StringVar(value='両極')  # 両極 / POS / NEG
         self.settle_time_var = tk.DoubleVar(value=0.2)
+        self.avg_count = tk.IntVar(value=1)          # DMM平均回数 (1 = 平均なし)
+        self.avg_method = tk.StringVar(value='STAT')  # STAT / FIFO
+        # DMM取得プロファイル (ベンチごとに保存、従来設定 = NPLC 5)
+        self.dmm_profile = tk.StringVar(value=dmm_profiles.label_of(dmm_profiles.selected('linearity')))
+        self._averager = None
+        self._dmm_nplc = 5           # 計測中の NPLC (読み取り待ちの上限の計算用)
+        self._dmm_avg_text = None    # 直前の極の DMM平均の記録 (XLSX 用)
         self.th_gain = tk.DoubleVar(value=0.01)
         self.th_offset = tk.DoubleVar(value=10.0)
         self.th_error = tk.DoubleVar(value=1.5)
-        self.save_dir = tk.StringVar(value='linearity_data')
+        self.save_dir = save_dir_var or tk.StringVar(value='linearity_data')
 
         self._load_settings()
         self._create_widgets()
 
         # 全設定変数の変更を監視して自動保存
         for var in [self.pattern_mode, self.num_points, self.dac_var, self.pole_select,
-                    self.settle_time_var, self.th_gain, self.th_offset,
-                    self.th_error, self.save_dir, self.pattern_file]:
+                    self.settle_time_var, self.avg_count, self.avg_method, self.th_gain,
+                    self.th_offset, self.th_error, self.save_dir, self.pattern_file,
+                    self.random_seed]:
             var.trace_add("write", lambda *_: self._save_settings())
+        self.dmm_profile.trace_add(
+            "write", lambda *_: dmm_profiles.select('linearity', dmm_profiles.name_of(self.dmm_profile.get())))
 
     # ==================== UI ====================
     def _create_widgets(self):
@@ -100,10 +123,11 @@ class LinearityTab(ttk.Frame):
 
         mode_frame = ttk.Frame(pat_frame)
         mode_frame.pack(fill=tk.X, pady=2)
-        ttk.Label(mode_frame, text="モード:").grid(row=0, column=0, sticky=tk.W, rowspan=2)
+        ttk.Label(mode_frame, text="モード:").grid(row=0, column=0, sticky=tk.W, rowspan=3)
         modes = [
             (0, 1, 'Ship', '出荷Sequence'), (0, 2, 'Random', 'Random'),
             (1, 1, 'Linear', 'Sequential'),  (1, 2, 'File', 'File(ｵﾌｾｯﾄﾊﾞｲﾅﾘ10進数 0～)'),
+            (2, 1, 'Model', 'Model(ビット重み)'),
         ]
         for r, c, value, label in modes:
             ttk.Radiobutton(mode_frame, text=label, variable=self.pattern_mode,
@@ -117,6 +141,9 @@ class LinearityTab(ttk.Frame):
                                        values=['32', '64', '128', '256', '512', '1024', '2048', '4096'],
                                        width=8, state='readonly')
         self.pts_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Label(pts_frame, text="シード:").pack(side=tk.LEFT)
+        self.seed_entry = ttk.Entry(pts_frame, textvariable=self.random_seed, width=11)
+        self.seed_entry.pack(side=tk.LEFT, padx=2)
 
         file_frame = ttk.Frame(pat_frame)
         file_frame.pack(fill=tk.X, pady=2)
@@ -150,6 +177,21 @@ class LinearityTab(ttk.Frame):
                      textvariable=self.settle_time_var, width=6, format="%.2f").pack(side=tk.LEFT, padx=2)
         ttk.Label(settle_frame, text="sec").pack(side=tk.LEFT)
 
+        avg_frame = ttk.Frame(dac_frame)
+        avg_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(avg_frame, text="DMM平均:").pack(side=tk.LEFT)
+        ttk.Spinbox(avg_frame, from_=1, to=1000, increment=1,
+                     textvariable=self.avg_count, width=6).pack(side=tk.LEFT, padx=2)
+        ttk.Label(avg_frame, text="回").pack(side=tk.LEFT)
+        ttk.Combobox(avg_frame, textvariable=self.avg_method, state="readonly", width=6,
+                     values=[m.upper() for m in dmm_average.METHODS]).pack(side=tk.LEFT, padx=(8, 0))
+
+        profile_frame = ttk.Frame(dac_frame)
+        profile_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(profile_frame, text="DMMプロファイル:").pack(side=tk.LEFT)
+        ttk.Combobox(profile_frame, textvariable=self.dmm_profile, state="readonly", width=10,
+                     values=dmm_profiles.labels()).pack(side=tk.LEFT, padx=2)
+
         # --- DEF選択&スキャナーCH (test_tabの変数を直接使用→両画面同期) ---
         def_frame = ttk.LabelFrame(parent, text="DEF選択&スキャナーCH", padding=4)
         def_frame.pack(fill=tk.X, pady=(0, 5))
@@ -287,78 +329,58 @@ class LinearityTab(ttk.Frame):
         toolbar.pack(fill=tk.X, padx=5, pady=2)
         ttk.Button(toolbar, text="クリア", command=self._clear_log, width=8).pack(side=tk.LEFT)
 
-        self.log_text = ScrolledText(self._log_window, wrap=tk.WORD,
-                                      state=tk.DISABLED, font=('Courier', 9))
-        self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
-        self.log_text.tag_config('INFO', foreground='black')
-        self.log_text.tag_config('SUCCESS', foreground='green')
-        self.log_text.tag_config('WARNING', foreground='orange')
-        self.log_text.tag_config('ERROR', foreground='red')
-
-        # 既存ログがあれば復元
-        if hasattr(self, '_log_buffer'):
-            self.log_text.config(state=tk.NORMAL)
-            for msg, level in self._log_buffer:
-                ms = 0
-                self.log_text.insert(tk.END, f"{msg}\n", level)
-            self.log_text.see(tk.END)
-            self.log_text.config(state=tk.DISABLED)
+        # バッファ内の既存ログも含めて表示
+        LogConsole(self._log_window, buffer=self._log_buffer, wrap=tk.WORD,
+                   font=('Courier', 9), show_filter=True).pack(
+            fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
 
     def _clear_log(self):
         """ログをクリア"""
-        if hasattr(self, 'log_text') and self.log_text.winfo_exists():
-            self.log_text.config(state=tk.NORMAL)
-            self.log_text.delete('1.0', tk.END)
-            self.log_text.config(state=tk.DISABLED)
-        if hasattr(self, '_log_buffer'):
-            self._log_buffer.clear()
+        self._log_buffer.clear()
 
     # ==================== 設定 ====================
     def _load_settings(self):
         try:
-            if os.path.exists('app_settings.json'):
-                with open('app_settings.json', 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                lin = config.get('linearity', {})
-                self.pattern_mode.set(lin.get('pattern_mode', 'Ship'))
-                self.num_points.set(lin.get('num_points', '64'))
-                dac_type = lin.get('dac_type')
-                if dac_type:
-                    self.dac_var.set(dac_type)
-                elif lin.get('lbc', False):
-                    self.dac_var.set('LBC')
-                else:
-                    self.dac_var.set('Position')
-                self.pole_select.set(lin.get('pole_select', '両極'))
-                self.settle_time_var.set(lin.get('settle_time', 0.2))
-                self.th_gain.set(lin.get('th_gain', 0.01))
-                self.th_offset.set(lin.get('th_offset', 10.0))
-                self.th_error.set(lin.get('th_error', 1.5))
-                self.save_dir.set(lin.get('save_dir', 'linearity_data'))
-                self.pattern_file.set(lin.get('pattern_file', ''))
+            lin = self._settings.section('linearity')
+            self.pattern_mode.set(lin.get('pattern_mode', 'Ship'))
+            self.num_points.set(lin.get('num_points', '64'))
+            dac_type = lin.get('dac_type')
+            if dac_type:
+                self.dac_var.set(dac_type)
+            elif lin.get('lbc', False):
+                self.dac_var.set('LBC')
+            else:
+                self.dac_var.set('Position')
+            self.pole_select.set(lin.get('pole_select', '両極'))
+            self.settle_time_var.set(lin.get('settle_time', 0.2))
+            self.avg_count.set(lin.get('avg_count', 1))
+            self.avg_method.set(lin.get('avg_method', 'STAT'))
+            self.th_gain.set(lin.get('th_gain', 0.01))
+            self.th_offset.set(lin.get('th_offset', 10.0))
+            self.th_error.set(lin.get('th_error', 1.5))
+            self.save_dir.set(lin.get('save_dir', 'linearity_data'))
+            self.pattern_file.set(lin.get('pattern_file', ''))
+            self.random_seed.set(lin.get('random_seed', ''))
         except Exception:
             pass
 
     def _save_settings(self):
         try:
-            config = {}
-            if os.path.exists('app_settings.json'):
-                with open('app_settings.json', 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            config['linearity'] = {
+            self._settings.set('linearity', {
                 'pattern_mode': self.pattern_mode.get(),
                 'num_points': self.num_points.get(),
                 'dac_type': self.dac_var.get(),
                 'pole_select': self.pole_select.get(),
                 'settle_time': self.settle_time_var.get(),
+                'avg_count': self.avg_count.get(),
+                'avg_method': self.avg_method.get(),
                 'th_gain': self.th_gain.get(),
                 'th_offset': self.th_offset.get(),
                 'th_error': self.th_error.get(),
                 'save_dir': self.save_dir.get(),
                 'pattern_file': self.pattern_file.get(),
-            }
-            with open('app_settings.json', 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+                'random_seed': self.random_seed.get(),
+            })
         except Exception:
             pass
 
@@ -367,9 +389,11 @@ class LinearityTab(ttk.Frame):
         mode = self.pattern_mode.get()
         is_file = mode == 'File'
         is_ship = mode == 'Ship'
+        is_model = mode == 'Model'
         self.file_entry.config(state=tk.NORMAL if is_file else tk.DISABLED)
         self.file_browse_btn.config(state=tk.NORMAL if is_file else tk.DISABLED)
-        if is_file or is_ship:
+        self.seed_entry.config(state=tk.NORMAL if mode == 'Random' else tk.DISABLED)
+        if is_file or is_ship or is_model:
             self.pts_combo.config(state=tk.NORMAL)
             self.num_points.set('')
             self.pts_combo.config(state=tk.DISABLED)
@@ -429,9 +453,11 @@ class LinearityTab(ttk.Frame):
         0xDFFF, 0xE000, 0xEFFF, 0xF000, 0xFFFF,
     ]
 
-    def _generate_pattern(self, bits, pole='POS'):
+    def _generate_pattern(self, bits, pole='POS', seed=None):
+        """計測パターン (seed: Random のシード。None ならシード欄の値、空欄なら新しく決める)"""
         mode = self.pattern_mode.get()
         max_val = (1 << bits) - 1
+        self._pattern_params = None
 
         if mode == 'File':
             values = []
@@ -458,6 +484,14 @@ class LinearityTab(ttk.Frame):
                 else:
                     return list(self.SHIP_PATTERN_LBC)
 
+        if mode == 'Model':
+            # ビット重みモデル用の設計コード (点数は bit 数と冗長点数で決まる)
+            cfg = self._model_config()
+            vals = linearity_model.design_codes(bits, cfg['redundancy'], cfg['seed'])
+            if pole == 'NEG':
+                vals.reverse()
+            return vals
+
         n = int(self.num_points.get())
         if mode == 'Linear':
             if n <= 1:
@@ -469,8 +503,18 @@ class LinearityTab(ttk.Frame):
             if pole == 'NEG':
                 vals.reverse()
             return vals
-        else:  # Random (VBAマクロ準拠: 未ソート、重複許可)
-            return [random.randint(0, max_val) for _ in range(n)]
+        else:  # Random (VBAマクロ準拠: 未ソート。シード付きの層別サンプリング)
+            cfg = self._pattern_gen_config()
+            seed_str = self.random_seed.get().strip()
+            if seed is None:
+                try:
+                    seed = int(seed_str) if seed_str else None
+                except ValueError:
+                    raise ValueError(f"シードが整数ではありません: {seed_str}")
+            vals, params = pattern_gen.generate(
+                bits, n, cfg['method'], seed, cfg['force'], cfg['carry_bits'])
+            self._pattern_params = pattern_gen.describe(params)
+            return vals
 
     # ==================== 計測制御 ====================
     def start_measurement(self):
@@ -490,6 +534,7 @@ class LinearityTab(ttk.Frame):
             return
 
         self._save_settings()
+        self._resume_paths, self._resume_seeds = self._ask_resume(defs)
         self.is_running = True
         self._stop_event.clear()
         self.start_btn.config(state=tk.DISABLED)
@@ -509,7 +554,6 @@ class LinearityTab(ttk.Frame):
 
         self._worker_thread = threading.Thread(target=self._measurement_worker, daemon=True)
         self._worker_thread.start()
-        self._poll_updates()
 
     def stop_measurement(self):
         self.log("=== 停止要求 ===", "WARNING")
@@ -521,6 +565,117 @@ class LinearityTab(ttk.Frame):
         self.stop_btn.config(state=tk.DISABLED)
         self.target_label.config(text="完了")
 
+    def _selected_poles(self):
+        """極性フィルタ (両極 / POS / NEG) で計測する極"""
+        pole_sel = self.pole_select.get()
+        if pole_sel in ('POS', 'NEG'):
+            return [pole_sel]
+        return ['POS', 'NEG']
+
+    # ==================== チェックポイント ====================
+    def _journal_dir(self):
+        return os.path.join(self.save_dir.get(), 'journal')
+
+    def _ask_resume(self, defs):
+        """同じ条件 (シリアル・DAC・極・パターン) の未完了ジャーナルがあれば再開するか確認
+
+        シリアル・DAC・極が同じジャーナルを探し、現在の設定でパターンを作り直して
+        pattern_hash が一致するものを再開対象にする。シード空欄の Random はジャーナルに
+        記録したシード (pattern_params) でパターンを作り直す。
+        Returns:
+            (再開するジャーナルのパスの集合, 再開する Random のシード {(シリアル, 極): seed})
+            「いいえ」なら空で、見つかったジャーナルは削除して最初から計測
+        """
+        dac_name = self.dac_var.get()
+        bits = self.DAC_SPECS[dac_name]['bits']
+        found = []
+        seeds = {}
+        for pole in self._selected_poles():
+            for def_info in defs:
+                serial_no = self._get_serial_number(def_info['index'])
+                for path in run_journal.find(self._journal_dir(), serial_no, dac_name, pole):
+                    try:
+                        meta, records, _ = run_journal.read(path)
+                        seed = self._journal_seed(meta)
+                        phash = run_journal.pattern_hash(self._generate_pattern(bits, pole, seed))
+                    except (OSError, ValueError, KeyError):
+                        continue
+                    if phash != meta.get('pattern_hash'):
+                        continue
+                    if seed is not None:
+                        seeds[(serial_no, pole)] = seed
+                    found.append((path, f"{serial_no} {dac_name} {pole}: "
+                                        f"{len(records)}/{meta.get('points', '?')}点 "
+                                        f"({meta.get('started', '')})"))
+                    break   # 同じ条件で一致したうち最新のもの
+        if not found:
+            return set(), {}
+        lines = '\n'.join(text for _, text in found)
+        if messagebox.askyesno(
+                "確認", f"途中で終了した計測があります:\n{lines}\n\n"
+                        f"続きから計測しますか? (いいえ: 最初から計測)"):
+            return {path for path, _ in found}, seeds
+        for path, _ in found:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return set(), {}
+
+    def _journal_seed(self, meta):
+        """シード空欄の Random で、ジャーナルに記録したパターンのシード (それ以外は None)"""
+        if (self.pattern_mode.get() != 'Random' or self.random_seed.get().strip()
+                or meta.get('mode') != 'Random' or not meta.get('pattern_params')):
+            return None
+        return pattern_gen.parse(meta['pattern_params'])['seed']
+
+    def _open_journal(self, path, meta):
+        """極のジャーナルを開く (再開対象なら既存の点を読み込む)
+
+        Returns:
+            (journal, records) records は [(番号, コード, 電圧, 時刻), ...]
+        """
+        if path in self._resume_paths:
+            try:
+                journal, _, records = run_journal.Journal.resume(path)
+                return journal, records
+            except (OSError, ValueError) as e:
+                self._queue_update('log', (f"  ジャーナル読込エラー: {e} (最初から計測)", "WARNING"))
+        return run_journal.Journal.create(path, meta), []
+
+    def _close_journal(self, discard=False):
+        if self._journal is None:
+            return
+        try:
+            if discard:
+                self._journal.discard()
+            else:
+                self._journal.close()
+        except OSError as e:
+            self._queue_update('log', (f"  ジャーナル保存エラー: {e}", "WARNING"))
+        self._journal = None
+
+    def _save_sidecar(self, name, meta, pattern, x_vals, y_vals, t_vals, s_vals=None, n_vals=None):
+        """計測生データのサイドカー (.npz) を保存先に出力 (再解析用)
+
+        DMM平均時は各点の標準偏差 (sdev) と平均点数 (nsamp) も保存する。
+        """
+        path = os.path.join(self.save_dir.get(), name)
+        arrays = {
+            'codes': np.asarray(x_vals, dtype=np.int64),
+            'volts': np.asarray(y_vals, dtype=float),
+            'times': np.asarray(t_vals, dtype=float),
+            'pattern': np.asarray(pattern, dtype=np.int64),
+        }
+        if s_vals is not None:
+            arrays['sdev'] = np.asarray(s_vals, dtype=float)
+            arrays['nsamp'] = np.asarray(n_vals, dtype=np.int64)
+        try:
+            os.makedirs(self.save_dir.get(), exist_ok=True)
+            raw_sidecar.save(path, {'kind': 'linearity', **meta}, arrays)
+        except OSError as e:
+            self._queue_update('log', (f"  生データ保存エラー: {e}", "WARNING"))
+
     # ==================== DEF情報取得 ====================
     def _get_selected_defs(self):
         selected = []
@@ -541,9 +696,7 @@ class LinearityTab(ttk.Frame):
 
     def _get_serial_number(self, def_index):
         try:
-            with open('app_settings.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            sn = config.get('comm_profiles', {}).get('1', {}).get('serial_numbers', {})
+            sn = self._settings.section('comm_profiles').get('1', {}).get('serial_numbers', {})
             return sn.get(f'DEF{def_index}_sn', f'DEF{def_index}')
         except Exception:
             return f'DEF{def_index}'
@@ -560,6 +713,12 @@ class LinearityTab(ttk.Frame):
             self._scanner_cpon()
             time.sleep(0.5)
 
+            # GPIB の完了待ちをサービスリクエスト (SRQ) で行う (使えなければシリアルポール)
+            for gpib in (self.gpib_scanner, self.gpib_dmm):
+                success, message = gpib.enable_events()
+                self._queue_update('log', (f"{gpib.device_type}: {message}",
+                                           "INFO" if success else "WARNING"))
+
             dac_types = [self.dac_var.get()]
             is_ship = self.pattern_mode.get() == 'Ship'
 
@@ -581,14 +740,30 @@ class LinearityTab(ttk.Frame):
                 self._datagen_send(f"alt s sa {ci_cmd}")
                 time.sleep(0.1)
 
-                # DMM設定: NPLC 5 + レンジ
-                self._queue_update('log', ("DMM NPLC 5 設定", "INFO"))
-                self.gpib_dmm.write("NPLC 5")
-                time.sleep(0.1)
-                self._queue_update('log', (f"DMM Range: DCV {dmm_range}", "INFO"))
-                self.gpib_dmm.write(f"DCV {dmm_range}")
+                # DMM設定: プロファイル (NPLC・AZERO・ARANGE・DISP) + レンジ、従来設定は NPLC 5 + レンジ
+                # (従来設定でも前回のプロファイルの AZERO OFF 等が残らないよう既定値に戻す)
+                profile = dmm_profiles.name_of(self.dmm_profile.get())
+                if profile:
+                    nplc = dmm_profiles.PROFILES[profile]['nplc']
+                    success, message = dmm_profiles.apply(self.gpib_dmm, profile, "DCV", dmm_range)
+                    self._queue_update('log', (f"DMM Range: DCV {dmm_range}, {message}",
+                                               "INFO" if success else "ERROR"))
+                else:
+                    nplc = 5
+                    success, message = dmm_profiles.apply_conventional(self.gpib_dmm, nplc, "DCV", dmm_range)
+                    self._queue_update('log', (f"DMM Range: DCV {dmm_range}, {message}",
+                                               "INFO" if success else "ERROR"))
+                self._dmm_nplc = nplc
                 time.sleep(0.3)
 
+                # DMM平均: NRDGS n 点を 1 回のトリガーで取得 (1 点ずつ TRIG SGL を往復しない)
+                self._averager = dmm_average.DMMAverager(
+                    self.gpib_dmm, self._avg_count_value(), self.avg_method.get().lower(), nplc=nplc)
+                if self._averager.enabled:
+                    success, message = self._averager.arm()
+                    self._queue_update('log', (message, "INFO" if success else "ERROR"))
+                averaging = self._averager.enabled
+
                 for def_info in selected_defs:
                     if self._stop_event.is_set():
                         break
@@ -596,18 +771,10 @@ class LinearityTab(ttk.Frame):
                     serial_no = self._get_serial_number(def_info['index'])
                     ship_pole_results = {}
                     linear_pole_results = {}
+                    merge_deps = []   # 統合前に完了が必要な出力ジョブ
                     common_timestamp = time.strftime('%Y%m%d_%H%M%S')
 
-                    # 極性フィルタ
-                    pole_sel = self.pole_select.get()
-                    if pole_sel == 'POS':
-                        poles = ['POS']
-                    elif pole_sel == 'NEG':
-                        poles = ['NEG']
-                    else:
-                        poles = ['POS', 'NEG']
-
-                    for pole in poles:
+                    for pole in self._selected_poles():
                         if self._stop_event.is_set():
                             break
 
@@ -622,7 +789,8 @@ class LinearityTab(ttk.Frame):
 
                         # パターン生成 (出荷SequenceはPOS/NEGで異なるパターン)
                         try:
-                            sweep_values = self._generate_pattern(bits, pole)
+                            sweep_values = self._generate_pattern(
+                                bits, pole, self._resume_seeds.get((serial_no, pole)))
                         except ValueError as e:
                             self._queue_update('log', (str(e), "ERROR"))
                             continue
@@ -630,6 +798,14 @@ class LinearityTab(ttk.Frame):
                         self._queue_update('log', (
                             f"  {pole} パターン: {len(sweep_values)}点, "
                             f"安定待ち: {settle_time}秒", "INFO"))
+                        if self._pattern_params:
+                            cov = pattern_gen.coverage(sweep_values, bits)
+                            self._queue_update('log', (
+                                f"  生成: {self._pattern_params} / "
+                                f"区間充足 {cov['bin_fill'] * 100:.1f}%, "
+                                f"最大間隔 {cov['max_gap']} LSB (理想の{cov['gap_ratio']:.2f}倍), "
+                                f"ビットON率 {cov['bit_on_min']:.3f}~{cov['bit_on_max']:.3f}",
+                                "INFO"))
 
                         ch_number = channel.replace("CH", "")
                         channel_addr = f"@{self.scanner_slot}{ch_number}"
@@ -642,35 +818,79 @@ class LinearityTab(ttk.Frame):
                         # スキャナーCH切替
                         self._switch_scanner(channel_addr, switch_delay)
 
-                        # Center設定
-                        self._datagen_set_value(center_hex, ci_cmd, pole_cmd)
-                        time.sleep(settle_time)
+                        # 計測条件 (ジャーナル・サイドカーに記録)
+                        total_pts = len(sweep_values)
+                        phash = run_journal.pattern_hash(sweep_values)
+                        run_meta = {
+                            'serial_no': serial_no, 'def_name': def_info['name'],
+                            'dac': dac_name, 'bits': bits, 'span': span, 'pole': pole,
+                            'mode': self.pattern_mode.get(), 'points': total_pts,
+                            'pattern_params': self._pattern_params,
+                            'pattern_file': self._record_pattern_file(),
+                            'pattern_hash': phash,
+                            'dmm': {'function': 'DCV', 'range': dmm_range, 'nplc': nplc,
+                                    'profile': profile,
+                                    'avg_count': self._averager.count,
+                                    'avg_method': self._averager.method},
+                            'settle_time': settle_time, 'switch_delay': switch_delay,
+                            'thresholds': {'gain': self.th_gain.get(),
+                                           'offset': self.th_offset.get(),
+                                           'error': self.th_error.get()},
+                            'criteria': self.SHIP_CRITERIA[dac_name],
+                            'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+                        }
+
+                        # チェックポイント: 計測した点をジャーナルへ追記 (途中再開用)
+                        journal_path = run_journal.journal_path(
+                            self._journal_dir(), serial_no, dac_name, pole, phash)
+                        self._journal, records = self._open_journal(journal_path, run_meta)
 
                         # 計測ループ (POS/NEGそれぞれ専用パターンでスイープ)
-                        x_vals = []
-                        y_vals = []
-                        total_pts = len(sweep_values)
+                        x_vals = [code for _, code, _, _ in records]
+                        y_vals = [volt for _, _, volt, _ in records]
+                        t_vals = [t for _, _, _, t in records]
+                        # DMM平均の標準偏差・点数 (ジャーナルから再開した点は不明)
+                        s_vals = [float('nan')] * len(records)
+                        n_vals = [0] * len(records)
+                        start_idx = records[-1][0] + 1 if records else 0
+                        mask = (1 << bits) - 1
+                        shift = 20 - bits  # LBC(16bit)は上詰め(4bit左シフト)
+
+                        if start_idx == 0:
+                            # Center設定
+                            self._datagen_set_value(center_hex, ci_cmd, pole_cmd)
+                            tracer.sleep(settle_time, "settle", code=center_hex)
+                        elif start_idx < total_pts:
+                            # 再開: Center は経由せず、ループの最初の点 (再開コード) の設定・安定待ちから計測
+                            self._queue_update('log', (
+                                f"  再開: {len(records)}点読込済み、{start_idx + 1}点目から計測", "INFO"))
 
                         for idx, val in enumerate(sweep_values):
+                            if idx < start_idx:
+                                continue
                             if self._stop_event.is_set():
                                 break
 
-                            mask = (1 << bits) - 1
-                            shift = 20 - bits  # LBC(16bit)は上詰め(4bit左シフト)
                             hex_str = f"{(val & mask) << shift:05X}"
 
                             # DAC値設定
                             self._datagen_set_value(hex_str, ci_cmd, pole_cmd)
-                            time.sleep(settle_time)
+                            tracer.sleep(settle_time, "settle", code=hex_str)
 
                             # DMM計測
-                            voltage = self._measure_voltage()
+                            voltage, sdev, nsamp = self._measure_voltage()
                             if voltage is not None:
+                                t = time.time()
                                 x_vals.append(val)
                                 y_vals.append(voltage)
+                                t_vals.append(t)
+                                s_vals.append(sdev if sdev is not None else float('nan'))
+                                n_vals.append(nsamp)
+                                self._journal.append(idx, val, voltage, t)
                                 self._queue_update('voltage', f"{voltage:.6f} V")
+                                avg_str = f" (σ={sdev:.2E} V, n={nsamp})" if sdev is not None else ""
                                 self._queue_update('log', (
-                                    f"  [{idx+1}/{total_pts}] {hex_str} → {voltage:.6f} V",
+                                    f"  [{idx+1}/{total_pts}] {hex_str} → {voltage:.6f} V{avg_str}",
                                     "INFO"))
                             else:
                                 self._queue_update('voltage', "--- V")
@@ -685,8 +905,23 @@ class LinearityTab(ttk.Frame):
                         self._datagen_set_value(center_hex, ci_cmd, pole_cmd)
 
                         if self._stop_event.is_set():
+                            # 停止時はジャーナルを残し、次回開始時に続きから計測できるようにする
+                            self._close_journal()
+                            self._queue_update('log', (
+                                f"  途中データ保存: {len(x_vals)}/{total_pts}点 → {journal_path}",
+                                "INFO"))
                             break
 
+                        # 生データのサイドカー (.npz) を保存してからジャーナルを削除
+                        self._save_sidecar(
+                            f"{serial_no}_{dac_name}_linearity_{self._mode_name()}_"
+                            f"{common_timestamp}_{pole}.npz",
+                            run_meta, sweep_values, x_vals, y_vals, t_vals,
+                            *((s_vals, n_vals) if averaging else ()))
+                        self._close_journal(discard=True)
+                        self._dmm_avg_text = (linearity_records.avg_summary(
+                            self._averager.describe(), s_vals) if averaging else None)
+
                         if len(x_vals) < 2:
                             self._queue_update('log', (
                                 "計測点不足、解析スキップ", "WARNING"))
@@ -695,29 +930,14 @@ class LinearityTab(ttk.Frame):
                         if is_ship:
                             # --- 出荷Sequenceモード: INL/DNL (Excelマクロ準拠) ---
                             # コード昇順にソート (降順パターンの場合に対応)
-                            paired = sorted(zip(x_vals, y_vals))
-                            x_vals = [p[0] for p in paired]
-                            y_vals = [p[1] for p in paired]
-
-                            ship_results = self._calculate_linearity_ship(
-                                x_vals, y_vals, bits, dac_name)
-
                             criteria = self.SHIP_CRITERIA[dac_name]
-                            inl_arr = np.array(ship_results['inl'])
-                            dnl_vals = [d for d in ship_results['dnl'] if d is not None]
-                            dnl_arr = np.array(dnl_vals) if dnl_vals else np.array([0.0])
-
-                            inl_max_p = float(np.max(inl_arr))
-                            inl_max_n = float(np.min(inl_arr))
-                            dnl_max_p = float(np.max(dnl_arr))
-                            dnl_max_n = float(np.min(dnl_arr))
-
-                            inl_ok = max(abs(inl_max_p), abs(inl_max_n)) <= criteria['inl']
-                            dnl_ok = max(abs(dnl_max_p), abs(dnl_max_n)) <= criteria['dnl']
-                            judge = 'OK' if (inl_ok and dnl_ok) else 'NG'
-
-                            inl_worst = inl_max_n if abs(inl_max_n) >= abs(inl_max_p) else inl_max_p
-                            dnl_worst = dnl_max_n if abs(dnl_max_n) >= abs(dnl_max_p) else dnl_max_p
+                            x_vals, y_vals, summary = linearity_records.ship_analysis(
+                                x_vals, y_vals, bits, dac_name, criteria)
+                            ship_results = summary['ship_results']
+                            inl_max_p, inl_max_n = summary['inl_max'], summary['inl_min']
+                            dnl_max_p, dnl_max_n = summary['dnl_max'], summary['dnl_min']
+                            judge = summary['judge']
+                            inl_worst, dnl_worst = summary['inl_worst'], summary['dnl_worst']
 
                             self._queue_update('log', (
                                 f"  INL: {inl_max_n:+.4f} ~ {inl_max_p:+.4f} LSB "
@@ -727,25 +947,13 @@ class LinearityTab(ttk.Frame):
                                 "ERROR" if judge == 'NG' else "SUCCESS"
                             ))
 
-                            # XLSX保存 (POS: 最終ファイル名, NEG: 一時ファイル)
-                            save_dir = self.save_dir.get()
-                            os.makedirs(save_dir, exist_ok=True)
-                            base_name = (f"{serial_no}_{dac_name}_linearity_"
-                                         f"出荷Sequence_{common_timestamp}")
-                            if pole == 'POS':
-                                xlsx_filepath = os.path.join(
-                                    save_dir, base_name + '.xlsx')
-                            else:
-                                xlsx_filepath = os.path.join(
-                                    save_dir, base_name + '_tmp.xlsx')
-
-                            xlsx_path, _ = self._save_xlsx_ship(
-                                ship_results, x_vals, y_vals,
-                                dac_name, pole, def_info, serial_no, bits,
-                                filepath=xlsx_filepath)
-                            if xlsx_path:
-                                self._queue_update('log', (
-                                    f"  XLSX保存: {xlsx_path}", "SUCCESS"))
+                            # XLSX・PNG 出力は出力パイプラインで実行 (計測は次の極へ進む)
+                            xlsx_filepath = self._pole_xlsx_path(
+                                f"{serial_no}_{dac_name}_linearity_"
+                                f"出荷Sequence_{common_timestamp}",
+                                pole, ship_pole_results)
+                            record = self._ship_record(
+                                y_vals, dac_name, pole, serial_no, bits, xlsx_filepath)
 
                             pole_data = {
                                 'def_name': def_info['name'],
@@ -758,40 +966,41 @@ class LinearityTab(ttk.Frame):
                                 'x_vals': x_vals,
                                 'serial_no': serial_no,
                                 'bits': bits,
-                                'xlsx_path': xlsx_path,
+                                'xlsx_path': xlsx_filepath if record else None,
                             }
                             ship_pole_results[pole] = pole_data
+                            merge_deps += self._submit_pole_exports(
+                                'ship', pole_data, 'write_ship', record)
 
                             # サマリー更新 + PNG表示を即時キュー
                             self._queue_update('ship_pole_done', pole_data)
 
                         else:
-                            # --- 通常モード: XLSX保存 + Gain/Offset/Error ---
-                            save_dir = self.save_dir.get()
-                            os.makedirs(save_dir, exist_ok=True)
+                            # --- 通常モード: Gain/Offset/Error 計算 (XLSX は出力パイプライン) ---
                             raw_mode = self.pattern_mode.get().lower()
-                            mode = 'sequential' if raw_mode == 'linear' else raw_mode
                             pts_str = (f"_{len(x_vals)}pts"
                                        if raw_mode in ('random', 'linear') else "")
-                            base_name = (f"{serial_no}_{dac_name}_linearity_"
-                                         f"{mode}{pts_str}_{common_timestamp}")
-                            if pole == 'POS':
-                                xlsx_filepath = os.path.join(
-                                    save_dir, base_name + '.xlsx')
-                            else:
-                                xlsx_filepath = os.path.join(
-                                    save_dir, base_name + '_tmp.xlsx')
+                            xlsx_filepath = self._pole_xlsx_path(
+                                f"{serial_no}_{dac_name}_linearity_"
+                                f"{self._mode_name()}{pts_str}_{common_timestamp}",
+                                pole, linear_pole_results)
 
                             if dac_name == 'LBC':
-                                xlsx_path, results = self._save_xlsx_lbc_random(
-                                    x_vals, y_vals, pole,
-                                    def_info, serial_no, bits, span,
-                                    filepath=xlsx_filepath)
+                                writer = 'write_lbc_random'
+                                record, results = self._lbc_random_record(
+                                    x_vals, y_vals, pole, serial_no, bits, span,
+                                    xlsx_filepath)
                             else:
-                                xlsx_path, results = self._save_xlsx_linear(
-                                    x_vals, y_vals, dac_name, pole,
-                                    def_info, serial_no, bits, span,
-                                    filepath=xlsx_filepath)
+                                writer = 'write_linear'
+                                record, results = self._linear_record(
+                                    x_vals, y_vals, dac_name, pole, serial_no,
+                                    bits, span, xlsx_filepath)
+
+                            if self.pattern_mode.get() == 'Model':
+                                self._model_analysis(
+                                    x_vals, y_vals, dac_name, bits, pole,
+                                    f"{serial_no}_{dac_name}_model_verify_{pole}_"
+                                    f"{common_timestamp}.txt")
 
                             if results:
                                 ng_flags = results.get('ng_detail', [])
@@ -805,46 +1014,37 @@ class LinearityTab(ttk.Frame):
                                     "ERROR" if ng_flags else "SUCCESS"
                                 ))
 
-                            if xlsx_path:
-                                self._queue_update('log', (
-                                    f"  XLSX保存: {xlsx_path}", "SUCCESS"))
-
                             pole_data = {
                                 'def_name': def_info['name'],
                                 'dac_name': dac_name,
                                 'pole': pole,
                                 'results': results or {},
                                 'serial_no': serial_no,
-                                'xlsx_path': xlsx_path,
+                                'xlsx_path': xlsx_filepath if record else None,
                             }
                             linear_pole_results[pole] = pole_data
+                            merge_deps += self._submit_pole_exports(
+                                'linear', pole_data, writer, record)
 
                             # サマリー + PNG表示
                             self._queue_update('linear_pole_done', pole_data)
 
-                    # POS/NEGを1ファイルに統合
+                    # POS/NEGを1ファイルに統合 (両極の XLSX・COM PNG 出力後に実行)
+                    # 片極のみの場合は最初から最終ファイル名で出力済み
                     pole_results = ship_pole_results if is_ship \
                         else linear_pole_results
-                    merge_msg = 'merge_ship_xlsx' if is_ship \
-                        else 'merge_linear_xlsx'
-                    self._queue_update('log', (
-                        f"[DBG] worker: before merge queue "
-                        f"({merge_msg}, poles={list(pole_results.keys())})",
-                        "INFO"))
-                    if len(pole_results) == 2:
-                        self._queue_update(merge_msg, pole_results)
-                    elif len(pole_results) == 1:
-                        only_data = list(pole_results.values())[0]
-                        xp = only_data.get('xlsx_path', '')
-                        if '_tmp.xlsx' in xp:
-                            final = xp.replace('_tmp.xlsx', '.xlsx')
-                            try:
-                                os.rename(xp, final)
-                                only_data['xlsx_path'] = final
-                            except Exception:
-                                pass
-                    self._queue_update('log', (
-                        "[DBG] worker: after merge queue", "INFO"))
+                    if len(pole_results) == 2 and all(
+                            d.get('xlsx_path') for d in pole_results.values()):
+                        # Ship は NEG の1枚目 (表) のみ、それ以外は NEG の全シートを POS へ
+                        from utils import xlsx_merge
+                        self._submit_export(
+                            xlsx_merge.merge_pos_neg,
+                            pole_results['POS']['xlsx_path'],
+                            pole_results['NEG']['xlsx_path'],
+                            [0] if is_ship else None,
+                            deps=merge_deps,
+                            label=f"XLSX統合 {serial_no} {dac_name}",
+                            tag=('merge', None, pole_results))
 
             # 終了処理
             self._scanner_cpon()
@@ -853,738 +1053,342 @@ class LinearityTab(ttk.Frame):
 
         except Exception as e:
             import traceback
+            self._close_journal()   # 途中までの点は次回開始時に再開可能
             self._queue_update('log', (
                 f"エラー: {e}\n{traceback.format_exc()}", "ERROR"))
             self._queue_update('done', None)
+        finally:
+            # DMM平均の設定を 1 点読み取りに戻す
+            if self._averager is not None and self._averager.enabled:
+                self._averager.disarm()
+            self._averager = None
+            for gpib in (self.gpib_scanner, self.gpib_dmm):
+                gpib.disable_events()
 
     # ==================== ハードウェア操作 ====================
+    def _scanner(self):
+        """スキャナーのリレー状態を持つドライバー (measurement_window・DC特性と共有)"""
+        return scanner_driver.get_driver(self.gpib_scanner, self.scanner_slot)
+
     def _scanner_cpon(self):
         """スキャナー全チャンネルOPEN (cpon)"""
-        orig_timeout = self.gpib_scanner.instrument.timeout
-        self.gpib_scanner.instrument.timeout = 5000
-        try:
-            self.gpib_scanner.write(f":system:cpon {self.scanner_slot}")
-        finally:
-            self.gpib_scanner.instrument.timeout = orig_timeout
+        success, message = self._scanner().reset()
+        if not success:
+            self._queue_update('log', (f"スキャナー cpon: {message}", "WARNING"))
 
     def _switch_scanner(self, channel_addr, switch_delay):
-        """スキャナーCH切替 (cpon方式 - measurement_windowと同じ)"""
-        orig_timeout = self.gpib_scanner.instrument.timeout
-        self.gpib_scanner.instrument.timeout = 5000
-        try:
-            # 1. cpon: 全CH OPEN
-            self.gpib_scanner.write(f":system:cpon {self.scanner_slot}")
-            # 2. リレー安定待ち
-            time.sleep(switch_delay / 2)
-            # 3. *OPC?: cpon完了確認（pyvisa終端文字警告を抑制）
-            import warnings
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                self.gpib_scanner.query("*OPC?")
-            # 4. CLOSE: 対象CH選択
-            self.gpib_scanner.write(f"CLOSE ({channel_addr})")
-            # 5. CLOSE後安定待ち
-            time.sleep(switch_delay / 2)
-        finally:
-            self.gpib_scanner.instrument.timeout = orig_timeout
+        """スキャナーCH切替 (前のCHを OPEN → 対象CHを CLOSE の差分切り替え、エラー時は cpon方式)
+
+        リレー安定待ち switch_delay/2 は CLOSE 送信からの最小時間として確保する (完了待ちと重ねる)
+        """
+        success, info = self._scanner().switch(channel_addr, settle=switch_delay / 2)
+        for line in info['detail']:
+            self._queue_update('log', (f"スキャナー {line}", "INFO" if success else "WARNING"))
+        if not success:
+            self._queue_update('log', (f"スキャナー切替失敗: {channel_addr}", "ERROR"))
 
     def _measure_voltage(self):
-        """DMM計測 (TRIG SGL)"""
-        orig_timeout = self.gpib_dmm.instrument.timeout
-        self.gpib_dmm.instrument.timeout = 5000
+        """DMM計測 (TRIG SGL、DMM平均時は NRDGS n 点の平均)
+
+        Returns:
+            (電圧, 標準偏差, 点数) 失敗時は電圧 None、平均なしは標準偏差 None
+        """
         try:
-            success, response = self.gpib_dmm.query("TRIG SGL")
+            if self._averager is not None and self._averager.enabled:
+                success, result = self._averager.read()
+                if success:
+                    metrics.record_reading("linearity")
+                    return result['mean'], result['sdev'], result['count']
+                return None, None, 0
+            success, response = self.gpib_dmm.trigger_read(
+                "TRIG SGL", timeout=max(5.0, dmm_average.read_timeout(1, self._dmm_nplc)))
             if success:
-                return float(response.strip())
+                value = float(response.strip())
+                metrics.record_reading("linearity")
+                return value, None, 1
         except Exception:
             pass
-        finally:
-            self.gpib_dmm.instrument.timeout = orig_timeout
-        return None
+        return None, None, 0
+
+    def _avg_count_value(self):
+        """DMM平均回数 (不正な入力は 1)"""
+        try:
+            return max(1, int(self.avg_count.get()))
+        except (tk.TclError, ValueError):
+            return 1
 
     def _datagen_send(self, cmd):
         """DataGenコマンド送信"""
         self._queue_update('log', (f"  DG SEND: {cmd}", "INFO"))
-        self.datagen.send_command(cmd)
-        time.sleep(0.05)
+        with tracer.span("datagen.send", "datagen", cmd=cmd):
+            self.datagen.send_command(cmd)
+            time.sleep(0.05)
 
     def _datagen_set_value(self, hex_str, ci_cmd, pole_cmd):
         """DAC値設定（Position/LBCともにp/n省略で1行送信）"""
         self._datagen_send(f"alt a {hex_str} {ci_cmd}")
 
     def _load_switch_delay(self):
-        """スキャナー切替時間を設定ファイルから読み込み"""
+        """スキャナー切替時間を設定ストアから読み込み"""
         try:
-            with open('app_settings.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            return max(0.4, config.get('measurement_window', {}).get('switch_delay_sec', 0.4))
+            return max(0.4, self._settings.section('measurement_window').get('switch_delay_sec', 0.4))
         except Exception:
             return 0.4
 
-    # ==================== 最小二乗法・誤差計算 ====================
-    def _calculate_linearity(self, x, y, bits, span, is_neg):
-        """最小二乗法で直線性を計算
+    # ==================== XLSX出力レコード ====================
+    # 計算は計測スレッドで行い、XLSX への書き込みは出力パイプライン
+    # (utils.linearity_xlsx、プロセスプール) で行う。計算・レコード作成は
+    # utils.linearity_records (再解析 CLI reanalyze.py と共通)
+    def _thresholds(self):
+        return {'gain': self.th_gain.get(), 'offset': self.th_offset.get(),
+                'error': self.th_error.get()}
 
-        Args:
-            x: DAC設定値 (numpy array)
-            y: 測定電圧 (numpy array)
-            bits: DACビット数 (20 or 16)
-            span: 電圧スパン (V)
-            is_neg: NEG極性フラグ
+    def _mode_name(self):
+        """ファイル名・シート表記用のモード名 (Linear → sequential)"""
+        return linearity_records.mode_name(self.pattern_mode.get())
 
-        Returns:
-            dict: gain, offset, max_error, errors, etc.
-        """
-        n = len(x)
-        max_val = (1 << bits) - 1
-        v_per_lsb = span / max_val
-
-        # 最小二乗法: y = m*x + b
-        sx = np.sum(x)
-        sy = np.sum(y)
-        sxx = np.sum(x * x)
-        sxy = np.sum(x * y)
-        denom = n * sxx - sx * sx
-
-        m = (n * sxy - sx * sy) / denom
-        b = (sy * sxx - sx * sxy) / denom
-
-        # 理論値: コード0 → -span/2, コードmax → +span/2
-        # 理論傾き = span / max_val = v_per_lsb
-        # 理論切片 = -span / 2
-        # POS: コード000000→-10V, コードFFFFF→+10V (傾き正)
-        # NEG: コード000000→+10V, コードFFFFF→-10V (傾き負)
-        ideal_slope = v_per_lsb if not is_neg else -v_per_lsb
-        ideal_intercept = -span / 2 if not is_neg else span / 2
-
-        # Gain (LSB/LSB): 実測傾き / 理論傾き
-        gain = m / ideal_slope
-        # Offset (LSB): 実測切片と理論切片の差をLSB換算
-        offset = (b - ideal_intercept) / v_per_lsb
-
-        # 各点の誤差 (LSB)
-        y_fit = m * x + b
-        errors = (y - y_fit) / v_per_lsb
-        max_error = float(np.max(np.abs(errors)))
+    def _record_pattern_file(self):
+        """Fileモード時のみパターンファイルパス (XLSX に記録)"""
+        return self.pattern_file.get() if self.pattern_mode.get() == 'File' else None
 
-        return {
-            'gain': float(gain),
-            'offset': float(offset),
-            'max_error': max_error,
-            'm': float(m),
-            'b': float(b),
-            'v_per_lsb': v_per_lsb,
-            'errors': errors.tolist(),
-            'y_fit': y_fit.tolist(),
-        }
-
-    def _calculate_linearity_ship(self, unsigned_vals, measured_v, bits, dac_name):
-        """出荷試験用 INL/DNL計算 (Excelマクロ DacTestBench5K 準拠)
+    def _pole_xlsx_path(self, base_name, pole, pole_results):
+        """1極分の XLSX 保存パス
 
-        - 係数: 端点フィット (last_V - first_V) / (last_signed - first_signed)
-        - 理論電圧: first_V + coeff * (signed - first_signed)
-        - INL: (measured - theoretical) / v_per_lsb
-        - DNL: INL[i+1] - INL[i] (コードステップ=1 の場合のみ)
+        POS 出力済みの NEG は統合まで一時ファイル (_tmp.xlsx)、それ以外は最終ファイル名
         """
-        offset_val = 2 ** (bits - 1)
-        signed = np.array([v - offset_val for v in unsigned_vals], dtype=float)
+        save_dir = self.save_dir.get()
+        os.makedirs(save_dir, exist_ok=True)
+        suffix = '_tmp.xlsx' if pole == 'NEG' and 'POS' in pole_results else '.xlsx'
+        return os.path.join(save_dir, base_name + suffix)
 
-        y = np.array(measured_v, dtype=float)
+    def _template_or_log(self, key):
+        template_path = self._get_template_path(key)
+        if not template_path:
+            self._queue_update('log', (
+                f"テンプレートが見つかりません: linearity_{key.lower()}.xlsx", "ERROR"))
+        return template_path
 
-        # 端点フィット: coeff = (V_last - V_first) / (signed_last - signed_first)
-        coeff = float((y[-1] - y[0]) / (signed[-1] - signed[0]))
+    def _lbc_random_record(self, x_vals, y_vals, pole, serial_no, bits, span, filepath):
+        """LBC Random/Linear/File: Gain/Offset/MaxErr を計算して XLSX 出力レコードを作成
 
-        # 理論電圧: first_V + coeff * (signed - first_signed)
-        theoretical_v = y[0] + coeff * (signed - signed[0])
+        Returns:
+            (record, calc_results) テンプレートがなければ record は None
+        """
+        stream, values_only = self._xlsx_export_config()
+        return linearity_records.lbc_random_record(
+            x_vals, y_vals, pole, serial_no, bits, span, filepath, self._thresholds(),
+            self._mode_name(), self._template_or_log('lbc_random'),
+            pattern_file=self._record_pattern_file(), pattern_params=self._pattern_params,
+            stream=stream, values_only=values_only, dmm_avg=self._dmm_avg_text)
 
-        # 誤差計算用 V/LSB
-        if dac_name == 'Position':
-            v_per_lsb = coeff  # Position: 係数 = V/LSB (常に正)
-        else:  # LBC: Position 1LSB = 10V / 2^15 = 20V / 2^16
-            v_per_lsb = 10.0 / (2 ** (bits - 1))
+    def _linear_record(self, x_vals, y_vals, dac_name, pole, serial_no, bits, span, filepath):
+        """Random/Linear/File: Gain/Offset/誤差を計算して XLSX 出力レコードを作成
 
-        # INL
-        inl = ((y - theoretical_v) / v_per_lsb).tolist()
+        Returns:
+            (record, calc_results) テンプレートがなければ record は None
+        """
+        return linearity_records.linear_record(
+            x_vals, y_vals, dac_name, pole, serial_no, bits, span, filepath,
+            self._thresholds(), self._mode_name(), self._template_or_log('linear'),
+            pattern_file=self._record_pattern_file(), pattern_params=self._pattern_params,
+            stream=self._xlsx_export_config()[0], dmm_avg=self._dmm_avg_text)
 
-        # DNL: INL[i+1] - INL[i] (コードステップ=1 の時のみ)
-        dnl = [None] * len(unsigned_vals)
-        for i in range(len(unsigned_vals) - 1):
-            if unsigned_vals[i + 1] - unsigned_vals[i] == 1:
-                dnl[i] = inl[i + 1] - inl[i]
+    def _ship_record(self, measured_v, dac_name, pole, serial_no, bits, filepath):
+        """出荷Sequence: テンプレート (linearity_{dac}.xlsx) への XLSX 出力レコードを作成
 
-        return {
-            'coeff': coeff,
-            'signed': signed.tolist(),
-            'theoretical_v': theoretical_v.tolist(),
-            'inl': inl,
-            'dnl': dnl,
-            'v_per_lsb': v_per_lsb,
-        }
+        PNG を Agg で描画する設定なら表PNG (A5～判定結果行) も同じジョブで描画する。
+        Returns:
+            record (テンプレートがなければ None)
+        """
+        renderer, _ = self._png_export_config()
+        table_png = (linearity_records.ship_table_png_path(filepath, pole)
+                     if renderer != 'excel' else None)
+        return linearity_records.ship_record(
+            measured_v, dac_name, pole, serial_no, bits, filepath,
+            self._template_or_log(dac_name), table_png)
 
-    def _save_xlsx_lbc_random(self, x_vals, y_vals, pole,
-                              def_info, serial_no, bits, span,
-                              filepath=None):
-        """LBC Random/Linear/File計測結果をLBCランダム用テンプレートXLSXに保存
+    def _get_template_path(self, dac_name):
+        """テンプレートXLSXのパスを取得 (PyInstaller対応)"""
+        return linearity_records.template_path(dac_name)
 
-        テンプレート (linearity_lbc_random.xlsx) をコピーし、
-        A列(設定DAC値), D列(測定電圧), I列(測定順) を上書き。
-        B,C,E,F,G列の参照式は行数に合わせて拡張。
-        同一シート内の埋め込みグラフ + 別シートグラフの範囲も更新。
+    # ==================== 出力パイプライン ====================
+    def _png_export_config(self):
+        """app_settings.json の png_export 設定
+        renderer: "agg" (matplotlib で描画、既定) / "excel" (Excel COM)
+        processes: 出力パイプライン (XLSX/PNG) のプロセス数 (0 ならスレッドで実行)
         """
-        import shutil
-        import re
-        import zipfile
-
-        template_path = self._get_template_path('lbc_random')
-        if not template_path:
-            self._queue_update('log', (
-                "テンプレートが見つかりません: linearity_lbc_random.xlsx",
-                "ERROR"))
-            return None, None
-
-        offset_val = 2 ** (bits - 1)  # 32768
-        n = len(x_vals)
-
-        # Sort by signed DAC value (ascending) — 測定順を保持
-        order = list(range(1, n + 1))
-        data_sorted = sorted(
-            zip(x_vals, y_vals, order), key=lambda r: r[0])
-
-        # Copy template → 保存先
-        if filepath is None:
-            save_dir = self.save_dir.get()
-            os.makedirs(save_dir, exist_ok=True)
-            timestamp = time.strftime('%Y%m%d_%H%M%S')
-            raw_mode = self.pattern_mode.get().lower()
-            mode = 'sequential' if raw_mode == 'linear' else raw_mode
-            pts_str = f"_{n}pts" if raw_mode in ('random', 'linear') else ""
-            filename = (f"{serial_no}_LBC_linearity_"
-                        f"{mode}{pts_str}_{timestamp}.xlsx")
-            filepath = os.path.join(save_dir, filename)
-        shutil.copy2(template_path, filepath)
-
-        wb = openpyxl.load_workbook(filepath)
-        ws = wb['計算データ']
-        old_sheet_name = ws.title
-        mode = 'sequential' if self.pattern_mode.get().lower() == 'linear' else self.pattern_mode.get().lower()
-        sheet_name = f"{serial_no}{pole[0]}"[:31]
-        ws.title = sheet_name
-
-        # チャートシートを削除（埋め込みグラフのみ使用）
-        for cs in list(wb.chartsheets):
-            wb.remove(cs)
-
-        # テンプレートの書式を保存 (Row 4 = 最初のデータ行)
-        col_formats_lbc = {}
-        for c in (1, 2, 3, 4, 5, 6, 7, 9):
-            col_formats_lbc[c] = ws.cell(row=4, column=c).number_format
-
-        # 旧データクリア (Row 4 以降)
-        for r in range(4, ws.max_row + 1):
-            for c in (1, 2, 3, 4, 5, 6, 7, 9):  # A-G, I
-                ws.cell(row=r, column=c).value = None
-
-        last_row = 3 + n
-        title = f"{serial_no} {pole} LBC リニアリティ({n}点{mode})"
-
-        # Row 1 パラメータ式を更新 (行範囲)
-        ws['D1'] = f'=(D4-D{last_row})/(B4-B{last_row})'
-        ws['E1'] = '=D4-D1*B4'
-        ws['F1'] = f'=AVERAGE(F4:F{last_row})'
-
-        # データ行 (Row 4+): A,D,I 上書き + B,C,E,F,G 式拡張
-        for i, (ucode, measured, orig_order) in enumerate(data_sorted):
-            r = 4 + i
-            signed = int(ucode) - offset_val
-
-            ws.cell(row=r, column=1, value=signed)             # A: 設定DAC値
-            ws.cell(row=r, column=2, value=f'=A{r}+2^15')     # B: unsigned
-            ws.cell(row=r, column=3, value=f'=DEC2HEX(B{r},4)')  # C: HEX
-            ws.cell(row=r, column=4, value=measured)           # D: 測定電圧
-            ws.cell(row=r, column=5, value=f'=D$1*B{r}+D$4')  # E: 理想電圧
-            ws.cell(row=r, column=6,
-                    value=f'=(D{r}-E{r})/C$1')                 # F: INL
-            ws.cell(row=r, column=7, value=f'=F{r}-F$1')      # G: offset補正INL
-            ws.cell(row=r, column=9, value=orig_order)         # I: 測定順
-            # テンプレート書式を適用
-            for c, fmt in col_formats_lbc.items():
-                ws.cell(row=r, column=c).number_format = fmt
-
-        # Gain/Offset/MaxErr: LSQ fit (Position と同じ計算方法)
-        signed_arr = np.array(
-            [int(d[0]) - offset_val for d in data_sorted], dtype=float)
-        meas_arr = np.array([d[1] for d in data_sorted], dtype=float)
-        n_pts = len(data_sorted)
-        sx = float(np.sum(signed_arr))
-        sy = float(np.sum(meas_arr))
-        sxx = float(np.sum(signed_arr * signed_arr))
-        sxy = float(np.sum(signed_arr * meas_arr))
-        denom = n_pts * sxx - sx * sx
-        m_slope = (n_pts * sxy - sx * sy) / denom
-        b_intercept = (sy * sxx - sx * sxy) / denom
-
-        max_val = (1 << bits) - 1  # 65535
-        vgain = span / max_val     # V/LSB (常に正、VBA準拠)
-        pole_sign = -1 if pole == 'NEG' else 1
-
-        # VBA準拠: CELL_GAIN = sign*m/vgain, CELL_OFFSET = b/vgain
-        gain_lsb = pole_sign * m_slope / vgain
-        offset_lsb = b_intercept / vgain
-
-        # MaxErr: テンプレートG列 (endpoint fit, 符号付き)
-        first_v = data_sorted[0][1]
-        first_code = int(data_sorted[0][0])
-        last_code = int(data_sorted[-1][0])
-        ep_slope = (data_sorted[-1][1] - first_v) / (last_code - first_code)
-        c1_ref = 160 / (2 ** 19)  # テンプレート C1 = B1/2^19
-        f_vals = []
-        for ucode, measured, _ in data_sorted:
-            e_val = ep_slope * int(ucode) + first_v
-            f_vals.append((measured - e_val) / c1_ref)
-        f_avg = float(np.mean(f_vals))
-        g_arr = np.array([f - f_avg for f in f_vals])
-        max_pos = float(np.max(g_arr))
-        min_neg = float(np.min(g_arr))
-        max_err = min_neg if abs(min_neg) > abs(max_pos) else max_pos
-
-        ng_flags = []
-        if abs(gain_lsb - 1.0) > self.th_gain.get():
-            ng_flags.append('Gain')
-        if abs(offset_lsb) > self.th_offset.get():
-            ng_flags.append('Offset')
-        if abs(max_err) > self.th_error.get():
-            ng_flags.append('Error')
-
-        calc_results = {
-            'gain': gain_lsb,
-            'offset': offset_lsb,
-            'max_error': max_err,
-            'ng': bool(ng_flags),
-            'judge': 'NG' if ng_flags else 'OK',
-            'ng_detail': ng_flags,
+        cfg = self._settings.section('png_export')
+        return cfg.get('renderer', 'agg'), int(cfg.get('processes', 2))
+
+    def _pattern_gen_config(self):
+        """app_settings.json の pattern_gen 設定 (Random モード)
+        method: stratified (層別) / lhs (上位・下位ビットのラテン超方格) / uniform (一様乱数)
+        force: 必ず含めるコード ["boundary" (ビット境界), "carry" (上位ビットの主要キャリー)]
+        carry_bits: carry で対象にする上位ビット数
+        """
+        cfg = self._settings.section('pattern_gen')
+        return {
+            'method': cfg.get('method', 'stratified'),
+            'force': tuple(cfg.get('force', ())),
+            'carry_bits': int(cfg.get('carry_bits', 3)),
         }
 
-        # Fileモード: パターンファイル情報を記録
-        if self.pattern_mode.get() == 'File':
-            ws['N1'] = 'パターンファイル'
-            ws['N2'] = self.pattern_file.get()
-
-        # J-L列: Gain/Offset/MaxErr 書き込み
-        red_font = Font(color="FF0000")
-        ws['K1'] = gain_lsb
-        ws['K1'].number_format = '0.000000'
-        ws['K2'] = offset_lsb
-        ws['K2'].number_format = '0.000'
-        ws['K3'] = max_err
-        ws['K3'].number_format = '0.000'
-
-        if 'Gain' in ng_flags:
-            ws['L1'] = 'NG'
-            for cell in ['J1', 'K1', 'L1']:
-                ws[cell].font = red_font
-        if 'Offset' in ng_flags:
-            ws['L2'] = 'NG'
-            for cell in ['J2', 'K2', 'L2']:
-                ws[cell].font = red_font
-        if 'Error' in ng_flags:
-            ws['L3'] = 'NG'
-            for cell in ['J3', 'K3', 'L3']:
-                ws[cell].font = red_font
-
-        try:
-            wb.save(filepath)
-        except Exception as e:
-            self._queue_update('log', (f"XLSX保存エラー: {e}", "ERROR"))
-            return None, None
-
-        # 埋め込みチャートXML更新 (シート名・データ範囲・タイトル)
-        try:
-            tmp = filepath + '.tmp'
-            with zipfile.ZipFile(filepath, 'r') as zin:
-                with zipfile.ZipFile(tmp, 'w') as zout:
-                    for item in zin.infolist():
-                        raw = zin.read(item.filename)
-                        if item.filename.startswith('xl/charts/chart'):
-                            content = raw.decode('utf-8')
-                            content = content.replace(
-                                old_sheet_name, sheet_name)
-                            content = re.sub(
-                                r'([$][A-I][$]4:[$][A-I][$])\d+',
-                                rf'\g<1>{last_row}', content)
-                            content = re.sub(
-                                r'(<a:t>)[^<]*(</a:t>)',
-                                rf'\g<1>{title}\g<2>',
-                                content, count=1)
-                            content = re.sub(
-                                r'<c:numCache>.*?</c:numCache>',
-                                '', content, flags=re.DOTALL)
-                            raw = content.encode('utf-8')
-                        zout.writestr(item, raw)
-            shutil.move(tmp, filepath)
-        except Exception as e:
-            self._queue_update('log', (
-                f"  チャート範囲更新エラー: {e}", "WARNING"))
-
-        return filepath, calc_results
-
-    def _save_xlsx_linear(self, x_vals, y_vals, dac_name, pole,
-                          def_info, serial_no, bits, span,
-                          filepath=None):
-        """Random/Linear/File計測結果をテンプレートXLSXに保存 (DacTestBench5K準拠)
-
-        テンプレート (linearity_linear.xlsx) をコピーし、データ部分を書き換え。
-        グラフシートはテンプレートの書式をそのまま保持。
-        シート名を "{serial}{P/N}" に変更し、チャート参照も更新。
+    def _model_config(self):
+        """app_settings.json の linearity_model 設定
+        redundancy: 設計コードに加える乱数コードの点数 (残差の自由度)
+        seed: 乱数コードのシード
+        worst_count: 報告・検証する最悪コード数 (INL/DNL それぞれ)
         """
-        import shutil
-        import re
-        import zipfile
-
-        template_path = self._get_template_path('linear')
-        if not template_path:
-            self._queue_update('log', (
-                "テンプレートが見つかりません: linearity_linear.xlsx", "ERROR"))
-            return None, None
-
-        offset_val = 2 ** (bits - 1)
-        max_val = (1 << bits) - 1
-        vgain = span / max_val  # V/LSB (常に正、VBA準拠)
-        pole_sign = -1 if pole == 'NEG' else 1
-
-        # Signed DAC values
-        n = len(x_vals)
-        signed_vals = [int(x - offset_val) for x in x_vals]
-
-        # 最小二乗法 (signed値ベース): y = m*x + b
-        x_arr = np.array(signed_vals, dtype=float)
-        y_arr = np.array(y_vals, dtype=float)
-        sx = float(np.sum(x_arr))
-        sy = float(np.sum(y_arr))
-        sxx = float(np.sum(x_arr * x_arr))
-        sxy = float(np.sum(x_arr * y_arr))
-        denom = n * sxx - sx * sx
-        m = (n * sxy - sx * sy) / denom
-        b = (sy * sxx - sx * sxy) / denom
-
-        # GAIN (LSB/LSB), OFFSET (LSB) — VBA準拠: CELL_GAIN = sign*m/vgain, CELL_OFFSET = b/vgain
-        gain_lsb = pole_sign * m / vgain
-        offset_lsb = b / vgain
-
-        # Sort by signed DAC value (ascending), preserving original order
-        order = list(range(1, n + 1))
-        data_sorted = sorted(
-            zip(order, signed_vals, y_vals), key=lambda r: r[1])
-
-        # テンプレートコピー → 保存先
-        if filepath is None:
-            save_dir = self.save_dir.get()
-            os.makedirs(save_dir, exist_ok=True)
-            timestamp = time.strftime('%Y%m%d_%H%M%S')
-            raw_mode = self.pattern_mode.get().lower()
-            mode = 'sequential' if raw_mode == 'linear' else raw_mode
-            pts_str = f"_{n}pts" if raw_mode in ('random', 'linear') else ""
-            filename = (f"{serial_no}_{dac_name}_linearity_"
-                        f"{mode}{pts_str}_{timestamp}.xlsx")
-            filepath = os.path.join(save_dir, filename)
-        shutil.copy2(template_path, filepath)
-
-        # データシート書き換え
-        mode = 'sequential' if self.pattern_mode.get().lower() == 'linear' else self.pattern_mode.get().lower()
-        sheet_name = f"{serial_no}{pole[0]}"[:31]
-        wb = openpyxl.load_workbook(filepath)
-        ws = wb['計算データ']
-        old_sheet_name = ws.title
-        ws.title = sheet_name
-
-        # チャートシートのタブ名も変更
-        chart_tab_name = f"{serial_no}{pole[0]}_chart"[:31]
-        for cs in wb.chartsheets:
-            cs.title = chart_tab_name
-
-        # テンプレートの書式を保存 (Row 7 = 最初のデータ行)
-        col_formats_lin = {}
-        for c in range(1, 9):
-            col_formats_lin[c] = ws.cell(row=7, column=c).number_format
-
-        hex_digits = bits // 4  # Position=20bit→5桁, LBC=16bit→4桁
-
-        # 旧データクリア (Row 7+)
-        for r in range(7, ws.max_row + 1):
-            for c in range(1, 10):
-                ws.cell(row=r, column=c).value = None
-
-        # ヘッダー
-        title = f"{serial_no} {pole} {dac_name} ({n}点{mode})"
-        ws['A1'] = title
-        ws['B2'] = mode
-        ws['B3'] = gain_lsb
-        ws['B4'] = offset_lsb
-        ws['C3'] = None
-        ws['C4'] = None
-
-        # Fileモード: パターンファイル情報を記録
-        if self.pattern_mode.get() == 'File':
-            ws['A5'] = 'パターンファイル'
-            ws['B5'] = self.pattern_file.get()
-
-        # GAIN NG判定
-        red_font = Font(color="FF0000")
-        if abs(gain_lsb - 1.0) > self.th_gain.get():
-            ws['C3'] = "NG"
-            for cell in ['A3', 'B3', 'C3']:
-                ws[cell].font = red_font
-
-        # OFFSET NG判定
-        if abs(offset_lsb) > self.th_offset.get():
-            ws['C4'] = "NG"
-            for cell in ['A4', 'B4', 'C4']:
-                ws[cell].font = red_font
-
-        # データ行 (Row 7+)
-        err_threshold = self.th_error.get()
-        max_err = 0.0
-        for i, (orig_order, s_val, m_val) in enumerate(data_sorted):
-            r = 7 + i
-            # VBA準拠: COUT = sdt*vgain*sign, CIN = mdt/vgain, FITOUT = (m*sdt+b)/vgain
-            theo_v = s_val * vgain * pole_sign
-            meas_dac = m_val / vgain
-            fit_val = (m * s_val + b) / vgain
-            err_lsb = m_val / vgain - fit_val
-            max_err = max(max_err, abs(err_lsb))
-
-            ws.cell(row=r, column=1, value=orig_order)
-            ws.cell(row=r, column=2, value=s_val)
-            ws.cell(row=r, column=3, value=theo_v)
-            ws.cell(row=r, column=4, value=m_val)
-            ws.cell(row=r, column=5, value=meas_dac)
-            ws.cell(row=r, column=6, value=fit_val)
-            ws.cell(row=r, column=7, value=err_lsb)
-            # H: オフセットバイナリ値, I: HEX
-            unsigned_val = s_val + offset_val
-            ws.cell(row=r, column=8, value=unsigned_val)
-            ws.cell(row=r, column=9, value=format(unsigned_val, f'0{hex_digits}X'))
-            # テンプレート書式を適用
-            for c, fmt in col_formats_lin.items():
-                ws.cell(row=r, column=c).number_format = fmt
-
-            if abs(err_lsb) > err_threshold:
-                ws.cell(row=r, column=10, value="NG")
-                for c in range(1, 11):
-                    ws.cell(row=r, column=c).font = red_font
-
-        # NG判定 (サマリー用)
-        ng_flags = []
-        if abs(gain_lsb - 1.0) > self.th_gain.get():
-            ng_flags.append('Gain')
-        if abs(offset_lsb) > self.th_offset.get():
-            ng_flags.append('Offset')
-        if max_err > err_threshold:
-            ng_flags.append('Error')
-        calc_results = {
-            'gain': gain_lsb,
-            'offset': offset_lsb,
-            'max_error': max_err,
-            'ng': bool(ng_flags),
-            'judge': 'NG' if ng_flags else 'OK',
-            'ng_detail': ng_flags,
+        cfg = self._settings.section('linearity_model')
+        return {
+            'redundancy': int(cfg.get('redundancy', 8)),
+            'seed': int(cfg.get('seed', 0)),
+            'worst_count': int(cfg.get('worst_count', 8)),
         }
 
-        try:
-            wb.save(filepath)
-        except Exception as e:
-            self._queue_update('log', (f"XLSX保存エラー: {e}", "ERROR"))
-            return None, calc_results
+    def _model_analysis(self, x_vals, y_vals, dac_name, bits, pole, verify_name):
+        """Modelモード: ビット重みをフィットして全コードの INL/DNL を予測 (ワーカースレッド)
 
-        # チャートXML更新: シート名参照 + データ範囲 + タイトル + キャッシュ削除
-        last_row = 6 + n
+        最悪コードを信頼限界付きでログに出し、検証スイープ用のパターンファイル
+        (File モードでそのまま読み込める unsigned 10進数) を保存先に書き出す。
+        """
         try:
-            tmp = filepath + '.tmp'
-            with zipfile.ZipFile(filepath, 'r') as zin:
-                with zipfile.ZipFile(tmp, 'w') as zout:
-                    for item in zin.infolist():
-                        raw = zin.read(item.filename)
-                        if item.filename == 'xl/charts/chart1.xml':
-                            content = raw.decode('utf-8')
-                            content = content.replace(
-                                old_sheet_name, sheet_name)
-                            content = re.sub(
-                                r'([$][A-G][$]7:[$][A-G][$])\d+',
-                                rf'\g<1>{last_row}',
-                                content)
-                            content = re.sub(
-                                r'(<a:t>)[^<]*(</a:t>)',
-                                rf'\g<1>{title}\g<2>',
-                                content, count=1)
-                            content = re.sub(
-                                r'<numCache>.*?</numCache>',
-                                '', content, flags=re.DOTALL)
-                            raw = content.encode('utf-8')
-                        zout.writestr(item, raw)
-            shutil.move(tmp, filepath)
-        except Exception as e:
-            self._queue_update('log', (
-                f"  チャート範囲更新エラー: {e}", "WARNING"))
-
-        return filepath, calc_results
+            model = linearity_model.fit(x_vals, y_vals, bits)
+        except ValueError as e:
+            self._queue_update('log', (f"  ビット重みモデル: {e}", "ERROR"))
+            return
+        cfg = self._model_config()
+        report = linearity_model.worst_cases(model, cfg['worst_count'])
+        judge = linearity_model.judge(report, self.SHIP_CRITERIA[dac_name])
+        digits = (bits + 3) // 4
 
-    def _save_xlsx_ship(self, ship_results, unsigned_vals, measured_v,
-                        dac_name, pole, def_info, serial_no, bits,
-                        filepath=None):
-        """出荷試験結果をテンプレートXLSXに書き込み保存"""
-        template_path = self._get_template_path(dac_name)
-        if not template_path:
-            self._queue_update('log', (
-                f"テンプレートが見つかりません: linearity_{dac_name.lower()}.xlsx",
-                "ERROR"))
-            return None, False
-
-        wb = openpyxl.load_workbook(template_path)
-        ws = wb.active
-
-        # シート名変更 + チャート参照更新
-        old_name = ws.title
-        new_name = f"{serial_no}{pole[0]}"[:31]
-        ws.title = new_name
-        self._update_chart_refs(ws, old_name, new_name)
-
-        # A-D列はテンプレートのまま、E列(測定電圧)のみ書き込み
-        # POS出力: コード昇順で電圧上昇(-V→+V)
-        # NEG出力: コード昇順で電圧下降(+V→-V) ※cii入力の補数関係
-        # Position: -V先頭 → NEGのみ逆順、LBC: +V先頭 → POSのみ逆順
-        n_pts = len(measured_v)
-        if (bits == 20 and pole == 'NEG') or (bits < 20 and pole == 'POS'):
-            measured_v = list(reversed(measured_v))
-
-        for i in range(n_pts):
-            ws.cell(row=7 + i, column=5, value=measured_v[i])
-
-        # チャートタイトル変更
-        chart = ws._charts[0]
-        runs = chart.title.tx.rich.paragraphs[0].r
-        runs[0].t = f"{serial_no} {pole} {dac_name} "
-        runs[2].t = f"({n_pts}"
-
-        # ファイル保存
-        if filepath is None:
-            save_dir = self.save_dir.get()
-            os.makedirs(save_dir, exist_ok=True)
-            timestamp = time.strftime('%Y%m%d_%H%M%S')
-            filename = (f"{serial_no}_{dac_name}_{pole}_linearity_"
-                        f"出荷Sequence_{timestamp}.xlsx")
-            filepath = os.path.join(save_dir, filename)
+        self._queue_update('log', (
+            f"  ビット重みモデル ({len(x_vals)}点, 条件数 {report['cond']:.1f}, "
+            f"残差 {report['sigma'] * 1e6:.2f} uV): "
+            f"予測 INL {report['inl_min']:+.4f} ~ {report['inl_max']:+.4f} LSB, "
+            f"DNL {report['dnl_min']:+.4f} ~ {report['dnl_max']:+.4f} LSB \u2192 {judge}",
+            "ERROR" if judge == 'NG' else "WARNING" if judge == '要検証' else "SUCCESS"))
+        for key, label in (('inl', 'INL'), ('dnl', 'DNL')):
+            for code, value, bound in report[key]:
+                self._queue_update('log', (
+                    f"    {label} 最悪 {code:0{digits}X}: {value:+.4f} "
+                    f"\u00b1 {bound:.4f} LSB", "INFO"))
 
+        codes = linearity_model.verification_codes(report, bits)
+        verify_path = os.path.join(self.save_dir.get(), verify_name)
         try:
-            wb.save(filepath)
-            return filepath, True
-        except Exception as e:
-            self._queue_update('log', (f"XLSX保存エラー: {e}", "ERROR"))
-            return None, False
-
-    @staticmethod
-    def _update_chart_refs(ws, old_name, new_name):
-        """チャート内のシート参照を更新"""
-        old_unquoted = f"{old_name}!"
-        old_quoted = f"'{old_name}'!"
-        new_ref = f"'{new_name}'!"
-
-        for chart in ws._charts:
-            for child in chart._charts:
-                for series in child.series:
-                    if (hasattr(series.val, 'numRef') and series.val.numRef
-                            and series.val.numRef.f):
-                        f = series.val.numRef.f
-                        f = f.replace(old_quoted, new_ref)
-                        f = f.replace(old_unquoted, new_ref)
-                        series.val.numRef.f = f
-                    if (hasattr(series, 'title')
-                            and hasattr(series.title, 'strRef')
-                            and series.title.strRef
-                            and series.title.strRef.f):
-                        f = series.title.strRef.f
-                        f = f.replace(old_quoted, new_ref)
-                        f = f.replace(old_unquoted, new_ref)
-                        series.title.strRef.f = f
-
-    def _get_template_path(self, dac_name):
-        """テンプレートXLSXのパスを取得 (PyInstaller対応)"""
-        filename = f'linearity_{dac_name.lower()}.xlsx'
-
-        candidates = [
-            os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                         '..', 'template', filename),
-        ]
-
-        if getattr(sys, 'frozen', False):
-            base_path = sys._MEIPASS
-            candidates.insert(0, os.path.join(base_path, 'template', filename))
-            exe_dir = os.path.dirname(sys.executable)
-            candidates.insert(0, os.path.join(exe_dir, 'template', filename))
+            os.makedirs(self.save_dir.get(), exist_ok=True)
+            with open(verify_path, 'w') as f:
+                f.write(f"# {dac_name} {pole} ビット重みモデルの予測最悪コード (検証スイープ用)\n")
+                for code in codes:
+                    f.write(f"{code}\n")
+        except OSError as e:
+            self._queue_update('log', (f"  検証パターン保存エラー: {e}", "ERROR"))
+            return
+        self._queue_update('log', (
+            f"  検証スイープ: {len(codes)}点 → {verify_path} (File モードで計測)", "INFO"))
 
-        for path in candidates:
-            if os.path.exists(path):
-                return path
+    def _xlsx_export_config(self):
+        """app_settings.json の xlsx_export 設定
+        stream: データ行を XML で直接出力 (null なら点数で自動判定、true/false で固定)
+        values_only: LBC Random の B,C,E,F,G 列を参照式ではなく計算済みの値で出力
+        """
+        cfg = self._settings.section('xlsx_export')
+        return cfg.get('stream'), bool(cfg.get('values_only', False))
+
+    def _submit_export(self, func, *args, label, deps=(), in_process=True, tag=None):
+        """出力ジョブを投入 (状態は UI バス経由で _on_export_job に通知)"""
+        from utils import export_pipeline
+        _, processes = self._png_export_config()
+        bus = ui_bus.get_bus(self)
+        return export_pipeline.shared(processes).submit(
+            func, *args, deps=deps, label=label, in_process=in_process, tag=tag,
+            on_status=lambda job: bus.post(self, self._on_export_job, job))
+
+    def _run_com(self, func, *args):
+        """Excel COM 処理をパイプラインのスレッドで実行 (COM 初期化 + 同時アクセス禁止)"""
+        import pythoncom
+        pythoncom.CoInitialize()
+        try:
+            with self._excel_lock:
+                return func(*args)
+        finally:
+            pythoncom.CoUninitialize()
 
-        return None
+    def _submit_pole_exports(self, kind, data, writer, record):
+        """1極分の XLSX・グラフPNG を出力パイプラインに投入 (計測スレッドから呼ぶ)
 
-    def _delayed_delete(self, filepath, retries=10):
-        """ファイルを遅延削除（PNGエクスポート完了待ち、最大10秒リトライ）"""
-        if not os.path.exists(filepath):
-            return
-        try:
-            os.remove(filepath)
-        except Exception:
-            if retries > 0:
-                self.after(1000, lambda: self._delayed_delete(
-                    filepath, retries - 1))
+        Returns:
+            POS/NEG 統合の前に完了している必要があるジョブ ID のリスト
+            (XLSX と、XLSX を開く Excel COM の PNG 出力)
+        """
+        from utils import linearity_xlsx
+        label = f"{data['serial_no']} {data['dac_name']} {data['pole']}"
+        blockers = []
+        if record is not None:
+            data['xlsx_job'] = self._submit_export(
+                getattr(linearity_xlsx, writer), record,
+                label=f"XLSX {label}", tag=('xlsx', kind, data))
+            blockers.append(data['xlsx_job'])
+        if not data.get('xlsx_path'):
+            return blockers
+
+        renderer, _ = self._png_export_config()
+        payload = self._chart_payload(kind, data) if renderer != 'excel' else None
+        if payload is not None:
+            from utils import linearity_charts
+            self._submit_export(
+                linearity_charts.render_png, kind, payload, self._chart_png_path(data),
+                label=f"PNG {label}", tag=('png', kind, data))
+        else:
+            blockers.append(self._submit_com_png(kind, data))
+        return blockers
+
+    def _submit_com_png(self, kind, data):
+        """Excel COM による PNG 出力ジョブを投入 (XLSX 出力後に実行)"""
+        export_func = self._save_graph_ship_png if kind == 'ship' else self._save_graph_linear_png
+        label = f"{data['serial_no']} {data['dac_name']} {data['pole']}"
+        return self._submit_export(
+            self._run_com, export_func, data, deps=(data.get('xlsx_job'),),
+            in_process=False, label=f"PNG(Excel) {label}", tag=('png_com', kind, data))
+
+    def _on_export_job(self, job):
+        """出力ジョブの状態変化 (メインスレッド)"""
+        from utils import export_pipeline
+        what, kind, data = job.tag if job.tag else (None, None, None)
+        if job.status == export_pipeline.RETRYING:
+            self.log(f"  [出力] {job.label}: 再試行 ({job.error})", "WARNING")
+        elif job.status in (export_pipeline.FAILED, export_pipeline.SKIPPED):
+            self.log(f"  [出力] {job.label}: 失敗 ({job.error})", "ERROR")
+            if what == 'png':
+                # Agg 描画失敗 → Excel COM で出力
+                self.log("  → Excel COM で PNG を出力", "WARNING")
+                self._submit_com_png(kind, data)
+        elif job.status == export_pipeline.DONE:
+            if what == 'xlsx':
+                self.log(f"  XLSX保存: {job.result['xlsx']} ({job.elapsed:.1f}s)", "SUCCESS")
+                for warning in job.result.get('warnings', []):
+                    self.log(f"  {warning}", "WARNING")
+                if job.result.get('table_png'):
+                    self.log(f"  表PNG保存: {job.result['table_png']}", "SUCCESS")
+            elif what in ('png', 'png_com') and job.result:
+                self.log(f"  PNG保存: {job.result}", "SUCCESS")
+                self._show_png(job.result)
+            elif what == 'merge':
+                self.log(f"  XLSX統合完了: {job.result['xlsx']} ({job.elapsed:.2f}s)", "SUCCESS")
+                if not job.result['removed']:
+                    self.log(f"  NEG一時ファイルを削除できません: {data['NEG']['xlsx_path']}",
+                             "WARNING")
+
+    def _chart_png_path(self, data):
+        """XLSX パスから グラフPNG のパスを生成 (NEG の _tmp は除去)"""
+        return linearity_records.chart_png_path(data['xlsx_path'], data.get('pole', ''))
+
+    def _chart_payload(self, kind, data):
+        """Agg 描画に渡すデータ (pickle 可能な dict) を生成"""
+        return linearity_records.chart_payload(kind, data)
 
     # ==================== グラフ表示 ====================
-    def _export_png_async(self, export_func, data):
-        """PNGエクスポートをバックグラウンドスレッドで実行"""
-        def _worker():
-            pole = data.get('pole', '?')
-            tid = threading.get_ident()
-            self._queue_update('log', (
-                f"[DBG] png_bg: start pole={pole} tid={tid}", "INFO"))
-            import pythoncom
-            pythoncom.CoInitialize()
-            try:
-                # Excel COM 操作は全て同一ロックで直列化
-                self._queue_update('log', (
-                    f"[DBG] png_bg: lock wait pole={pole}", "INFO"))
-                with self._excel_lock:
-                    self._queue_update('log', (
-                        f"[DBG] png_bg: lock acquired pole={pole}", "INFO"))
-                    png_path = export_func(data)
-                self._queue_update('log', (
-                    f"[DBG] png_bg: lock released pole={pole} path={png_path}",
-                    "INFO"))
-                if png_path:
-                    self.after(0, lambda: self.log(
-                        f"  PNG保存: {png_path}", "SUCCESS"))
-                    self.after(0, lambda: self._show_png(png_path))
-            finally:
-                pythoncom.CoUninitialize()
-                self._queue_update('log', (
-                    f"[DBG] png_bg: end pole={pole} tid={tid}", "INFO"))
-        t = threading.Thread(target=_worker, daemon=True)
-        self._png_threads.append(t)
-        t.start()
-
-    def _wait_png_threads(self, timeout=60.0):
-        """進行中の PNG 出力 bg スレッド完了を待つ (merge 前に呼ぶ)"""
-        pending = [t for t in self._png_threads if t.is_alive()]
-        if not pending:
-            return
-        self._queue_update('log', (
-            f"[DBG] wait_png: joining {len(pending)} thread(s)", "INFO"))
-        for t in pending:
-            t.join(timeout=timeout)
-        # 終了したスレッドはリストから除去
-        self._png_threads[:] = [
-            t for t in self._png_threads if t.is_alive()]
-        self._queue_update('log', (
-            f"[DBG] wait_png: done (残 {len(self._png_threads)})", "INFO"))
-
     def _show_png(self, png_path):
         """PNGファイルをウィンドウで表示"""
         try:
@@ -1604,6 +1408,7 @@ class LinearityTab(ttk.Frame):
         except Exception as e:
             self.log(f"  PNG表示エラー: {e}", "WARNING")
 
+    @tracer.traced("png.ship_com", "export")
     def _save_graph_ship_png(self, data):
         """XLSX内のグラフと表をExcel COM経由でPNGエクスポート"""
         xlsx_path = data.get('xlsx_path')
@@ -1673,6 +1478,7 @@ class LinearityTab(ttk.Frame):
                 f"  PNGエクスポートエラー: {e}", "WARNING"))
             return None
 
+    @tracer.traced("png.linear_com", "export")
     def _save_graph_linear_png(self, data):
         """Linear/Random/File XLSX内のグラフをExcel COM経由でPNGエクスポート
         LBC: 埋め込みグラフ (ChartObjects), Position: チャートシート (Charts)"""
@@ -1695,6 +1501,7 @@ class LinearityTab(ttk.Frame):
             os.remove(png_abs)
 
         def _dbg(msg):
+            tracer.instant("linear_png", "export", pole=pole, step=msg)
             self._queue_update('log', (
                 f"[DBG] linear_png({pole}): {msg}", "INFO"))
 
@@ -1775,220 +1582,50 @@ class LinearityTab(ttk.Frame):
             self.log(f"  PNGエクスポートエラー: {e}", "WARNING")
             return None
 
-    def _dispatch_merge_async(self, merge_func, pole_results):
-        """
-        merge を bg スレッドで実行する。
-        1) 進行中の PNG 出力スレッドを join (順序保証)
-        2) _excel_lock を取得 (同時 Excel COM 禁止)
-        3) merge_func を呼び出す
-        UI スレッドをブロックせずに Excel COM 競合を排除する。
-        """
-        def _worker():
-            import pythoncom
-            pythoncom.CoInitialize()
-            try:
-                self._queue_update('log', (
-                    "[DBG] merge_bg: wait png threads", "INFO"))
-                self._wait_png_threads()
-                self._queue_update('log', (
-                    "[DBG] merge_bg: lock wait", "INFO"))
-                with self._excel_lock:
-                    self._queue_update('log', (
-                        "[DBG] merge_bg: lock acquired", "INFO"))
-                    merge_func(pole_results)
-                self._queue_update('log', (
-                    "[DBG] merge_bg: lock released", "INFO"))
-            finally:
-                pythoncom.CoUninitialize()
-                self._queue_update('log', (
-                    "[DBG] merge_bg: end", "INFO"))
-        threading.Thread(target=_worker, daemon=True).start()
-
-    def _merge_linear_xlsx(self, pole_results):
-        """Linear/Random/File: POS/NEGのXLSXを1ファイルに統合
-        NEGの全シートをPOSファイルにコピー
-        (bg スレッドから呼ばれる想定: ログは _queue_update で UI に投げる)"""
-        pos_xlsx = pole_results.get('POS', {}).get('xlsx_path')
-        neg_xlsx = pole_results.get('NEG', {}).get('xlsx_path')
-
-        if not pos_xlsx or not neg_xlsx:
-            return
-
-        def _dbg(msg):
-            self._queue_update(
-                'log', (f"[DBG] merge_linear: {msg}", "INFO"))
-
-        try:
-            import win32com.client
-
-            _dbg("DispatchEx")
-            excel = win32com.client.DispatchEx("Excel.Application")
-            excel.Visible = False
-            excel.DisplayAlerts = False
-            try:
-                _dbg(f"Open POS {os.path.basename(pos_xlsx)}")
-                wb_pos = excel.Workbooks.Open(os.path.abspath(pos_xlsx))
-                _dbg(f"Open NEG {os.path.basename(neg_xlsx)}")
-                wb_neg = excel.Workbooks.Open(os.path.abspath(neg_xlsx))
-
-                # NEGのデータシートをPOSファイルにコピー
-                sheet_count = wb_neg.Sheets.Count
-                _dbg(f"Copy {sheet_count} sheets NEG->POS")
-                for i in range(1, sheet_count + 1):
-                    wb_neg.Sheets(i).Copy(
-                        None, wb_pos.Sheets(wb_pos.Sheets.Count))
-
-                _dbg("Save POS")
-                wb_pos.Save()
-                _dbg("Close NEG")
-                wb_neg.Close(False)
-                _dbg("Close POS")
-                wb_pos.Close(False)
-            finally:
-                _dbg("excel.Quit")
-                excel.Quit()
-                _dbg("excel.Quit done")
-
-            # NEG 一時ファイル削除 (after で UI スレッド経由 → リトライも安全)
-            _dbg("delayed delete NEG tmp")
-            self.after(0, lambda p=neg_xlsx: self._delayed_delete(p))
-
-            self._queue_update(
-                'log', (f"  XLSX統合完了: {pos_xlsx}", "SUCCESS"))
-
-        except Exception as e:
-            self._queue_update(
-                'log', (f"  XLSX統合エラー: {e}", "WARNING"))
-
-    def _merge_ship_xlsx(self, pole_results):
-        """POS/NEGのXLSXを1ファイルに統合 (PNGは各pole完了時に既にエクスポート済み)
-        (bg スレッドから呼ばれる想定: ログは _queue_update で UI に投げる)"""
-        pos_xlsx = pole_results.get('POS', {}).get('xlsx_path')
-        neg_xlsx = pole_results.get('NEG', {}).get('xlsx_path')
-
-        if not pos_xlsx or not neg_xlsx:
-            return
-
-        def _dbg(msg):
-            self._queue_update('log', (f"[DBG] merge_ship: {msg}", "INFO"))
-
-        try:
-            import win32com.client
-
-            _dbg("DispatchEx")
-            excel = win32com.client.DispatchEx("Excel.Application")
-            excel.Visible = False
-            excel.DisplayAlerts = False
-            try:
-                _dbg(f"Open POS {os.path.basename(pos_xlsx)}")
-                wb_pos = excel.Workbooks.Open(os.path.abspath(pos_xlsx))
-                _dbg(f"Open NEG {os.path.basename(neg_xlsx)}")
-                wb_neg = excel.Workbooks.Open(os.path.abspath(neg_xlsx))
-
-                # NEGシートをPOSファイルにコピー
-                _dbg("Copy sheet NEG->POS")
-                wb_neg.Sheets(1).Copy(None, wb_pos.Sheets(wb_pos.Sheets.Count))
-
-                _dbg("Save POS")
-                wb_pos.Save()
-                _dbg("Close NEG")
-                wb_neg.Close(False)
-                _dbg("Close POS")
-                wb_pos.Close(False)
-            finally:
-                _dbg("excel.Quit")
-                excel.Quit()
-                _dbg("excel.Quit done")
-
-            # NEG 一時ファイル削除 (after で UI スレッド経由)
-            _dbg("delayed delete NEG tmp")
-            self.after(0, lambda p=neg_xlsx: self._delayed_delete(p))
-
-            self._queue_update(
-                'log', (f"  XLSX統合完了: {pos_xlsx}", "SUCCESS"))
-
-        except Exception as e:
-            self._queue_update(
-                'log', (f"  XLSX統合エラー: {e}", "WARNING"))
-
-    # ==================== 更新キュー・ポーリング ====================
+    # ==================== UI 更新 ====================
     def _queue_update(self, msg_type, data):
-        """ワーカースレッドからUI更新をキューに追加"""
-        self._update_queue.put((msg_type, data))
-
-    def _poll_updates(self):
-        """UIスレッドで更新キューをポーリング"""
-        try:
-            while not self._update_queue.empty():
-                msg_type, data = self._update_queue.get_nowait()
-
-                if msg_type == 'log':
-                    self.log(data[0], data[1])
-                elif msg_type == 'target':
-                    self.target_label.config(text=data)
-                elif msg_type == 'voltage':
-                    self.voltage_label.config(text=data)
-                elif msg_type == 'progress':
-                    current, total = data
-                    self.progress_label.config(text=f"{current} / {total}")
-                    self.progressbar['maximum'] = total
-                    self.progressbar['value'] = current
-                elif msg_type == 'linear_pole_done':
-                    res = data['results']
-                    tag = 'ng' if res['ng'] else 'ok'
-                    self.summary_tree.insert('', 'end', values=(
-                        data['def_name'], data['dac_name'], data['pole'],
-                        f"{res['gain']:.6f}", f"{res['offset']:.3f}",
-                        f"{res['max_error']:.3f}", res['judge']
-                    ), tags=(tag,))
-                    self._export_png_async(
-                        self._save_graph_linear_png, data)
-                elif msg_type == 'merge_linear_xlsx':
-                    self.log(
-                        "[DBG] poll: merge_linear_xlsx dispatch bg", "INFO")
-                    self._dispatch_merge_async(
-                        self._merge_linear_xlsx, data)
-                elif msg_type == 'ship_pole_done':
-                    tag = 'ng' if data['judge'] == 'NG' else 'ok'
-                    self.summary_tree.insert('', 'end', values=(
-                        data['def_name'], data['dac_name'], data['pole'],
-                        f"{data['inl_worst']:.4f}", f"{data['dnl_worst']:.4f}",
-                        '', data['judge']
-                    ), tags=(tag,))
-                    self._export_png_async(
-                        self._save_graph_ship_png, data)
-                elif msg_type == 'merge_ship_xlsx':
-                    self.log(
-                        "[DBG] poll: merge_ship_xlsx dispatch bg", "INFO")
-                    self._dispatch_merge_async(
-                        self._merge_ship_xlsx, data)
-                elif msg_type == 'done':
-                    self._finish()
-                    return
-        except Exception:
-            pass
-
-        if self.is_running:
-            self.after(50, self._poll_updates)
+        """ワーカースレッドからUI更新を投入 (反映は UI バスの次フレーム)"""
+        self._ui.put((msg_type, data))
+
+    def _on_logs(self, items):
+        for message, level in items:
+            self.log(message, level)
+
+    def _on_target(self, text):
+        self.target_label.config(text=text)
+
+    def _on_voltage(self, text):
+        self.voltage_label.config(text=text)
+
+    def _on_progress(self, data):
+        current, total = data
+        self.progress_label.config(text=f"{current} / {total}")
+        self.progressbar['maximum'] = total
+        self.progressbar['value'] = current
+
+    def _on_linear_pole_done(self, data):
+        res = data['results']
+        tag = 'ng' if res['ng'] else 'ok'
+        self.summary_tree.insert('', 'end', values=(
+            data['def_name'], data['dac_name'], data['pole'],
+            f"{res['gain']:.6f}", f"{res['offset']:.3f}",
+            f"{res['max_error']:.3f}", res['judge']
+        ), tags=(tag,))
+
+    def _on_ship_pole_done(self, data):
+        tag = 'ng' if data['judge'] == 'NG' else 'ok'
+        self.summary_tree.insert('', 'end', values=(
+            data['def_name'], data['dac_name'], data['pole'],
+            f"{data['inl_worst']:.4f}", f"{data['dnl_worst']:.4f}",
+            '', data['judge']
+        ), tags=(tag,))
+
+    def _on_done(self, _data):
+        self._finish()
 
     # ==================== ログ ====================
     def log(self, message, level="INFO"):
-        """ログ出力（バッファに蓄積 + ウィンドウが開いていれば表示）"""
+        """ログ出力（バッファに蓄積、ログウィンドウは次フレームで反映）"""
         ms = int(time.time() * 1000) % 1000
         timestamp = time.strftime("%H:%M:%S") + f".{ms:03d}"
-        formatted = f"[{timestamp}] {message}"
-
-        # バッファに蓄積
-        if not hasattr(self, '_log_buffer'):
-            self._log_buffer = []
-        self._log_buffer.append((formatted, level))
-
-        # ログウィンドウが開いていれば書き込み
-        if self._log_window and self._log_window.winfo_exists():
-            try:
-                self.log_text.config(state=tk.NORMAL)
-                self.log_text.insert(tk.END, formatted + "\n", level)
-                self.log_text.see(tk.END)
-                self.log_text.config(state=tk.DISABLED)
-            except tk.TclError:
-                pass
+        self._log_buffer.append(f"[{timestamp}] {message}", level)
@@ -1,7 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import time
-import json
 import os
 import sys
 import threading
@@ -14,6 +13,13 @@ if project_root not in sys.path:
 
 # CSV保存用ロガーのインポート
 from utils.csv_logger import MeasurementCSVLogger
+from utils.log_console import LogConsole
+from utils import (dmm_average, dmm_profiles, metrics, noise_analysis, scanner_driver, settings_store,
+                   tracer, ui_bus)
+
+
+# ノイズ解析の Welch セグメント長 (チャネルごとの計測は 1 回/巡回なので短め)
+NOISE_NFFT = 256
 
 
 class MeasurementWindow(tk.Toplevel):
@@ -32,15 +38,28 @@ class MeasurementWindow(tk.Toplevel):
         
         self.is_measuring = False
         self.measurement_count = 0
+        self._settings = settings_store.app_settings()
         
         # ★★★ 前回のスキャナ切替時間を読み込み ★★★
         saved_switch_delay = self._load_switch_delay()
         self.switch_delay_sec = tk.DoubleVar(value=saved_switch_delay)
 
+        # ★★★ DMM平均 (NRDGS n 点を 1 回のトリガーで取得、1 = 平均なし) ★★★
+        mw_settings = self._settings.section("measurement_window")
+        self.avg_count_var = tk.IntVar(value=mw_settings.get("avg_count", 1))
+        self.avg_method_var = tk.StringVar(value=mw_settings.get("avg_method", "stat").upper())
+        self._averager = None
+        self._dmm_read_timeout = 3.0   # TRIG SGL の読み取り待ちの上限 (秒、NPLC から計算)
+
+        # ★★★ DMM取得プロファイル (ベンチごとに保存、従来設定 = DMMタブの設定のまま) ★★★
+        self.dmm_profile_var = tk.StringVar(
+            value=dmm_profiles.label_of(dmm_profiles.selected("measurement_window")))
+
         self.scanner_slot = "1"
         self.last_closed_channel = None
         self._last_dmm_end_time = 0  # ch間処理時間計測用
-        self.update_timer_id = None
+        self.pattern_info_timer = None  # UI バスの定期処理ハンドル
+        self._pattern_change_timer = None
         
         # ★★★ DMM設定情報を保持 ★★★
         self.dmm_mode = "---"
@@ -51,6 +70,11 @@ class MeasurementWindow(tk.Toplevel):
         self.csv_logger = None
         self.is_csv_logging = False
 
+        # ★★★ ノイズ解析: チャネル (DEF Pole) ごとの Allan 偏差・PSD ★★★
+        self.noise_analyzers = {}   # {"DEF1 Pos": NoiseAnalyzer}
+        self._noise_codes = {}      # チャネルごとの直前の (DataSet, Code)
+        self.noise_window = None
+
         # ★★★ パターン実行同期オプション ★★★
         self.sync_with_pattern_var = tk.BooleanVar(value=self._load_sync_option())
         self.last_pattern_running_state = False  # パターン実行状態の前回値
@@ -63,9 +87,11 @@ class MeasurementWindow(tk.Toplevel):
         self.waiting_pole = "Pos"  # 待機中の極性
 
         # ★★★ スレッド化用: 結果キューとロック（スキャナーとDMMで分離）★★★
+        # ワーカーは結果をキューに入れた後 UI バスへ通知し、次フレームで取り出す
         self.scanner_queue = queue.Queue()
         self.dmm_queue = queue.Queue()
         self.measurement_lock = threading.Lock()
+        self._bus = ui_bus.get_bus(self)
 
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.create_widgets()
@@ -76,6 +102,11 @@ class MeasurementWindow(tk.Toplevel):
         # 測定間隔目安の初期表示と定期更新
         self._update_estimate()
         self._start_estimate_update()
+
+    def _deliver_result(self, result_queue, result, check):
+        """ワーカースレッドの結果をキューに入れ、UI バスの次フレームで check() を実行"""
+        result_queue.put(result)
+        self._bus.post(self, check)
         
     def create_widgets(self):
         """ウィジェットを作成"""
@@ -96,6 +127,34 @@ class MeasurementWindow(tk.Toplevel):
         switch_spinbox.bind('<FocusOut>', lambda e: self._on_delay_changed())
         ttk.Label(delay_frame, text="sec").pack(side=tk.LEFT)
 
+        # DMM平均
+        avg_frame = ttk.Frame(config_frame)
+        avg_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(avg_frame, text="DMM平均:").pack(side=tk.LEFT, padx=5)
+        self.avg_spinbox = ttk.Spinbox(avg_frame, from_=1, to=1000, increment=1,
+                                       textvariable=self.avg_count_var, width=6,
+                                       command=self._on_avg_changed)
+        self.avg_spinbox.pack(side=tk.LEFT, padx=2)
+        self.avg_spinbox.bind('<FocusOut>', lambda e: self._on_avg_changed())
+        ttk.Label(avg_frame, text="回").pack(side=tk.LEFT)
+        self.avg_method_combo = ttk.Combobox(avg_frame, textvariable=self.avg_method_var,
+                                             values=[m.upper() for m in dmm_average.METHODS],
+                                             state="readonly", width=6)
+        self.avg_method_combo.pack(side=tk.LEFT, padx=(10, 2))
+        self.avg_method_combo.bind("<<ComboboxSelected>>", lambda e: self._on_avg_changed())
+        ttk.Label(avg_frame, text="(1=平均なし, STAT: 3458A内部で統計 / FIFO: メモリから一括転送)",
+                  foreground="gray").pack(side=tk.LEFT, padx=5)
+
+        # DMM取得プロファイル (計測開始時に現在のレンジのまま適用)
+        profile_frame = ttk.Frame(config_frame)
+        profile_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(profile_frame, text="DMMプロファイル:").pack(side=tk.LEFT, padx=5)
+        self.profile_combo = ttk.Combobox(profile_frame, textvariable=self.dmm_profile_var,
+                                          values=dmm_profiles.labels(), state="readonly", width=10)
+        self.profile_combo.pack(side=tk.LEFT, padx=2)
+        self.profile_combo.bind("<<ComboboxSelected>>", lambda e: dmm_profiles.select(
+            "measurement_window", dmm_profiles.name_of(self.dmm_profile_var.get())))
+
         # 測定間隔目安表示
         estimate_frame = ttk.Frame(config_frame)
         estimate_frame.pack(fill=tk.X, pady=5)
@@ -163,6 +222,9 @@ class MeasurementWindow(tk.Toplevel):
         )
         self.sync_checkbox.pack(anchor=tk.W)
 
+        ttk.Button(button_row, text="ノイズ解析", command=self.open_noise_window,
+                   width=10).pack(side=tk.LEFT, padx=(15, 2))
+
         # ステータス表示
         self.count_label = ttk.Label(button_row, text="計測回数: 0", font=("", 10, "bold"))
         self.count_label.pack(side=tk.LEFT, padx=15)
@@ -227,18 +289,10 @@ class MeasurementWindow(tk.Toplevel):
         ttk.Button(log_option_frame, text="クリア", width=6,
                    command=self.clear_log).pack(side=tk.RIGHT, padx=5)
 
-        log_scroll = ttk.Scrollbar(log_frame)
-        log_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.log_text = tk.Text(log_frame, height=15, width=80, yscrollcommand=log_scroll.set,
-                                state=tk.DISABLED, font=("Courier", 9))
-        self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        log_scroll.config(command=self.log_text.yview)
-        
-        self.log_text.tag_config("INFO", foreground="black")
-        self.log_text.tag_config("SUCCESS", foreground="green")
-        self.log_text.tag_config("WARNING", foreground="orange")
-        self.log_text.tag_config("ERROR", foreground="red")
+        # 容量固定のログコンソール（長時間計測でもメモリ・描画コストが一定）
+        self.log_console = LogConsole(log_frame, capacity=10000, height=15, width=80,
+                                      font=("Courier", 9), show_filter=True)
+        self.log_console.pack(fill=tk.BOTH, expand=True)
         
         self.log("計測ウィンドウを初期化", "INFO")
         
@@ -246,17 +300,11 @@ class MeasurementWindow(tk.Toplevel):
         """ログ出力"""
         ms = int(time.time() * 1000) % 1000
         timestamp = time.strftime("%H:%M:%S") + f".{ms:03d}"
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n", level)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        self.update_idletasks()
+        self.log_console.log(f"[{timestamp}] {message}", level)
 
     def clear_log(self):
         """ログをクリア"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete("1.0", tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_console.clear()
     
     def get_selected_defs(self):
         """選択DEF取得"""
@@ -294,25 +342,44 @@ class MeasurementWindow(tk.Toplevel):
             messagebox.showwarning("警告", "DEFが選択されていません")
             return
         
+        # ★★★ DMM取得プロファイルを適用 (レンジは DMM タブで設定したまま) ★★★
+        profile = dmm_profiles.name_of(self.dmm_profile_var.get())
+        if profile and self.gpib_dmm.connected:
+            success, message = dmm_profiles.apply(self.gpib_dmm, profile)
+            self.log(message, "INFO" if success else "ERROR")
+
         # ★★★ DMM設定を取得 ★★★
         self.log("DMM設定を取得中...", "INFO")
         if not self.get_dmm_settings():
             if not messagebox.askyesno("警告", "DMM設定の取得に失敗しました。計測を続行しますか?"):
                 return
         
-        # 計測開始時にスロット全チャンネルをOPEN（cponでリセット）
-        orig_timeout = self.gpib_scanner.instrument.timeout
-        self.gpib_scanner.instrument.timeout = 5000
+        # 計測開始時にスロット全チャンネルをOPEN（cponでリセット、リレー状態モデルも全 OPEN）
+        self._scanner().reset()
+        self.last_closed_channel = None
 
-        try:
-            self.gpib_scanner.write(f":system:cpon {self.scanner_slot}")
-        finally:
-            self.gpib_scanner.instrument.timeout = orig_timeout
+        # ★★★ GPIB の完了待ちをサービスリクエスト (SRQ) で行う (使えなければシリアルポール) ★★★
+        for gpib in (self.gpib_scanner, self.gpib_dmm):
+            if gpib.connected:
+                success, message = gpib.enable_events()
+                self.log(f"{gpib.device_type}: {message}", "INFO" if success else "WARNING")
+
+        # ★★★ DMM平均の設定 (3458A への設定は最初の計測時にワーカースレッドで行う) ★★★
+        nplc_time = self._get_nplc_time()
+        self._averager = dmm_average.DMMAverager(
+            self.gpib_dmm, self._avg_count(), self.avg_method_var.get().lower(),
+            nplc=nplc_time / 0.02 if nplc_time > 0 else None)
+        self._dmm_read_timeout = max(3.0, dmm_average.read_timeout(1, nplc_time / 0.02)) if nplc_time > 0 else 3.0
+        self.avg_spinbox.config(state=tk.DISABLED)
+        self.avg_method_combo.config(state=tk.DISABLED)
+        self.profile_combo.config(state=tk.DISABLED)
+        if self._averager.enabled:
+            self.log(f"DMM平均: {self._averager.describe()}", "INFO")
 
-        self.last_closed_channel = None
-        
         self.is_measuring = True
         self.measurement_count = 0
+        self.noise_analyzers.clear()
+        self._noise_codes.clear()
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
 
@@ -341,6 +408,13 @@ class MeasurementWindow(tk.Toplevel):
         self.start_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
 
+        # ★★★ DMM平均の設定とイベント待ちを解除 (計測中のワーカーの完了を待ってから) ★★★
+        averager, self._averager = self._averager, None
+        threading.Thread(target=self._release_instruments, args=(averager,), daemon=True).start()
+        self.avg_spinbox.config(state=tk.NORMAL)
+        self.avg_method_combo.config(state="readonly")
+        self.profile_combo.config(state="readonly")
+
         # ★★★ パターン切替待機中なら解除 ★★★
         if self.is_waiting_for_pattern_change:
             self._end_waiting_for_pattern_change()
@@ -375,6 +449,9 @@ class MeasurementWindow(tk.Toplevel):
                 per_ch = cycle_duration / ch_count if ch_count > 0 else 0
                 estimate = self._get_measurement_interval_seconds()
                 diff = cycle_duration - estimate
+                tracer.instant("cycle.done", "measure", duration=cycle_duration,
+                               estimate=estimate, channels=ch_count)
+                metrics.observe_cycle(cycle_duration, estimate)
                 cycle_time_str = f" 実測: {cycle_duration:.1f}秒 ({per_ch:.2f}秒/ch), 目安: {estimate:.1f}秒, 差: {diff:+.1f}秒"
             self._cycle_start_time = now
 
@@ -435,102 +512,67 @@ class MeasurementWindow(tk.Toplevel):
         # スキャナー切替開始時刻を記録
         self._scanner_start_time = time_module.time()
 
-        # 別スレッドでスキャナー切り替えを実行
+        # 別スレッドでスキャナー切り替えを実行（完了時に結果チェックを UI バスへ通知）
+        check = lambda: self._check_scanner_result(selected_defs, def_index, pole, def_info)
         thread = threading.Thread(
             target=self._scanner_switch_worker,
-            args=(channel_addr, def_info, pole),
+            args=(channel_addr, def_info, pole, check),
             daemon=True
         )
         thread.start()
 
-        # 結果のポーリング開始
-        self.after(10, lambda: self._check_scanner_result(selected_defs, def_index, pole, def_info))
-
-    def _scanner_switch_worker(self, channel_addr, def_info, pole):
+    @tracer.traced("scanner.switch", "measure")
+    def _scanner_switch_worker(self, channel_addr, def_info, pole, check):
         """スキャナー切り替えのワーカースレッド
 
-        cponで全チャンネルOPEN後、対象チャンネルのみCLOSE
-        （Excelマクロと同じ方式で確実にクリーンな状態を保証）
+        リレー状態モデルから、閉じているチャンネルだけを OPEN → 間隔 → 対象チャンネルを CLOSE
+        (同じチャンネルなら何も送らない)。エラー時・differential 無効時は cpon で全 OPEN 後に CLOSE
         """
         result = {
             'success': False,
             'channel_addr': channel_addr,
             'error': None,
+            'mode': None,
             'detail': [],  # 詳細ログ用
             'timing': {}   # コマンド別タイミング
         }
 
         try:
-            detail_mode = self.detail_mode_var.get()
-
             with self.measurement_lock:
-                orig_timeout = self.gpib_scanner.instrument.timeout
-                self.gpib_scanner.instrument.timeout = 5000
-                switch_delay = self.switch_delay_sec.get()
-
-                try:
-                    # cponで全チャンネルOPEN（Excelマクロと同じ方式）
-                    open_start = time.time()
-                    open_success, _ = self.gpib_scanner.write(f":system:cpon {self.scanner_slot}")
-                    open_elapsed = time.time() - open_start
-                    result['timing']['open'] = open_elapsed
-
-                    wait_time = switch_delay / 2
-                    result['detail'].append(f"cpon {self.scanner_slot}: {open_elapsed:.3f}秒 → 待機 {wait_time:.2f}秒")
-
-                    sleep_start = time.time()
-                    time.sleep(wait_time)
-                    actual_sleep = time.time() - sleep_start
-                    result['timing']['cpon_wait_requested'] = wait_time
-                    result['timing']['cpon_wait_actual'] = actual_sleep
-
-                    if not open_success:
-                        result['error'] = 'cpon_failed'
-                        self.scanner_queue.put(result)
-                        return
-
-                    # *OPC?でcpon完了を確認（常時実行）
-                    # - cpon処理完了まで応答をブロック → CLOSE前に確実に完了保証
-                    # - GPIB busの往復通信でアイドル後の再接続コストを解消
-                    #   → CLOSE所要時間を0.13-0.27秒 → 0.003秒に削減
-                    try:
-                        opc_start = time.time()
-                        _, opc_resp = self.gpib_scanner.query("*OPC?")
-                        opc_elapsed = time.time() - opc_start
-                        result['timing']['opc_after_wait'] = opc_elapsed
-                        if detail_mode:
-                            result['detail'].append(
-                                f"*OPC? (cpon完了確認): {opc_elapsed:.3f}秒"
-                                f" → {'完了済み' if opc_elapsed < 0.05 else 'cpon未完了 +' + f'{opc_elapsed:.3f}秒待ち'}"
-                            )
-                    except Exception as e:
-                        result['timing']['opc_after_wait'] = -1
-                        if detail_mode:
-                            result['detail'].append(f"*OPC? エラー: {e}")
-
-                    # 新しいチャンネルをCLOSE
-                    close_start = time.time()
-                    success, _ = self.gpib_scanner.write(f"CLOSE ({channel_addr})")
-                    close_elapsed = time.time() - close_start
-                    result['timing']['close'] = close_elapsed
-
-                    # cpon送信～CLOSE完了の合計時間（待機+GPIB全込み）
-                    result['timing']['cpon_to_close_total'] = time.time() - open_start
-                    # cpon待機+CLOSE所要時間の合計（一定になるはずの値）
-                    result['timing']['wait_plus_close'] = actual_sleep + close_elapsed
-
-                    result['detail'].append(f"CLOSE ({channel_addr}): {close_elapsed:.3f}秒")
-                    if success:
-                        result['success'] = True
-                    else:
-                        result['error'] = 'close_failed'
-                finally:
-                    self.gpib_scanner.instrument.timeout = orig_timeout
+                start = time.time()
+                # CLOSE後の安定待ちは UI 側 (_check_scanner_result) で行う
+                success, info = self._scanner().switch(channel_addr, settle=0.0)
+                timing = info['timing']
+                result['mode'] = info['mode']
+                result['timing']['open'] = timing['open']
+                result['timing']['close'] = timing['close']
+                result['timing']['cpon_wait_requested'] = self._scanner().cfg['break_gap_sec'] if info['open'] else 0.0
+                result['timing']['cpon_wait_actual'] = timing['gap']
+                # OPEN～CLOSE完了の合計時間（間隔+GPIB全込み）
+                result['timing']['cpon_to_close_total'] = time.time() - start
+                result['timing']['wait_plus_close'] = timing['gap'] + timing['close']
+
+                opened = ",".join(info['open']) or "なし"
+                if info['mode'] == 'unchanged':
+                    result['detail'].append(f"unchanged: CLOSE ({channel_addr}) のまま (コマンド送信なし)")
+                else:
+                    result['detail'].append(
+                        f"{info['mode']}: OPEN {opened} ({timing['open']:.3f}秒) → 間隔 {timing['gap']:.3f}秒 → "
+                        f"CLOSE ({channel_addr}) ({timing['close']:.3f}秒)")
+                result['detail'].extend(info['detail'])
+                if success:
+                    result['success'] = True
+                else:
+                    result['error'] = 'switch_failed'
         except Exception as e:
             result['error'] = str(e)
 
         result['timing']['thread_end'] = time.time()
-        self.scanner_queue.put(result)
+        self._deliver_result(self.scanner_queue, result, check)
+
+    def _scanner(self):
+        """スキャナーのリレー状態を持つドライバー (Linearity・DC特性と共有)"""
+        return scanner_driver.get_driver(self.gpib_scanner, self.scanner_slot)
 
     def _check_scanner_result(self, selected_defs, def_index, pole, def_info):
         """スキャナー切り替え結果をチェック"""
@@ -549,8 +591,10 @@ class MeasurementWindow(tk.Toplevel):
 
             if result['success']:
                 self.last_closed_channel = result['channel_addr']
+                tracer.instant("tk.pickup", "ui", kind="scanner",
+                               latency=time_module.time() - result['timing']['thread_end'])
 
-                # 詳細モードの場合、cpon/CLOSEの詳細をログ出力
+                # 詳細モードの場合、OPEN/CLOSEの詳細をログ出力
                 if self.detail_mode_var.get() and result.get('detail'):
                     for detail in result['detail']:
                         self.log(f"  {detail}", "INFO")
@@ -565,14 +609,14 @@ class MeasurementWindow(tk.Toplevel):
                     open_time = timing.get('open', 0)
                     close_time = timing.get('close', 0)
                     gpib_total = open_time + close_time
-                    self.log(f"  スキャナー切替時間: {scanner_elapsed:.3f}秒 (GPIB: cpon={open_time:.3f}秒 + CLOSE={close_time:.3f}秒 = {gpib_total:.3f}秒)", "INFO")
+                    self.log(f"  スキャナー切替時間: {scanner_elapsed:.3f}秒 (GPIB: OPEN={open_time:.3f}秒 + CLOSE={close_time:.3f}秒 = {gpib_total:.3f}秒)", "INFO")
 
-                    # cpon待機+CLOSE合計（一定になるはずの値）
+                    # OPEN後の間隔+CLOSE合計（一定になるはずの値）
                     wait_plus_close = timing.get('wait_plus_close', 0)
                     cpon_wait_actual = timing.get('cpon_wait_actual', 0)
                     cpon_wait_requested = timing.get('cpon_wait_requested', 0)
                     sleep_diff = cpon_wait_actual - cpon_wait_requested
-                    self.log(f"  cpon待機+CLOSE合計: {wait_plus_close:.3f}秒 (sleep実績: {cpon_wait_actual:.3f}秒, 要求: {cpon_wait_requested:.3f}秒, 差: {sleep_diff:+.3f}秒)", "INFO")
+                    self.log(f"  間隔+CLOSE合計: {wait_plus_close:.3f}秒 (sleep実績: {cpon_wait_actual:.3f}秒, 要求: {cpon_wait_requested:.3f}秒, 差: {sleep_diff:+.3f}秒)", "INFO")
 
                     # キュー取得遅延（スレッド完了→メインスレッドpickupまで）
                     thread_end = timing.get('thread_end', 0)
@@ -580,18 +624,24 @@ class MeasurementWindow(tk.Toplevel):
                         queue_latency = time_module.time() - thread_end
                         self.log(f"  キュー取得遅延: {queue_latency:.3f}秒 (スレッド→メインスレッド)", "INFO")
 
-                # スキャナー切替時間の1/2: CLOSE後、DMM計測開始までの待ち時間
-                delay_ms = int(self.switch_delay_sec.get() / 2 * 1000)
+                # スキャナー切替時間の1/2: CLOSE送信から DMM計測開始までの最小時間 (完了待ちの分を差し引く)
+                # 同じチャンネルのまま (リレー操作なし) なら待たない
+                close_time = result.get('timing', {}).get('close', 0)
+                delay_ms = int(max(0.0, self.switch_delay_sec.get() / 2 - close_time) * 1000)
+                if result.get('mode') == 'unchanged':
+                    delay_ms = 0
                 if self.detail_mode_var.get():
                     self.log(f"  CLOSE後待機 {delay_ms/1000:.2f}秒 → DMM計測", "INFO")
                 self.after(delay_ms, lambda: self.do_dmm_measurement(selected_defs, def_index, pole, def_info))
             else:
+                for detail in result.get('detail', []):
+                    self.log(f"  {detail}", "ERROR")
                 self.log(f"CLOSE失敗: {result.get('error', 'unknown')}", "ERROR")
                 self.stop_measurement()
 
         except queue.Empty:
-            # まだ結果がない → 再チェック（UIは応答可能）
-            self.after(20, lambda: self._check_scanner_result(selected_defs, def_index, pole, def_info))
+            # キュークリア済みの古い通知 → 何もしない
+            pass
     
     def do_dmm_measurement(self, selected_defs, def_index, pole, def_info):
         """DMM計測（非同期版）- 別スレッドで実行してUIをブロックしない"""
@@ -607,18 +657,17 @@ class MeasurementWindow(tk.Toplevel):
         # 計測開始時刻を記録
         self._dmm_start_time = time_module.time()
 
-        # 別スレッドで測定を実行
+        # 別スレッドで測定を実行（完了時に結果チェックを UI バスへ通知）
+        check = lambda: self._check_dmm_result(selected_defs, def_index, pole, def_info)
         thread = threading.Thread(
             target=self._dmm_measure_worker,
-            args=(selected_defs, def_index, pole, def_info),
+            args=(check,),
             daemon=True
         )
         thread.start()
 
-        # 結果のポーリング開始
-        self.after(10, lambda: self._check_dmm_result(selected_defs, def_index, pole, def_info))
-
-    def _dmm_measure_worker(self, selected_defs, def_index, pole, def_info):
+    @tracer.traced("dmm.measure", "measure")
+    def _dmm_measure_worker(self, check):
         """DMM測定のワーカースレッド"""
         result = {
             'success': False,
@@ -633,28 +682,46 @@ class MeasurementWindow(tk.Toplevel):
                 lock_acquired = time.time()
                 result['timing']['lock_wait'] = lock_acquired - result['timing']['thread_start']
 
-                orig_timeout = self.gpib_dmm.instrument.timeout
-                self.gpib_dmm.instrument.timeout = 3000
-
-                try:
-                    # TRIG SGLコマンドの時間計測
-                    trig_start = time.time()
-                    success, response = self.gpib_dmm.query("TRIG SGL")
-                    trig_elapsed = time.time() - trig_start
-                    result['timing']['trig_sgl'] = trig_elapsed
-
+                # TRIG SGLコマンドの時間計測
+                trig_start = time.time()
+                averager = self._averager
+                if averager is not None and averager.enabled:
+                    # NRDGS n 点を 1 回のトリガーで取得し、平均・標準偏差・点数を受け取る
+                    success, response = averager.read()
                     if success:
-                        result['success'] = True
-                        result['response'] = response
+                        result['sdev'] = response['sdev']
+                        result['count'] = response['count']
+                        response = f"{response['mean']:+.9E}"
                     else:
-                        result['error'] = 'query_failed'
-                finally:
-                    self.gpib_dmm.instrument.timeout = orig_timeout
+                        result['detail'] = response
+                else:
+                    # イベント待ち有効時は Data Available の SRQ を待ってから読む
+                    success, response = self.gpib_dmm.trigger_read("TRIG SGL", timeout=self._dmm_read_timeout)
+                trig_elapsed = time.time() - trig_start
+                result['timing']['trig_sgl'] = trig_elapsed
+
+                if success:
+                    result['success'] = True
+                    result['response'] = response
+                    metrics.record_reading("measurement_window")
+                else:
+                    result['error'] = 'query_failed'
         except Exception as e:
             result['error'] = str(e)
 
         result['timing']['thread_end'] = time.time()
-        self.dmm_queue.put(result)
+        self._deliver_result(self.dmm_queue, result, check)
+
+    def _release_instruments(self, averager):
+        """DMM平均の設定解除とイベント待ちの解除 (ワーカースレッド)"""
+        with self.measurement_lock:
+            success, message = True, "OK"
+            if averager is not None and averager.armed and averager.enabled:
+                success, message = averager.disarm()
+            for gpib in (self.gpib_scanner, self.gpib_dmm):
+                gpib.disable_events()
+        if not success:
+            self._bus.post(self, self.log, f"DMM平均の解除失敗: {message}", "WARNING")
 
     def _check_dmm_result(self, selected_defs, def_index, pole, def_info):
         """DMM測定結果をチェック・UI更新"""
@@ -673,6 +740,8 @@ class MeasurementWindow(tk.Toplevel):
 
             if result['success']:
                 value = result['response'].strip()
+                tracer.instant("tk.pickup", "ui", kind="dmm",
+                               latency=time_module.time() - result['timing']['thread_end'])
                 # 計測完了時にDEF/Pole/CHも再表示（表示ずれ防止）
                 self.def_label.config(text=def_info['name'])
                 self.pole_label.config(text=pole)
@@ -682,7 +751,10 @@ class MeasurementWindow(tk.Toplevel):
                 self.measurement_label.config(text=f"{value} V")
                 self.measurement_count += 1
                 self.count_label.config(text=f"計測回数: {self.measurement_count}")
-                self.log(f"計測OK ({self.measurement_count}): {def_info['name']} {pole} = {value} V", "SUCCESS")
+                sdev, count = result.get('sdev'), result.get('count')
+                avg_str = f" (σ={sdev:.3E} V, n={count})" if sdev is not None else ""
+                self.log(f"計測OK ({self.measurement_count}): {def_info['name']} {pole} = {value} V{avg_str}", "SUCCESS")
+                self._feed_noise(f"{def_info['name']} {pole}", value)
 
                 # 詳細モードの場合、DMM計測時間を表示
                 if self.detail_mode_var.get():
@@ -718,12 +790,14 @@ class MeasurementWindow(tk.Toplevel):
                         value,
                         is_cycle_start=is_cycle_start,
                         dataset=dataset,
-                        code=code
+                        code=code,
+                        sdev=sdev,
+                        count=count
                     )
             else:
                 error_msg = result.get('error', 'unknown')
                 if error_msg == 'query_failed':
-                    self.log("TRIG SGL失敗", "ERROR")
+                    self.log(f"TRIG SGL失敗{': ' + result['detail'] if result.get('detail') else ''}", "ERROR")
                 else:
                     self.log(f"計測失敗: {error_msg}", "ERROR")
 
@@ -735,9 +809,37 @@ class MeasurementWindow(tk.Toplevel):
             self.do_one_measurement(selected_defs, next_idx, next_pole)
 
         except queue.Empty:
-            # まだ結果がない → 再チェック（UIは応答可能）
-            self.after(20, lambda: self._check_dmm_result(selected_defs, def_index, pole, def_info))
+            # キュークリア済みの古い通知 → 何もしない
+            pass
     
+    def _feed_noise(self, name, value):
+        """チャネルのノイズ解析に計測値を追加 (コードが変わったらそのチャネルをリセット)"""
+        try:
+            volts = float(value)
+        except ValueError:
+            return
+        pattern = self.get_current_pattern_info()
+        code = (pattern['dataset'], pattern['code'])
+
+        analyzer = self.noise_analyzers.get(name)
+        if analyzer is None:
+            analyzer = noise_analysis.NoiseAnalyzer(
+                noise_analysis.lsb_voltage_from_settings(), nfft=NOISE_NFFT)
+            self.noise_analyzers[name] = analyzer
+        elif self._noise_codes.get(name) != code:
+            analyzer.reset()
+        self._noise_codes[name] = code
+        analyzer.update([time.time()], [volts])
+
+    def open_noise_window(self):
+        """チャネルごとのノイズ解析ウィンドウ (Allan 偏差・振幅スペクトル密度, LSB) を開く"""
+        if self.noise_window is not None and self.noise_window.winfo_exists():
+            self.noise_window.lift()
+            return
+        from tabs.noise_window import NoiseWindow
+        self.noise_window = NoiseWindow(self, lambda: dict(self.noise_analyzers),
+                                        title="ノイズ解析 (パターン計測)")
+
     def get_next(self, idx, pole, total):
         """次の位置"""
         return (idx, "Neg") if pole == "Pos" else (idx + 1, "Pos")
@@ -757,7 +859,9 @@ class MeasurementWindow(tk.Toplevel):
             return
         
         # CSVロガーを初期化
-        self.csv_logger = MeasurementCSVLogger(save_dir, filename, serial_numbers)
+        # DMM平均中は標準偏差・点数の列も保存
+        stats = self._averager is not None and self._averager.enabled
+        self.csv_logger = MeasurementCSVLogger(save_dir, filename, serial_numbers, stats=stats)
         
         # ログ記録開始
         success, message = self.csv_logger.start_logging()
@@ -832,39 +936,34 @@ class MeasurementWindow(tk.Toplevel):
             self.log(f"DEFチェックボックス操作エラー: {e}", "WARNING")
     
     def _load_save_config(self):
-        """設定ファイルから保存先とシリアルNo.を取得"""
-        config_file = "app_settings.json"
+        """設定ストアから保存先とシリアルNo.を取得"""
         save_dir = "measurement_data"
         filename = "measurement.csv"  # デフォルトは拡張子付き
         serial_numbers = {}
         
         try:
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                
-                # 保存先ディレクトリ
-                save_dir = config.get("save_config", {}).get("save_dir", save_dir)
-                
-                # CSVファイル名（DEFシリアルの設定）
-                comm1_config = config.get("comm_profiles", {}).get("1", {})
-                file_name_with_ext = comm1_config.get("save_config", {}).get("file_name", "measurement.csv")
-                # 拡張子が付いていない場合は追加
-                if not file_name_with_ext.lower().endswith('.csv'):
-                    filename = f"{file_name_with_ext}.csv"
-                else:
-                    filename = file_name_with_ext
-                
-                # シリアルナンバー（DEFシリアルの設定、チェックされたDEFのみ）
-                serial_config = comm1_config.get("serial_numbers", {})
-                
-                # チェックされたDEFのみを取得
-                if hasattr(self.test_tab, 'def_check_vars'):
-                    for i, check_var in enumerate(self.test_tab.def_check_vars):
-                        if check_var.get():
-                            sn_key = f"DEF{i}_sn"
-                            serial = serial_config.get(sn_key, f"DEF{i}")
-                            serial_numbers[i] = serial
+            # 保存先ディレクトリ
+            save_dir = self._settings.section("save_config").get("save_dir", save_dir)
+
+            # CSVファイル名（DEFシリアルの設定）
+            comm1_config = self._settings.section("comm_profiles").get("1", {})
+            file_name_with_ext = comm1_config.get("save_config", {}).get("file_name", "measurement.csv")
+            # 拡張子が付いていない場合は追加
+            if not file_name_with_ext.lower().endswith('.csv'):
+                filename = f"{file_name_with_ext}.csv"
+            else:
+                filename = file_name_with_ext
+
+            # シリアルナンバー（DEFシリアルの設定、チェックされたDEFのみ）
+            serial_config = comm1_config.get("serial_numbers", {})
+
+            # チェックされたDEFのみを取得
+            if hasattr(self.test_tab, 'def_check_vars'):
+                for i, check_var in enumerate(self.test_tab.def_check_vars):
+                    if check_var.get():
+                        sn_key = f"DEF{i}_sn"
+                        serial = serial_config.get(sn_key, f"DEF{i}")
+                        serial_numbers[i] = serial
         
         except Exception as e:
             self.log(f"設定ファイル読み込みエラー: {e}", "ERROR")
@@ -914,14 +1013,7 @@ class MeasurementWindow(tk.Toplevel):
         計測停止時に呼ばれ、cponで全チャンネルをOPENする
         """
         try:
-            orig_timeout = self.gpib_scanner.instrument.timeout
-            self.gpib_scanner.instrument.timeout = 5000
-
-            try:
-                self.gpib_scanner.write(f":system:cpon {self.scanner_slot}")
-            finally:
-                self.gpib_scanner.instrument.timeout = orig_timeout
-
+            self._scanner().reset()
         except Exception as e:
             self.log(f"チャンネルOPEN時エラー: {e}", "ERROR")
             
@@ -1013,8 +1105,9 @@ class MeasurementWindow(tk.Toplevel):
         return {'pattern_no': pattern_no, 'dataset': dataset, 'code': code, 'pole': pole}
         
     def start_pattern_info_update(self):
-        """パターン情報の定期更新を開始"""
+        """パターン情報の定期更新を開始（UI バスで200msごと）"""
         self.update_pattern_info_display()
+        self.pattern_info_timer = self._bus.every(self, 200, self.update_pattern_info_display)
     
     def update_pattern_info_display(self):
         """パターン情報表示を更新（定期実行）"""
@@ -1058,9 +1151,6 @@ class MeasurementWindow(tk.Toplevel):
                     self.stop_measurement()
 
             self.last_pattern_running_state = current_pattern_running
-
-        # 200ms後に再度実行（定期更新）
-        self.update_timer_id = self.after(200, self.update_pattern_info_display)
         
     def get_dmm_settings(self):
         """DMMの設定を取得（dmm3458a_tabの機能を利用）"""
@@ -1118,17 +1208,11 @@ class MeasurementWindow(tk.Toplevel):
 
     def _load_switch_delay(self):
         """スキャナ切替時間を読み込み"""
-        config_file = "app_settings.json"
         default_switch = 1.0
 
         try:
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-
-                switch_delay = config.get("measurement_window", {}).get("switch_delay_sec", default_switch)
-                return max(0.4, switch_delay)
-
+            switch_delay = self._settings.section("measurement_window").get("switch_delay_sec", default_switch)
+            return max(0.4, switch_delay)
         except Exception:
             pass
 
@@ -1136,22 +1220,8 @@ class MeasurementWindow(tk.Toplevel):
 
     def _save_switch_delay(self):
         """スキャナ切替時間を保存"""
-        config_file = "app_settings.json"
-
         try:
-            config = {}
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-
-            if "measurement_window" not in config:
-                config["measurement_window"] = {}
-
-            config["measurement_window"]["switch_delay_sec"] = self.switch_delay_sec.get()
-
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
-
+            self._settings.update("measurement_window", switch_delay_sec=self.switch_delay_sec.get())
         except Exception as e:
             self.log(f"設定保存エラー: {e}", "WARNING")
 
@@ -1180,6 +1250,7 @@ class MeasurementWindow(tk.Toplevel):
                     nplc_time = nplc_val * 0.02  # 50Hz基準
                 except ValueError:
                     pass
+            nplc_time *= self._avg_count()  # DMM平均: n 点分の積分時間
 
             # オーバーヘッド: 1チャンネルあたり約0.40秒（実測ベース）
             # - スキャナーGPIB (cpon + *OPC? + CLOSE): 約0.016秒
@@ -1217,43 +1288,33 @@ class MeasurementWindow(tk.Toplevel):
 
     def _start_estimate_update(self):
         """測定間隔目安の定期更新を開始（DEF選択やチャンネル変更を検知）"""
-        self._update_estimate()
         # 1秒ごとに更新
-        self.after(1000, self._start_estimate_update)
-
-    def _load_sync_option(self):
-        """パターン実行同期オプションを読み込み"""
-        config_file = "app_settings.json"
+        self._bus.every(self, 1000, self._update_estimate)
 
+    def _avg_count(self):
+        """DMM平均回数 (不正な入力は 1)"""
         try:
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+            return max(1, int(self.avg_count_var.get()))
+        except (tk.TclError, ValueError):
+            return 1
 
-                return config.get("measurement_window", {}).get("sync_with_pattern", False)
-        except Exception:
-            pass
+    def _on_avg_changed(self):
+        """DMM平均設定の変更を保存"""
+        try:
+            self._settings.update("measurement_window", avg_count=self._avg_count(),
+                                  avg_method=self.avg_method_var.get().lower())
+        except Exception as e:
+            self.log(f"設定保存エラー: {e}", "WARNING")
+        self._update_estimate()
 
-        return False
+    def _load_sync_option(self):
+        """パターン実行同期オプションを読み込み"""
+        return self._settings.section("measurement_window").get("sync_with_pattern", False)
 
     def _save_sync_option(self):
         """パターン実行同期オプションを保存"""
-        config_file = "app_settings.json"
-
         try:
-            config = {}
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-
-            if "measurement_window" not in config:
-                config["measurement_window"] = {}
-
-            config["measurement_window"]["sync_with_pattern"] = self.sync_with_pattern_var.get()
-
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
-
+            self._settings.update("measurement_window", sync_with_pattern=self.sync_with_pattern_var.get())
         except Exception as e:
             self.log(f"設定保存エラー: {e}", "WARNING")
 
@@ -1304,7 +1365,7 @@ class MeasurementWindow(tk.Toplevel):
                 return 0
 
             switch_delay = self.switch_delay_sec.get()
-            nplc_time = self._get_nplc_time()
+            nplc_time = self._get_nplc_time() * self._avg_count()
 
             # オーバーヘッド: 1チャンネルあたり約0.40秒（実測ベース）
             # - スキャナーGPIB (cpon + *OPC? + CLOSE): 約0.016秒
@@ -1359,7 +1420,9 @@ class MeasurementWindow(tk.Toplevel):
         self.csv_status_label.config(text="■ パターン切替待機中", foreground="orange")
 
         # 500msごとにパターン切替をチェック
-        self.after(500, self._check_pattern_change)
+        if self._pattern_change_timer is not None:
+            self._pattern_change_timer.cancel()
+        self._pattern_change_timer = self._bus.every(self, 500, self._check_pattern_change)
 
     def _check_pattern_change(self):
         """パターンが切り替わったかをチェック"""
@@ -1386,15 +1449,14 @@ class MeasurementWindow(tk.Toplevel):
 
             # 計測を再開
             self.do_one_measurement(self.waiting_selected_defs, 0, "Pos")
-            return
-
-        # まだ切り替わっていない場合は再チェック
-        self.after(500, self._check_pattern_change)
 
     def _end_waiting_for_pattern_change(self):
         """パターン切替待機を終了"""
         self.is_waiting_for_pattern_change = False
         self.waiting_pattern_index = -1
+        if self._pattern_change_timer is not None:
+            self._pattern_change_timer.cancel()
+            self._pattern_change_timer = None
 
         if self.is_csv_logging:
             self.csv_status_label.config(text="■ CSV保存中", foreground="red")
@@ -0,0 +1,116 @@
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from utils import ui_bus
+
+REFRESH_MS = 1000   # グラフ更新間隔 (計測中に 1 秒ごと)
+
+
+class NoiseWindow(tk.Toplevel):
+    """DMM 計測値のノイズ解析ウィンドウ (Allan 偏差・振幅スペクトル密度を LSB で表示)
+
+    Args:
+        sources: {表示名: NoiseAnalyzer} を返す callable (チャネル選択の候補、毎回呼び直す)
+    """
+
+    def __init__(self, parent, sources, title="ノイズ解析"):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("820x720")
+        self.sources = sources
+        self._bus = ui_bus.get_bus(self)
+
+        self.create_widgets()
+        self._bus.every(self, REFRESH_MS, self.refresh, delay_ms=0)
+
+    def create_widgets(self):
+        top = ttk.Frame(self, padding=5)
+        top.pack(fill=tk.X)
+
+        ttk.Label(top, text="チャネル:").pack(side=tk.LEFT, padx=(5, 2))
+        self.source_var = tk.StringVar()
+        self.source_combo = ttk.Combobox(top, textvariable=self.source_var, width=24, state="readonly")
+        self.source_combo.pack(side=tk.LEFT, padx=2)
+        self.source_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+        ttk.Button(top, text="リセット", command=self.reset_source, width=8).pack(side=tk.LEFT, padx=10)
+
+        self.info_label = ttk.Label(top, text="---")
+        self.info_label.pack(side=tk.LEFT, padx=10)
+
+        self.summary_label = ttk.Label(self, text="---", foreground="blue", font=("", 10, "bold"),
+                                       padding=(10, 0))
+        self.summary_label.pack(fill=tk.X)
+
+        self.figure = Figure(figsize=(8, 6.4), dpi=100)
+        self.ax_adev = self.figure.add_subplot(211)
+        self.ax_asd = self.figure.add_subplot(212)
+        self.figure.subplots_adjust(hspace=0.35)
+        self.canvas = FigureCanvasTkAgg(self.figure, self)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    def _selected(self):
+        """選択中のチャネルの NoiseAnalyzer (候補の更新も行う)"""
+        analyzers = self.sources() or {}
+        names = list(analyzers)
+        if list(self.source_combo.cget("values")) != names:
+            self.source_combo.config(values=names)
+        if self.source_var.get() not in analyzers:
+            self.source_var.set(names[0] if names else "")
+        return analyzers.get(self.source_var.get())
+
+    def reset_source(self):
+        analyzer = self._selected()
+        if analyzer is not None:
+            analyzer.reset()
+            self.refresh()
+
+    def refresh(self):
+        analyzer = self._selected()
+        if analyzer is None:
+            self.info_label.config(text="解析対象の計測がありません")
+            return
+
+        res = analyzer.result()
+        self.info_label.config(
+            text=f"{res['count']} 点, τ0 = {res['tau0']:.4g} s, 1LSB = {analyzer.lsb_voltage:.4g} V")
+
+        ax = self.ax_adev
+        ax.clear()
+        if len(res['tau']):
+            ax.errorbar(res['tau'], res['adev'], yerr=res['adev_err'], fmt='o-', ms=3, capsize=2)
+            ax.set_xscale('log')
+            ax.set_yscale('log')
+        ax.set_xlabel('τ [s]')
+        ax.set_ylabel('Allan deviation [LSB]')
+        ax.grid(True, which='both', alpha=0.3)
+
+        ax = self.ax_asd
+        ax.clear()
+        if len(res['freqs']) > 1:
+            ax.loglog(res['freqs'][1:], res['asd'][1:], lw=0.8)
+        ax.set_xlabel('Frequency [Hz]')
+        ax.set_ylabel('ASD [LSB/√Hz]')
+        ax.grid(True, which='both', alpha=0.3)
+
+        self.canvas.draw_idle()
+        self.summary_label.config(text=self._summary(res))
+
+    @staticmethod
+    def _summary(res):
+        """最短 τ の雑音・Allan 偏差の最小点 (以降はドリフト等が優勢)・最長 τ の雑音"""
+        if not len(res['tau']):
+            return "データ不足"
+        parts = [f"σ(τ0) = {res['adev'][0]:.3g} LSB"]
+        if res['noise'] and res['noise'][0]:
+            parts[0] += f" ({res['noise'][0]})"
+        if res['adev_min'] is not None:
+            tau, value = res['adev_min']
+            parts.append(f"最小 {value:.3g} LSB @ τ = {tau:.3g} s")
+        slopes = [s for s in res['slopes'] if not np.isnan(s)]
+        if slopes:
+            parts.append(f"長い τ: {res['noise'][-1]} (傾き {slopes[-1]:+.2f})")
+        return " / ".join(parts)
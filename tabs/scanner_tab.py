@@ -1,7 +1,6 @@
 import tkinter as tk
 from tkinter import ttk
-from utils import LoggerWidget
-import json
+from utils import LoggerWidget, scanner_driver, settings_store
 import time
 import os
 
@@ -127,6 +126,9 @@ class ScannerTab(ttk.Frame):
             self.channel_vars[channel].set(not is_checked)
             return
 
+        # 計測タブのスキャナードライバーを通さずにリレーを操作するので、次の切り替えで状態を読み直させる
+        scanner_driver.invalidate(self.gpib)
+
         if is_checked:
             # レ点が入った → 他のチャンネルをOPENしてからCLOSE
             # 他のチェックを外す（単一選択）
@@ -278,32 +280,15 @@ class ScannerTab(ttk.Frame):
 
     # ---------- 設定読み込み・保存 ----------
     def load_relay_delay(self):
-        """設定ファイルからリレー待ち時間を読み込み"""
-        try:
-            with open(self.SETTINGS_FILE, "r", encoding="utf-8") as f:
-                settings = json.load(f)
-                return settings.get("scanner", {}).get("relay_switch_delay", 0.5)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return 0.5
+        """設定ストアからリレー待ち時間を読み込み"""
+        store = settings_store.get_store(self.SETTINGS_FILE)
+        return store.section("scanner").get("relay_switch_delay", 0.5)
 
     def save_relay_delay(self, delay_value):
-        """リレー待ち時間を設定ファイルに保存"""
+        """リレー待ち時間を設定ストアに保存 (ファイル書き込みは遅延実行)"""
         try:
-            # 既存の設定を読み込み
-            try:
-                with open(self.SETTINGS_FILE, "r", encoding="utf-8") as f:
-                    settings = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                settings = {}
-
-            # scanner設定を更新
-            if "scanner" not in settings:
-                settings["scanner"] = {}
-            settings["scanner"]["relay_switch_delay"] = delay_value
-
-            # 保存
-            with open(self.SETTINGS_FILE, "w", encoding="utf-8") as f:
-                json.dump(settings, f, indent=4, ensure_ascii=False)
+            settings_store.get_store(self.SETTINGS_FILE).update(
+                "scanner", relay_switch_delay=delay_value)
         except Exception as e:
             self.logger.log(f"設定保存エラー: {e}", "ERROR")
 
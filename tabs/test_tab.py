@@ -3,9 +3,10 @@ import time
 import csv
 import os
 from tkinter import ttk, filedialog, messagebox
-from tkinter.scrolledtext import ScrolledText
 
 from utils.browse_helpers import pick_directory, pick_file
+from utils.log_console import LogConsole
+from utils import settings_store, ui_bus
 
 class TestTab(ttk.Frame):
     def __init__(self, parent, serial_manager):
@@ -26,6 +27,7 @@ class TestTab(ttk.Frame):
         
         self.is_running = False
         self.is_holding = False  # ホールド(一時停止)フラグ
+        self._time_display_timer = None  # 時間表示の定期処理ハンドル(UI バス)
         self.skip_requested = False  # スキップフラグ
         self.def_vars = []  # DEF操作タブから共有するDEF選択状態
         self.save_folder = tk.StringVar(value="")  # 保存フォルダパス
@@ -357,15 +359,10 @@ class TestTab(ttk.Frame):
         log_frame = ttk.LabelFrame(right_frame, text="実行ログ", padding=10)
         log_frame.pack(fill=tk.BOTH, expand=True)
         
-        self.log_text = ScrolledText(log_frame, height=25, width=35,
-                                     wrap=tk.WORD, state=tk.DISABLED)
-        self.log_text.pack(fill=tk.BOTH, expand=True)
-        
-        # ログのタグ設定
-        self.log_text.tag_config('INFO', foreground='black')
-        self.log_text.tag_config('SUCCESS', foreground='green')
-        self.log_text.tag_config('ERROR', foreground='red')
-        self.log_text.tag_config('WARNING', foreground='orange')
+        # 容量固定のログコンソール（フレーム単位でまとめて描画、レベル色分け済み）
+        self.log_console = LogConsole(log_frame, capacity=5000, height=25, width=35,
+                                      wrap=tk.WORD, font=None)
+        self.log_console.pack(fill=tk.BOTH, expand=True)
         
     def create_pattern_row(self, parent, index):
         """パターン入力行を作成"""
@@ -637,7 +634,7 @@ class TestTab(ttk.Frame):
             self._start_countdown(wait_sec, enabled_patterns)
         else:
             # 時間表示更新を開始(100msごと)
-            self.update_time_display()
+            self._start_time_display()
             # パターンを順次実行
             self.execute_patterns(enabled_patterns, 0)
     
@@ -655,7 +652,7 @@ class TestTab(ttk.Frame):
             self.current_pattern_label.config(text="実行開始")
             self.log_message("待機完了、パターン実行を開始します", "INFO")
             # 時間表示更新を開始(100msごと)
-            self.update_time_display()
+            self._start_time_display()
             self.execute_patterns(enabled_patterns, 0)
             return
 
@@ -950,12 +947,8 @@ class TestTab(ttk.Frame):
         self.log_message("=" * 40, "INFO")
     
     def log_message(self, message, level="INFO"):
-        """ログメッセージを表示"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, message + "\n", level)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        self.update_idletasks()
+        """ログメッセージを表示（描画は次フレームでまとめて反映）"""
+        self.log_console.log(message, level)
         
     def update_status_display(self, current_index, total_patterns):
         """実行状況の表示を更新"""
@@ -985,9 +978,19 @@ class TestTab(ttk.Frame):
         for label in self.no_labels:
             label.config(bg='#f0f0f0', fg='black', font=('', 9))
     
+    def _start_time_display(self):
+        """時間表示の定期更新を UI バスに登録(100msごと)"""
+        if self._time_display_timer is not None:
+            self._time_display_timer.cancel()
+        self.update_time_display()
+        self._time_display_timer = ui_bus.get_bus(self).every(self, 100, self.update_time_display)
+
     def update_time_display(self):
         """時間表示を更新(100msごとに呼ばれる)"""
         if not self.is_running:
+            if self._time_display_timer is not None:
+                self._time_display_timer.cancel()
+                self._time_display_timer = None
             return
         
         current_time = time.time()
@@ -1019,9 +1022,6 @@ class TestTab(ttk.Frame):
                 )
         # ホールド中は表示を更新しない(時間が止まって見える)
 
-        # 100ms後に再度更新
-        self.after(100, self.update_time_display)
-
     def get_pattern_remaining_seconds(self):
         """現在のパターンの残り秒数を取得
 
@@ -1046,46 +1046,34 @@ class TestTab(ttk.Frame):
         return self.current_pattern_index if self.is_running else -1
 
     def load_settings(self):
-        """設定ファイルから前回値を読み込み"""
-        import json
-        import os
-        
+        """設定ストアから前回値を読み込み"""
         try:
-            if os.path.exists('app_settings.json'):
-                with open('app_settings.json', 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                    
-                    # test設定を読み込み
-                    if 'test' in settings:
-                        test_settings = settings['test']
-                        self.save_folder.set(test_settings.get('save_folder', ''))
-                        self.default_filename = test_settings.get('filename', 'pattern')
-                        self.last_pattern_file = test_settings.get('last_pattern_file', '')
-                        
-                        # DEFチェック状態を読み込み（追加）
-                        if 'def_checks' in test_settings:
-                            self.saved_def_checks = test_settings['def_checks']
-                        else:
-                            self.saved_def_checks = [i == 0 for i in range(6)]  # DEF0のみTrue
-                        
-                        # スキャナーチャンネル設定を読み込み(Pos/Neg別々に)
-                        if 'scanner_channels_pos' in test_settings:
-                            self.saved_scanner_channels_pos = test_settings['scanner_channels_pos']
-                        else:
-                            self.saved_scanner_channels_pos = ['ー'] * 6
-                            
-                        if 'scanner_channels_neg' in test_settings:
-                            self.saved_scanner_channels_neg = test_settings['scanner_channels_neg']
-                        else:
-                            self.saved_scanner_channels_neg = ['ー'] * 6
+            # test設定を読み込み
+            if 'test' in settings_store.app_settings():
+                test_settings = settings_store.app_settings().section('test')
+                self.save_folder.set(test_settings.get('save_folder', ''))
+                self.default_filename = test_settings.get('filename', 'pattern')
+                self.last_pattern_file = test_settings.get('last_pattern_file', '')
 
-                        # 未選択DataSetにCenter送信オプション（デフォルト: True）
-                        self.send_opposite_center.set(test_settings.get('send_opposite_center', True))
-                    else:
-                        self.default_filename = 'pattern'
-                        self.saved_def_checks = [i == 0 for i in range(6)]
-                        self.saved_scanner_channels_pos = ['ー'] * 6
-                        self.saved_scanner_channels_neg = ['ー'] * 6
+                # DEFチェック状態を読み込み（追加）
+                if 'def_checks' in test_settings:
+                    self.saved_def_checks = test_settings['def_checks']
+                else:
+                    self.saved_def_checks = [i == 0 for i in range(6)]  # DEF0のみTrue
+
+                # スキャナーチャンネル設定を読み込み(Pos/Neg別々に)
+                if 'scanner_channels_pos' in test_settings:
+                    self.saved_scanner_channels_pos = test_settings['scanner_channels_pos']
+                else:
+                    self.saved_scanner_channels_pos = ['ー'] * 6
+
+                if 'scanner_channels_neg' in test_settings:
+                    self.saved_scanner_channels_neg = test_settings['scanner_channels_neg']
+                else:
+                    self.saved_scanner_channels_neg = ['ー'] * 6
+
+                # 未選択DataSetにCenter送信オプション（デフォルト: True）
+                self.send_opposite_center.set(test_settings.get('send_opposite_center', True))
             else:
                 self.default_filename = 'pattern'
                 self.saved_def_checks = [i == 0 for i in range(6)]
@@ -1099,19 +1087,10 @@ class TestTab(ttk.Frame):
             self.saved_scanner_channels_neg = ['ー'] * 6
     
     def save_settings(self):
-        """設定ファイルに現在値を保存"""
-        import json
-        import os
-        
+        """設定ストアに現在値を保存 (ファイル書き込みは設定ストアが遅延実行)"""
         try:
-            # 既存の設定を読み込み
-            settings = {}
-            if os.path.exists('app_settings.json'):
-                with open('app_settings.json', 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-            
             # test設定を更新(DEFチェック状態も保存)
-            settings['test'] = {
+            settings_store.app_settings().set('test', {
                 'save_folder': self.save_folder.get(),
                 'filename': self.filename_entry.get().strip(),
                 'last_pattern_file': self.last_pattern_file,
@@ -1119,12 +1098,7 @@ class TestTab(ttk.Frame):
                 'scanner_channels_pos': [ch.get() for ch in self.scanner_channels_pos],
                 'scanner_channels_neg': [ch.get() for ch in self.scanner_channels_neg],
                 'send_opposite_center': self.send_opposite_center.get()  # 未選択DataSetにCenter送信
-            }
-            
-            # 設定ファイルに書き込み
-            with open('app_settings.json', 'w', encoding='utf-8') as f:
-                json.dump(settings, f, indent=4, ensure_ascii=False)
-                
+            })
         except Exception as e:
             print(f"設定ファイル保存エラー: {e}")
             
@@ -1307,8 +1281,8 @@ class TestTab(ttk.Frame):
                         pass
                 
                 # タイマーをキャンセル
-                if hasattr(self.measurement_window, 'update_timer_id') and self.measurement_window.update_timer_id is not None:
-                    self.measurement_window.after_cancel(self.measurement_window.update_timer_id)
+                if getattr(self.measurement_window, 'pattern_info_timer', None) is not None:
+                    self.measurement_window.pattern_info_timer.cancel()
                 
                 # ウィンドウを破棄
                 self.measurement_window.destroy()
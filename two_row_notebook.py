@@ -1,6 +1,34 @@
+import time
 import tkinter as tk
 from tkinter import ttk
 
+from utils import tracer
+
+
+class LazyTab:
+    """遅延生成タブのハンドル
+
+    タブは初回選択時 (または get() 呼び出し時) に factory(parent) で生成する。
+    他タブからの参照はこのハンドル経由で行い、未生成のタブを無理に生成しない場合は
+    peek() で生成済みかどうかを確認する。
+    """
+
+    def __init__(self, notebook, index):
+        self._notebook = notebook
+        self._index = index
+
+    @property
+    def built(self):
+        return self._notebook._tabs[self._index]['frame'] is not None
+
+    def peek(self):
+        """生成済みならタブを返す (未生成なら None、生成はしない)"""
+        return self._notebook._tabs[self._index]['frame']
+
+    def get(self):
+        """タブを返す (未生成なら生成する)"""
+        return self._notebook.build(self._index)
+
 
 class TwoRowNotebook(ttk.Frame):
     """2段タブヘッダーを持つカスタムNotebookウィジェット"""
@@ -38,8 +66,9 @@ class TwoRowNotebook(ttk.Frame):
         self.content.pack(fill=tk.BOTH, expand=True)
 
         # 内部管理
-        self._tabs = []      # [{frame, text, row, button}, ...]
+        self._tabs = []      # [{frame, text, row, button, factory}, ...]
         self._current = None  # 選択中インデックス
+        self.build_times = {}  # タブ名 -> 生成時間 [s] (遅延生成タブのみ)
 
         # タブ色定義
         self._tab_colors = {}
@@ -55,6 +84,26 @@ class TwoRowNotebook(ttk.Frame):
 
     def add(self, frame, text="", row=1, group=None):
         """タブを追加。row=1: 1段目、row=2: 2段目。group: グループ枠"""
+        self._add_entry(frame, None, text, row, group)
+
+    def add_lazy(self, factory, text="", row=1, group=None):
+        """初回選択時に factory(content) で生成するタブを追加し、LazyTab を返す"""
+        idx = self._add_entry(None, factory, text, row, group)
+        return LazyTab(self, idx)
+
+    def build(self, index):
+        """index のタブを生成して返す (生成済みならそのまま返す)"""
+        tab = self._tabs[index]
+        if tab['frame'] is None:
+            name = tab['text'].strip()
+            start = time.perf_counter()
+            with tracer.span("tab.build", "startup", tab=name):
+                tab['frame'] = tab['factory'](self.content)
+            self.build_times[name] = time.perf_counter() - start
+            tab['factory'] = None
+        return tab['frame']
+
+    def _add_entry(self, frame, factory, text, row, group):
         idx = len(self._tabs)
         if group is not None:
             target = group
@@ -72,11 +121,13 @@ class TwoRowNotebook(ttk.Frame):
             'text': text,
             'row': row,
             'button': btn,
+            'factory': factory,
         })
 
         # 最初のタブを自動選択
         if self._current is None:
             self._select_tab(0)
+        return idx
 
     def _select_tab(self, index):
         """タブ選択の内部処理"""
@@ -87,8 +138,8 @@ class TwoRowNotebook(ttk.Frame):
         if self._current is not None:
             self._tabs[self._current]['frame'].pack_forget()
 
-        # 新しいタブを表示
-        self._tabs[index]['frame'].pack(fill=tk.BOTH, expand=True)
+        # 新しいタブを表示 (遅延生成タブは初回のみ生成)
+        self.build(index).pack(fill=tk.BOTH, expand=True)
         self._current = index
         self._update_all_buttons()
         self.event_generate('<<NotebookTabChanged>>')
@@ -100,9 +151,11 @@ class TwoRowNotebook(ttk.Frame):
 
         if isinstance(tab_or_index, int):
             self._select_tab(tab_or_index)
+        elif isinstance(tab_or_index, LazyTab):
+            self._select_tab(tab_or_index._index)
         else:
             for i, tab in enumerate(self._tabs):
-                if tab['frame'] == tab_or_index:
+                if tab['frame'] is not None and tab['frame'] == tab_or_index:
                     self._select_tab(i)
                     return
 
@@ -1,14 +1,31 @@
-from .logger import LoggerWidget
 from .validators import validate_number, validate_integer, validate_gpib_address, validate_command
-from .file_handler import FileHandler
-from .graph_helper import GraphHelper
 
 __all__ = [
     'LoggerWidget',
+    'LogBuffer',
+    'LogConsole',
     'validate_number',
     'validate_integer',
     'validate_gpib_address',
     'validate_command',
     'FileHandler',
     'GraphHelper'
-]
\ No newline at end of file
+]
+
+
+_LAZY = {
+    'LoggerWidget': 'logger',
+    'LogBuffer': 'log_console',
+    'LogConsole': 'log_console',
+    'FileHandler': 'file_handler',
+    'GraphHelper': 'graph_helper',
+}
+
+
+def __getattr__(name):
+    # Tk・matplotlib を使うクラスは初回参照時にインポート
+    # (utils の計算モジュールだけを使う再解析 CLI では Tk を読み込まない)
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module(f".{_LAZY[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,22 +1,25 @@
-import json
-import os
+from . import settings_store
+
+CONFIG_FILE = settings_store.CONFIG_FILE
+
+
+def _store():
+    return settings_store.config()
 
-CONFIG_FILE = "config.json"
 
 def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    """config.json の内容 (コピー) を返す"""
+    return _store().data()
+
 
 def save_config(data):
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """config.json の内容を data で置き換える (書き込みは設定ストアが遅延実行)"""
+    store = _store()
+    for key in set(store.data()) - set(data):
+        store.delete(key)
+    store.set_many(data)
+
 
 def update_config_value(key_path, value):
-    config = load_config()
-    current = config
-    for key in key_path[:-1]:
-        current = current.setdefault(key, {})
-    current[key_path[-1]] = value
-    save_config(config)
+    store = _store()
+    store.set_path(key_path, value)
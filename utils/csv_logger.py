@@ -3,6 +3,8 @@ import os
 import threading
 from datetime import datetime
 
+from utils import metrics
+
 
 class MeasurementCSVLogger:
     """
@@ -11,19 +13,25 @@ class MeasurementCSVLogger:
     スキャナ周回ごとにタイムスタンプと測定電圧を記録
     周回完了ごとにファイルに追記（メモリハング対策）
     シリアルNo.が異なる場合は新しい列に追加
+    DMM平均 (NRDGS n) 使用時は平均値の列の後に標準偏差・点数の列を追加
     """
-    
-    def __init__(self, save_dir, filename, def_serial_numbers):
+
+    # 値の列の末尾 → cycle_data のキー (長いものから判定)
+    COLUMN_SUFFIXES = ('_POS_SDEV', '_POS_N', '_NEG_SDEV', '_NEG_N', '_POS', '_NEG')
+
+    def __init__(self, save_dir, filename, def_serial_numbers, stats=False):
         """
         Args:
             save_dir: 保存先ディレクトリ
             filename: CSVファイル名（拡張子付き、例: "measurement.csv"）
             def_serial_numbers: {def_index: serial_number} の辞書
                                例: {0: "DFH903", 1: "SUBJ02", ...}
+            stats: True なら {serial}_POS_SDEV / {serial}_POS_N 列 (NEG も同様) を追加
         """
         self.save_dir = save_dir
         self.filename = filename
         self.def_serial_numbers = def_serial_numbers  # {def_index: "DFH903", ...}
+        self.stats = stats
         
         # 保存用データ構造
         self.cycle_data = {}  # 現在の1周回分のデータ {def_index: {"POS": value, "NEG": value}}
@@ -125,17 +133,19 @@ class MeasurementCSVLogger:
         except Exception as e:
             return False, f"保存失敗: {str(e)}"
     
-    def record_measurement(self, def_index, pole, value, is_cycle_start=False, dataset='', code=''):
+    def record_measurement(self, def_index, pole, value, is_cycle_start=False, dataset='', code='',
+                           sdev=None, count=None):
         """
         測定値を記録（シンプル版：即時書き込み）
 
         Args:
             def_index: DEFインデックス (0-5)
             pole: "POS" or "NEG"
-            value: 測定値（文字列）
+            value: 測定値（文字列、平均時は平均値）
             is_cycle_start: スキャナ周回の最初の測定かどうか
             dataset: DataSet値
             code: Code値
+            sdev / count: DMM平均の標準偏差・点数（平均なしは None）
         """
         if not self.is_logging:
             return
@@ -144,6 +154,7 @@ class MeasurementCSVLogger:
         if is_cycle_start:
             # 前の周回データがあれば書き込み
             if self.cycle_timestamp is not None and self.cycle_data:
+                metrics.CSV_QUEUE_DEPTH.inc()
                 thread = threading.Thread(
                     target=self._write_cycle_async,
                     args=({
@@ -167,6 +178,10 @@ class MeasurementCSVLogger:
             self.cycle_data[def_index] = {}
 
         self.cycle_data[def_index][pole] = value
+        if sdev is not None:
+            self.cycle_data[def_index][f"{pole}_SDEV"] = f"{sdev:.6E}"
+        if count is not None:
+            self.cycle_data[def_index][f"{pole}_N"] = count
 
     def discard_current_cycle(self):
         """現在の周回データを破棄（コード変更時に呼び出し）"""
@@ -180,9 +195,27 @@ class MeasurementCSVLogger:
         headers = ["Timestamp", "DataSet", "Code"]  # ★★★ DataSet, Codeを追加 ★★★
         for def_idx in sorted(self.def_serial_numbers.keys()):
             serial = self.def_serial_numbers[def_idx]
-            headers.append(f"{serial}_POS")
-            headers.append(f"{serial}_NEG")
+            for pole in ("POS", "NEG"):
+                headers.append(f"{serial}_{pole}")
+                if self.stats:
+                    headers.append(f"{serial}_{pole}_SDEV")
+                    headers.append(f"{serial}_{pole}_N")
         return headers
+
+    def _column_value(self, header, cycle_data):
+        """ヘッダー ({serial}_POS など) に対応する周回データの値 (該当なしは空白)"""
+        for suffix in self.COLUMN_SUFFIXES:
+            if header.endswith(suffix):
+                serial, key = header[:-len(suffix)], suffix[1:]
+                break
+        else:
+            return ''
+
+        # 該当するdef_indexを検索
+        for def_idx, sn in self.def_serial_numbers.items():
+            if sn == serial:
+                return cycle_data.get(def_idx, {}).get(key, '')
+        return ''
     
     def _update_file_with_new_columns(self):
         """既存ファイルに新しい列を追加（既存列も保持）"""
@@ -229,6 +262,13 @@ class MeasurementCSVLogger:
     
     def _write_cycle_async(self, write_data):
         """1周回分のデータをCSVファイルに書き込み（別スレッドで実行）"""
+        try:
+            self._write_cycle_locked(write_data)
+        finally:
+            metrics.CSV_QUEUE_DEPTH.dec()
+
+    def _write_cycle_locked(self, write_data):
+        """_write_cycle_async の本体（write_lock で排他）"""
         with self.write_lock:
             if not self.csv_writer:
                 return
@@ -239,29 +279,13 @@ class MeasurementCSVLogger:
 
                 # ヘッダーに従ってデータを配置
                 for header in self.current_headers[3:]:
-                    if '_POS' in header:
-                        serial = header.replace('_POS', '')
-                        pole = 'POS'
-                    elif '_NEG' in header:
-                        serial = header.replace('_NEG', '')
-                        pole = 'NEG'
-                    else:
-                        row.append('')
-                        continue
-
-                    # 該当するdef_indexを検索
-                    value = ''
-                    for def_idx, sn in self.def_serial_numbers.items():
-                        if sn == serial:
-                            data = write_data['data'].get(def_idx, {})
-                            value = data.get(pole, '')
-                            break
-
-                    row.append(value)
+                    row.append(self._column_value(header, write_data['data']))
 
                 # CSVファイルに書き込み
+                pos = self.csv_file.tell()
                 self.csv_writer.writerow(row)
                 self.csv_file.flush()
+                metrics.CSV_BYTES.inc(self.csv_file.tell() - pos)
             except Exception:
                 pass  # 別スレッドなのでエラーは無視
 
@@ -276,30 +300,14 @@ class MeasurementCSVLogger:
 
             # ヘッダーに従ってデータを配置
             for header in self.current_headers[3:]:  # ★★★ Timestamp, DataSet, Codeを除く（[1:]→[3:]に変更）★★★
-                # ヘッダーから SerialNo_POS/NEG を解析
-                if '_POS' in header:
-                    serial = header.replace('_POS', '')
-                    pole = 'POS'
-                elif '_NEG' in header:
-                    serial = header.replace('_NEG', '')
-                    pole = 'NEG'
-                else:
-                    row.append('')
-                    continue
-
-                # 該当するdef_indexを検索
-                value = ''
-                for def_idx, sn in self.def_serial_numbers.items():
-                    if sn == serial:
-                        data = self.cycle_data.get(def_idx, {})
-                        value = data.get(pole, '')
-                        break
-
-                row.append(value)
+                # ヘッダーから SerialNo_POS/NEG (平均時は _SDEV / _N も) を解析
+                row.append(self._column_value(header, self.cycle_data))
 
             # CSVファイルに書き込み
+            pos = self.csv_file.tell()
             self.csv_writer.writerow(row)
             self.csv_file.flush()  # すぐにディスクに書き込む
+            metrics.CSV_BYTES.inc(self.csv_file.tell() - pos)
             
         except Exception as e:
             print(f"CSV書き込みエラー: {e}")
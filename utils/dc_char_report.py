@@ -0,0 +1,417 @@
+"""DC特性の表 (POSTION / LBC / moni) の XLSX・PNG 出力と再判定
+
+DCCharTab の計測結果 slots_data [(serial_no, display_data), ...] (最大 4 枠) から
+表の XLSX を作成する。Tk・計測器には依存しないため、出力パイプラインのプロセスや
+再解析 CLI (reanalyze.py) からそのまま呼び出せる。
+
+- write_position_sheet / write_lbc_sheet / write_moni_sheet: 表の書き込み
+- export_tables: XLSX 保存 + 表PNG の直接描画
+- rejudge: dc_char_definitions の期待値・許容誤差で誤差・判定を計算し直す
+"""
+import os
+
+import openpyxl
+from openpyxl.styles import Font, Border, Side, Alignment, PatternFill
+
+from dc_char_definitions import POSITION_TEST_POINTS, LBC_TEST_POINTS, MONI_TEST_POINTS
+
+SHEET_TITLES = {'position': 'POSTION', 'lbc': 'LBC', 'moni': 'moni'}
+
+# 表範囲 (ヘッダ1行 + データ行)
+TABLE_RANGES = {
+    'position': "A1:H25",   # 24 data
+    'moni': "A1:H17",       # 16 data
+    'lbc': "A1:I25",        # 24 data
+}
+
+# 表の書式 (全セル・全シートで同じオブジェクトを共有)
+_THIN = Side(style='thin')
+_THICK = Side(style='medium')
+BORDER_ALL = Border(top=_THIN, left=_THIN, right=_THIN, bottom=_THIN)
+BORDER_TOP_THICK = Border(top=_THICK, left=_THIN, right=_THIN, bottom=_THIN)
+DAT_FONT = Font(name='MS Pゴシック', size=10)
+CENTER = Alignment(horizontal='center', vertical='center', wrap_text=True)
+RIGHT_ALIGN = Alignment(horizontal='right', vertical='center')
+GRAY_FILL = PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid')
+
+
+# ==================== 表の書き込み ====================
+def write_position_sheet(ws, slots_data):
+    """Position XLSX書き込み（docx仕様: 4DEF固定枠、セル結合、右寄せ、数式埋込）
+
+    slots_data: [(serial_no, display_data), ...] 最大 4 枠
+    """
+    # ヘッダー（太字なし）
+    headers = ['ﾕﾆｯﾄ No.', '極', '入力ｺｰﾄﾞ', '測定電圧(V)', '許容誤差(V)(<0.1%)', '誤差(V)', '誤差(%)', '判定']
+    for c, h in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=c, value=h)
+        cell.font = DAT_FONT; cell.alignment = CENTER; cell.border = BORDER_ALL
+
+    expected_strs = [
+        "160.000±0.160", "0.000±0.100", "-160.000±0.160",
+        "160.000±0.160", "0.000±0.100", "-160.000±0.160",
+    ]
+    # 期待値数値（数式用）
+    expected_vals = [160.0, 0.0, -160.0, 160.0, 0.0, -160.0]
+    code_strs = ["FFFFF H", "80000 H", "00000 H", "00000 H", "80000 H", "FFFFF H"]
+
+    for slot in range(4):
+        base = 2 + slot * 6
+        if slot < len(slots_data):
+            sn_slot, slot_data = slots_data[slot]
+            unit_label = f"1PB397MK2\n{sn_slot}"
+        else:
+            slot_data = None
+            unit_label = ""
+
+        for ri in range(6):
+            r = base + ri
+            is_center = (ri == 1 or ri == 4)
+            bdr = BORDER_TOP_THICK if ri == 0 else BORDER_ALL
+
+            if slot_data and ri < len(slot_data):
+                d = slot_data[ri]
+                v = d['voltage'] if d['voltage'] is not None else ''
+                judge = d['judge']
+            else:
+                v, judge = '', ''
+
+            # 入力ｺｰﾄﾞ（右寄せ）
+            c3 = ws.cell(row=r, column=3, value=code_strs[ri])
+            c3.font = DAT_FONT; c3.alignment = RIGHT_ALIGN; c3.border = bdr
+            # 測定電圧（右寄せ）
+            c4 = ws.cell(row=r, column=4, value=v)
+            c4.font = DAT_FONT; c4.alignment = RIGHT_ALIGN; c4.border = bdr
+            if v != '': c4.number_format = '0.000'
+            # 許容誤差（右寄せ）
+            c5 = ws.cell(row=r, column=5, value=expected_strs[ri])
+            c5.font = DAT_FONT; c5.alignment = RIGHT_ALIGN; c5.border = bdr
+            # 誤差V = 測定電圧 - 期待値（数式）
+            exp_v = expected_vals[ri]
+            if v != '':
+                c6 = ws.cell(row=r, column=6, value=f'=D{r}-({exp_v})')
+            else:
+                c6 = ws.cell(row=r, column=6, value='')
+            c6.font = DAT_FONT; c6.alignment = RIGHT_ALIGN; c6.border = bdr
+            c6.number_format = '0.000'
+            # 誤差% = 誤差V / 期待値 * 100（数式、centerはグレー空欄）
+            c7 = ws.cell(row=r, column=7)
+            if is_center:
+                c7.value = ''
+                c7.fill = GRAY_FILL
+            elif v != '' and exp_v != 0:
+                c7.value = f'=F{r}/{exp_v}*100'
+                c7.number_format = '0.000'
+            else:
+                c7.value = ''
+            c7.font = DAT_FONT; c7.alignment = RIGHT_ALIGN; c7.border = bdr
+            # 判定（中央）
+            c8 = ws.cell(row=r, column=8, value=judge)
+            c8.font = DAT_FONT; c8.alignment = CENTER; c8.border = bdr
+
+        # ﾕﾆｯﾄNo: 6行結合
+        ws.merge_cells(start_row=base, start_column=1, end_row=base + 5, end_column=1)
+        c1 = ws.cell(row=base, column=1, value=unit_label)
+        c1.font = DAT_FONT; c1.alignment = CENTER
+        for ri in range(6):
+            ws.cell(row=base + ri, column=1).border = BORDER_TOP_THICK if ri == 0 else BORDER_ALL
+
+        # 極POS: 3行結合
+        ws.merge_cells(start_row=base, start_column=2, end_row=base + 2, end_column=2)
+        ws.cell(row=base, column=2, value='POS').font = DAT_FONT
+        ws.cell(row=base, column=2).alignment = CENTER
+        for ri in range(3):
+            ws.cell(row=base + ri, column=2).border = BORDER_TOP_THICK if ri == 0 else BORDER_ALL
+
+        # 極NEG: 3行結合
+        ws.merge_cells(start_row=base + 3, start_column=2, end_row=base + 5, end_column=2)
+        ws.cell(row=base + 3, column=2, value='NEG').font = DAT_FONT
+        ws.cell(row=base + 3, column=2).alignment = CENTER
+        for ri in range(3, 6):
+            ws.cell(row=base + ri, column=2).border = BORDER_ALL
+
+    for r in range(1, 26 + 1):
+        ws.row_dimensions[r].height = 16
+    for c, w in {1: 14, 2: 6, 3: 12, 4: 14, 5: 22, 6: 10, 7: 10, 8: 6}.items():
+        ws.column_dimensions[openpyxl.utils.get_column_letter(c)].width = w
+
+def write_lbc_sheet(ws, slots_data):
+    """LBC XLSX書き込み（docx仕様: 9列、4DEF固定枠、セル結合、数式埋込、小数3桁）
+
+    slots_data: [(serial_no, display_data), ...] 最大 4 枠
+    """
+    headers = ['ﾕﾆｯﾄ No.', 'LBC\nATT', '入力ｺｰﾄﾞ', 'POS 出力電圧(V)', 'NEG 出力電圧(V)',
+               '許容差(V)', 'POS 誤差\n(V)', 'NEG 誤差\n(V)', '判定']
+    for c, h in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=c, value=h)
+        cell.font = DAT_FONT; cell.alignment = CENTER; cell.border = BORDER_ALL
+
+    # 期待値数値（POS/NEG）: ATT 1/1, 1/2, 1/4 の FFFF/0000
+    expected_pos = [6.180, -6.180, 3.090, -3.090, 1.545, -1.545]
+    expected_neg = [-6.180, 6.180, -3.090, 3.090, -1.545, 1.545]
+    code_strs = ['FFFF H', '0000 H', 'FFFF H', '0000 H', 'FFFF H', '0000 H']
+
+    for slot in range(4):
+        base = 2 + slot * 6
+        if slot < len(slots_data):
+            sn_slot, slot_data = slots_data[slot]
+            unit_label = f"1PB397MK2\n{sn_slot}"
+        else:
+            slot_data = None
+            unit_label = ""
+
+        for ri in range(6):
+            r = base + ri
+            bdr = BORDER_TOP_THICK if ri == 0 else BORDER_ALL
+
+            if slot_data and ri < len(slot_data):
+                d = slot_data[ri]
+                is_cal_ng = (d['judge'] == 'CAL NG')
+                vp = d['voltage_pos'] if d['voltage_pos'] is not None else ''
+                vn = d['voltage_neg'] if d['voltage_neg'] is not None else ''
+                judge = d['judge']
+            else:
+                is_cal_ng = False
+                vp, vn, judge = '', '', ''
+
+            c3 = ws.cell(row=r, column=3, value=code_strs[ri])
+            c3.font = DAT_FONT; c3.alignment = RIGHT_ALIGN; c3.border = bdr
+
+            if is_cal_ng:
+                # CAL NG: 電圧欄に"CAL NG"、誤差・判定も"CAL NG"
+                c4 = ws.cell(row=r, column=4, value='CAL NG')
+                c4.font = DAT_FONT; c4.alignment = CENTER; c4.border = bdr
+                c5 = ws.cell(row=r, column=5, value='CAL NG')
+                c5.font = DAT_FONT; c5.alignment = CENTER; c5.border = bdr
+                c7 = ws.cell(row=r, column=7, value='')
+                c7.font = DAT_FONT; c7.alignment = RIGHT_ALIGN; c7.border = bdr
+                c8 = ws.cell(row=r, column=8, value='')
+                c8.font = DAT_FONT; c8.alignment = RIGHT_ALIGN; c8.border = bdr
+                c9 = ws.cell(row=r, column=9, value='CAL NG')
+                c9.font = DAT_FONT; c9.alignment = CENTER; c9.border = bdr
+            else:
+                # POS電圧
+                c4 = ws.cell(row=r, column=4, value=vp)
+                c4.font = DAT_FONT; c4.alignment = RIGHT_ALIGN; c4.border = bdr
+                if vp != '': c4.number_format = '0.000'
+                # NEG電圧
+                c5 = ws.cell(row=r, column=5, value=vn)
+                c5.font = DAT_FONT; c5.alignment = RIGHT_ALIGN; c5.border = bdr
+                if vn != '': c5.number_format = '0.000'
+                # POS誤差 = POS電圧 - 期待値（数式）
+                if vp != '':
+                    c7 = ws.cell(row=r, column=7, value=f'=D{r}-({expected_pos[ri]})')
+                else:
+                    c7 = ws.cell(row=r, column=7, value='')
+                c7.font = DAT_FONT; c7.alignment = RIGHT_ALIGN; c7.border = bdr
+                c7.number_format = '0.000'
+                # NEG誤差 = NEG電圧 - 期待値（数式）
+                if vn != '':
+                    c8 = ws.cell(row=r, column=8, value=f'=E{r}-({expected_neg[ri]})')
+                else:
+                    c8 = ws.cell(row=r, column=8, value='')
+                c8.font = DAT_FONT; c8.alignment = RIGHT_ALIGN; c8.border = bdr
+                c8.number_format = '0.000'
+                # 判定
+                c9 = ws.cell(row=r, column=9, value=judge)
+                c9.font = DAT_FONT; c9.alignment = CENTER; c9.border = bdr
+
+        # ﾕﾆｯﾄNo: 6行結合
+        ws.merge_cells(start_row=base, start_column=1, end_row=base + 5, end_column=1)
+        ws.cell(row=base, column=1, value=unit_label).font = DAT_FONT
+        ws.cell(row=base, column=1).alignment = CENTER
+        for ri in range(6):
+            ws.cell(row=base + ri, column=1).border = BORDER_TOP_THICK if ri == 0 else BORDER_ALL
+
+        # ATT: 各2行結合
+        for ai, att_val in enumerate(['1/1', '1/2', '1/4']):
+            sr = base + ai * 2
+            ws.merge_cells(start_row=sr, start_column=2, end_row=sr + 1, end_column=2)
+            ws.cell(row=sr, column=2, value=att_val).font = DAT_FONT
+            ws.cell(row=sr, column=2).alignment = CENTER
+            for ri in range(2):
+                ws.cell(row=sr + ri, column=2).border = BORDER_TOP_THICK if (ai == 0 and ri == 0) else BORDER_ALL
+
+        # 許容差: 各2行結合
+        for ai, exp_val in enumerate(['±6.180±0.062', '±3.090±0.031', '±1.545±0.015']):
+            sr = base + ai * 2
+            ws.merge_cells(start_row=sr, start_column=6, end_row=sr + 1, end_column=6)
+            ws.cell(row=sr, column=6, value=exp_val).font = DAT_FONT
+            ws.cell(row=sr, column=6).alignment = RIGHT_ALIGN
+            for ri in range(2):
+                ws.cell(row=sr + ri, column=6).border = BORDER_TOP_THICK if (ai == 0 and ri == 0) else BORDER_ALL
+
+    ws.row_dimensions[1].height = 32
+    for r in range(2, 26):
+        ws.row_dimensions[r].height = 16
+    for c, w in {1: 14, 2: 6, 3: 12, 4: 14, 5: 14, 6: 18, 7: 10, 8: 10, 9: 6}.items():
+        ws.column_dimensions[openpyxl.utils.get_column_letter(c)].width = w
+
+def write_moni_sheet(ws, slots_data):
+    """moni XLSX書き込み（docx仕様: 4DEF固定枠、セル結合、右寄せ、数式埋込、小数2桁）
+
+    slots_data: [(serial_no, display_data), ...] 最大 4 枠
+    """
+    headers = ['ﾕﾆｯﾄ No.', '極', '入力ｺｰﾄﾞ', '測定電圧(V)', '許容誤差(V)(<1%)', '誤差(V)', '誤差(%)', '判定']
+    for c, h in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=c, value=h)
+        cell.font = DAT_FONT; cell.alignment = CENTER; cell.border = BORDER_ALL
+
+    # 表示順: POS FFFFF, POS 00000, NEG 00000, NEG FFFFF
+    expected_strs = ['+5.00±0.05', '-5.00±0.05', '+5.00±0.05', '-5.00±0.05']
+    expected_vals = [5.0, -5.0, 5.0, -5.0]
+    code_strs = ['FFFFF H', '00000 H', '00000 H', 'FFFFF H']
+
+    for slot in range(4):
+        base = 2 + slot * 4
+        if slot < len(slots_data):
+            sn_slot, slot_data = slots_data[slot]
+            unit_label = f"1PB397MK2\n{sn_slot}"
+        else:
+            slot_data = None
+            unit_label = ""
+
+        for ri in range(4):
+            r = base + ri
+            bdr = BORDER_TOP_THICK if ri == 0 else BORDER_ALL
+
+            if slot_data and ri < len(slot_data):
+                d = slot_data[ri]
+                v = d['voltage'] if d['voltage'] is not None else ''
+                judge = d['judge']
+            else:
+                v, judge = '', ''
+
+            c3 = ws.cell(row=r, column=3, value=code_strs[ri])
+            c3.font = DAT_FONT; c3.alignment = RIGHT_ALIGN; c3.border = bdr
+            c4 = ws.cell(row=r, column=4, value=v)
+            c4.font = DAT_FONT; c4.alignment = RIGHT_ALIGN; c4.border = bdr
+            if v != '': c4.number_format = '0.00'
+            c5 = ws.cell(row=r, column=5, value=expected_strs[ri])
+            c5.font = DAT_FONT; c5.alignment = RIGHT_ALIGN; c5.border = bdr
+            # 誤差V = 測定電圧 - 期待値（数式）
+            exp_v = expected_vals[ri]
+            if v != '':
+                c6 = ws.cell(row=r, column=6, value=f'=D{r}-({exp_v})')
+            else:
+                c6 = ws.cell(row=r, column=6, value='')
+            c6.font = DAT_FONT; c6.alignment = RIGHT_ALIGN; c6.border = bdr
+            c6.number_format = '0.00'
+            # 誤差% = 誤差V / 期待値 * 100
+            c7 = ws.cell(row=r, column=7)
+            if v != '' and exp_v != 0:
+                c7.value = f'=F{r}/{exp_v}*100'
+                c7.number_format = '0.00'
+            else:
+                c7.value = ''
+            c7.font = DAT_FONT; c7.alignment = RIGHT_ALIGN; c7.border = bdr
+            c8 = ws.cell(row=r, column=8, value=judge)
+            c8.font = DAT_FONT; c8.alignment = CENTER; c8.border = bdr
+
+        # ﾕﾆｯﾄNo: 4行結合
+        ws.merge_cells(start_row=base, start_column=1, end_row=base + 3, end_column=1)
+        c1 = ws.cell(row=base, column=1, value=unit_label)
+        c1.font = DAT_FONT; c1.alignment = CENTER
+        for ri in range(4):
+            ws.cell(row=base + ri, column=1).border = BORDER_TOP_THICK if ri == 0 else BORDER_ALL
+
+        # 極POS: 2行結合
+        ws.merge_cells(start_row=base, start_column=2, end_row=base + 1, end_column=2)
+        ws.cell(row=base, column=2, value='POS').font = DAT_FONT
+        ws.cell(row=base, column=2).alignment = CENTER
+        for ri in range(2):
+            ws.cell(row=base + ri, column=2).border = BORDER_TOP_THICK if ri == 0 else BORDER_ALL
+
+        # 極NEG: 2行結合
+        ws.merge_cells(start_row=base + 2, start_column=2, end_row=base + 3, end_column=2)
+        ws.cell(row=base + 2, column=2, value='NEG').font = DAT_FONT
+        ws.cell(row=base + 2, column=2).alignment = CENTER
+        for ri in range(2, 4):
+            ws.cell(row=base + ri, column=2).border = BORDER_ALL
+
+    for r in range(1, 18):
+        ws.row_dimensions[r].height = 16
+    for c, w in {1: 14, 2: 6, 3: 12, 4: 14, 5: 20, 6: 10, 7: 10, 8: 6}.items():
+        ws.column_dimensions[openpyxl.utils.get_column_letter(c)].width = w
+
+
+# ==================== 保存 ====================
+def export_tables(sheet_key, slots_data, xlsx_path, png_path=None):
+    """DC特性の表を XLSX 保存し、png_path 指定時は表PNGも描画
+
+    出力パイプライン (utils.export_pipeline) のプロセスで実行する (Tk・計測器に依存しない)。
+    slots_data: [(serial_no, display_data), ...] 最大 4 枠
+
+    Returns:
+        {"xlsx": 保存パス, "png": PNGパス (描画しなかった・失敗時は None), "warnings": [...]}
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = SHEET_TITLES.get(sheet_key, sheet_key)
+
+    if sheet_key == 'position':
+        write_position_sheet(ws, slots_data)
+    elif sheet_key == 'lbc':
+        write_lbc_sheet(ws, slots_data)
+    else:
+        write_moni_sheet(ws, slots_data)
+
+    part = xlsx_path + '.part'
+    wb.save(part)
+    os.replace(part, xlsx_path)
+
+    result = {'xlsx': xlsx_path, 'png': None, 'warnings': []}
+    if png_path:
+        # 保存したワークシートから直接描画 (Excel・クリップボード不要)
+        try:
+            from utils import sheet_raster
+            result['png'] = sheet_raster.render_range_png(
+                ws, png_path, TABLE_RANGES.get(sheet_key, "A1:I25"))
+        except Exception as e:
+            result['warnings'].append(f"PNG直接描画エラー ({e})、Excel で再試行します")
+    return result
+
+
+# ==================== 再判定 ====================
+def rejudge(sheet_key, rows):
+    """計測値から誤差・判定を計算し直した行のリストを返す (DCCharTab の計測時と同じ計算)
+
+    期待値・許容誤差は現在の dc_char_definitions を使う (規格変更後の再判定用)。
+    該当する計測ポイントがない行・CAL NG の行はそのまま。
+    """
+    if sheet_key == 'lbc':
+        points = {(tp.att, tp.display_code): tp for tp in LBC_TEST_POINTS}
+    else:
+        defs = POSITION_TEST_POINTS if sheet_key == 'position' else MONI_TEST_POINTS
+        points = {(tp.part, tp.display_code): tp for tp in defs}
+
+    judged = []
+    for row in rows:
+        row = dict(row)
+        if sheet_key == 'lbc':
+            tp = points.get((row.get('att'), row.get('code')))
+            if tp is not None and row.get('judge') != 'CAL NG':
+                vp, vn = row.get('voltage_pos'), row.get('voltage_neg')
+                if vp is not None and vn is not None:
+                    row['error_pos'] = vp - tp.expected_pos
+                    row['error_neg'] = vn - tp.expected_neg
+                    ok = (abs(row['error_pos']) <= tp.tolerance
+                          and abs(row['error_neg']) <= tp.tolerance)
+                    row['judge'] = "OK" if ok else "NG"
+                else:
+                    row['error_pos'], row['error_neg'], row['judge'] = None, None, "NG"
+                row['expected_str'] = tp.expected_str
+        else:
+            tp = points.get((row.get('part'), row.get('code')))
+            if tp is not None:
+                voltage = row.get('voltage')
+                if voltage is not None:
+                    error = voltage - tp.expected
+                    row['error'] = error
+                    row['error_pct'] = (error / tp.expected * 100) if tp.expected != 0 else 0
+                    row['judge'] = "OK" if abs(error) <= tp.tolerance else "NG"
+                else:
+                    row['error'], row['error_pct'], row['judge'] = None, None, "NG"
+                row['expected_str'] = tp.expected_str
+        judged.append(row)
+    return judged
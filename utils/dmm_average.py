@@ -0,0 +1,163 @@
+"""3458A の複数回読み取り平均 (MATH STAT / MEM FIFO, Tk 非依存)
+
+NPLC を上げる代わりに 1 回のトリガーで NRDGS n 点を読み、平均・標準偏差・点数を
+まとめて取得する。n 点ごとに TRIG SGL を往復させないので、バスの往復は 1 回で済む。
+
+- "stat": MATH STAT で 3458A 内部の統計レジスタに積算し、RMATH MEAN / SDEV / NSAMP を読む
+          (読み取り値そのものは転送しない。MEM FIFO には SINT で格納)
+- "fifo": MEM FIFO (DREAL) に n 点を格納し、RMEM の 1 回のバイナリ転送で読み出して PC 側で計算
+
+どちらも読み取り値は MEM FIFO に格納する (出力バッファに n 点が溜まらないようにするため)。
+平均回数 1 のときは従来どおり TRIG SGL の 1 点読み取り。
+
+使用例:
+    averager = DMMAverager(gpib, count=16, method="stat", nplc=10)
+    success, message = averager.arm()
+    success, result = averager.read()      # {"mean", "sdev", "count"} (V)
+    averager.disarm()
+"""
+import numpy as np
+
+LINE_FREQ = 50          # 電源周波数 (Hz)
+METHODS = ("stat", "fifo")
+# 標準メモリに入る点数: stat は SINT (2 バイト)、fifo は DREAL (8 バイト) で格納する
+MAX_COUNT = {"stat": 10240, "fifo": 2560}
+READ_MARGIN_MS = 3000   # 読み取りタイムアウトの余裕
+
+
+def expected_time(count, nplc, azero=True):
+    """n 点の読み取りにかかる時間の目安 (秒)"""
+    return count * (float(nplc) / LINE_FREQ * (2 if azero else 1) + 0.002)
+
+
+def read_timeout(count, nplc, azero=True):
+    """n 点の読み取りを待つ時間の上限 (秒): 目安の 1.5 倍 + 余裕"""
+    return expected_time(count, nplc, azero) * 1.5 + READ_MARGIN_MS / 1000.0
+
+
+def stats(values):
+    """(mean, sdev, count) 標準偏差は 3458A の SDEV と同じ n-1 で割る形"""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return None, None, 0
+    sdev = float(values.std(ddof=1)) if n > 1 else 0.0
+    return float(values.mean()), sdev, n
+
+
+class DMMAverager:
+    """3458A の NRDGS n 点平均
+
+    Args:
+        gpib: 3458A の GPIBController
+        count: 平均回数 (1 なら平均なし)
+        method: "stat" / "fifo"
+        nplc: 読み取りタイムアウトの計算用 (不明なら None)
+    """
+
+    def __init__(self, gpib, count=1, method="stat", nplc=None):
+        if method not in METHODS:
+            raise ValueError(f"平均方式は {' / '.join(METHODS)} のいずれかです: {method}")
+        self.gpib = gpib
+        self.count = max(1, min(int(count), MAX_COUNT[method]))
+        self.method = method
+        self.nplc = nplc
+        self.armed = False
+
+    @property
+    def enabled(self):
+        return self.count > 1
+
+    def describe(self):
+        return f"{self.method.upper()} {self.count}回" if self.enabled else "なし"
+
+    def _write_all(self, commands):
+        for command in commands:
+            success, message = self.gpib.write(command)
+            if not success:
+                return False, f"{command}: {message}"
+        return True, "OK"
+
+    def arm(self):
+        """平均用の設定 (NRDGS n・MEM FIFO・MATH STAT + SINT または DREAL)
+
+        Returns:
+            (success, message)
+        """
+        if not self.enabled:
+            self.armed = True
+            return True, "平均なし"
+        commands = ["MEM FIFO", f"NRDGS {self.count},AUTO"]
+        if self.method == "stat":
+            commands += ["MFORMAT SINT", "MATH STAT"]
+        else:
+            commands += ["MATH OFF", "MFORMAT DREAL", "OFORMAT DREAL"]
+        success, message = self._write_all(commands)
+        self.armed = success
+        return success, (f"平均設定: {self.describe()}" if success else f"平均設定失敗: {message}")
+
+    def disarm(self):
+        """1 点読み取り (NRDGS 1・MEM OFF・MATH OFF・MFORMAT SREAL・OFORMAT ASCII) に戻す"""
+        self.armed = False
+        if not self.enabled:
+            return True, "OK"
+        return self._write_all(["MATH OFF", "MEM OFF", "NRDGS 1,AUTO", "MFORMAT SREAL", "OFORMAT ASCII"])
+
+    def read(self):
+        """1 回トリガーして平均値を取得
+
+        Returns:
+            (success, {"mean", "sdev", "count"} または エラーメッセージ)
+            平均なしのときは sdev None・count 1
+        """
+        if not self.armed:
+            success, message = self.arm()
+            if not success:
+                return False, message
+        if not self.enabled:
+            success, response = self.gpib.query("TRIG SGL")
+            if not success:
+                return False, response
+            try:
+                return True, {"mean": float(response), "sdev": None, "count": 1}
+            except ValueError:
+                return False, f"応答が不正: {response}"
+
+        instrument = self.gpib.instrument
+        orig_timeout = instrument.timeout
+        if self.nplc is not None:
+            instrument.timeout = max(orig_timeout, int(read_timeout(self.count, self.nplc) * 1000))
+        try:
+            if self.method == "stat":
+                return self._read_stat()
+            return self._read_fifo()
+        finally:
+            instrument.timeout = orig_timeout
+
+    def _read_stat(self):
+        # MATH STAT で統計レジスタをリセットしてから n 点を読み、3 つのレジスタを続けて出力させる
+        success, message = self.gpib.write("MEM FIFO;MATH STAT;TRIG SGL;RMATH MEAN;RMATH SDEV;RMATH NSAMP")
+        if not success:
+            return False, message
+        values = []
+        for _ in range(3):
+            success, response = self.gpib.read()
+            if not success:
+                return False, response
+            values.append(response)
+        try:
+            mean, sdev, nsamp = (float(v) for v in values)
+        except ValueError:
+            return False, f"RMATH の応答が不正: {values}"
+        return True, {"mean": mean, "sdev": sdev, "count": int(nsamp)}
+
+    def _read_fifo(self):
+        n = self.count
+        success, message = self.gpib.write(f"MEM FIFO;TRIG SGL;RMEM 1,{n},1")
+        if not success:
+            return False, message
+        success, raw = self.gpib.read_bytes(n * 8)
+        if not success:
+            return False, raw
+        mean, sdev, count = stats(np.frombuffer(raw, dtype='>f8'))
+        return True, {"mean": mean, "sdev": sdev, "count": count}
@@ -0,0 +1,240 @@
+"""3458A の取得プロファイル (確度と速度の組み合わせ) と簡易ベンチマーク (Tk 非依存)
+
+NPLC だけでなく、読み取り時間を左右する設定をまとめて切り替える。
+- NPLC: 積分時間 (整数 PLC なら電源ノイズを除去)
+- AZERO: オートゼロ (ON は読み取りごとにゼロ点を測るため時間が約 2 倍)
+- ARANGE: オートレンジ (OFF でレンジ判定を省く。レンジを固定できるときのみ)
+- DISP: 前面表示 (OFF で表示更新の時間を省く)
+- MATH: 演算 (OFF で演算の時間を省く。平均 (dmm_average) は読み取り時に MATH STAT を設定し直す)
+
+選択したプロファイルとベンチマーク結果はベンチ (計測 PC) ごとに app_settings の
+"dmm_profiles" に保存する。ベンチ名は "dmm_profiles" の bench、なければホスト名。
+
+使用例:
+    success, message = dmm_profiles.apply(gpib, "balanced", "DCV", 10)
+    success, message = dmm_profiles.apply_conventional(gpib, 5, "DCV", 10)   # 従来設定
+    success, result = dmm_profiles.benchmark(gpib, "max_speed", 10, lsb)
+    dmm_profiles.record_benchmark(result)
+    name = dmm_profiles.selected("linearity")      # None なら従来の設定
+"""
+import socket
+import time
+
+import numpy as np
+
+from utils import dmm_average, settings_store
+
+SETTINGS_KEY = "dmm_profiles"
+PROFILES = {
+    "max_accuracy": {"label": "最高確度", "nplc": 100, "azero": "ON", "arange": "OFF",
+                     "disp": "ON", "math": "OFF"},
+    "balanced": {"label": "バランス", "nplc": 10, "azero": "ON", "arange": "OFF",
+                 "disp": "OFF", "math": "OFF"},
+    "max_speed": {"label": "最高速度", "nplc": 1, "azero": "OFF", "arange": "OFF",
+                  "disp": "OFF", "math": "OFF"},
+}
+NONE_LABEL = "従来設定"   # プロファイルを使わない (各タブの従来の NPLC・レンジ)
+TEST_TYPES = {"linearity": "Linearity", "dc_char": "DC特性", "measurement_window": "パターン計測"}
+BENCH_SECONDS = 3.0       # ベンチマーク 1 プロファイルあたりの目安時間
+BENCH_MIN_READINGS = 5
+BENCH_MAX_READINGS = 200
+
+
+def labels():
+    """コンボボックス用の表示名 (先頭は従来設定)"""
+    return [NONE_LABEL] + [p["label"] for p in PROFILES.values()]
+
+
+def label_of(name):
+    return PROFILES[name]["label"] if name in PROFILES else NONE_LABEL
+
+
+def name_of(label):
+    """表示名からプロファイル名 (従来設定・不明な表示名は None)"""
+    for name, profile in PROFILES.items():
+        if profile["label"] == label:
+            return name
+    return None
+
+
+def commands(name, function="DCV", range_=None):
+    """プロファイルを設定するコマンド列
+
+    Args:
+        function: 測定ファンクション (range_ が None なら FUNC は送らない)
+        range_: レンジ (V)。固定レンジのときだけ ARANGE を送る。
+                "AUTO" のときはオートレンジのまま、None のときは現在のレンジ設定
+                (オートレンジを含む) のままにする (ARANGE OFF で今のレンジに固定しない)
+    """
+    profile = PROFILES[name]
+    result = []
+    if range_ is not None:
+        result.append(f"{function} {range_}")
+        if str(range_).upper() != "AUTO":
+            result.append(f"ARANGE {profile['arange']}")
+    result += [
+        f"NPLC {profile['nplc']}",
+        f"AZERO {profile['azero']}",
+        f"MATH {profile['math']}",
+        f"DISP {profile['disp']}",
+    ]
+    return result
+
+
+def apply(gpib, name, function="DCV", range_=None):
+    """プロファイルを 3458A に設定
+
+    Returns:
+        (success, message)
+    """
+    if name not in PROFILES:
+        return False, f"不明なプロファイル: {name}"
+    for command in commands(name, function, range_):
+        success, message = gpib.write(command)
+        if not success:
+            return False, f"{command}: {message}"
+    return True, f"プロファイル設定: {describe(name)}"
+
+
+def conventional_commands(nplc, function="DCV", range_=None):
+    """従来設定 (プロファイルなし) のコマンド列
+
+    前回のプロファイルで変えた AZERO・DISP・ARANGE が残らないよう、既定値 (ON) に戻してから
+    NPLC とレンジを設定する。range_ が "AUTO" のときは ARANGE ON も送る。
+    """
+    result = ["AZERO ON", "DISP ON", "MATH OFF", f"NPLC {nplc}"]
+    if range_ is not None:
+        result.append(f"{function} {range_}")
+        if str(range_).upper() == "AUTO":
+            result.append("ARANGE ON")
+    return result
+
+
+def apply_conventional(gpib, nplc, function="DCV", range_=None):
+    """従来設定を 3458A に設定
+
+    Returns:
+        (success, message)
+    """
+    for command in conventional_commands(nplc, function, range_):
+        success, message = gpib.write(command)
+        if not success:
+            return False, f"{command}: {message}"
+    return True, f"{NONE_LABEL} (NPLC {nplc}, AZERO ON, DISP ON)"
+
+
+def describe(name):
+    """"バランス (NPLC 10, AZERO ON, ARANGE OFF, DISP OFF)" の形の説明"""
+    p = PROFILES[name]
+    return (f"{p['label']} (NPLC {p['nplc']}, AZERO {p['azero']}, "
+            f"ARANGE {p['arange']}, DISP {p['disp']})")
+
+
+def benchmark_count(name):
+    """BENCH_SECONDS で読める点数 (BENCH_MIN_READINGS～BENCH_MAX_READINGS)"""
+    p = PROFILES[name]
+    per_reading = dmm_average.expected_time(1, p["nplc"], azero=p["azero"] == "ON")
+    return max(BENCH_MIN_READINGS, min(BENCH_MAX_READINGS, int(BENCH_SECONDS / per_reading)))
+
+
+def benchmark(gpib, name, range_, lsb, count=None, stop_event=None):
+    """プロファイルを設定し、TRIG SGL の 1 点読み取りを繰り返して速度とノイズを測る
+
+    各タブの計測と同じ 1 点ずつの読み取りなので、rdg/s には GPIB の往復時間も含まれる。
+    入力は安定した電圧 (DAC 固定出力やショート) にしておくこと。
+
+    Returns:
+        (success, {"profile", "range", "readings", "elapsed", "rate" (rdg/s), "mean" (V),
+                   "sdev" (V), "noise_lsb", "lsb", "time"} または エラーメッセージ)
+    """
+    success, message = apply(gpib, name, "DCV", range_)
+    if not success:
+        return False, message
+    count = count or benchmark_count(name)
+    p = PROFILES[name]
+    instrument = gpib.instrument
+    orig_timeout = instrument.timeout
+    per_reading = dmm_average.expected_time(1, p["nplc"], azero=p["azero"] == "ON")
+    instrument.timeout = max(orig_timeout, int(per_reading * 1500) + dmm_average.READ_MARGIN_MS)
+    try:
+        # 設定直後の 1 点 (オートゼロ・レンジ切り替えの影響) は捨てる
+        success, response = gpib.query("TRIG SGL")
+        if not success:
+            return False, f"TRIG SGL: {response}"
+        values = []
+        start = time.perf_counter()
+        for _ in range(count):
+            if stop_event is not None and stop_event.is_set():
+                break
+            success, response = gpib.query("TRIG SGL")
+            if not success:
+                return False, f"TRIG SGL: {response}"
+            try:
+                values.append(float(response))
+            except ValueError:
+                return False, f"応答が不正: {response}"
+        elapsed = time.perf_counter() - start
+    finally:
+        instrument.timeout = orig_timeout
+
+    if len(values) < 2:
+        return False, "読み取り点数が不足しています"
+    mean, sdev, n = dmm_average.stats(np.asarray(values))
+    return True, {
+        "profile": name,
+        "range": range_,
+        "readings": n,
+        "elapsed": elapsed,
+        "rate": n / elapsed if elapsed > 0 else None,
+        "mean": mean,
+        "sdev": sdev,
+        "noise_lsb": sdev / lsb if lsb else None,
+        "lsb": lsb,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+# ==================== ベンチごとの保存 ====================
+def bench_id():
+    """ベンチ名 (app_settings "dmm_profiles" の bench、なければホスト名)"""
+    bench = settings_store.app_settings().section(SETTINGS_KEY).get("bench")
+    return bench or socket.gethostname() or "default"
+
+
+def _bench_settings():
+    benches = settings_store.app_settings().section(SETTINGS_KEY).get("benches", {})
+    return benches.get(bench_id(), {})
+
+
+def selected(test_type):
+    """このベンチで test_type に選択しているプロファイル名 (従来設定なら None)"""
+    name = _bench_settings().get("selected", {}).get(test_type)
+    return name if name in PROFILES else None
+
+
+def select(test_type, name):
+    """このベンチの test_type のプロファイルを保存 (None で従来設定)"""
+    settings_store.app_settings().set_path(
+        [SETTINGS_KEY, "benches", bench_id(), "selected", test_type], name)
+
+
+def benchmarks():
+    """このベンチのベンチマーク結果 {profile: result}"""
+    return _bench_settings().get("benchmarks", {})
+
+
+def record_benchmark(result):
+    """ベンチマーク結果をこのベンチのプロファイルごとに保存 (前回の結果は上書き)"""
+    settings_store.app_settings().set_path(
+        [SETTINGS_KEY, "benches", bench_id(), "benchmarks", result["profile"]], result)
+
+
+def format_result(result):
+    """ベンチマーク結果の 1 行表示"""
+    if not result:
+        return "未測定"
+    rate = result.get("rate")
+    noise = result.get("noise_lsb")
+    return (f"{rate:.2f} rdg/s" if rate else "--- rdg/s") + ", " + \
+        (f"σ {noise:.3f} LSB" if noise is not None else "σ ---") + \
+        f" ({result.get('readings', 0)}点, {result.get('time', '')})"
@@ -0,0 +1,368 @@
+"""3458A ストリーミング連続計測 (リングバッファ・移動統計・読み取りスレッド, Tk 非依存)
+
+1 読み取りごとにスレッドを作って TRIG SGL → read → 間隔待ちを繰り返すのではなく、
+常駐の読み取りスレッドが 3458A を連続トリガーしたまま読み続け、固定長の
+NumPy リングバッファ (時刻・値) に取り込む。
+
+- 'auto':  TARM AUTO / TRIG AUTO / NRDGS 1,AUTO で連続トリガー (1 read = 1 読み取り)
+- 'burst': NRDGS n,AUTO + TARM SGL で n 点ずつバースト (バースト間だけ GPIB 書き込み)
+
+どちらも END ALWAYS (読み取りごとに EOI) が前提。統計値 (平均・標準偏差・最小・最大・p-p) は
+バッチ単位の Welford 合成で更新するので 1 サンプルあたり O(1)。
+
+使用例:
+    buf = dmm_stream.RingBuffer(100000)
+    reader = dmm_stream.StreamReader(gpib, buf, lock=measurement_lock, mode='auto')
+    success, msg = reader.start()
+    times, values = buf.snapshot(last=5000)
+    reader.stats_snapshot()   # {"count", "mean", "std", "min", "max", "pp"}
+    reader.stop()
+    dmm_stream.export(path, buf, meta)   # .npz (raw_sidecar 形式) / それ以外は CSV
+"""
+import csv
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from utils import metrics
+
+LINE_FREQ = 50              # 電源周波数 (Hz) 1 PLC = 20 ms
+READ_OVERHEAD_S = 0.0005    # ASCII 出力 + GPIB 転送 1 読み取りあたりのオーバーヘッド (目安)
+FLUSH_SEC = 0.05            # 読み取りスレッドがバッファ・統計へ反映する間隔
+FLUSH_MAX = 1000            # この点数が溜まったら間隔を待たずに反映
+RATE_WINDOW = 1.0           # readings/s の計算に使う直近の秒数
+MAX_CONSECUTIVE_ERRORS = 10
+MODES = ('auto', 'burst')
+
+
+def max_rate(nplc, line_freq=LINE_FREQ, azero=True):
+    """選択した NPLC での 3458A の読み取り速度の上限 (readings/s, 目安)
+
+    積分時間 (AZERO ON はゼロ点と 2 回積分) + 1 読み取りの転送オーバーヘッド。
+    """
+    try:
+        nplc = float(nplc)
+    except (TypeError, ValueError):
+        return 0.0
+    integration = nplc / line_freq * (2 if azero else 1)
+    return 1.0 / (integration + READ_OVERHEAD_S)
+
+
+def parse_readings(response):
+    """read() の応答を値のリストへ (END ALWAYS でなければ複数値がカンマ・改行区切りで来る)"""
+    text = response.replace('\r', '\n').replace(',', '\n')
+    return [float(s) for s in text.split() if s]
+
+
+# ==================== リングバッファ ====================
+class RingBuffer:
+    """固定長の (時刻, 値) リングバッファ (古いものから上書き)
+
+    書き込み (読み取りスレッド) と snapshot (UI) は内部ロックで排他する。
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self._t = np.empty(self.capacity, dtype=np.float64)
+        self._v = np.empty(self.capacity, dtype=np.float64)
+        self._head = 0      # 次に書き込む位置
+        self.total = 0      # これまでに追加した総数 (上書き分を含む)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self.total = 0
+
+    def extend(self, times, values):
+        """times / values (同じ長さ) を末尾に追加"""
+        t = np.asarray(times, dtype=np.float64)
+        v = np.asarray(values, dtype=np.float64)
+        n = len(v)
+        if n == 0:
+            return
+        cap = self.capacity
+        with self._lock:
+            if n >= cap:
+                self._t[:] = t[-cap:]
+                self._v[:] = v[-cap:]
+                self._head = 0
+            else:
+                head = self._head
+                first = min(n, cap - head)
+                self._t[head:head + first] = t[:first]
+                self._v[head:head + first] = v[:first]
+                if first < n:
+                    self._t[:n - first] = t[first:]
+                    self._v[:n - first] = v[first:]
+                self._head = (head + n) % cap
+            self.total += n
+
+    def snapshot(self, last=None):
+        """時系列順のコピー (times, values)
+
+        Args:
+            last: 末尾 last 点だけ返す (None なら全体)
+        """
+        with self._lock:
+            n = len(self)
+            if last is not None:
+                n = min(n, int(last))
+            start = (self._head - n) % self.capacity
+            end = start + n
+            if end <= self.capacity:
+                return self._t[start:end].copy(), self._v[start:end].copy()
+            wrap = end - self.capacity
+            return (np.concatenate((self._t[start:], self._t[:wrap])),
+                    np.concatenate((self._v[start:], self._v[:wrap])))
+
+
+# ==================== 統計 ====================
+class RunningStats:
+    """平均・標準偏差・最小・最大・p-p の逐次計算 (バッチを Welford/Chan 合成)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        v = np.asarray(values, dtype=np.float64)
+        n = len(v)
+        if n == 0:
+            return
+        b_mean = float(v.mean())
+        b_m2 = float(((v - b_mean) ** 2).sum())
+        total = self.count + n
+        delta = b_mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += b_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(v.min()))
+        self.max = max(self.max, float(v.max()))
+
+    @property
+    def std(self):
+        """標本標準偏差 (n-1)"""
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    @property
+    def pp(self):
+        return self.max - self.min if self.count else 0.0
+
+    def as_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'std': self.std,
+                'min': self.min if self.count else None,
+                'max': self.max if self.count else None, 'pp': self.pp}
+
+
+# ==================== 読み取りスレッド ====================
+class StreamReader:
+    """3458A を連続トリガーしてリングバッファに取り込む常駐スレッド
+
+    Args:
+        gpib: GPIBController (3458A)
+        buffer: RingBuffer
+        lock: GPIB の排他ロック (単発測定と共有、ストリーム中は保持し続ける)
+        mode: 'auto' (TARM AUTO / TRIG AUTO) / 'burst' (NRDGS n + TARM SGL)
+        nrdgs: burst の 1 バーストの点数
+        source: metrics.record_reading の計測元
+        on_stopped: 停止時に読み取りスレッドから呼ぶ fn(error) (正常停止は None)
+    """
+
+    def __init__(self, gpib, buffer, lock=None, mode='auto', nrdgs=100, source='dmm_tab',
+                 on_stopped=None):
+        if mode not in MODES:
+            raise ValueError(f"不明なモード: {mode}")
+        self.gpib = gpib
+        self.buffer = buffer
+        self.lock = lock or threading.Lock()
+        self.mode = mode
+        self.nrdgs = max(1, int(nrdgs))
+        self.source = source
+        self.on_stopped = on_stopped
+        self.stats = RunningStats()
+        self.errors = 0
+        self.latest = None          # 最新の応答文字列 (パネル表示用)
+        self.started_at = None
+        self._stats_lock = threading.Lock()
+        self._rate_marks = deque()  # (monotonic, total)
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_listener(self, fn):
+        """バッチ反映ごとに読み取りスレッドから fn(times, values) を呼ぶ (np.ndarray)"""
+        self._listeners.append(fn)
+
+    def start(self):
+        """ストリームを開始
+
+        Returns:
+            (success, message)
+        """
+        if self.running:
+            return False, "既にストリーム中です"
+        self._stop.clear()
+        with self._stats_lock:
+            self.stats.reset()
+            self._rate_marks.clear()
+        self.errors = 0
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True, f"ストリーム開始 ({self.mode})"
+
+    def stop(self, wait=False, timeout=None):
+        """停止を要求 (実際の停止は実行中の読み取りが終わってから)"""
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats_snapshot(self):
+        with self._stats_lock:
+            return self.stats.as_dict()
+
+    def rate(self):
+        """直近 RATE_WINDOW 秒の readings/s"""
+        with self._stats_lock:
+            if len(self._rate_marks) < 2:
+                return 0.0
+            (t0, n0), (t1, n1) = self._rate_marks[0], self._rate_marks[-1]
+        return (n1 - n0) / (t1 - t0) if t1 > t0 else 0.0
+
+    # ---------- スレッド本体 ----------
+    def _write(self, command):
+        success, message = self.gpib.write(command)
+        if not success:
+            raise RuntimeError(f"{command} 失敗: {message}")
+
+    def _arm(self):
+        if self.mode == 'auto':
+            for command in ("TARM AUTO", "NRDGS 1,AUTO", "TRIG AUTO"):
+                self._write(command)
+        else:
+            for command in ("TARM HOLD", "TRIG AUTO", f"NRDGS {self.nrdgs},AUTO"):
+                self._write(command)
+
+    def _disarm(self):
+        """TRIG HOLD で読み取りを止め、出力バッファを捨てて単発測定 (TRIG SGL) 用の状態に戻す"""
+        for command in ("TRIG HOLD", "TARM AUTO", "NRDGS 1,AUTO"):
+            self.gpib.write(command)
+        try:
+            self.gpib.instrument.clear()
+        except Exception:
+            pass
+
+    def _read_one(self, times, values):
+        success, response = self.gpib.read()
+        now = time.time()
+        if not success:
+            raise IOError(response)
+        try:
+            readings = parse_readings(response)
+        except ValueError:
+            raise IOError(f"変換エラー: {response}") from None
+        for v in readings:
+            times.append(now)
+            values.append(v)
+            metrics.record_reading(self.source)
+        self.latest = response
+
+    def _flush(self, times, values):
+        if not values:
+            return
+        t = np.asarray(times, dtype=np.float64)
+        v = np.asarray(values, dtype=np.float64)
+        times.clear()
+        values.clear()
+        self.buffer.extend(t, v)
+        now = time.monotonic()
+        with self._stats_lock:
+            self.stats.update(v)
+            self._rate_marks.append((now, self.buffer.total))
+            while len(self._rate_marks) > 2 and now - self._rate_marks[0][0] > RATE_WINDOW:
+                self._rate_marks.popleft()
+        for fn in self._listeners:
+            try:
+                fn(t, v)
+            except Exception as e:
+                print(f"ストリームリスナーエラー: {e}")
+
+    def _run(self):
+        error = None
+        times, values = [], []
+        consecutive = 0
+        with self.lock:
+            try:
+                self._arm()
+                last_flush = time.monotonic()
+                while not self._stop.is_set():
+                    try:
+                        if self.mode == 'burst':
+                            self._write("TARM SGL")
+                            for _ in range(self.nrdgs):
+                                self._read_one(times, values)
+                        else:
+                            self._read_one(times, values)
+                        consecutive = 0
+                    except IOError as e:
+                        self.errors += 1
+                        consecutive += 1
+                        if consecutive >= MAX_CONSECUTIVE_ERRORS:
+                            raise RuntimeError(f"読み取りエラーが {consecutive} 回連続: {e}")
+                    now = time.monotonic()
+                    if now - last_flush >= FLUSH_SEC or len(values) >= FLUSH_MAX:
+                        self._flush(times, values)
+                        last_flush = now
+            except Exception as e:
+                error = str(e)
+            finally:
+                self._flush(times, values)
+                self._disarm()
+        if self.on_stopped:
+            self.on_stopped(error)
+
+
+# ==================== 保存 ====================
+def export(path, buffer, meta=None):
+    """バッファの内容を保存 (.npz は raw_sidecar 形式 kind="dmm_stream"、それ以外は CSV)
+
+    Returns:
+        (success, message)
+    """
+    times, values = buffer.snapshot()
+    if len(values) == 0:
+        return False, "バッファが空です"
+    try:
+        if path.lower().endswith('.npz'):
+            from utils import raw_sidecar
+            raw_sidecar.save(path, {'kind': 'dmm_stream', **(meta or {})},
+                             {'times': times, 'values': values})
+        else:
+            t0 = times[0]
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['Timestamp', 'Elapsed_s', 'Value'])
+                for t, v in zip(times.tolist(), values.tolist()):
+                    stamp = datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+                    writer.writerow([stamp, f"{t - t0:.6f}", repr(v)])
+        return True, f"{len(values)} 点を保存しました: {path}"
+    except Exception as e:
+        return False, f"保存失敗: {e}"
@@ -0,0 +1,315 @@
+"""計測結果の出力 (XLSX / PNG / 統合) をバックグラウンドで処理するジョブパイプライン
+
+計測スレッドは結果 (pickle 可能な dict などの不変データ) と出力関数を submit() して
+すぐに次の計測へ進む。ジョブはプロセスプール (openpyxl / matplotlib の処理で
+計測スレッドの GIL を奪わない) またはスレッドで実行する。
+
+- 依存関係: deps に指定したジョブが全て成功してから実行 (POS/NEG の XLSX → 統合 など)。
+  依存ジョブが失敗した場合は実行せず "skipped"
+- 再試行: ワーカープロセスの異常終了 (BrokenProcessPool) はプールを作り直して、
+  OSError (ファイルロック等) は retry_delay 秒後に、最大 retries 回まで再実行
+- 状態通知: ジョブごとの on_status(snapshot) を状態が変わるたびに呼ぶ。
+  プールのスレッドから呼ばれるため、UI へは UI バス経由で渡すこと。
+  snapshot はその時点の状態のコピー (tag に呼び出し側の任意データを持たせられる)
+
+出力関数はモジュールのトップレベル関数にする (プロセスへ渡すため)。
+出力ファイルは一時ファイルに書いてから置換し、途中で失敗しても壊れたファイルを残さない。
+アプリ全体で1つのプロセスプールを共有する (shared())。
+
+使用例:
+    pipeline = export_pipeline.shared(processes=2)
+    notify = lambda job: bus.post(self, self._on_export_job, job)
+    pos = pipeline.submit(write_xlsx, pos_record, label="XLSX POS", on_status=notify)
+    neg = pipeline.submit(write_xlsx, neg_record, label="XLSX NEG", on_status=notify)
+    pipeline.submit(merge_xlsx, pos_path, neg_path, deps=(pos, neg), label="統合",
+                    on_status=notify)
+"""
+import copy
+import itertools
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import metrics, tracer
+
+# ジョブ状態
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+FINISHED = (DONE, FAILED, SKIPPED)
+
+DEFAULT_RETRIES = 1
+DEFAULT_RETRY_DELAY = 1.0   # OSError 時の再試行待ち [s]
+
+
+class ExportJob:
+    """出力ジョブ1件 (状態は ExportPipeline が更新)"""
+
+    def __init__(self, job_id, func, args, deps, label, retries, in_process,
+                 on_status=None, tag=None):
+        self.id = job_id
+        self.func = func
+        self.args = args
+        self.deps = tuple(deps)
+        self.label = label or getattr(func, '__name__', 'job')
+        self.retries = retries
+        self.in_process = in_process
+        self.on_status = on_status
+        self.tag = tag
+        self.status = QUEUED
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.elapsed = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def snapshot(self):
+        """現在の状態のコピー (関数・引数は含めない)"""
+        snap = copy.copy(self)
+        snap.func = snap.args = snap.on_status = None
+        return snap
+
+    def __repr__(self):
+        return f"ExportJob({self.id}, {self.label!r}, {self.status})"
+
+
+class ExportPipeline:
+    """依存関係付きの出力ジョブキュー"""
+
+    def __init__(self, processes=2, name="export", retry_delay=DEFAULT_RETRY_DELAY):
+        """
+        Args:
+            processes: ワーカープロセス数 (0 なら in_process のジョブもスレッドで実行)
+            name: トレース・メトリクス・スレッド名に使う名前
+        """
+        self.processes = processes
+        self.name = name
+        self.retry_delay = retry_delay
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._process_pool = None
+        self._thread_pool = None
+        self._closed = False
+
+    # ---------- 公開API ----------
+    def submit(self, func, *args, deps=(), label=None, retries=DEFAULT_RETRIES,
+               in_process=True, on_status=None, tag=None):
+        """ジョブを登録してジョブ ID を返す (どのスレッドからでも可)
+
+        Args:
+            func: 出力関数 (in_process=True ならトップレベル関数、引数・戻り値も pickle 可能)
+            deps: 先に成功している必要があるジョブ ID (None は無視)
+            retries: 異常終了・OSError 時の再試行回数
+            in_process: False ならスレッドで実行 (Excel COM など、プロセスに渡せない処理)
+            on_status: 状態変化時に呼ぶ関数 on_status(snapshot)
+            tag: snapshot に付けて返す任意のデータ (プロセスには渡さない)
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("出力パイプラインは停止済みです")
+            job = ExportJob(next(self._ids), func, args,
+                            [d for d in deps if d is not None], label, retries, in_process,
+                            on_status, tag)
+            self._jobs[job.id] = job
+        metrics.EXPORT_QUEUE_DEPTH.inc(pipeline=self.name)
+        self._notify(job)
+        self._dispatch_ready()
+        return job.id
+
+    def job(self, job_id):
+        """ジョブ (状態・結果・エラー) を返す"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        """未完了のジョブ数"""
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if not j.finished)
+
+    def wait(self, job_ids=None, timeout=None):
+        """指定ジョブ (None なら全ジョブ) の完了を待つ
+
+        Returns:
+            全て完了した場合 True (タイムアウト時 False)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                jobs = (self._jobs.values() if job_ids is None
+                        else [self._jobs[i] for i in job_ids if i in self._jobs])
+                if all(j.finished for j in jobs):
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+
+    def forget_finished(self):
+        """完了済みジョブを破棄 (長時間運転時のメモリ解放用)"""
+        with self._lock:
+            finished = {i for i, j in self._jobs.items() if j.finished}
+            waited = {d for j in self._jobs.values() if not j.finished for d in j.deps}
+            for i in finished - waited:
+                del self._jobs[i]
+
+    def shutdown(self, wait=False):
+        """新規ジョブの受付を止めてプールを停止"""
+        with self._lock:
+            self._closed = True
+            pools = [p for p in (self._process_pool, self._thread_pool) if p is not None]
+            self._process_pool = self._thread_pool = None
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    # ---------- 内部処理 ----------
+    def _executor(self, job):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("出力パイプラインは停止済みです")
+            if job.in_process and self.processes and self.processes > 0:
+                if self._process_pool is None:
+                    self._process_pool = ProcessPoolExecutor(max_workers=self.processes)
+                return self._process_pool
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=max(1, self.processes or 1),
+                    thread_name_prefix=f"{self.name}-job")
+            return self._thread_pool
+
+    def _reset_process_pool(self, broken):
+        """異常終了したプロセスプールを破棄 (次の投入で作り直す)"""
+        with self._lock:
+            if self._process_pool is broken:
+                self._process_pool = None
+        try:
+            broken.shutdown(wait=False, cancel_futures=True)
+        except Exception:
+            pass
+
+    def _dispatch_ready(self):
+        """依存が解決したジョブを実行開始、依存が失敗したジョブは skipped に"""
+        while True:
+            to_run, to_skip = [], []
+            with self._lock:
+                if self._closed:
+                    return
+                for job in self._jobs.values():
+                    if job.status != QUEUED:
+                        continue
+                    deps = [self._jobs.get(d) for d in job.deps]
+                    failed = [d for d in deps if d is not None and d.status in (FAILED, SKIPPED)]
+                    if failed:
+                        job.status = SKIPPED
+                        job.error = f"依存ジョブ失敗: {failed[0].label}"
+                        to_skip.append(job)
+                    elif all(d is None or d.status == DONE for d in deps):
+                        job.status = RUNNING
+                        to_run.append(job)
+            for job in to_skip:
+                self._finish(job)
+            for job in to_run:
+                self._launch(job)
+            if not to_skip:
+                return   # skipped の連鎖がなければ完了
+
+    def _launch(self, job):
+        job.attempts += 1
+        job.started = time.perf_counter()
+        self._notify(job)
+        try:
+            executor = self._executor(job)
+            future = executor.submit(job.func, *job.args)
+        except Exception as e:   # プール停止済み・pickle 不可など
+            self._on_error(job, e, None)
+            return
+        future.add_done_callback(lambda f, j=job, ex=executor: self._on_done(j, f, ex))
+
+    def _on_done(self, job, future, executor):
+        if future.cancelled():
+            self._on_error(job, RuntimeError("キャンセルされました"), None)
+            return
+        error = future.exception()
+        if error is not None:
+            self._on_error(job, error, executor)
+            return
+        job.result = future.result()
+        job.error = None
+        job.status = DONE
+        self._finish(job)
+        self._dispatch_ready()
+
+    def _on_error(self, job, error, executor):
+        crashed = isinstance(error, BrokenProcessPool)
+        if crashed and executor is not None:
+            self._reset_process_pool(executor)
+        retryable = crashed or isinstance(error, OSError)
+        if retryable and job.attempts <= job.retries and not self._closed:
+            job.status = RETRYING
+            job.error = f"{type(error).__name__}: {error}"
+            self._notify(job)
+            delay = 0 if crashed else self.retry_delay
+            threading.Timer(delay, self._launch, args=(job,)).start()
+            return
+        job.status = FAILED
+        job.error = f"{type(error).__name__}: {error}"
+        self._finish(job)
+        self._dispatch_ready()
+
+    def _finish(self, job):
+        job.elapsed = time.perf_counter() - (job.started or job.submitted)
+        metrics.EXPORT_QUEUE_DEPTH.dec(pipeline=self.name)
+        metrics.EXPORT_JOBS.inc(pipeline=self.name, status=job.status)
+        if job.status == DONE:
+            metrics.EXPORT_JOB_SECONDS.observe(job.elapsed, pipeline=self.name)
+            tracer.complete(f"{self.name}.job", "export", job.started, job.elapsed,
+                            label=job.label, attempts=job.attempts)
+        with self._changed:
+            self._changed.notify_all()
+        self._notify(job)
+
+    def _notify(self, job):
+        if job.on_status is None:
+            return
+        try:
+            job.on_status(job.snapshot())
+        except Exception:
+            pass
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared(processes=2):
+    """アプリ共通の出力パイプライン (processes は初回作成時のみ有効)"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ExportPipeline(processes=processes)
+        return _shared
+
+
+def shutdown_shared(wait=False, timeout=60.0):
+    """共通パイプラインを停止 (アプリ終了時)
+
+    wait=True なら未完了ジョブ (依存待ちを含む) の完了を最大 timeout 秒待ってから停止
+    """
+    global _shared
+    with _shared_lock:
+        pipeline, _shared = _shared, None
+    if pipeline is None:
+        return
+    if wait:
+        pipeline.wait(timeout=timeout)
+    pipeline.shutdown(wait=wait)
@@ -0,0 +1,276 @@
+"""3458A の高速サンプリングによる DAC グリッチ・セトリング波形の取得と解析 (Tk 非依存)
+
+DataGen のグリッチシーケンス (メジャーキャリー 7 パターン) の各ステップで 3458A を
+デジタイザとして使い、切り替え波形をメモリに取り込んで 1 回のバイナリ転送で読み出す。
+
+取得 (save_state → configure → capture × ステップ数 → restore):
+    DCV (AZERO OFF・小さい APER) を TIMER 間隔の NRDGS 点で MEM FIFO に SINT/DINT で格納し、
+    MCOUNT? で取り込み完了を待って RMEM → read_bytes で一括転送、ISCALE? を掛けて V に変換する。
+解析 (analyze): 1 回の取得に含まれる切り替え (遷移) ごとに
+    - グリッチピーク: 切り替え後の整定値からの最大偏差 (符号付き)
+    - グリッチインパルス面積: 理想ステップ (切り替え前後の整定値) との差の積分 (V·s)
+    - セトリング時間: 整定幅から出た最後のサンプルまでの時間 (区間内で整定しなければ None)
+
+使用例:
+    state = glitch_capture.save_state(gpib)
+    success, iscale = glitch_capture.configure(gpib, cfg)
+    success, (times, volts) = glitch_capture.capture(gpib, cfg, iscale)
+    transitions = glitch_capture.analyze(times, volts, lsb)
+    glitch_capture.restore(gpib, state)
+"""
+import time
+
+import numpy as np
+
+DEFAULTS = {
+    'range': 10.0,          # DCV レンジ (V)
+    'aper': 3e-6,           # 積分時間 (s)
+    'interval': 20e-6,      # サンプル間隔 TIMER (s)
+    'nrdgs': 4096,          # 1 回の取得点数
+    'format': 'SINT',       # メモリ・出力形式 (SINT: 2 バイト / DINT: 4 バイト)
+    'settle_band_lsb': 0.5, # 整定幅 (LSB、雑音の 3σ より狭くはしない)
+    'threshold_sigma': 8.0, # 遷移検出の閾値 (隣接サンプル差の雑音 σ の倍数)
+    'merge_samples': 10,    # これより近い検出は同じ遷移として扱う
+}
+FORMAT_BYTES = {'SINT': 2, 'DINT': 4}
+MEMORY_READINGS = {'SINT': 10240, 'DINT': 5120}   # 標準メモリで格納できる点数
+MIN_INTERVAL = 1e-5
+PRE_SAMPLES = 20        # 切り替え前の整定値に使う最大点数
+
+
+def config_from(settings=None):
+    """DEFAULTS に settings (app_settings の "glitch_capture" など) を重ねた設定"""
+    cfg = dict(DEFAULTS)
+    cfg.update({k: v for k, v in (settings or {}).items() if k in DEFAULTS})
+    return cfg
+
+
+def validate(cfg):
+    """取得設定の確認
+
+    Returns:
+        (success, message)
+    """
+    fmt = cfg['format']
+    if fmt not in FORMAT_BYTES:
+        return False, f"形式は SINT / DINT のみです: {fmt}"
+    if cfg['interval'] < MIN_INTERVAL:
+        return False, f"サンプル間隔は {MIN_INTERVAL * 1e6:.0f} µs 以上にしてください"
+    if cfg['aper'] >= cfg['interval']:
+        return False, "積分時間 (APER) はサンプル間隔より短くしてください"
+    if not 8 <= cfg['nrdgs'] <= MEMORY_READINGS[fmt]:
+        return False, f"{fmt} の取得点数は 8～{MEMORY_READINGS[fmt]} 点です"
+    return True, "OK"
+
+
+# ==================== 取得 ====================
+def _write_all(gpib, commands):
+    for command in commands:
+        success, message = gpib.write(command)
+        if not success:
+            return False, f"{command}: {message}"
+    return True, "OK"
+
+
+def save_state(gpib):
+    """取得前の FUNC / RANGE / NPLC (restore で戻す。取得できなかった項目は None)"""
+    state = {}
+    for key in ('FUNC', 'RANGE', 'NPLC'):
+        success, response = gpib.query(f"{key}?")
+        state[key] = response.split(',')[0].strip() if success and response else None
+    return state
+
+
+def configure(gpib, cfg):
+    """3458A を高速サンプリング (メモリ格納) に設定
+
+    Returns:
+        (success, ISCALE (V/カウント) または エラーメッセージ)
+    """
+    success, message = validate(cfg)
+    if not success:
+        return False, message
+    fmt = cfg['format']
+    success, message = _write_all(gpib, [
+        "TARM HOLD",
+        f"DCV {cfg['range']}",
+        "AZERO OFF",
+        f"APER {cfg['aper']:.3E}",
+        "DISP OFF",
+        "MATH OFF",
+        "DELAY 0",
+        f"MFORMAT {fmt}",
+        f"OFORMAT {fmt}",
+        "MEM FIFO",
+        f"TIMER {cfg['interval']:.6E}",
+        f"NRDGS {cfg['nrdgs']},TIMER",
+        "TRIG AUTO",
+        "END ON",
+    ])
+    if not success:
+        return False, f"設定失敗: {message}"
+    success, response = gpib.query("ISCALE?")
+    if not success:
+        return False, f"ISCALE? 失敗: {response}"
+    try:
+        return True, float(response)
+    except ValueError:
+        return False, f"ISCALE? の応答が不正: {response}"
+
+
+def decode(raw, fmt, iscale):
+    """SINT / DINT (ビッグエンディアンの符号付き整数) のバイト列を V に変換"""
+    dtype = '>i2' if fmt == 'SINT' else '>i4'
+    return np.frombuffer(raw, dtype=dtype).astype(np.float64) * iscale
+
+
+def capture(gpib, cfg, iscale, timeout=None, poll=0.01):
+    """1 回取得 (TARM SGL → MCOUNT? で完了待ち → RMEM を一括転送)
+
+    Returns:
+        (success, (times, volts) または エラーメッセージ) times は先頭サンプルからの秒
+    """
+    n, fmt, interval = cfg['nrdgs'], cfg['format'], cfg['interval']
+    success, message = _write_all(gpib, ["MEM FIFO", "TARM SGL"])
+    if not success:
+        return False, f"取得開始失敗: {message}"
+
+    deadline = time.monotonic() + (timeout if timeout is not None else n * interval + 2.0)
+    count = 0
+    while count < n:
+        success, response = gpib.query("MCOUNT?")
+        if success:
+            try:
+                count = int(float(response))
+            except ValueError:
+                pass
+        if count >= n:
+            break
+        if time.monotonic() > deadline:
+            return False, f"取得タイムアウト ({count}/{n} 点)"
+        time.sleep(poll)
+
+    success, message = gpib.write(f"RMEM 1,{n},1")
+    if not success:
+        return False, f"RMEM 失敗: {message}"
+    success, raw = gpib.read_bytes(n * FORMAT_BYTES[fmt])
+    if not success:
+        return False, f"メモリ転送失敗: {raw}"
+    return True, (np.arange(n) * interval, decode(raw, fmt, iscale))
+
+
+def restore(gpib, state):
+    """通常の計測状態 (PRESET NORM・END ALWAYS・TARM AUTO) に戻し、取得前の設定を再設定"""
+    commands = ["PRESET NORM", "END ALWAYS", "TARM AUTO"]
+    if state.get('FUNC'):
+        commands.append(f"FUNC {state['FUNC']}")
+    if state.get('RANGE'):
+        commands.append(f"RANGE {state['RANGE']}")
+    if state.get('NPLC'):
+        commands.append(f"NPLC {state['NPLC']}")
+    return _write_all(gpib, commands)
+
+
+# ==================== 解析 ====================
+def noise_sigma(volts):
+    """隣接サンプル差の MAD から白色雑音の σ (量子化ステップの半分を下限)"""
+    d = np.diff(volts)
+    sigma = 1.4826 * float(np.median(np.abs(d - np.median(d)))) / np.sqrt(2.0)
+    steps = np.abs(d[d != 0])
+    if len(steps):
+        sigma = max(sigma, float(steps.min()) / 2.0)
+    return sigma
+
+
+def analyze(times, volts, lsb, settle_band_lsb=DEFAULTS['settle_band_lsb'],
+            threshold_sigma=DEFAULTS['threshold_sigma'], merge_samples=DEFAULTS['merge_samples']):
+    """遷移ごとのグリッチピーク・インパルス面積・セトリング時間
+
+    Returns:
+        [{"index", "time" (s), "pre" (V), "post" (V), "step_lsb", "peak_v", "peak_lsb",
+          "peak_time" (s), "area_vs" (V·s), "abs_area_vs", "settling_s" (整定しなければ None)}]
+    """
+    t = np.asarray(times, dtype=np.float64)
+    v = np.asarray(volts, dtype=np.float64)
+    n = len(v)
+    if n < 8:
+        return []
+    dt = float(np.median(np.diff(t)))
+    sigma = noise_sigma(v)
+    jumps = np.flatnonzero(np.abs(np.diff(v)) > threshold_sigma * sigma * np.sqrt(2.0)) + 1
+    if len(jumps) == 0:
+        return []
+
+    # 近い検出をまとめて遷移 (開始・終了インデックス) にする
+    breaks = np.flatnonzero(np.diff(jumps) > merge_samples)
+    starts = np.concatenate(([jumps[0]], jumps[breaks + 1]))
+    ends = np.concatenate((jumps[breaks], [jumps[-1]]))
+    band = max(settle_band_lsb * lsb, 3.0 * sigma)
+
+    transitions = []
+    for k, i0 in enumerate(starts):
+        pre_from = ends[k - 1] + 1 if k > 0 else 0
+        seg_end = starts[k + 1] if k + 1 < len(starts) else n
+        pre = v[max(pre_from, i0 - PRE_SAMPLES):i0]
+        seg = v[i0:seg_end]
+        if len(pre) < 3 or len(seg) < 8:
+            continue    # 取得の先頭・末尾で切れた遷移
+        pre_level = float(np.median(pre))
+        post_level = float(np.median(seg[len(seg) // 2:]))
+        dev = seg - post_level
+
+        ip = int(np.argmax(np.abs(dev)))
+        outside = np.flatnonzero(np.abs(dev) > band)
+        settle_end = int(outside[-1]) + 1 if len(outside) else 0
+        settled = settle_end < len(dev) - 3
+        t_edge = t[i0 - 1]
+
+        transitions.append({
+            'index': int(i0),
+            'time': float(t_edge),
+            'pre': pre_level,
+            'post': post_level,
+            'step_lsb': (post_level - pre_level) / lsb,
+            'peak_v': float(dev[ip]),
+            'peak_lsb': float(dev[ip]) / lsb,
+            'peak_time': float(t[i0 + ip] - t_edge),
+            'area_vs': float(dev[:settle_end].sum()) * dt,
+            'abs_area_vs': float(np.abs(dev[:settle_end]).sum()) * dt,
+            'settling_s': float(t[i0 + settle_end - 1] - t_edge) + dt if settled else None,
+        })
+    return transitions
+
+
+def summarize(transitions):
+    """ステップ (1 回の取得) ごとのまとめ: 遷移数・最大ピーク・最大面積・最大セトリング時間"""
+    if not transitions:
+        return {'count': 0, 'peak_lsb': None, 'area_nvs': None, 'settling_us': None, 'unsettled': 0}
+    peak = max((tr['peak_lsb'] for tr in transitions), key=abs)
+    area = max((tr['area_vs'] for tr in transitions), key=abs)
+    settled = [tr['settling_s'] for tr in transitions if tr['settling_s'] is not None]
+    return {
+        'count': len(transitions),
+        'peak_lsb': peak,
+        'area_nvs': area * 1e9,
+        'settling_us': max(settled) * 1e6 if settled else None,
+        'unsettled': len(transitions) - len(settled),
+    }
+
+
+def save_sidecar(path, steps, meta):
+    """取得波形と解析結果をサイドカー (.npz, kind "glitch") に保存
+
+    Args:
+        steps: [{"label", "times", "volts", "transitions"}] (ステップ順)
+        meta: 取得設定など (cfg・lsb・direction・polarity)
+    """
+    from utils import raw_sidecar
+
+    arrays = {}
+    info = []
+    for i, step in enumerate(steps, 1):
+        arrays[f'times_{i}'] = step['times']
+        arrays[f'volts_{i}'] = step['volts']
+        info.append({'label': step['label'], 'transitions': step['transitions'],
+                     'summary': summarize(step['transitions'])})
+    return raw_sidecar.save(path, {'kind': 'glitch', **meta, 'steps': info}, arrays)
@@ -1,6 +1,3 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
 import matplotlib
 import numpy as np
 from datetime import datetime
@@ -10,6 +7,22 @@ import re
 matplotlib.rcParams['font.family'] = ['MS Gothic', 'Yu Gothic', 'Meiryo', 'sans-serif']
 
 
+def pyplot():
+    """TkAgg の pyplot (グラフウィンドウを開くときに読み込む)
+
+    区間平均などの計算だけを使う再解析 CLI (reanalyze.py) では Tk を読み込まない。
+    """
+    # pyplot より先にバックエンドを確定 (graph_helper / prewarm と同じ)
+    matplotlib.use('TkAgg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def lsb_voltage(bit_precision, pos_full_voltage, neg_full_voltage):
+    """1LSB 電圧値 (V) = (+Full - (-Full)) / (2^bit精度 - 1)"""
+    return (pos_full_voltage - neg_full_voltage) / (2 ** bit_precision - 1)
+
+
 class LSBGraphPlotter:
     """
     CSVデータをLSB換算してグラフ化するクラス（Matplotlib最適化版）
@@ -57,7 +70,7 @@ class LSBGraphPlotter:
         self.skip_before_change = skip_before_change
 
         # 1LSB電圧値を計算
-        self.lsb_voltage = (pos_full_voltage - neg_full_voltage) / (2 ** bit_precision - 1)
+        self.lsb_voltage = lsb_voltage(bit_precision, pos_full_voltage, neg_full_voltage)
 
     def extract_hex_from_code(self, code_str, dataset):
         """
@@ -528,10 +541,12 @@ class LSBGraphPlotter:
             None（Matplotlibの別ウィンドウが開く）
         """
         if not elapsed_times:
+            from tkinter import messagebox
             messagebox.showwarning("Warning", f"No data for {serial} {pole}")
             return None
 
         # グラフを作成
+        plt = pyplot()
         fig, ax = plt.subplots(figsize=(10, 6))
 
         # Codeごとに色分けしてプロット（線のみ、マーカーなし）
@@ -617,7 +632,7 @@ class LSBGraphPlotter:
         if temp_char_mode:
             colors = [self._get_code_color(code) for code, dataset in unique_keys]
         else:
-            colors = [plt.cm.tab10(i % 10) for i in range(len(unique_keys))]
+            colors = [pyplot().cm.tab10(i % 10) for i in range(len(unique_keys))]
 
         # ラベル重複回避
         used_labels = set()
@@ -996,6 +1011,7 @@ class LSBGraphPlotter:
             return None
 
         # 2軸グラフを作成（縦:横 = 4.5:5.5）
+        plt = pyplot()
         fig, ax1 = plt.subplots(figsize=(7.33, 6))
 
         # 左軸: LSB変動（コードごとに色分け、温特グラフ用凡例）
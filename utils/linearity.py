@@ -0,0 +1,305 @@
+"""DAC 直線性解析 (NumPy ベクトル演算)
+
+LinearityTab の計測結果 (DAC コードと測定電圧) から Gain / Offset / INL / DNL を計算する。
+Tk・計測器には依存しない。全ての関数は最後の軸を計測点として扱い、
+(DEF, 極) ごとの複数の計測を積み重ねた配列 (shape = (計測数, 点数)) もそのまま処理できる。
+点数の異なる計測をまとめて解析する場合は batch() を使う。
+
+- lsq_fit: 最小二乗直線 (平均を引いてから計算するため 20bit コードでも桁落ちしない)
+- endpoint_fit: 端点を結ぶ直線
+- gain_offset: Gain (LSB/LSB)・Offset (LSB) (VBA 準拠の符号: Gain = 極性 * 傾き / Vlsb)
+- detect_stride / dnl: 連続コードの刻み幅を計測ごとに検出して DNL を計算
+  (刻み幅 1 と 2 の計測を積み重ねても、それぞれの刻み幅で DNL を求める)
+- position_linearity / lbc_linearity / ship_linearity: 各モードの XLSX・判定と同じ計算
+- ng_flags / ship_judge: LinearityTab の OK/NG 判定
+
+使用例:
+    from utils import linearity
+    res = linearity.position_linearity(signed, measured, bits=20, span=20.0, pole='POS')
+    res['gain'], res['offset'], res['max_error']
+    results = linearity.batch(linearity.ship_linearity, [(codes1, v1), (codes2, v2)],
+                              bits=20, dac_name='Position')
+"""
+import numpy as np
+
+LBC_C1_REF = 160 / (2 ** 19)   # LBC ランダム用テンプレート C1 = B1/2^19
+
+
+# ==================== 基本カーネル ====================
+def lsq_fit(x, y):
+    """最小二乗直線 y = m*x + b
+
+    x, y の平均を引いてから傾きを求める (大きなコード値の2乗和同士の引き算を避ける)。
+    Returns:
+        (m, b) 計測が1つなら float、積み重ねた配列なら shape (計測数,) の配列
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x_mean = x.mean(axis=-1, keepdims=True)
+    y_mean = y.mean(axis=-1, keepdims=True)
+    dx = x - x_mean
+    m = np.sum(dx * (y - y_mean), axis=-1) / np.sum(dx * dx, axis=-1)
+    b = y_mean[..., 0] - m * x_mean[..., 0]
+    return _scalar(m), _scalar(b)
+
+
+def endpoint_fit(x, y):
+    """端点 (最初と最後の点) を結ぶ直線の傾き
+
+    Returns:
+        (slope, x0, y0) 直線は y0 + slope * (x - x0)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    slope = (y[..., -1] - y[..., 0]) / (x[..., -1] - x[..., 0])
+    return _scalar(slope), _scalar(x[..., 0]), _scalar(y[..., 0])
+
+
+def gain_offset(m, b, v_per_lsb, pole_sign=1):
+    """最小二乗直線 (signed コード基準) の Gain (LSB/LSB)・Offset (LSB)
+
+    VBA (DacTestBench5K) 準拠: CELL_GAIN = sign*m/vgain, CELL_OFFSET = b/vgain
+    """
+    return pole_sign * m / v_per_lsb, b / v_per_lsb
+
+
+def detect_stride(codes):
+    """隣り合うコードの刻み幅 (最も多い正の差) を計測ごとに検出 (なければ 0)
+
+    Returns:
+        計測が1つなら int、積み重ねた配列なら shape (計測数,) の配列
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    steps = np.diff(codes, axis=-1)
+    steps = steps.reshape(int(np.prod(codes.shape[:-1])), steps.shape[-1])
+    strides = np.zeros(steps.shape[0], dtype=np.int64)
+    for i, row in enumerate(steps):
+        row = row[row > 0]
+        if row.size:
+            values, counts = np.unique(row, return_counts=True)
+            strides[i] = values[np.argmax(counts)]
+    if codes.ndim <= 1:
+        return int(strides[0]) if strides.size else 0
+    return strides.reshape(codes.shape[:-1])
+
+
+def dnl(codes, inl, stride=None):
+    """DNL (LSB): 刻み幅 stride で隣り合うコードの INL の差 / stride
+
+    stride=None なら detect_stride() で計測ごとに検出。刻み幅が異なる箇所は NaN
+    (stride > 1 のときは stride コード分の平均 DNL)。最後の点も NaN。
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    inl = np.asarray(inl, dtype=float)
+    if stride is None:
+        stride = detect_stride(codes)
+    stride = np.expand_dims(np.asarray(stride, dtype=np.int64), -1)
+    out = np.full(inl.shape, np.nan)
+    step = np.diff(codes, axis=-1)
+    diff = np.diff(inl, axis=-1) / np.where(stride > 0, stride, 1)
+    out[..., :-1] = np.where((stride > 0) & (step == stride), diff, np.nan)
+    return out
+
+
+def worst(values, axis=-1, ties_negative=True):
+    """絶対値が最大の値 (符号付き、NaN は無視)
+
+    ties_negative: 正負で絶対値が同じとき負側を返すか
+    """
+    values = np.asarray(values, dtype=float)
+    hi = np.nanmax(values, axis=axis)
+    lo = np.nanmin(values, axis=axis)
+    use_lo = np.abs(lo) >= np.abs(hi) if ties_negative else np.abs(lo) > np.abs(hi)
+    return _scalar(np.where(use_lo, lo, hi))
+
+
+def _scalar(a):
+    """0次元の結果は float に"""
+    return float(a) if np.ndim(a) == 0 else a
+
+
+# ==================== モード別の解析 ====================
+def position_linearity(signed, measured, bits, span, pole):
+    """Position Random/Linear/File (linearity_linear.xlsx と同じ計算)
+
+    Args:
+        signed: signed DAC コード (コード昇順に並べておく)
+        measured: 測定電圧 [V]
+    Returns:
+        {"gain", "offset", "m", "b", "v_per_lsb", "max_error" (|誤差| の最大),
+         "theo_v", "meas_dac", "fit", "errors" (LSB)}
+    """
+    signed = np.asarray(signed, dtype=float)
+    measured = np.asarray(measured, dtype=float)
+    v_per_lsb = span / ((1 << bits) - 1)   # V/LSB (常に正、VBA準拠)
+    pole_sign = -1 if pole == 'NEG' else 1
+
+    m, b = lsq_fit(signed, measured)
+    gain, offset = gain_offset(m, b, v_per_lsb, pole_sign)
+    m_col = np.expand_dims(m, -1)
+    b_col = np.expand_dims(b, -1)
+
+    # VBA準拠: COUT = sdt*vgain*sign, CIN = mdt/vgain, FITOUT = (m*sdt+b)/vgain
+    meas_dac = measured / v_per_lsb
+    fit = (m_col * signed + b_col) / v_per_lsb
+    # 誤差 = CIN - FITOUT (大きな値同士の引き算を避けて平均からの残差で計算)
+    errors = ((measured - measured.mean(axis=-1, keepdims=True))
+              - m_col * (signed - signed.mean(axis=-1, keepdims=True))) / v_per_lsb
+    return {
+        'gain': gain,
+        'offset': offset,
+        'm': m,
+        'b': b,
+        'v_per_lsb': v_per_lsb,
+        'max_error': _scalar(np.max(np.abs(errors), axis=-1)),
+        'theo_v': signed * v_per_lsb * pole_sign,
+        'meas_dac': meas_dac,
+        'fit': fit,
+        'errors': errors,
+    }
+
+
+def lbc_linearity(unsigned, measured, bits, span, pole, c1_ref=LBC_C1_REF):
+    """LBC Random/Linear/File (linearity_lbc_random.xlsx と同じ計算)
+
+    Gain/Offset は signed コードの最小二乗直線、誤差はテンプレートの G 列
+    (E = 端点の傾き * unsigned + 先頭電圧、F = (D-E)/C1、G = F - F の平均)。
+    Args:
+        unsigned: unsigned DAC コード (コード昇順に並べておく)
+        measured: 測定電圧 [V]
+        c1_ref: テンプレート C1 (INL の換算値)
+    Returns:
+        {"gain", "offset", "m", "b", "v_per_lsb", "max_error" (符号付き),
+         "inl" (F 列), "errors" (G 列)}
+    """
+    unsigned = np.asarray(unsigned, dtype=float)
+    measured = np.asarray(measured, dtype=float)
+    signed = unsigned - 2 ** (bits - 1)
+    v_per_lsb = span / ((1 << bits) - 1)
+    pole_sign = -1 if pole == 'NEG' else 1
+
+    m, b = lsq_fit(signed, measured)
+    gain, offset = gain_offset(m, b, v_per_lsb, pole_sign)
+
+    slope, _, first_v = endpoint_fit(unsigned, measured)
+    ideal = np.expand_dims(slope, -1) * unsigned + np.expand_dims(first_v, -1)
+    inl = (measured - ideal) / c1_ref
+    errors = inl - inl.mean(axis=-1, keepdims=True)
+    return {
+        'gain': gain,
+        'offset': offset,
+        'm': m,
+        'b': b,
+        'v_per_lsb': v_per_lsb,
+        'max_error': worst(errors, ties_negative=False),
+        'inl': inl,
+        'errors': errors,
+    }
+
+
+def ship_linearity(unsigned, measured, bits, dac_name, stride=1):
+    """出荷Sequence の INL/DNL (Excelマクロ DacTestBench5K 準拠)
+
+    - 係数: 端点フィット (last_V - first_V) / (last_signed - first_signed)
+    - 理論電圧: first_V + coeff * (signed - first_signed)
+    - INL: (measured - theoretical) / v_per_lsb
+      (v_per_lsb は Position = 係数、LBC = Position の 1LSB = 10V / 2^(bits-1))
+    - DNL: 刻み幅 stride の隣接コード間の INL の差 (None なら刻み幅を検出)
+    Args:
+        unsigned: unsigned DAC コード (コード昇順に並べておく)
+    Returns:
+        {"coeff", "signed", "theoretical_v", "inl", "dnl" (該当しない点は NaN), "v_per_lsb",
+         "inl_max", "inl_min", "dnl_max", "dnl_min"}
+    """
+    codes = np.asarray(unsigned, dtype=np.int64)
+    y = np.asarray(measured, dtype=float)
+    signed = codes.astype(float) - 2 ** (bits - 1)
+
+    coeff, first_signed, first_v = endpoint_fit(signed, y)
+    coeff_col = np.expand_dims(coeff, -1)
+    theoretical_v = np.expand_dims(first_v, -1) + coeff_col * (
+        signed - np.expand_dims(first_signed, -1))
+
+    if dac_name == 'Position':
+        v_per_lsb = coeff   # Position: 係数 = V/LSB (常に正)
+    else:
+        v_per_lsb = 10.0 / (2 ** (bits - 1))
+    inl = (y - theoretical_v) / np.expand_dims(v_per_lsb, -1)
+    dnl_arr = dnl(codes, inl, stride)
+    has_dnl = np.any(~np.isnan(dnl_arr), axis=-1)
+    # DNL 対象の点がない計測は 0 とする (判定・表示用)
+    dnl_filled = np.where(has_dnl[..., None], dnl_arr, 0.0)
+    return {
+        'coeff': coeff,
+        'signed': signed,
+        'theoretical_v': theoretical_v,
+        'inl': inl,
+        'dnl': dnl_arr,
+        'v_per_lsb': v_per_lsb,
+        'inl_max': _scalar(np.max(inl, axis=-1)),
+        'inl_min': _scalar(np.min(inl, axis=-1)),
+        'dnl_max': _scalar(np.nanmax(dnl_filled, axis=-1)),
+        'dnl_min': _scalar(np.nanmin(dnl_filled, axis=-1)),
+    }
+
+
+# ==================== 判定 ====================
+def ng_flags(gain, offset, max_error, th_gain, th_offset, th_error):
+    """Random/Linear/File の NG 項目 (['Gain', 'Offset', 'Error'] のうち閾値を超えたもの)"""
+    flags = []
+    if abs(gain - 1.0) > th_gain:
+        flags.append('Gain')
+    if abs(offset) > th_offset:
+        flags.append('Offset')
+    if abs(max_error) > th_error:
+        flags.append('Error')
+    return flags
+
+
+def ship_judge(res, criteria):
+    """出荷Sequence の判定
+
+    Args:
+        res: ship_linearity() の結果 (計測1つ分)
+        criteria: {"inl": 基準 LSB, "dnl": 基準 LSB}
+    Returns:
+        (judge 'OK'/'NG', INL の最悪値, DNL の最悪値) 最悪値は正負で絶対値が同じなら負側
+    """
+    inl_max_p, inl_max_n = res['inl_max'], res['inl_min']
+    dnl_max_p, dnl_max_n = res['dnl_max'], res['dnl_min']
+    inl_ok = max(abs(inl_max_p), abs(inl_max_n)) <= criteria['inl']
+    dnl_ok = max(abs(dnl_max_p), abs(dnl_max_n)) <= criteria['dnl']
+    inl_worst = inl_max_n if abs(inl_max_n) >= abs(inl_max_p) else inl_max_p
+    dnl_worst = dnl_max_n if abs(dnl_max_n) >= abs(dnl_max_p) else dnl_max_p
+    return ('OK' if (inl_ok and dnl_ok) else 'NG'), inl_worst, dnl_worst
+
+
+# ==================== バッチ ====================
+def batch(func, runs, **kwargs):
+    """点数の異なる複数の計測をまとめて解析
+
+    同じ点数の計測を積み重ねて func を1回ずつ呼び、計測ごとの結果に分けて返す。
+    Args:
+        func: position_linearity / lbc_linearity / ship_linearity など (x, y, **kwargs)
+        runs: [(x, y), ...] (各計測のコードと測定電圧)
+        kwargs: func に渡す共通パラメータ
+    Returns:
+        runs と同じ順の結果 dict のリスト
+    """
+    groups = {}
+    for i, (x, y) in enumerate(runs):
+        groups.setdefault(len(x), []).append(i)
+    results = [None] * len(runs)
+    for indices in groups.values():
+        xs = np.stack([np.asarray(runs[i][0]) for i in indices])
+        ys = np.stack([np.asarray(runs[i][1], dtype=float) for i in indices])
+        stacked = func(xs, ys, **kwargs)
+        for k, i in enumerate(indices):
+            results[i] = {key: _take(value, k) for key, value in stacked.items()}
+    return results
+
+
+def _take(value, k):
+    if np.ndim(value) == 0:
+        return value
+    return _scalar(np.asarray(value)[k])
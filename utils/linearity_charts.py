@@ -0,0 +1,152 @@
+"""Linearity グラフの PNG 描画 (matplotlib Agg、Excel 不要)
+
+template/linearity_*.xlsx のグラフと同じ内容を、計測結果のデータから直接描画する。
+
+- 出荷Sequence: INL (折れ線+■) / DNL (◆のみ) をコード順に表示
+  (縦軸 Position ±1.5 LSB / LBC ±0.5 LSB、横軸は上側)
+- Random / Linear / File: 設定DAC値 (signed) に対する誤差 [LSB] の散布図 (線のみ)
+- NG 時はプロット領域を薄い黄色にする (Excel COM 版と同じ)
+
+pyplot を使わず Figure + FigureCanvasAgg で描画するため、スレッド・別プロセスから
+並列に呼び出せる。render_png は引数・戻り値とも pickle 可能なので
+出力パイプライン (utils.export_pipeline) のプロセスプールにそのまま投入できる。
+
+使用例:
+    from utils import export_pipeline, linearity_charts
+    job_id = export_pipeline.shared().submit(
+        linearity_charts.render_png, "ship", payload, "xxx_POS_chart.png")
+"""
+import functools
+import math
+import os
+
+from matplotlib import rc_context
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import MultipleLocator, FormatStrFormatter
+
+# テンプレートのグラフ書式
+FONT_FAMILY = ['MS Gothic', 'Yu Gothic', 'Meiryo', 'IPAexGothic', 'Noto Sans CJK JP', 'sans-serif']
+FIG_SIZE_SHIP = (7.2, 4.8)       # 埋め込みグラフ相当 [inch]
+FIG_SIZE_LINEAR = (10.0, 6.2)    # チャートシート相当 [inch]
+DPI = 100
+NG_FACE_COLOR = '#FFFFCC'        # Excel 版: RGB(255,255,204)
+
+SHIP_Y_LIMIT = {'Position': 1.5, 'LBC': 0.5}
+SHIP_INL_COLOR = '#FF00FF'
+SHIP_DNL_COLOR = '#000080'
+LINEAR_COLOR = {'Position': '#800080', 'LBC': '#FF00FF'}
+LINEAR_Y_LIMIT = {'Position': 1.5, 'LBC': 0.5}
+LINEAR_Y_STEP = {'Position': 0.25, 'LBC': 0.1}
+
+
+def _new_figure(size, ng):
+    fig = Figure(figsize=size, dpi=DPI, facecolor='white')
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_facecolor(NG_FACE_COLOR if ng else 'white')
+    return fig, ax
+
+
+def _save(fig, path):
+    """一時ファイルに書いてから置換 (書き込み途中の PNG を表示しない)"""
+    tmp = path + '.part'
+    fig.savefig(tmp, format='png', dpi=DPI, facecolor=fig.get_facecolor())
+    os.replace(tmp, path)
+    return path
+
+
+def _with_font(func):
+    """日本語フォントで描画 (rcParams はこの関数内だけ変更)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with rc_context({'font.family': FONT_FAMILY, 'axes.unicode_minus': False}):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@_with_font
+def render_ship_png(payload, path):
+    """出荷Sequence の INL/DNL グラフを PNG 保存
+
+    Args:
+        payload: {"title", "dac_name", "inl": [...], "dnl": [... or None], "ng": bool}
+                 inl / dnl はテンプレートの行順 (グラフの横軸順)
+        path: 出力 PNG パス
+    Returns:
+        path
+    """
+    inl = list(payload['inl'])
+    dnl = [math.nan if v is None else v for v in payload['dnl']]
+    n = len(inl)
+    cats = list(range(1, n + 1))
+    limit = SHIP_Y_LIMIT.get(payload.get('dac_name'), 1.5)
+
+    fig, ax = _new_figure(FIG_SIZE_SHIP, payload.get('ng', False))
+    ax.plot(cats, inl, color=SHIP_INL_COLOR, linewidth=1.0,
+            marker='s', markersize=4, label='INL')
+    ax.plot(cats, dnl, linestyle='none', color=SHIP_DNL_COLOR,
+            marker='D', markersize=4, label='DNL')
+
+    ax.set_ylim(-limit, limit)
+    ax.yaxis.set_major_locator(MultipleLocator(0.25 if limit > 1 else 0.1))
+    ax.yaxis.set_major_formatter(FormatStrFormatter('%.2f'))
+    ax.grid(axis='y', color='#808080', linewidth=0.5)
+    ax.set_xlim(0.5, n + 0.5)
+    ax.xaxis.tick_top()
+    ax.xaxis.set_major_locator(MultipleLocator(2))
+    ax.tick_params(axis='x', direction='in', labelsize=8)
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.set_ylabel('INL(LSB)')
+    ax.legend(loc='lower right', fontsize=9, frameon=False)
+    fig.suptitle(payload.get('title', ''), fontsize=11, y=0.995)
+    fig.subplots_adjust(left=0.13, right=0.97, top=0.86, bottom=0.06)
+    return _save(fig, path)
+
+
+@_with_font
+def render_linear_png(payload, path):
+    """Random / Linear / File の誤差グラフを PNG 保存
+
+    Args:
+        payload: {"title", "dac_name", "codes": [signed...], "errors": [LSB...], "ng": bool}
+                 codes 昇順
+        path: 出力 PNG パス
+    Returns:
+        path
+    """
+    dac_name = payload.get('dac_name', 'Position')
+    codes = list(payload['codes'])
+    errors = list(payload['errors'])
+    limit = LINEAR_Y_LIMIT.get(dac_name, 1.5)
+
+    fig, ax = _new_figure(FIG_SIZE_LINEAR, payload.get('ng', False))
+    ax.plot(codes, errors, color=LINEAR_COLOR.get(dac_name, '#800080'), linewidth=1.0)
+
+    ax.set_ylim(-limit, limit)
+    ax.yaxis.set_major_locator(MultipleLocator(LINEAR_Y_STEP.get(dac_name, 0.25)))
+    if dac_name == 'LBC':
+        ax.xaxis.set_major_locator(MultipleLocator(20000))
+        ax.grid(color='black', linewidth=0.5, linestyle=(0, (2, 2)))
+        ax.set_ylabel('INL（LSB)')
+    else:
+        ax.set_xlim(-600000, 600000)
+        ax.xaxis.set_major_locator(MultipleLocator(200000))
+        ax.grid(color='#808080', linewidth=0.5)
+        ax.set_ylabel('error [LSB]')
+    ax.tick_params(direction='in', labelsize=9)
+    ax.set_title(payload.get('title', ''), fontsize=12)
+    fig.subplots_adjust(left=0.09, right=0.97, top=0.9, bottom=0.08)
+    return _save(fig, path)
+
+
+RENDERERS = {
+    'ship': render_ship_png,
+    'linear': render_linear_png,
+}
+
+
+def render_png(kind, payload, path):
+    """kind ("ship" / "linear") のグラフを PNG 保存して path を返す"""
+    return RENDERERS[kind](payload, path)
+
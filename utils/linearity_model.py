@@ -0,0 +1,239 @@
+"""DAC ビット重みモデルによる全コード INL/DNL 予測 (NumPy ベクトル演算)
+
+バイナリ重み DAC の出力を重ね合わせモデル
+    V(code) = v0 + Σ_k w_k * bit_k(code)
+で表し、少数の設計コード (2×bits + 冗長点) の測定電圧からビット重み w_k を
+最小二乗で推定して、全 2^bits コードの INL/DNL を予測する。
+Tk・計測器には依存しない (LinearityTab の Model モードから使う)。
+
+- design_codes: 条件の良い設計コード (0・フルスケール・各ビット単独 ON・各ビット単独 OFF + 乱数コード)
+- fit: ビット重み・共分散・残差の標準偏差
+- predict_voltages / predict_inl_dnl: 全コードの予測 (2^bits 点をビットごとの連結で生成)
+- worst_cases: |INL|・|DNL| 最悪コードと信頼限界 (デルタ法)
+- verification_codes: 最悪コードの検証スイープ用コード (File モードのパターンとして保存可能)
+
+INL/DNL の定義は出荷Sequence と同じ端点基準 (LSB = (V(full) - V(0)) / full)。
+
+使用例:
+    from utils import linearity_model
+    codes = linearity_model.design_codes(20, redundancy=8, seed=0)
+    model = linearity_model.fit(codes, volts, 20)
+    report = linearity_model.worst_cases(model, count=8)
+    linearity_model.verification_codes(report)
+"""
+import numpy as np
+
+CONFIDENCE_Z = 1.96   # 信頼限界の係数 (正規近似 95%)
+
+
+# ==================== 設計コード ====================
+def design_codes(bits, redundancy=8, seed=0):
+    """計測する設計コード (unsigned、昇順、重複なし)
+
+    0・フルスケールと、各ビットを単独で ON (1 << k) / 単独で OFF (full ^ (1 << k)) にした
+    コードで各ビット重みを2通りの状態から測る。redundancy 点の乱数コード (seed で再現可能)
+    を加えて残差の自由度を確保する。
+    """
+    full = (1 << bits) - 1
+    codes = {0, full}
+    for k in range(bits):
+        codes.add(1 << k)
+        codes.add(full ^ (1 << k))
+    rng = np.random.default_rng(seed)
+    while len(codes) < 2 * bits + 2 + redundancy:
+        codes.add(int(rng.integers(0, full + 1)))
+    return sorted(codes)
+
+
+def design_matrix(codes, bits):
+    """最小二乗の計画行列 [1, bit_0, ..., bit_{bits-1}] (shape = (点数, bits + 1))"""
+    codes = np.asarray(codes, dtype=np.int64)
+    x = np.empty((codes.size, bits + 1))
+    x[:, 0] = 1.0
+    x[:, 1:] = (codes[:, None] >> np.arange(bits)) & 1
+    return x
+
+
+def condition_number(codes, bits):
+    """計画行列の条件数 (大きいほどビット重みの推定が測定ノイズに敏感)"""
+    return float(np.linalg.cond(design_matrix(codes, bits)))
+
+
+# ==================== フィット ====================
+def fit(codes, volts, bits):
+    """ビット重みを最小二乗で推定
+
+    Returns:
+        {"bits", "v0", "weights" (V, shape (bits,)), "cov" (weights の共分散),
+         "sigma" (残差の標準偏差 V), "dof", "residuals" (V), "cond"}
+    Raises:
+        ValueError: 計測点数がパラメータ数 (bits + 1) 以下
+    """
+    x = design_matrix(codes, bits)
+    y = np.asarray(volts, dtype=float)
+    n, p = x.shape
+    if n <= p:
+        raise ValueError(f"計測点数不足: {n}点 (ビット重みモデルは{p + 1}点以上必要)")
+    theta, _, rank, sv = np.linalg.lstsq(x, y, rcond=None)
+    if rank < p:
+        raise ValueError("設計コードで全ビットを区別できません (計画行列が縮退)")
+    residuals = y - x @ theta
+    dof = n - p
+    sigma = float(np.sqrt(residuals @ residuals / dof))
+    cov = sigma ** 2 * np.linalg.inv(x.T @ x)
+    return {
+        'bits': bits,
+        'v0': float(theta[0]),
+        'weights': theta[1:],
+        'cov': cov[1:, 1:],
+        'sigma': sigma,
+        'dof': dof,
+        'residuals': residuals,
+        'cond': float(sv[0] / sv[-1]),
+    }
+
+
+# ==================== 全コード予測 ====================
+def predict_voltages(model):
+    """全 2^bits コードの予測電圧 (コード順)
+
+    下位ビットから「これまでの全コード」と「それに w_k を足したもの」を連結して生成
+    (ビットを展開した行列を作らないため 20bit でも 8MB・数 ms)。
+    """
+    v = np.array([model['v0']])
+    for w in model['weights']:
+        v = np.concatenate((v, v + w))
+    return v
+
+
+def predict_inl_dnl(model):
+    """全コードの INL (2^bits 点) と DNL (2^bits - 1 点、DNL[c] は c → c+1) [LSB]"""
+    v = predict_voltages(model)
+    full = v.size - 1
+    lsb = (v[-1] - v[0]) / full
+    inl = (v - v[0]) / lsb - np.arange(v.size)
+    dnl = np.diff(v) / lsb - 1.0
+    return inl, dnl
+
+
+def _bits_of(codes, bits):
+    codes = np.asarray(codes, dtype=np.int64)
+    return ((codes[:, None] >> np.arange(bits)) & 1).astype(float)
+
+
+def _std(grad, cov):
+    """デルタ法の標準偏差 sqrt(g^T Σ g) (grad は shape (点数, bits))"""
+    return np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', grad, cov, grad), 0.0))
+
+
+def inl_std(model, codes):
+    """INL 予測値の標準偏差 [LSB]
+
+    INL(c) = full * (b(c)·w) / Σw - c の w に関する勾配は (full * b(c) - (INL + c)) / Σw
+    """
+    w = model['weights']
+    bits = model['bits']
+    full = (1 << bits) - 1
+    total = w.sum()
+    b = _bits_of(codes, bits)
+    inl = full * (b @ w) / total - np.asarray(codes, dtype=float)
+    grad = (full * b - (inl + np.asarray(codes, dtype=float))[:, None]) / total
+    return _std(grad, model['cov'])
+
+
+def dnl_std(model, codes):
+    """DNL 予測値 (c → c+1) の標準偏差 [LSB]
+
+    DNL(c) = full * (d·w) / Σw - 1 (d = b(c+1) - b(c)) の勾配は (full * d - (DNL + 1)) / Σw
+    """
+    w = model['weights']
+    bits = model['bits']
+    full = (1 << bits) - 1
+    total = w.sum()
+    codes = np.asarray(codes, dtype=np.int64)
+    d = _bits_of(codes + 1, bits) - _bits_of(codes, bits)
+    step = full * (d @ w) / total
+    grad = (full * d - step[:, None]) / total
+    return _std(grad, model['cov'])
+
+
+# ==================== 最悪コード ====================
+def _spread_worst(values, count, min_gap):
+    """|値| の大きい順に、既に選んだコードから min_gap 以上離れたコードを count 個選ぶ
+
+    隣接コードの INL はほぼ同じ値になるため、単純な上位 count 個では同じ場所に集中する。
+    """
+    mag = np.abs(values)
+    mag = np.where(np.isnan(mag), -1.0, mag)
+    picked = []
+    for _ in range(min(count, mag.size)):
+        i = int(np.argmax(mag))
+        if mag[i] < 0:
+            break
+        picked.append(i)
+        mag[max(0, i - min_gap):i + min_gap + 1] = -1.0
+    return np.array(picked, dtype=np.int64)
+
+
+def worst_cases(model, count=8, z=CONFIDENCE_Z, min_gap=None):
+    """予測 INL/DNL の最悪コードと信頼限界
+
+    Args:
+        count: INL・DNL それぞれの最悪コード数
+        z: 信頼限界の係数 (予測値 ± z * 標準偏差)
+        min_gap: 最悪コード同士の最小間隔 (None なら 2^(bits-1) / count)
+    Returns:
+        {"inl_max", "inl_min", "dnl_max", "dnl_min" (全コードの予測範囲),
+         "inl": [(code, 予測値, 限界幅), ...], "dnl": [(code, 予測値, 限界幅), ...]
+         (|予測値| の大きい順、DNL の code は c → c+1 の c), "sigma", "cond"}
+    """
+    inl, dnl = predict_inl_dnl(model)
+    if min_gap is None:
+        min_gap = max(1, (1 << (model['bits'] - 1)) // max(count, 1))
+    inl_codes = _spread_worst(inl, count, min_gap)
+    dnl_codes = _spread_worst(dnl, count, min_gap)
+    inl_bound = z * inl_std(model, inl_codes)
+    dnl_bound = z * dnl_std(model, dnl_codes)
+    return {
+        'inl_max': float(inl.max()),
+        'inl_min': float(inl.min()),
+        'dnl_max': float(dnl.max()),
+        'dnl_min': float(dnl.min()),
+        'inl': [(int(c), float(inl[c]), float(b)) for c, b in zip(inl_codes, inl_bound)],
+        'dnl': [(int(c), float(dnl[c]), float(b)) for c, b in zip(dnl_codes, dnl_bound)],
+        'sigma': model['sigma'],
+        'cond': model['cond'],
+    }
+
+
+def judge(report, criteria):
+    """予測値と信頼限界による判定
+
+    Args:
+        criteria: {"inl": 基準 LSB, "dnl": 基準 LSB} (LinearityTab.SHIP_CRITERIA)
+    Returns:
+        'OK' (限界を含めて基準内) / 'NG' (限界を含めても基準外) / '要検証' (限界が基準をまたぐ)
+    """
+    verdicts = []
+    for key in ('inl', 'dnl'):
+        limit = criteria[key]
+        worst = report[key]
+        lower = max((abs(v) - b for _, v, b in worst), default=0.0)
+        upper = max((abs(v) + b for _, v, b in worst), default=0.0)
+        verdicts.append('NG' if lower > limit else 'OK' if upper <= limit else '要検証')
+    if 'NG' in verdicts:
+        return 'NG'
+    return 'OK' if all(v == 'OK' for v in verdicts) else '要検証'
+
+
+def verification_codes(report, bits=None):
+    """最悪コードの検証スイープ用コード (昇順、重複なし)
+
+    INL 最悪コードと、DNL 最悪の遷移の両側 (c, c+1)。
+    """
+    codes = {c for c, _, _ in report['inl']}
+    for c, _, _ in report['dnl']:
+        codes.update((c, c + 1))
+    if bits is not None:
+        codes = {c for c in codes if 0 <= c < (1 << bits)}
+    return sorted(codes)
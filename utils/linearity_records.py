@@ -0,0 +1,326 @@
+"""Linearity の解析結果と XLSX・PNG 出力レコードの作成 (Tk 非依存)
+
+LinearityTab の計測後の処理 (判定・XLSX 出力レコード・グラフ PNG のデータ) を
+タブから独立させたもの。GUI と再解析 CLI (reanalyze.py) が同じ関数を使う。
+
+- lbc_random_record / linear_record: Random/Linear/File/Model の判定と XLSX レコード
+- ship_analysis / ship_record: 出荷Sequence の INL/DNL 判定と XLSX レコード
+- chart_payload / chart_png_path: linearity_charts.render_png に渡すデータとパス
+- avg_summary: DMM平均 (NRDGS n) の XLSX 記録用の文字列
+- template_path: テンプレート XLSX の検索 (PyInstaller 対応)
+
+thresholds は {"gain", "offset", "error"} (LinearityTab の NG判定閾値)。
+"""
+import os
+import sys
+
+import numpy as np
+
+from utils import linearity
+
+
+def template_path(key):
+    """テンプレート XLSX (template/linearity_{key}.xlsx) のパス (見つからなければ None)"""
+    filename = f'linearity_{key.lower()}.xlsx'
+
+    candidates = [
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'template', filename),
+    ]
+
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+        candidates.insert(0, os.path.join(base_path, 'template', filename))
+        exe_dir = os.path.dirname(sys.executable)
+        candidates.insert(0, os.path.join(exe_dir, 'template', filename))
+
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+
+    return None
+
+
+def mode_name(mode):
+    """ファイル名・シート表記用のモード名 (Linear → sequential)"""
+    raw_mode = mode.lower()
+    return 'sequential' if raw_mode == 'linear' else raw_mode
+
+
+def avg_summary(method_text, sdevs):
+    """DMM平均の記録 (XLSX 用): "STAT 16回 (σ中央値 1.23E-06 V)"
+
+    Args:
+        method_text: DMMAverager.describe() の文字列
+        sdevs: 各点の標準偏差 (V、不明な点は NaN)
+    """
+    sdevs = np.asarray(sdevs, dtype=float)
+    sdevs = sdevs[np.isfinite(sdevs)]
+    if not len(sdevs):
+        return method_text
+    return f"{method_text} (σ中央値 {float(np.median(sdevs)):.2E} V)"
+
+
+# ==================== Random / Linear / File ====================
+def lbc_random_record(x_vals, y_vals, pole, serial_no, bits, span, filepath, thresholds,
+                      mode, template, pattern_file=None, pattern_params=None,
+                      stream=None, values_only=False, dmm_avg=None):
+    """LBC Random/Linear/File: Gain/Offset/MaxErr を計算して XLSX 出力レコードを作成
+
+    出力先は LBCランダム用テンプレート (linearity_lbc_random.xlsx)。
+    Args:
+        mode: mode_name() のモード名
+        template: テンプレートのパス (None なら record は作らない)
+        dmm_avg: DMM平均の記録 (avg_summary() の文字列、平均なしは None)
+    Returns:
+        (record, calc_results) テンプレートがなければ record は None
+    """
+    offset_val = 2 ** (bits - 1)  # 32768
+    n = len(x_vals)
+
+    # Sort by signed DAC value (ascending) — 測定順を保持
+    order = list(range(1, n + 1))
+    data_sorted = sorted(
+        zip(x_vals, y_vals, order), key=lambda r: r[0])
+
+    # Gain/Offset: LSQ fit (Position と同じ計算方法)
+    # MaxErr: テンプレートG列 (endpoint fit, 符号付き)
+    res = linearity.lbc_linearity(
+        [d[0] for d in data_sorted], [d[1] for d in data_sorted], bits, span, pole)
+    gain_lsb, offset_lsb, max_err = res['gain'], res['offset'], res['max_error']
+
+    ng_flags = linearity.ng_flags(gain_lsb, offset_lsb, max_err, thresholds['gain'],
+                                  thresholds['offset'], thresholds['error'])
+
+    title = f"{serial_no} {pole} LBC リニアリティ({n}点{mode})"
+    calc_results = {
+        'gain': gain_lsb,
+        'offset': offset_lsb,
+        'max_error': max_err,
+        'ng': bool(ng_flags),
+        'judge': 'NG' if ng_flags else 'OK',
+        'ng_detail': ng_flags,
+        # グラフ描画用 (テンプレートの A列 / G列、タイトル)
+        'codes': [int(d[0]) - offset_val for d in data_sorted],
+        'errors': res['errors'].tolist(),
+        'title': title,
+    }
+
+    if not template:
+        return None, calc_results
+    record = {
+        'template_path': template,
+        'filepath': filepath,
+        'serial_no': serial_no,
+        'pole': pole,
+        'title': title,
+        'rows': [(int(u) - offset_val, float(v), o) for u, v, o in data_sorted],
+        'gain': gain_lsb,
+        'offset': offset_lsb,
+        'max_error': max_err,
+        'ng_detail': ng_flags,
+        'pattern_file': pattern_file,
+        'pattern_params': pattern_params,
+        'stream': stream,
+        'values_only': values_only,
+        'dmm_avg': dmm_avg,
+    }
+    return record, calc_results
+
+
+def linear_record(x_vals, y_vals, dac_name, pole, serial_no, bits, span, filepath, thresholds,
+                  mode, template, pattern_file=None, pattern_params=None, stream=None,
+                  dmm_avg=None):
+    """Random/Linear/File: Gain/Offset/誤差を計算して XLSX 出力レコードを作成 (DacTestBench5K準拠)
+
+    出力先は linearity_linear.xlsx。dmm_avg は lbc_random_record と同じ。
+    Returns:
+        (record, calc_results) テンプレートがなければ record は None
+    """
+    offset_val = 2 ** (bits - 1)
+
+    # Sort by signed DAC value (ascending), preserving original order
+    n = len(x_vals)
+    order = list(range(1, n + 1))
+    data_sorted = sorted(
+        zip(order, [int(x - offset_val) for x in x_vals], y_vals), key=lambda r: r[1])
+    signed_sorted = [d[1] for d in data_sorted]
+
+    # 最小二乗法 (signed値ベース) → GAIN (LSB/LSB), OFFSET (LSB), 各点の誤差 (LSB)
+    res = linearity.position_linearity(
+        signed_sorted, [d[2] for d in data_sorted], bits, span, pole)
+    gain_lsb, offset_lsb, max_err = res['gain'], res['offset'], res['max_error']
+    err_list = res['errors'].tolist()
+
+    # データ行
+    err_threshold = thresholds['error']
+    rows = [
+        (orig_order, s_val, theo_v, m_val, meas_dac, fit_val, err_lsb,
+         abs(err_lsb) > err_threshold)
+        for (orig_order, s_val, m_val), theo_v, meas_dac, fit_val, err_lsb in zip(
+            data_sorted, res['theo_v'].tolist(), res['meas_dac'].tolist(),
+            res['fit'].tolist(), err_list)]
+
+    # NG判定 (サマリー用)
+    ng_flags = linearity.ng_flags(gain_lsb, offset_lsb, max_err, thresholds['gain'],
+                                  thresholds['offset'], err_threshold)
+    gain_ng = 'Gain' in ng_flags
+    offset_ng = 'Offset' in ng_flags
+
+    title = f"{serial_no} {pole} {dac_name} ({n}点{mode})"
+    calc_results = {
+        'gain': gain_lsb,
+        'offset': offset_lsb,
+        'max_error': max_err,
+        'ng': bool(ng_flags),
+        'judge': 'NG' if ng_flags else 'OK',
+        'ng_detail': ng_flags,
+        # グラフ描画用 (テンプレートの B列 / G列、タイトル)
+        'codes': signed_sorted,
+        'errors': err_list,
+        'title': title,
+    }
+
+    if not template:
+        return None, calc_results
+    record = {
+        'template_path': template,
+        'filepath': filepath,
+        'serial_no': serial_no,
+        'pole': pole,
+        'bits': bits,
+        'mode': mode,
+        'title': title,
+        'rows': rows,
+        'offset_val': offset_val,
+        'gain': gain_lsb,
+        'offset': offset_lsb,
+        'gain_ng': gain_ng,
+        'offset_ng': offset_ng,
+        'pattern_file': pattern_file,
+        'pattern_params': pattern_params,
+        'stream': stream,
+        'dmm_avg': dmm_avg,
+    }
+    return record, calc_results
+
+
+# ==================== 出荷Sequence ====================
+def ship_analysis(x_vals, y_vals, bits, dac_name, criteria):
+    """出荷Sequence: INL/DNL (Excelマクロ準拠) と判定
+
+    Returns:
+        (x_sorted, y_sorted, summary) コード昇順に並べた計測値と
+        {"judge", "inl_worst", "dnl_worst", "inl_max", "inl_min", "dnl_max", "dnl_min",
+         "ship_results": {"inl": [...], "dnl": [... (DNL 対象外の点は None)]}}
+    """
+    # コード昇順にソート (降順パターンの場合に対応)
+    paired = sorted(zip(x_vals, y_vals))
+    x_sorted = [p[0] for p in paired]
+    y_sorted = [p[1] for p in paired]
+
+    res = linearity.ship_linearity(x_sorted, y_sorted, bits, dac_name)
+    judge, inl_worst, dnl_worst = linearity.ship_judge(res, criteria)
+    summary = {
+        'judge': judge,
+        'inl_worst': inl_worst,
+        'dnl_worst': dnl_worst,
+        'inl_max': res['inl_max'],
+        'inl_min': res['inl_min'],
+        'dnl_max': res['dnl_max'],
+        'dnl_min': res['dnl_min'],
+        # 出力パイプライン・グラフ用にリストで保持 (DNL 対象外の点は None)
+        'ship_results': {
+            'inl': res['inl'].tolist(),
+            'dnl': [None if d != d else float(d) for d in res['dnl'].tolist()],
+        },
+    }
+    return x_sorted, y_sorted, summary
+
+
+def _ship_reversed(bits, pole):
+    """テンプレートの行順がコード降順になる組み合わせ
+    (Position: -V先頭 → NEGのみ逆順、LBC: +V先頭 → POSのみ逆順)
+    """
+    return (bits == 20 and pole == 'NEG') or (bits < 20 and pole == 'POS')
+
+
+def ship_table_png_path(filepath, pole):
+    """出荷Sequence の表PNG のパス (NEG の _tmp は除去)"""
+    base = os.path.splitext(filepath)[0]
+    if base.endswith('_tmp'):
+        base = base[:-4]
+    return f"{base}_{pole}_table.png"
+
+
+def ship_record(measured_v, dac_name, pole, serial_no, bits, filepath, template,
+                table_png=None):
+    """出荷Sequence: テンプレート (linearity_{dac}.xlsx) への XLSX 出力レコードを作成
+
+    table_png を指定すると表PNG (A5～判定結果行) も同じジョブで描画する。
+    Returns:
+        record (テンプレートがなければ None)
+    """
+    if not template:
+        return None
+
+    # A-D列はテンプレートのまま、E列(測定電圧)のみ書き込み
+    # POS出力: コード昇順で電圧上昇(-V→+V)
+    # NEG出力: コード昇順で電圧下降(+V→-V) ※cii入力の補数関係
+    if _ship_reversed(bits, pole):
+        measured_v = list(reversed(measured_v))
+
+    return {
+        'template_path': template,
+        'filepath': filepath,
+        'serial_no': serial_no,
+        'pole': pole,
+        'dac_name': dac_name,
+        'measured_v': [float(v) for v in measured_v],
+        'table_png': table_png,
+    }
+
+
+# ==================== グラフ PNG ====================
+def chart_png_path(xlsx_path, pole):
+    """XLSX パスから グラフPNG のパスを生成 (NEG の _tmp は除去)"""
+    base = os.path.splitext(xlsx_path)[0]
+    if base.endswith('_tmp'):
+        base = base[:-4]
+    return f"{base}_{pole}_chart.png"
+
+
+def chart_payload(kind, data):
+    """Agg 描画 (linearity_charts.render_png) に渡すデータ (pickle 可能な dict)
+
+    Args:
+        kind: 'ship' / 'linear'
+        data: 極ごとの結果 (ship: "ship_results", "bits", "pole", "serial_no", "dac_name"、
+              linear: "results" (calc_results), "dac_name")
+    Returns:
+        dict (グラフ用のデータがなければ None)
+    """
+    if kind == 'ship':
+        res = data['ship_results']
+        inl, dnl = list(res['inl']), list(res['dnl'])
+        # テンプレートの行順に合わせる (ship_record の E列と同じ並び)
+        bits, pole = data['bits'], data['pole']
+        if _ship_reversed(bits, pole):
+            inl.reverse()
+            dnl.reverse()
+        return {
+            'title': (f"{data['serial_no']} {pole} {data['dac_name']} "
+                      f"直線性({len(inl)}点シーケンシャル測定)"),
+            'dac_name': data['dac_name'],
+            'inl': inl,
+            'dnl': dnl,
+        }
+    res = data.get('results') or {}
+    if 'codes' not in res:
+        return None
+    return {
+        'title': res.get('title', ''),
+        'dac_name': data['dac_name'],
+        'codes': res['codes'],
+        'errors': res['errors'],
+        'ng': res.get('ng', False),
+    }
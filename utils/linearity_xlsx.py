@@ -0,0 +1,401 @@
+"""Linearity 計測結果の XLSX 出力 (テンプレート書き込み)
+
+LinearityTab の計測スレッドで計算した結果 (pickle 可能な dict) を受け取り、
+template/linearity_*.xlsx に書き込んで保存する。Tk・計測器には依存しないため
+出力パイプライン (utils.export_pipeline) のプロセスプールで実行できる。
+
+- write_lbc_random: LBC Random/Linear/File (linearity_lbc_random.xlsx)
+- write_linear: Position Random/Linear/File (linearity_linear.xlsx)
+- write_ship: 出荷Sequence (linearity_position.xlsx / linearity_lbc.xlsx)、表PNG も描画
+
+テンプレートは utils.template_cache でプロセスごとに1回だけ読み込み、メモリから複製する。
+チャート XML の書き換え (シート名・データ範囲・タイトル) は保存時のシリアライズと同じパスで行い、
+一時ファイル (.part) に1回だけ書いてから置換する (途中で失敗しても壊れた XLSX を残さない)。
+点数が多い場合 (STREAM_THRESHOLD 以上、または record["stream"]) はデータ行を
+utils.xlsx_stream で XML に直接書き出す (メモリ・時間が点数に比例)。
+LBC Random は record["values_only"] で行ごとの参照式の代わりに計算済みの値を書ける。
+各関数は {"xlsx": 保存パス, "warnings": [...]} を返す。
+"""
+import re
+
+from openpyxl.styles import Font
+
+from . import template_cache, xlsx_stream
+
+RED_FONT_COLOR = "FF0000"
+RED_FONT = Font(color=RED_FONT_COLOR)   # NG 表示 (全セルで共有)
+
+# この点数以上はデータ行を openpyxl のセルではなく XML で直接出力 (utils.xlsx_stream)
+STREAM_THRESHOLD = 2000
+
+
+# ==================== 共通 ====================
+def _is_chart_part(name):
+    return name.startswith('xl/charts/chart')
+
+
+def _use_stream(record):
+    """データ行をストリーミング出力するか (record["stream"] が None なら点数で判定)"""
+    stream = record.get('stream')
+    if stream is None:
+        return len(record['rows']) >= STREAM_THRESHOLD
+    return bool(stream)
+
+
+def update_chart_refs(ws, old_name, new_name):
+    """チャート内のシート参照を更新"""
+    old_unquoted = f"{old_name}!"
+    old_quoted = f"'{old_name}'!"
+    new_ref = f"'{new_name}'!"
+
+    for chart in ws._charts:
+        for child in chart._charts:
+            for series in child.series:
+                if (hasattr(series.val, 'numRef') and series.val.numRef
+                        and series.val.numRef.f):
+                    f = series.val.numRef.f
+                    f = f.replace(old_quoted, new_ref)
+                    f = f.replace(old_unquoted, new_ref)
+                    series.val.numRef.f = f
+                if (hasattr(series, 'title')
+                        and hasattr(series.title, 'strRef')
+                        and series.title.strRef
+                        and series.title.strRef.f):
+                    f = series.title.strRef.f
+                    f = f.replace(old_quoted, new_ref)
+                    f = f.replace(old_unquoted, new_ref)
+                    series.title.strRef.f = f
+
+
+# ==================== LBC Random/Linear/File ====================
+LBC_FIRST_ROW = 4
+LBC_COLUMNS = {'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7, 'I': 9}
+
+
+def _lbc_random_cells(rows, lsb=None):
+    """LBC Random のデータ行 (行番号, [(列記号, 値), ...]) を順に返す
+
+    lsb が None なら B,C,E,F,G 列はテンプレートと同じ参照式。
+    lsb (テンプレート C1 = B1/2^19) を渡すと式と同じ計算をした値を書く (values-only)。
+    """
+    first = LBC_FIRST_ROW
+    if lsb is None:
+        for i, (signed, measured, orig_order) in enumerate(rows):
+            r = first + i
+            yield r, [('A', signed), ('B', f'=A{r}+2^15'), ('C', f'=DEC2HEX(B{r},4)'),
+                      ('D', measured), ('E', f'=D$1*B{r}+D$4'), ('F', f'=(D{r}-E{r})/C$1'),
+                      ('G', f'=F{r}-F$1'), ('I', orig_order)]
+        return
+
+    # D1 = (D4-Dn)/(B4-Bn), E = D1*B+D4, F = (D-E)/C1, G = F-F1 (F1 = F の平均)
+    unsigned = [signed + 2 ** 15 for signed, _, _ in rows]
+    d_first, d_last = rows[0][1], rows[-1][1]
+    b_span = unsigned[0] - unsigned[-1]
+    slope = (d_first - d_last) / b_span if b_span else 0.0
+    ideal = [slope * u + d_first for u in unsigned]
+    inl = [(m - e) / lsb for (_, m, _), e in zip(rows, ideal)]
+    inl_avg = sum(inl) / len(inl)
+    for i, (signed, measured, orig_order) in enumerate(rows):
+        yield first + i, [('A', signed), ('B', unsigned[i]), ('C', format(unsigned[i], '04X')),
+                          ('D', measured), ('E', ideal[i]), ('F', inl[i]),
+                          ('G', inl[i] - inl_avg), ('I', orig_order)]
+
+
+def write_lbc_random(record):
+    """LBC Random/Linear/File 計測結果を LBCランダム用テンプレートに保存
+
+    A列(設定DAC値), D列(測定電圧), I列(測定順) を上書きし、
+    B,C,E,F,G列の参照式は行数に合わせて拡張 (values_only なら計算済みの値)。
+    同一シート内の埋め込みグラフの範囲・タイトルも更新 (チャートシートは削除)。
+
+    Args:
+        record: {"template_path", "filepath", "serial_no", "pole", "title",
+                 "rows": [(signed, measured, 測定順), ...] (signed 昇順),
+                 "gain", "offset", "max_error", "ng_detail", "pattern_file", "pattern_params",
+                 "stream" (省略時は点数で自動), "values_only" (省略時 False),
+                 "dmm_avg" (DMM平均の記録、省略可)}
+    """
+    filepath = record['filepath']
+    rows = record['rows']
+    n = len(rows)
+    title = record['title']
+    stream = _use_stream(record)
+    warnings = []
+
+    wb = template_cache.load_workbook(record['template_path'])
+    ws = wb['計算データ']
+    old_sheet_name = ws.title
+    sheet_name = f"{record['serial_no']}{record['pole'][0]}"[:31]
+    ws.title = sheet_name
+
+    # チャートシートを削除（埋め込みグラフのみ使用）
+    for cs in list(wb.chartsheets):
+        wb.remove(cs)
+
+    # テンプレートの書式を保存 (Row 4 = 最初のデータ行)
+    col_formats = {}
+    for c in LBC_COLUMNS.values():
+        col_formats[c] = ws.cell(row=LBC_FIRST_ROW, column=c).number_format
+
+    # 旧データクリア (Row 4 以降)
+    for r in range(LBC_FIRST_ROW, ws.max_row + 1):
+        for c in LBC_COLUMNS.values():  # A-G, I
+            ws.cell(row=r, column=c).value = None
+
+    last_row = LBC_FIRST_ROW - 1 + n
+
+    # Row 1 パラメータ式を更新 (行範囲)
+    ws['D1'] = f'=(D4-D{last_row})/(B4-B{last_row})'
+    ws['E1'] = '=D4-D1*B4'
+    ws['F1'] = f'=AVERAGE(F4:F{last_row})'
+
+    # values-only: テンプレート C1 (=B1/2^19) と同じ LSB 値で INL を計算
+    lsb = None
+    if record.get('values_only'):
+        b1 = ws['B1'].value
+        if isinstance(b1, (int, float)) and b1:
+            lsb = b1 / 2 ** 19
+        else:
+            warnings.append("テンプレート B1 が数値でないため参照式で出力しました")
+
+    # データ行 (Row 4+): ストリーミング時は見本の1行のみ (残りは保存時に XML で出力)
+    for i, (r, cells) in enumerate(_lbc_random_cells(rows, lsb)):
+        if stream and i > 0:
+            break
+        for col, value in cells:
+            cell = ws.cell(row=r, column=LBC_COLUMNS[col], value=value)
+            cell.number_format = col_formats[LBC_COLUMNS[col]]   # テンプレート書式を適用
+
+    # Fileモード: パターンファイル情報を記録
+    if record.get('pattern_file'):
+        ws['N1'] = 'パターンファイル'
+        ws['N2'] = record['pattern_file']
+    # Randomモード: 再生成用のシード・生成パラメータを記録
+    if record.get('pattern_params'):
+        ws['O1'] = 'パターン生成'
+        ws['O2'] = record['pattern_params']
+    # DMM平均 (NRDGS n 点の平均値を測定電圧として記録)
+    if record.get('dmm_avg'):
+        ws['P1'] = 'DMM平均'
+        ws['P2'] = record['dmm_avg']
+
+    # J-L列: Gain/Offset/MaxErr 書き込み
+    ng_flags = record['ng_detail']
+    ws['K1'] = record['gain']
+    ws['K1'].number_format = '0.000000'
+    ws['K2'] = record['offset']
+    ws['K2'].number_format = '0.000'
+    ws['K3'] = record['max_error']
+    ws['K3'].number_format = '0.000'
+    for flag, row in (('Gain', 1), ('Offset', 2), ('Error', 3)):
+        if flag in ng_flags:
+            ws[f'L{row}'] = 'NG'
+            for col in 'JKL':
+                ws[f'{col}{row}'].font = RED_FONT
+
+    # 埋め込みチャートXML更新 (シート名・データ範囲・タイトル)
+    def rewrite(content):
+        content = content.replace(old_sheet_name, sheet_name)
+        content = re.sub(r'([$][A-I][$]4:[$][A-I][$])\d+',
+                         rf'\g<1>{last_row}', content)
+        content = re.sub(r'(<a:t>)[^<]*(</a:t>)',
+                         rf'\g<1>{title}\g<2>', content, count=1)
+        return re.sub(r'<c:numCache>.*?</c:numCache>', '', content, flags=re.DOTALL)
+
+    rewrites = [(_is_chart_part, rewrite)]
+    if stream:
+        def rewrite_sheet(content):
+            styles = xlsx_stream.row_styles(content, LBC_FIRST_ROW)
+            return xlsx_stream.replace_rows(
+                content, LBC_FIRST_ROW, last_row,
+                ((r, cells, styles) for r, cells in _lbc_random_cells(rows, lsb)))
+        part = xlsx_stream.sheet_part(wb, ws)
+        rewrites.append((lambda name: name == part, rewrite_sheet))
+
+    warnings += template_cache.save_workbook(wb, filepath, rewrites)
+    return {'xlsx': filepath, 'warnings': warnings}
+
+
+# ==================== Position Random/Linear/File ====================
+LINEAR_FIRST_ROW = 7
+
+
+def _linear_cells(rows, offset_val, hex_digits):
+    """Position のデータ行 (行番号, [(列記号, 値), ...], NG) を順に返す"""
+    for i, (orig_order, s_val, theo_v, m_val, meas_dac, fit_val, err_lsb, ng) in enumerate(rows):
+        # H: オフセットバイナリ値, I: HEX
+        unsigned_val = s_val + offset_val
+        cells = [('A', orig_order), ('B', s_val), ('C', theo_v), ('D', m_val),
+                 ('E', meas_dac), ('F', fit_val), ('G', err_lsb), ('H', unsigned_val),
+                 ('I', format(unsigned_val, f'0{hex_digits}X'))]
+        if ng:
+            cells.append(('J', "NG"))
+        yield LINEAR_FIRST_ROW + i, cells, ng
+
+
+def write_linear(record):
+    """Random/Linear/File 計測結果をテンプレートに保存 (DacTestBench5K準拠)
+
+    グラフシートはテンプレートの書式をそのまま保持。
+    シート名を "{serial}{P/N}" に変更し、チャート参照も更新。
+
+    Args:
+        record: {"template_path", "filepath", "serial_no", "pole", "bits", "mode", "title",
+                 "rows": [(測定順, signed, 理論電圧, 測定電圧, 測定DAC, FIT, 誤差LSB, NG), ...],
+                 "offset_val", "gain", "offset", "gain_ng", "offset_ng", "pattern_file", "pattern_params",
+                 "stream" (省略時は点数で自動), "dmm_avg" (DMM平均の記録、省略可)}
+    """
+    filepath = record['filepath']
+    rows = record['rows']
+    n = len(rows)
+    title = record['title']
+    serial_no, pole = record['serial_no'], record['pole']
+    stream = _use_stream(record)
+
+    wb = template_cache.load_workbook(record['template_path'])
+    ws = wb['計算データ']
+    old_sheet_name = ws.title
+    sheet_name = f"{serial_no}{pole[0]}"[:31]
+    ws.title = sheet_name
+
+    # チャートシートのタブ名も変更
+    chart_tab_name = f"{serial_no}{pole[0]}_chart"[:31]
+    for cs in wb.chartsheets:
+        cs.title = chart_tab_name
+
+    # テンプレートの書式を保存 (Row 7 = 最初のデータ行)
+    col_formats = {}
+    for c in range(1, 9):
+        col_formats[c] = ws.cell(row=LINEAR_FIRST_ROW, column=c).number_format
+
+    hex_digits = record['bits'] // 4  # Position=20bit→5桁, LBC=16bit→4桁
+    offset_val = record['offset_val']
+
+    # 旧データクリア (Row 7+)
+    for r in range(LINEAR_FIRST_ROW, ws.max_row + 1):
+        for c in range(1, 10):
+            ws.cell(row=r, column=c).value = None
+
+    # ヘッダー
+    ws['A1'] = title
+    ws['B2'] = record['mode']
+    ws['B3'] = record['gain']
+    ws['B4'] = record['offset']
+    ws['C3'] = None
+    ws['C4'] = None
+
+    # Fileモード: パターンファイル情報を記録
+    if record.get('pattern_file'):
+        ws['A5'] = 'パターンファイル'
+        ws['B5'] = record['pattern_file']
+    # Randomモード: 再生成用のシード・生成パラメータを記録
+    if record.get('pattern_params'):
+        ws['D5'] = 'パターン生成'
+        ws['E5'] = record['pattern_params']
+    # DMM平均 (NRDGS n 点の平均値を測定電圧として記録)
+    if record.get('dmm_avg'):
+        ws['G5'] = 'DMM平均'
+        ws['H5'] = record['dmm_avg']
+
+    # GAIN / OFFSET NG判定
+    if record['gain_ng']:
+        ws['C3'] = "NG"
+        for cell in ['A3', 'B3', 'C3']:
+            ws[cell].font = RED_FONT
+    if record['offset_ng']:
+        ws['C4'] = "NG"
+        for cell in ['A4', 'B4', 'C4']:
+            ws[cell].font = RED_FONT
+
+    # データ行 (Row 7+): ストリーミング時は見本として OK 行・NG 行の最初の1行ずつのみ
+    # (残りは保存時に XML で出力)
+    sample_rows = {}   # {NG: 行番号}
+    for r, cells, ng in _linear_cells(rows, offset_val, hex_digits):
+        if stream:
+            if ng in sample_rows:
+                continue
+            sample_rows[ng] = r
+        for c, (_, value) in enumerate(cells, 1):
+            cell = ws.cell(row=r, column=c, value=value)
+            if c in col_formats:
+                cell.number_format = col_formats[c]   # テンプレート書式を適用
+            if ng:
+                cell.font = RED_FONT
+        if ng:
+            for c in range(len(cells) + 1, 11):
+                ws.cell(row=r, column=c).font = RED_FONT
+        if stream and len(sample_rows) == 2:
+            break
+
+    # チャートXML更新: シート名参照 + データ範囲 + タイトル + キャッシュ削除
+    last_row = LINEAR_FIRST_ROW - 1 + n
+
+    def rewrite(content):
+        content = content.replace(old_sheet_name, sheet_name)
+        content = re.sub(r'([$][A-G][$]7:[$][A-G][$])\d+',
+                         rf'\g<1>{last_row}', content)
+        content = re.sub(r'(<a:t>)[^<]*(</a:t>)',
+                         rf'\g<1>{title}\g<2>', content, count=1)
+        return re.sub(r'<numCache>.*?</numCache>', '', content, flags=re.DOTALL)
+
+    rewrites = {'xl/charts/chart1.xml': rewrite}
+    if stream:
+        def rewrite_sheet(content):
+            styles = {ng: xlsx_stream.row_styles(content, r) for ng, r in sample_rows.items()}
+            return xlsx_stream.replace_rows(
+                content, LINEAR_FIRST_ROW, last_row,
+                ((r, cells, styles[ng])
+                 for r, cells, ng in _linear_cells(rows, offset_val, hex_digits)))
+        rewrites[xlsx_stream.sheet_part(wb, ws)] = rewrite_sheet
+
+    warnings = template_cache.save_workbook(wb, filepath, rewrites)
+    return {'xlsx': filepath, 'warnings': warnings}
+
+
+# ==================== 出荷Sequence ====================
+def write_ship(record):
+    """出荷試験結果をテンプレートに書き込み保存 (E列=測定電圧のみ、A-D列はテンプレートのまま)
+
+    Args:
+        record: {"template_path", "filepath", "serial_no", "pole", "dac_name",
+                 "measured_v": [...] (テンプレートの行順),
+                 "table_png": 表PNGの保存パス (None なら描画しない)}
+    Returns:
+        {"xlsx", "table_png" (描画した場合), "warnings"}
+    """
+    filepath = record['filepath']
+    serial_no, pole, dac_name = record['serial_no'], record['pole'], record['dac_name']
+    measured_v = record['measured_v']
+    n_pts = len(measured_v)
+
+    wb = template_cache.load_workbook(record['template_path'])
+    ws = wb.active
+
+    # シート名変更 + チャート参照更新
+    old_name = ws.title
+    new_name = f"{serial_no}{pole[0]}"[:31]
+    ws.title = new_name
+    update_chart_refs(ws, old_name, new_name)
+
+    for i in range(n_pts):
+        ws.cell(row=7 + i, column=5, value=measured_v[i])
+
+    # チャートタイトル変更
+    chart = ws._charts[0]
+    runs = chart.title.tx.rich.paragraphs[0].r
+    runs[0].t = f"{serial_no} {pole} {dac_name} "
+    runs[2].t = f"({n_pts}"
+
+    warnings = template_cache.save_workbook(wb, filepath)
+    result = {'xlsx': filepath, 'table_png': None, 'warnings': warnings}
+
+    # 表PNG (A5～判定結果行) は保存したワークシートからそのまま描画
+    if record.get('table_png'):
+        try:
+            from . import sheet_raster
+            judge_row = 7 + n_pts - 1 + 4
+            result['table_png'] = sheet_raster.render_range_png(
+                ws, record['table_png'], f"A5:H{judge_row}")
+        except Exception as e:
+            warnings.append(f"表PNG描画エラー: {e}")
+    return result
@@ -0,0 +1,246 @@
+"""容量固定のログバッファと、フレーム単位でまとめて描画するログコンソール
+
+- LogBuffer: スレッドセーフなリングバッファ (古い行から破棄)。
+  任意でローテーションファイルへミラー出力 (書き込みはバックグラウンドスレッド)
+- LogConsole: LogBuffer を表示する ScrolledText。約30fpsで新着分を1回の
+  insert にまとめて描画し、max_lines を超えた古い行を削除する。レベル絞り込み可
+
+ワーカースレッドからは LogBuffer.append() を呼ぶだけでよく、
+Tk ウィジェットへの操作はすべて UI バスの定期処理 (メインスレッド) で行う。
+
+使用例:
+    self._log = LogBuffer(capacity=5000, name="linearity")
+    self._log.append("計測開始", "INFO")          # どのスレッドからでも可
+    LogConsole(frame, buffer=self._log, height=20).pack(fill=tk.BOTH, expand=True)
+"""
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import deque
+from tkinter import ttk
+from tkinter.scrolledtext import ScrolledText
+
+from . import settings_store, ui_bus
+
+LEVELS = ("INFO", "SUCCESS", "WARNING", "ERROR")
+LEVEL_COLORS = {
+    "INFO": "black",
+    "SUCCESS": "green",
+    "WARNING": "orange",
+    "ERROR": "red",
+}
+
+DEFAULT_CAPACITY = 5000
+FRAME_MS = 33  # 描画間隔 (約30fps)
+
+# ファイルミラーの既定値 (app_settings.json の "log_file" で上書き)
+DEFAULT_LOG_DIR = "logs"
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+
+def _load_file_mirror_config():
+    """app_settings.json の log_file 設定を読み込み"""
+    return settings_store.app_settings().section('log_file')
+
+
+class LogBuffer:
+    """容量固定・スレッドセーフなログ行バッファ"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, name=None):
+        """
+        Args:
+            capacity: 保持する最大行数 (超えると古い行から破棄)
+            name: ファイルミラー名。app_settings.json の log_file.enabled が
+                  True のとき logs/<name>.log へローテーション出力する
+        """
+        self._lines = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._seq = 0          # 追加済み行の通し番号
+        self._generation = 0   # clear() ごとに加算 (表示側の再描画判定用)
+        self._listener = None
+        self._file_logger = None
+        if name:
+            config = _load_file_mirror_config()
+            if config.get('enabled', False):
+                path = os.path.join(config.get('dir', DEFAULT_LOG_DIR), f"{name}.log")
+                self.attach_file(path,
+                                 config.get('max_bytes', DEFAULT_MAX_BYTES),
+                                 config.get('backup_count', DEFAULT_BACKUP_COUNT))
+
+    @property
+    def capacity(self):
+        return self._lines.maxlen
+
+    def append(self, text, level="INFO"):
+        """1行追加 (どのスレッドからでも呼べる)"""
+        with self._lock:
+            self._seq += 1
+            self._lines.append((self._seq, text, level))
+        if self._file_logger is not None:
+            self._file_logger.info(f"[{level}] {text}")
+
+    def clear(self):
+        """全行を破棄"""
+        with self._lock:
+            self._lines.clear()
+            self._generation += 1
+
+    def lines(self, levels=None):
+        """保持中の (text, level) を古い順に返す (levels 指定時は絞り込み)"""
+        return self.snapshot(levels)[2]
+
+    def snapshot(self, levels=None):
+        """(最新 seq, generation, 保持中の [(text, level), ...]) を一括取得"""
+        with self._lock:
+            seq, generation, items = self._seq, self._generation, list(self._lines)
+        return seq, generation, [(t, lv) for _, t, lv in items if levels is None or lv in levels]
+
+    def since(self, seq, limit=None):
+        """seq より後に追加された行を返す
+
+        Returns:
+            (最新 seq, generation, [(text, level), ...])
+            limit 指定時は新しい方から最大 limit 行
+        """
+        with self._lock:
+            new_count = min(self._seq - seq, len(self._lines))
+            if limit is not None:
+                new_count = min(new_count, limit)
+            items = list(itertools.islice(reversed(self._lines), max(new_count, 0)))
+            return self._seq, self._generation, [(t, lv) for _, t, lv in reversed(items)]
+
+    def state(self):
+        with self._lock:
+            return self._seq, self._generation
+
+    # ---------- ファイルミラー ----------
+    def attach_file(self, path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        """ローテーションファイルへのミラー出力を開始 (書き込みは別スレッド)"""
+        self.detach_file()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        except Exception as e:
+            return False, f"ログファイルを開けません: {e}"
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        log_queue = queue.Queue(-1)
+        logger = logging.getLogger(f"ontoku.log_console.{id(self)}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+        self._listener = logging.handlers.QueueListener(log_queue, handler)
+        self._listener.start()
+        self._file_logger = logger
+        return True, f"ログファイル出力: {path}"
+
+    def detach_file(self):
+        """ファイルミラーを停止 (未書き込み分はフラッシュ)"""
+        logger, listener = self._file_logger, self._listener
+        self._file_logger = None
+        self._listener = None
+        if listener is not None:
+            listener.stop()
+            for h in listener.handlers:
+                h.close()
+        if logger is not None:
+            logger.handlers[:] = []
+
+
+class LogConsole(ttk.Frame):
+    """LogBuffer をフレーム単位でまとめて描画するログ表示ウィジェット"""
+
+    def __init__(self, parent, buffer=None, capacity=DEFAULT_CAPACITY, max_lines=None,
+                 height=10, width=None, font=("Courier", 9), wrap=tk.WORD,
+                 show_filter=False):
+        """
+        Args:
+            buffer: 表示する LogBuffer (None なら capacity で新規作成)
+            max_lines: テキストに残す最大行数 (既定はバッファ容量)
+            font: None なら Tk の既定フォント
+            show_filter: True でレベル絞り込みチェックボックスを表示
+        """
+        super().__init__(parent)
+        self.buffer = buffer if buffer is not None else LogBuffer(capacity)
+        self.max_lines = max_lines or self.buffer.capacity
+        self._seq = 0
+        self._generation = None
+
+        self.level_vars = {lv: tk.BooleanVar(value=True) for lv in LEVELS}
+        if show_filter:
+            bar = ttk.Frame(self)
+            bar.pack(fill=tk.X)
+            ttk.Label(bar, text="表示:").pack(side=tk.LEFT)
+            for lv in LEVELS:
+                ttk.Checkbutton(bar, text=lv, variable=self.level_vars[lv],
+                                command=self.refresh).pack(side=tk.LEFT, padx=2)
+
+        options = dict(height=height, wrap=wrap, state=tk.DISABLED)
+        if font:
+            options['font'] = font
+        if width:
+            options['width'] = width
+        self.text = ScrolledText(self, **options)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        for lv, color in LEVEL_COLORS.items():
+            self.text.tag_config(lv, foreground=color)
+
+        # 描画は UI バスの定期処理で行う (ウィジェット破棄時に自動停止)
+        self._frame = ui_bus.get_bus(self).every(self, FRAME_MS, self._flush, delay_ms=0)
+
+    # ---------- 公開API ----------
+    def log(self, text, level="INFO"):
+        """バッファに1行追加 (描画は次フレーム)"""
+        self.buffer.append(text, level)
+
+    def clear(self):
+        """バッファと表示をクリア"""
+        self.buffer.clear()
+        self._flush()
+
+    def refresh(self):
+        """絞り込み条件を反映してバッファ全体を再描画"""
+        self._generation = None
+        self._flush()
+
+    # ---------- 描画 ----------
+    def _visible_levels(self):
+        return {lv for lv, var in self.level_vars.items() if var.get()}
+
+    def _flush(self):
+        seq, generation = self.buffer.state()
+        if generation == self._generation and seq == self._seq:
+            return
+
+        levels = self._visible_levels()
+        rebuild = generation != self._generation
+        if rebuild:
+            seq, generation, lines = self.buffer.snapshot(levels)
+            lines = lines[-self.max_lines:]
+        else:
+            # 1フレームで描画するのは最大 max_lines 行 (それ以前は削除対象のため省略)
+            seq, generation, lines = self.buffer.since(self._seq, limit=self.max_lines)
+            lines = [(t, lv) for t, lv in lines if lv in levels]
+        self._seq, self._generation = seq, generation
+
+        at_bottom = self.text.yview()[1] >= 0.999
+        self.text.config(state=tk.NORMAL)
+        if rebuild:
+            self.text.delete("1.0", tk.END)
+        if lines:
+            args = []
+            for t, lv in lines:
+                args.extend((t + "\n", lv))
+            self.text.insert(tk.END, *args)
+            # 上限超過分を先頭から削除 (各行が改行で終わるため行数は end-2c の行番号)
+            total = int(self.text.index("end-2c").split(".")[0])
+            if total > self.max_lines:
+                self.text.delete("1.0", f"{total - self.max_lines + 1}.0")
+        self.text.config(state=tk.DISABLED)
+        if at_bottom or rebuild:
+            self.text.see(tk.END)
@@ -1,11 +1,12 @@
 import tkinter as tk
-from tkinter import scrolledtext
 from datetime import datetime
 
+from .log_console import LogConsole
+
 class LoggerWidget:
     """ログ表示ウィジェット"""
     
-    def __init__(self, parent, height=10):
+    def __init__(self, parent, height=10, capacity=2000):
         """
         初期化
         
@@ -15,6 +16,8 @@ class LoggerWidget:
             親フレーム
         height : int
             テキストエリアの高さ
+        capacity : int
+            保持する最大行数（超えると古い行から削除）
         """
         self.frame = tk.Frame(parent)
         self.frame.pack(fill=tk.BOTH, expand=True)
@@ -30,21 +33,11 @@ class LoggerWidget:
         tk.Button(button_frame, text="コピー", 
                   command=self.copy_to_clipboard).pack(side=tk.LEFT, padx=5)
         
-        # スクロール付きテキストエリア
-        self.text_area = scrolledtext.ScrolledText(
-            self.frame,
-            height=height,
-            wrap=tk.WORD,
-            state=tk.DISABLED,
-            font=("Courier", 9)
-        )
-        self.text_area.pack(fill=tk.BOTH, expand=True)
-        
-        # タグの設定（色分け用）
-        self.text_area.tag_config("INFO", foreground="black")
-        self.text_area.tag_config("SUCCESS", foreground="green")
-        self.text_area.tag_config("ERROR", foreground="red")
-        self.text_area.tag_config("WARNING", foreground="orange")
+        # 容量固定のログコンソール（フレーム単位でまとめて描画）
+        self.console = LogConsole(self.frame, capacity=capacity, height=height,
+                                  font=("Courier", 9), show_filter=True)
+        self.console.pack(fill=tk.BOTH, expand=True)
+        self.text_area = self.console.text
     
     def log(self, message, level="INFO"):
         """
@@ -58,18 +51,11 @@ class LoggerWidget:
             ログレベル（INFO, SUCCESS, ERROR, WARNING）
         """
         timestamp = datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] [{level}] {message}\n"
-        
-        self.text_area.config(state=tk.NORMAL)
-        self.text_area.insert(tk.END, log_message, level)
-        self.text_area.see(tk.END)  # 最新行にスクロール
-        self.text_area.config(state=tk.DISABLED)
+        self.console.log(f"[{timestamp}] [{level}] {message}", level)
     
     def clear(self):
         """ログをクリア"""
-        self.text_area.config(state=tk.NORMAL)
-        self.text_area.delete(1.0, tk.END)
-        self.text_area.config(state=tk.DISABLED)
+        self.console.clear()
     
     def select_all(self):
         """全テキストを選択"""
@@ -0,0 +1,314 @@
+"""ベンチ監視用のローカルメトリクス (Prometheus テキスト形式)
+
+計測エンジン (計測ウィンドウ・Linearity・DC特性・DMM) と機器ドライバから
+カウンタ/ゲージ/ヒストグラムを更新し、標準ライブラリ http.server で
+http://127.0.0.1:<port>/metrics として公開する。
+
+- 記録は常時有効 (ロック付きの加算のみで軽量)、HTTP 公開は任意
+- バインド先は 127.0.0.1 固定 (外部公開しない)
+- TestTab のパターン番号などは scrape 時にコールバックで取得
+
+使用例:
+    from utils import metrics
+    metrics.observe_cycle(measured_sec, estimated_sec)
+    metrics.record_reading("measurement_window")
+    metrics.start_server(9108)
+"""
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 9108
+
+# バケット上限 [s]
+CYCLE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 300)
+OP_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UI_FRAME_BUCKETS = (0.001, 0.002, 0.004, 0.008, 0.016, 0.033, 0.05, 0.1, 0.25, 1)
+
+# readings/s を算出する移動窓 [s]
+READING_RATE_WINDOW = 60.0
+
+_lock = threading.Lock()
+_metrics = {}        # name -> _Metric (登録順を保持)
+_callbacks = {}      # name -> (help, fn) scrape 時に評価するゲージ
+_reading_times = deque(maxlen=100000)
+_server = None
+_server_thread = None
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in items)
+    return "{" + body + "}"
+
+
+def _format_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    """ラベル付きメトリクスの共通部"""
+    kind = ""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with _lock:
+            self.values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with _lock:
+            h = self.values.get(key)
+            if h is None:
+                h = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    h["counts"][i] += 1
+            h["sum"] += value
+            h["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, h in self.values.items():
+            for bound, cnt in zip(self.buckets, h["counts"]):
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', bound))} {cnt}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {h['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(h['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {h['count']}")
+        return lines
+
+
+def _register(metric):
+    _metrics[metric.name] = metric
+    return metric
+
+
+# ==================== メトリクス定義 ====================
+CYCLE_SECONDS = _register(Histogram(
+    "ontoku_cycle_duration_seconds", "計測ウィンドウ1周の実測時間", CYCLE_BUCKETS))
+CYCLE_MEASURED = _register(Gauge(
+    "ontoku_cycle_measured_seconds", "直近1周の実測時間"))
+CYCLE_ESTIMATED = _register(Gauge(
+    "ontoku_cycle_estimated_seconds", "直近1周の目安時間"))
+INSTRUMENT_OP_SECONDS = _register(Histogram(
+    "ontoku_instrument_op_seconds", "機器操作のレイテンシ", OP_BUCKETS))
+INSTRUMENT_ERRORS = _register(Counter(
+    "ontoku_instrument_errors_total", "機器操作のエラー回数"))
+CSV_QUEUE_DEPTH = _register(Gauge(
+    "ontoku_csv_write_queue_depth", "書き込み待ちの CSV 周回データ数"))
+CSV_BYTES = _register(Counter(
+    "ontoku_csv_bytes_written_total", "CSV に書き込んだバイト数"))
+READINGS = _register(Counter(
+    "ontoku_readings_total", "DMM 計測値の取得数"))
+UI_FRAME_SECONDS = _register(Histogram(
+    "ontoku_ui_frame_seconds", "UI バス1フレームの処理時間 (処理ありのフレームのみ)",
+    UI_FRAME_BUCKETS))
+UI_FRAME_OVERRUNS = _register(Counter(
+    "ontoku_ui_frame_overruns_total", "UI バスのフレーム予算超過回数"))
+UI_COALESCED = _register(Counter(
+    "ontoku_ui_coalesced_total", "最新値保持により破棄された UI 状態更新数"))
+STARTUP_SECONDS = _register(Gauge(
+    "ontoku_startup_first_paint_seconds", "起動から初回表示までの時間"))
+EXPORT_QUEUE_DEPTH = _register(Gauge(
+    "ontoku_export_queue_depth", "出力パイプラインの未完了ジョブ数"))
+EXPORT_JOBS = _register(Counter(
+    "ontoku_export_jobs_total", "出力パイプラインの完了ジョブ数 (状態別)"))
+EXPORT_JOB_SECONDS = _register(Histogram(
+    "ontoku_export_job_seconds", "出力ジョブの実行時間", OP_BUCKETS))
+
+
+# ==================== 記録 API ====================
+def observe_cycle(measured_sec, estimated_sec):
+    """計測1周の実測/目安時間を記録"""
+    CYCLE_SECONDS.observe(measured_sec)
+    CYCLE_MEASURED.set(measured_sec)
+    CYCLE_ESTIMATED.set(estimated_sec)
+
+
+def record_reading(source):
+    """DMM 計測値 1 件の取得を記録 (source: 計測元)"""
+    READINGS.inc(source=source)
+    _reading_times.append(time.monotonic())
+
+
+def readings_per_second(window=READING_RATE_WINDOW):
+    """直近 window 秒間の平均 readings/s"""
+    now = time.monotonic()
+    times = list(_reading_times)
+    recent = [t for t in times if now - t <= window]
+    if len(recent) < 2:
+        return 0.0
+    span = now - recent[0]
+    return len(recent) / span if span > 0 else 0.0
+
+
+class _OpTimer:
+    """機器操作 1 回のレイテンシ/エラーを記録する with ブロック"""
+    __slots__ = ("instrument", "op", "start", "failed")
+
+    def __init__(self, instrument, op):
+        self.instrument = instrument
+        self.op = op
+        self.failed = False
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        INSTRUMENT_OP_SECONDS.observe(time.perf_counter() - self.start,
+                                      instrument=self.instrument, op=self.op)
+        if self.failed or exc_type is not None:
+            INSTRUMENT_ERRORS.inc(instrument=self.instrument, op=self.op)
+        return False
+
+    def fail(self):
+        """例外を送出せずに失敗した操作をエラーとして数える"""
+        self.failed = True
+
+
+def op_timer(instrument, op):
+    """機器操作のレイテンシ計測 (with 文で使用)"""
+    return _OpTimer(instrument or "unknown", op)
+
+
+def register_gauge_callback(name, help_text, fn):
+    """scrape 時に fn() を評価して出力するゲージを登録 (None なら出力しない)"""
+    with _lock:
+        _callbacks[name] = (help_text, fn)
+
+
+def unregister_gauge_callback(name):
+    with _lock:
+        _callbacks.pop(name, None)
+
+
+# ==================== 出力 ====================
+def render():
+    """全メトリクスを Prometheus テキスト形式で返す"""
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.extend(metric.render())
+        callbacks = list(_callbacks.items())
+
+    lines.append("# HELP ontoku_readings_per_second 直近60秒の平均 readings/s")
+    lines.append("# TYPE ontoku_readings_per_second gauge")
+    lines.append(f"ontoku_readings_per_second {readings_per_second():.6g}")
+
+    for name, (help_text, fn) in callbacks:
+        try:
+            value = fn()
+        except Exception:
+            value = None
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # アクセスログは出力しない (scrape ごとに stderr が埋まるため)
+        pass
+
+
+def start_server(port=DEFAULT_PORT):
+    """127.0.0.1:port でメトリクス HTTP サーバーを起動
+
+    Returns:
+        (成功フラグ, メッセージ)
+    """
+    global _server, _server_thread
+    if _server is not None:
+        return True, f"メトリクス公開中: http://127.0.0.1:{_server.server_address[1]}/metrics"
+    try:
+        _server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+    except Exception as e:
+        _server = None
+        return False, f"メトリクスサーバー起動失敗: {e}"
+    _server.daemon_threads = True
+    _server_thread = threading.Thread(
+        target=_server.serve_forever, name="metrics-http", daemon=True)
+    _server_thread.start()
+    return True, f"メトリクス公開開始: http://127.0.0.1:{_server.server_address[1]}/metrics"
+
+
+def stop_server():
+    """メトリクス HTTP サーバーを停止"""
+    global _server, _server_thread
+    if _server is None:
+        return
+    _server.shutdown()
+    _server.server_close()
+    _server = None
+    _server_thread = None
+
+
+def is_serving():
+    return _server is not None
@@ -0,0 +1,280 @@
+"""DMM 計測値のノイズ解析 (Allan 偏差・Welch PSD を逐次計算, Tk 非依存)
+
+DAC の安定度評価用。計測値が届くたびに更新し、計測中に白色雑音と長期ドリフトを見分ける。
+結果は LSBGraphPlotter と同じ 1LSB 電圧 (graph_plotter.lsb_voltage) で LSB 換算する。
+
+- AllanDeviation: オクターブ間隔 τ の重複 Allan 偏差 (累積和の 2 階差分)
+  level 0 は τ = 1, 2, 4, …, SPAN (×τ0) を完全重複で計算し、それより長い τ = SPAN·2^ℓ は
+  累積和を 2^ℓ おきに間引いた系列 (level ℓ) で計算する (重複の間隔 2^ℓ)。
+  各 level が保持するのは直近の累積和 2·SPAN 点と二乗和だけなので、メモリは τ の数
+  (≒ log2 N) に比例する。
+- WelchPSD: Hann 窓・50% 重複のセグメントごとに |FFT|² を積算 (保持は NFFT 点)
+- NoiseAnalyzer: 両方をまとめて更新し (スレッドセーフ)、LSB 換算の結果を返す
+
+Allan 偏差の傾き (log-log) の目安:
+    -1/2 白色雑音 / 0 フリッカー / +1/2 ランダムウォーク / +1 ドリフト
+
+使用例:
+    analyzer = NoiseAnalyzer(lsb_voltage_from_settings())
+    analyzer.update(times, values)          # どのスレッドからでも可 (times は秒)
+    res = analyzer.result()                 # {"tau", "adev", "freqs", "asd", ...}
+"""
+import threading
+
+import numpy as np
+
+SPAN = 64       # level 0 の最大 m (2 のべき乗)。level ℓ の τ = SPAN·2^ℓ
+NFFT = 1024     # Welch のセグメント長
+
+NOISE_TYPES = (
+    (-0.25, "白色雑音"),
+    (0.25, "フリッカー"),
+    (0.75, "ランダムウォーク"),
+    (float('inf'), "ドリフト"),
+)
+
+
+def lsb_voltage_from_settings():
+    """グラフ設定 (graph_settings.json) の bit精度・±Full 電圧から 1LSB 電圧 (V)"""
+    from utils import settings_store
+    from utils.graph_plotter import lsb_voltage
+
+    settings = settings_store.graph_settings().data()
+    try:
+        return lsb_voltage(int(settings.get('bit_precision', '24')),
+                           float(settings.get('pos_full_voltage', '10.0')),
+                           float(settings.get('neg_full_voltage', '-10.0')))
+    except (TypeError, ValueError):
+        return lsb_voltage(24, 10.0, -10.0)
+
+
+def classify(slope):
+    """Allan 偏差の log-log 傾きから雑音の種類"""
+    for limit, name in NOISE_TYPES:
+        if slope < limit:
+            return name
+    return NOISE_TYPES[-1][1]
+
+
+# ==================== Allan 偏差 ====================
+class _AllanLevel:
+    """累積和を stride おきに間引いた系列で重複 Allan 分散の二乗和を積算"""
+
+    def __init__(self, stride, ms, cap):
+        self.stride = stride
+        self.ms = ms
+        self.cap = cap                  # 保持する累積和の点数 (= 2·max(ms))
+        self.n = 0                      # 受け取った累積和の点数
+        self.hist = np.empty(0)
+        self.sums = dict.fromkeys(ms, 0.0)
+        self.counts = dict.fromkeys(ms, 0)
+        self.child = None
+
+    def update(self, xs):
+        if len(xs) == 0:
+            return
+        n_before = self.n
+        full = np.concatenate((self.hist, xs))
+        size = len(full)
+        held = len(self.hist)
+        for m in self.ms:
+            if size <= 2 * m:
+                continue
+            # 新しく末尾が揃った項だけ: x[j+2m] - 2x[j+m] + x[j]
+            first = max(0, held - 2 * m)
+            dd = full[first + 2 * m:] - 2.0 * full[first + m:size - m] + full[first:size - 2 * m]
+            self.sums[m] += float(np.dot(dd, dd))
+            self.counts[m] += len(dd)
+        self.n += len(xs)
+        self.hist = full[-self.cap:].copy()
+
+        # 子 level (stride 2 倍) へは偶数番目の累積和を渡す
+        if self.child is None:
+            if n_before < self.cap <= self.n:
+                # 保持中に全点が残っているうちに作成 (最初から偶数番目を渡す)
+                self.child = _AllanLevel(self.stride * 2, (self.ms[-1],), self.cap)
+                self.child.update(full[0::2])
+        else:
+            offset = n_before % 2               # 新しい部分で最初の偶数番目 (通し番号)
+            self.child.update(full[held + offset::2])
+
+    def levels(self):
+        level = self
+        while level is not None:
+            yield level
+            level = level.child
+
+
+class AllanDeviation:
+    """オクターブ間隔 τ の重複 Allan 偏差 (逐次更新)"""
+
+    def __init__(self, span=SPAN):
+        self.span = span
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self._offset = None     # 最初の値 (累積和の桁落ちを防ぐため差し引く)
+        self._x = 0.0           # 直近の累積和
+        ms = tuple(2 ** k for k in range(int(np.log2(self.span)) + 1))
+        self._root = _AllanLevel(1, ms, 2 * self.span)
+        self._root.update(np.zeros(1))     # x_0 = 0
+
+    def update(self, values):
+        v = np.asarray(values, dtype=np.float64)
+        if len(v) == 0:
+            return
+        if self._offset is None:
+            self._offset = float(v[0])
+        xs = self._x + np.cumsum(v - self._offset)
+        self._x = float(xs[-1])
+        self.count += len(v)
+        self._root.update(xs)
+
+    def result(self):
+        """(m, adev, n_terms) のリスト (m は τ0 の倍数、adev は入力と同じ単位)"""
+        rows = []
+        for level in self._root.levels():
+            for m in level.ms:
+                count = level.counts[m]
+                if count == 0:
+                    continue
+                m_raw = m * level.stride
+                avar = level.sums[m] / (2.0 * m_raw * m_raw * count)
+                rows.append((m_raw, float(np.sqrt(max(avar, 0.0))), count))
+        return rows
+
+
+# ==================== Welch PSD ====================
+class WelchPSD:
+    """Hann 窓・50% 重複の Welch 法 PSD (セグメントごとに平均を除去、逐次積算)"""
+
+    def __init__(self, nfft=NFFT):
+        self.nfft = int(nfft)
+        self.step = self.nfft // 2
+        n = np.arange(self.nfft)
+        self.window = 0.5 - 0.5 * np.cos(2.0 * np.pi * n / self.nfft)
+        self._scale = float(np.dot(self.window, self.window))
+        self.reset()
+
+    def reset(self):
+        self._tail = np.empty(0)
+        self._sum = np.zeros(self.nfft // 2 + 1)
+        self.segments = 0
+
+    def update(self, values):
+        data = np.concatenate((self._tail, np.asarray(values, dtype=np.float64)))
+        if len(data) < self.nfft:
+            self._tail = data
+            return
+        k = (len(data) - self.nfft) // self.step + 1
+        segs = np.lib.stride_tricks.sliding_window_view(data, self.nfft)[::self.step][:k]
+        segs = segs - segs.mean(axis=1, keepdims=True)
+        spec = np.fft.rfft(segs * self.window, axis=1)
+        self._sum += (spec.real ** 2 + spec.imag ** 2).sum(axis=0)
+        self.segments += k
+        self._tail = data[k * self.step:].copy()
+
+    def psd(self, fs):
+        """(freqs, psd) 片側 PSD (入力の単位²/Hz)。セグメントがなければ空配列"""
+        if self.segments == 0 or fs <= 0:
+            return np.empty(0), np.empty(0)
+        psd = self._sum / (self.segments * fs * self._scale)
+        psd[1:-1] *= 2.0
+        return np.fft.rfftfreq(self.nfft, 1.0 / fs), psd
+
+
+# ==================== まとめ ====================
+class NoiseAnalyzer:
+    """Allan 偏差と Welch PSD を同時に逐次更新し、LSB 換算の結果を返す
+
+    Args:
+        lsb_voltage: 1LSB 電圧 (V)
+        span / nfft: AllanDeviation / WelchPSD のパラメータ
+    """
+
+    def __init__(self, lsb_voltage, span=SPAN, nfft=NFFT):
+        self.lsb_voltage = lsb_voltage
+        self.adev = AllanDeviation(span)
+        self.welch = WelchPSD(nfft)
+        self._lock = threading.Lock()
+        self.count = 0
+        self._t_first = None
+        self._t_last = None
+
+    def reset(self):
+        with self._lock:
+            self.adev.reset()
+            self.welch.reset()
+            self.count = 0
+            self._t_first = None
+            self._t_last = None
+
+    def update(self, times, values):
+        """計測値 (V) と時刻 (秒) を追加"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        with self._lock:
+            if self._t_first is None:
+                self._t_first = float(times[0])
+            self._t_last = float(times[-1])
+            self.count += len(values)
+            self.adev.update(values)
+            self.welch.update(values)
+
+    def sample_interval(self):
+        """平均の計測間隔 τ0 (秒)"""
+        if self.count < 2 or self._t_last <= self._t_first:
+            return 0.0
+        return (self._t_last - self._t_first) / (self.count - 1)
+
+    def result(self):
+        """LSB 換算の解析結果
+
+        Returns:
+            {"count", "tau0", "tau" (s), "adev" (LSB), "adev_err" (LSB, 1σ の目安),
+             "slopes" (隣り合う τ 間の傾き), "noise" (各傾きの雑音の種類),
+             "adev_min": (τ, LSB) / None, "freqs" (Hz), "psd" (LSB²/Hz), "asd" (LSB/√Hz)}
+        """
+        with self._lock:
+            tau0 = self.sample_interval()
+            rows = self.adev.result()
+            freqs, psd = self.welch.psd(1.0 / tau0 if tau0 > 0 else 0.0)
+            count = self.count
+
+        lsb = self.lsb_voltage
+        m = np.array([r[0] for r in rows], dtype=np.float64)
+        adev = np.array([r[1] for r in rows], dtype=np.float64) / lsb
+        # 独立な項数 ≒ N / m として 1/√n を誤差の目安にする
+        n_indep = np.maximum(1.0, count / np.maximum(m, 1.0))
+        adev_err = adev / np.sqrt(n_indep)
+        tau = m * tau0
+
+        slopes = []
+        valid = adev > 0
+        for i in range(1, len(tau)):
+            if valid[i] and valid[i - 1]:
+                slopes.append(float(np.log(adev[i] / adev[i - 1]) / np.log(m[i] / m[i - 1])))
+            else:
+                slopes.append(float('nan'))
+
+        adev_min = None
+        if valid.any():
+            i = int(np.argmin(np.where(valid, adev, np.inf)))
+            adev_min = (float(tau[i]), float(adev[i]))
+
+        psd = psd / (lsb * lsb)
+        return {
+            'count': count,
+            'tau0': tau0,
+            'tau': tau,
+            'adev': adev,
+            'adev_err': adev_err,
+            'slopes': slopes,
+            'noise': [classify(s) if s == s else "" for s in slopes],
+            'adev_min': adev_min,
+            'freqs': freqs,
+            'psd': psd,
+            'asd': np.sqrt(psd),
+        }
@@ -0,0 +1,189 @@
+"""Linearity Random モードのパターン生成 (シード付き・層別サンプリング)
+
+コード空間 [0, 2^bits) を計測点数と同じ数の区間 (層) に分けて各層から1点ずつ選ぶため、
+一様乱数より少ない点数で全域を均等にカバーする。シードと生成パラメータを記録しておけば
+同じパターンを再生成できる (XLSX には describe() の文字列を書き込む)。
+
+method:
+    stratified  コード空間を点数で等分した各区間から1点 (既定)
+    lhs         上位ビット・下位ビットの2次元ラテン超方格 (各次元で層別し、組み合わせを乱数で決める。
+                下位ビットのパターンも偏らない)
+    uniform     一様乱数 (従来の random.randint と同じ分布)
+force:
+    boundary    ビット境界 (2^k - 1, 2^k) と 0・フルスケール
+    carry       上位 carry_bits ビットの主要キャリー (m * 2^(bits-carry_bits) の前後)
+
+計測順は VBA マクロ準拠の Random と同じく未ソート (shuffle=False なら昇順)。
+
+使用例:
+    from utils import pattern_gen
+    codes, params = pattern_gen.generate(20, 1024, force=('boundary', 'carry'))
+    pattern_gen.describe(params)       # "method=stratified seed=... points=1024 bits=20 force=boundary+carry"
+    codes2, _ = pattern_gen.generate(**pattern_gen.parse(pattern_gen.describe(params)))
+    pattern_gen.coverage(codes, 20)
+"""
+import secrets
+
+import numpy as np
+
+METHODS = ('stratified', 'lhs', 'uniform')
+FORCE_OPTIONS = ('boundary', 'carry')
+
+
+# ==================== 強制コード ====================
+def boundary_codes(bits):
+    """ビット境界のコード (0, 2^k - 1, 2^k, ..., フルスケール)"""
+    codes = {0, (1 << bits) - 1}
+    for k in range(1, bits):
+        codes.update(((1 << k) - 1, 1 << k))
+    return sorted(codes)
+
+
+def carry_codes(bits, carry_bits=3):
+    """上位 carry_bits ビットの主要キャリーの前後 (m * 2^(bits-carry_bits) - 1, m * 2^(bits-carry_bits))"""
+    step = 1 << (bits - carry_bits)
+    codes = set()
+    for m in range(1, 1 << carry_bits):
+        codes.update((m * step - 1, m * step))
+    return sorted(codes)
+
+
+def forced_codes(bits, force=(), carry_bits=3):
+    """force で指定した強制コード (昇順、重複なし)"""
+    codes = set()
+    for name in force:
+        if name == 'boundary':
+            codes.update(boundary_codes(bits))
+        elif name == 'carry':
+            codes.update(carry_codes(bits, carry_bits))
+        else:
+            raise ValueError(f"不明な強制コード指定: {name}")
+    return sorted(codes)
+
+
+# ==================== サンプリング ====================
+def _stratified(rng, size, count, strata=None, occupied=()):
+    """[0, size) を strata 個の区間に等分し、occupied (既に点のある位置) を含まない区間から
+    count 個を選んで各区間から1点 (区間が空なら重複を許す)
+
+    strata は既定で count。強制コードがある場合は strata = 全点数として、
+    強制コードのない区間だけに乱数の点を割り当てる。
+    """
+    strata = strata or count
+    edges = (np.arange(strata + 1, dtype=np.int64) * size) // strata
+    free = np.setdiff1d(np.arange(strata),
+                        (np.asarray(occupied, dtype=np.int64) * strata) // size)
+    if free.size > count:
+        free = np.sort(rng.choice(free, count, replace=False))
+    elif free.size < count:   # 強制コードのない区間が足りない場合は全区間から補う
+        free = np.sort(np.concatenate((free, rng.choice(strata, count - free.size))))
+    lo = edges[free]
+    width = np.maximum(edges[free + 1] - lo, 1)
+    return lo + (rng.random(count) * width).astype(np.int64)
+
+
+def _sample(rng, method, bits, count, fixed):
+    size = 1 << bits
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+    strata = count + fixed.size
+    if method == 'stratified':
+        return _stratified(rng, size, count, strata, fixed)
+    if method == 'lhs':
+        lo_bits = bits // 2
+        hi = _stratified(rng, 1 << (bits - lo_bits), count, strata, fixed >> lo_bits)
+        lo = rng.permutation(_stratified(rng, 1 << lo_bits, count, strata,
+                                         fixed & ((1 << lo_bits) - 1)))
+        return (hi << lo_bits) | lo
+    if method == 'uniform':
+        return rng.integers(0, size, count, dtype=np.int64)
+    raise ValueError(f"不明な生成方式: {method}")
+
+
+def generate(bits, points, method='stratified', seed=None, force=(), carry_bits=3,
+             shuffle=True):
+    """パターンを生成
+
+    Args:
+        points: 計測点数 (強制コードを含む)
+        seed: 乱数シード (None なら新しく決めて params に記録)
+        force: 強制的に含めるコード ('boundary', 'carry')
+    Returns:
+        (codes: unsigned コードのリスト, params: generate() にそのまま渡せる生成パラメータ)
+    Raises:
+        ValueError: 点数が強制コード数より少ない、不明な method/force
+    """
+    if method not in METHODS:
+        raise ValueError(f"不明な生成方式: {method}")
+    if seed is None:
+        seed = secrets.randbelow(2 ** 31)
+    force = tuple(force)
+    params = {'bits': bits, 'points': points, 'method': method, 'seed': int(seed),
+              'force': force, 'carry_bits': carry_bits, 'shuffle': shuffle}
+
+    rng = np.random.default_rng(int(seed))
+    fixed = np.array(forced_codes(bits, force, carry_bits), dtype=np.int64)
+    if fixed.size > points:
+        raise ValueError(f"計測点数 {points} が強制コード数 {fixed.size} より少ない")
+    codes = np.concatenate((fixed, _sample(rng, method, bits, points - fixed.size, fixed)))
+    codes = rng.permutation(codes) if shuffle else np.sort(codes)
+    return codes.tolist(), params
+
+
+# ==================== 記録・再生成 ====================
+def describe(params):
+    """XLSX 記録用の1行表記 (parse() で generate() の引数に戻せる)"""
+    text = (f"method={params['method']} seed={params['seed']} points={params['points']} "
+            f"bits={params['bits']} force={'+'.join(params['force']) or '-'}")
+    if 'carry' in params['force']:
+        text += f" carry_bits={params['carry_bits']}"
+    if not params.get('shuffle', True):
+        text += " shuffle=0"
+    return text
+
+
+def parse(text):
+    """describe() の文字列を generate() のキーワード引数に変換"""
+    fields = dict(item.split('=', 1) for item in text.split())
+    kwargs = {
+        'bits': int(fields['bits']),
+        'points': int(fields['points']),
+        'method': fields['method'],
+        'seed': int(fields['seed']),
+        'force': tuple(f for f in fields.get('force', '-').split('+') if f and f != '-'),
+        'shuffle': fields.get('shuffle', '1') != '0',
+    }
+    if 'carry_bits' in fields:
+        kwargs['carry_bits'] = int(fields['carry_bits'])
+    return kwargs
+
+
+# ==================== カバレッジ ====================
+def coverage(codes, bits, bins=None):
+    """コード空間のカバレッジ統計
+
+    Args:
+        bins: 充足率を数える区間数 (None なら点数)
+    Returns:
+        {"points", "unique", "bins", "bin_fill" (点のある区間の割合),
+         "max_gap" (隣り合うコードの最大間隔 LSB、両端 0/フルスケールまで含む),
+         "gap_ratio" (最大間隔 / 理想間隔), "bit_on_min", "bit_on_max" (各ビットが 1 の割合の範囲)}
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    size = 1 << bits
+    unique = np.unique(codes)
+    bins = bins or max(codes.size, 1)
+    filled = np.unique((unique * bins) // size).size
+    edges = np.concatenate(([0], unique, [size - 1]))
+    max_gap = int(np.max(np.diff(edges))) if edges.size > 1 else 0
+    on = ((codes[:, None] >> np.arange(bits)) & 1).mean(axis=0) if codes.size else np.zeros(bits)
+    return {
+        'points': int(codes.size),
+        'unique': int(unique.size),
+        'bins': int(bins),
+        'bin_fill': filled / bins,
+        'max_gap': max_gap,
+        'gap_ratio': max_gap / (size / max(codes.size, 1)),
+        'bit_on_min': float(on.min()),
+        'bit_on_max': float(on.max()),
+    }
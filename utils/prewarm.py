@@ -0,0 +1,82 @@
+"""起動後のバックグラウンド事前インポート
+
+起動時は matplotlib / openpyxl / numpy / win32com などの重いモジュールを読み込まず、
+初回表示後にバックグラウンドスレッドで順番にインポートしておく。
+タブを初めて開いたときの待ち時間を短くするためのもので、失敗しても無視する
+(未インストールのモジュールは初回使用時に通常どおりエラーになる)。
+
+- app_settings.json の "startup": {"prewarm": false} で無効化
+- 各モジュールの読み込み時間は timings() / tracer の import.prewarm で確認
+
+使用例:
+    from utils import prewarm
+    self.after_idle(prewarm.start)
+"""
+import importlib
+import sys
+import threading
+import time
+
+from . import settings_store, tracer
+
+# 読み込み順 (先に読んだものは後続の読み込みで再利用される)
+DEFAULT_MODULES = (
+    "numpy",
+    "openpyxl",
+    "matplotlib",
+    "matplotlib.pyplot",
+    "matplotlib.backends.backend_tkagg",
+    "pyvisa",
+    "win32com.client",
+)
+
+_thread = None
+_timings = {}   # モジュール名 -> 読み込み時間 [s] (None は読み込み失敗)
+
+
+def enabled():
+    """app_settings.json の startup.prewarm (既定 True)"""
+    return bool(settings_store.app_settings().section('startup').get('prewarm', True))
+
+
+def _run(modules):
+    for name in modules:
+        if name in sys.modules:
+            continue
+        start = time.perf_counter()
+        try:
+            with tracer.span("import.prewarm", "startup", module=name):
+                if name == "matplotlib.pyplot":
+                    # pyplot より先にバックエンドを確定 (graph_helper / graph_plotter と同じ)
+                    import matplotlib
+                    matplotlib.use('TkAgg')
+                importlib.import_module(name)
+            _timings[name] = time.perf_counter() - start
+        except Exception:
+            _timings[name] = None
+
+
+def start(modules=DEFAULT_MODULES, force=False):
+    """事前インポートをバックグラウンドで開始 (2回目以降・無効時は何もしない)
+
+    Returns:
+        開始した場合 True
+    """
+    global _thread
+    if _thread is not None or not (force or enabled()):
+        return False
+    _thread = threading.Thread(target=_run, args=(tuple(modules),),
+                               name="import-prewarm", daemon=True)
+    _thread.start()
+    return True
+
+
+def wait(timeout=None):
+    """事前インポートの完了を待つ (未開始なら即座に戻る)"""
+    if _thread is not None:
+        _thread.join(timeout)
+
+
+def timings():
+    """{モジュール名: 読み込み時間 [s] または None} のコピー"""
+    return dict(_timings)
@@ -0,0 +1,195 @@
+"""計測生データのサイドカーファイル (.npz) と再解析用ローダー
+
+Linearity・DC特性の計測ごとに、整形済みの XLSX とは別に生データを NumPy の .npz で保存する。
+閾値の変更や別のフィットで再解析するときに XLSX を openpyxl で読み直さずに済む
+(8k 点でも読み込み・再計算は数 ms)。
+
+ファイルの中身:
+    __meta__    メタデータ JSON (UTF-8 バイト列の uint8 配列。pickle は使わない)
+    その他      生データの配列 (Linearity: codes, volts, times, pattern。DMM平均時は sdev, nsamp も)
+
+メタデータ (共通): format, kind ("linearity" / "dc_char" / "dmm_stream" / "glitch"), software_version, saved
+    Linearity: serial_no, def_name, dac, bits, span, pole, mode, pattern_params, pattern_file,
+               pattern_hash, dmm ({"function", "range", "nplc"}), settle_time, switch_delay,
+               thresholds ({"gain", "offset", "error"}), criteria (出荷Sequence の基準)
+    DC特性:    sheet_key, serial_nos, dmm, settle_time, switch_delay
+    DMM連続測定 (kind "dmm_stream", 配列 times / values): dmm, stream_mode, stats
+    グリッチ波形 (kind "glitch", 配列 times_<n> / volts_<n>): cfg, lsb, direction, polarity,
+               steps ([{"label", "transitions", "summary"}])
+
+使用例:
+    from utils import raw_sidecar
+    raw_sidecar.save(path, meta, {'codes': codes, 'volts': volts, 'times': times})
+    meta, arrays = raw_sidecar.load(path)
+    results = raw_sidecar.linearity_results(meta, arrays, th_error=1.0)
+    slots_data = raw_sidecar.dc_char_slots(meta, arrays)   # DCCharTab の export_tables に渡せる
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from utils import linearity
+
+FORMAT = 1
+META_KEY = '__meta__'
+SUFFIX = '.npz'
+
+
+def _software_version():
+    try:
+        from version import __version__
+        return __version__
+    except ImportError:
+        return None
+
+
+def save(path, meta, arrays):
+    """サイドカーを保存 (一時ファイルに書いてから置換)
+
+    Args:
+        meta: JSON に変換できる dict (format・software_version・saved は自動で追加)
+        arrays: {名前: 配列}
+    Returns:
+        path
+    """
+    meta = {'format': FORMAT, 'software_version': _software_version(),
+            'saved': time.strftime('%Y-%m-%d %H:%M:%S'), **meta}
+    payload = {name: np.asarray(value) for name, value in arrays.items()}
+    payload[META_KEY] = np.frombuffer(
+        json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+    part = path + '.part'
+    try:
+        with open(part, 'wb') as f:
+            np.savez_compressed(f, **payload)
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return path
+
+
+def load(path):
+    """サイドカーを読み込む
+
+    Returns:
+        (meta, arrays) arrays は {名前: np.ndarray}
+    Raises:
+        ValueError: メタデータがない (サイドカーではない)
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if META_KEY not in data.files:
+            raise ValueError(f"サイドカーファイルではありません: {path}")
+        meta = json.loads(data[META_KEY].tobytes().decode('utf-8'))
+        arrays = {name: data[name] for name in data.files if name != META_KEY}
+    return meta, arrays
+
+
+def load_meta(path):
+    """メタデータだけを読み込む (配列は展開しない)
+
+    Raises:
+        ValueError: メタデータがない (サイドカーではない)
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if META_KEY not in data.files:
+            raise ValueError(f"サイドカーファイルではありません: {path}")
+        return json.loads(data[META_KEY].tobytes().decode('utf-8'))
+
+
+# ==================== レコード列 (DC特性) ====================
+def records_to_arrays(records, prefix):
+    """dict のリストを列ごとの配列に変換 ({prefix + フィールド名: 配列})
+
+    数値の列は float (None は NaN)、それ以外は文字列 (None は空文字列) で保存する。
+    """
+    fields = []
+    for record in records:
+        fields += [k for k in record if k not in fields]
+    arrays = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool))
+               for v in values):
+            arrays[prefix + field] = np.array(
+                [np.nan if v is None else float(v) for v in values], dtype=float)
+        else:
+            arrays[prefix + field] = np.array(['' if v is None else str(v) for v in values])
+    return arrays
+
+
+def arrays_to_records(arrays, prefix):
+    """records_to_arrays() の逆変換 (NaN・空文字列は None)"""
+    columns = {name[len(prefix):]: value for name, value in arrays.items()
+               if name.startswith(prefix)}
+    if not columns:
+        return []
+    n = len(next(iter(columns.values())))
+    records = [{} for _ in range(n)]
+    for field, values in columns.items():
+        numeric = values.dtype.kind == 'f'
+        for record, v in zip(records, values.tolist()):
+            if numeric:
+                record[field] = None if v != v else v
+            else:
+                record[field] = v or None
+    return records
+
+
+def dc_char_arrays(slots_data):
+    """DC特性の slots_data [(serial_no, display_data), ...] を配列に変換"""
+    arrays = {}
+    for i, (_, rows) in enumerate(slots_data):
+        arrays.update(records_to_arrays(rows, f"slot{i}/"))
+    return arrays
+
+
+def dc_char_slots(meta, arrays):
+    """DC特性のサイドカーから slots_data を再構成"""
+    return [(sn, arrays_to_records(arrays, f"slot{i}/"))
+            for i, sn in enumerate(meta['serial_nos'])]
+
+
+# ==================== Linearity 再解析 ====================
+def linearity_results(meta, arrays, th_gain=None, th_offset=None, th_error=None, criteria=None):
+    """Linearity のサイドカーから判定結果を再計算 (LinearityTab と同じ計算・判定)
+
+    閾値・基準を省略した場合は計測時の値 (meta の thresholds / criteria) を使う。
+    Returns:
+        出荷Sequence: {"judge", "inl_worst", "dnl_worst", "inl_max", "inl_min",
+                       "dnl_max", "dnl_min", "points"}
+        その他:       {"judge", "ng_detail", "gain", "offset", "max_error", "points"}
+    """
+    bits, pole = meta['bits'], meta['pole']
+    order = np.argsort(arrays['codes'], kind='stable')
+    codes = np.asarray(arrays['codes'])[order]
+    volts = np.asarray(arrays['volts'], dtype=float)[order]
+
+    if meta['mode'] == 'Ship':
+        res = linearity.ship_linearity(codes, volts, bits, meta['dac'])
+        judge, inl_worst, dnl_worst = linearity.ship_judge(res, criteria or meta['criteria'])
+        return {
+            'judge': judge, 'inl_worst': inl_worst, 'dnl_worst': dnl_worst,
+            'inl_max': res['inl_max'], 'inl_min': res['inl_min'],
+            'dnl_max': res['dnl_max'], 'dnl_min': res['dnl_min'],
+            'points': int(codes.size),
+        }
+
+    if meta['dac'] == 'LBC':
+        res = linearity.lbc_linearity(codes, volts, bits, meta['span'], pole)
+    else:
+        res = linearity.position_linearity(
+            codes - 2 ** (bits - 1), volts, bits, meta['span'], pole)
+    th = meta.get('thresholds', {})
+    flags = linearity.ng_flags(
+        res['gain'], res['offset'], res['max_error'],
+        th['gain'] if th_gain is None else th_gain,
+        th['offset'] if th_offset is None else th_offset,
+        th['error'] if th_error is None else th_error)
+    return {
+        'judge': 'NG' if flags else 'OK', 'ng_detail': flags,
+        'gain': res['gain'], 'offset': res['offset'], 'max_error': res['max_error'],
+        'points': int(codes.size),
+    }
@@ -0,0 +1,143 @@
+"""Linearity 計測のチェックポイント (途中再開用のジャーナルファイル)
+
+計測した点 (パターン上の番号, コード, 電圧, 時刻) を1点ごとにジャーナルファイルへ追記し、
+一定の点数・時間ごとに fsync する。GPIB の異常・アプリの異常終了・停止で極の途中まで
+しか計測できなかった場合も、次回の開始時に同じ条件 (シリアル・DAC・極・パターン) の
+ジャーナルから続きを計測できる。極の計測が完了したらジャーナルは削除する。
+
+ファイル形式:
+    先頭行   MAGIC (b"ONTJ1\\n")
+    2行目    メタデータ JSON (1行)
+    以降     1点 24 バイトの固定長レコード (RECORD: 番号 uint32, コード int32,
+             電圧 float64, UNIX 時刻 float64)。書き込み途中で切れた末尾のレコードは読み捨てる
+
+ファイル名はシリアル・DAC・極・パターンのハッシュで決まるため、同じ条件の
+ジャーナルは journal_path() が存在するかどうかで判定できる。シード未指定の Random の
+ようにパターンを作り直さないとハッシュが分からない場合は、find() でシリアル・DAC・極の
+ジャーナルを探し、メタデータ (pattern_params・pattern_hash) からパターンを確認する。
+
+使用例:
+    from utils import run_journal
+    path = run_journal.journal_path(dir, serial, 'Position', 'POS', run_journal.pattern_hash(codes))
+    journal = run_journal.Journal.create(path, {'points': len(codes)})
+    journal.append(idx, code, volt)
+    ...
+    journal, meta, records = run_journal.Journal.resume(path)   # [(idx, code, volt, t), ...]
+    journal.discard()                                     # 完了したら削除
+"""
+import glob
+import hashlib
+import json
+import os
+import struct
+import time
+
+MAGIC = b"ONTJ1\n"
+RECORD = struct.Struct('<Iidd')
+SUFFIX = '.jrnl'
+
+
+def pattern_hash(codes):
+    """パターン (コード列) のハッシュ (16進12桁)"""
+    return hashlib.sha1(','.join(str(int(c)) for c in codes).encode('ascii')).hexdigest()[:12]
+
+
+def journal_path(directory, serial_no, dac_name, pole, phash):
+    """条件ごとのジャーナルファイルのパス"""
+    return os.path.join(directory, f"{serial_no}_{dac_name}_{pole}_{phash}{SUFFIX}")
+
+
+def find(directory, serial_no, dac_name, pole):
+    """シリアル・DAC・極が同じジャーナルのパス (パターンは問わない、新しい順)"""
+    pattern = os.path.join(glob.escape(directory),
+                           glob.escape(f"{serial_no}_{dac_name}_{pole}_") + '?' * 12 + SUFFIX)
+    return sorted(glob.glob(pattern), key=os.path.getmtime, reverse=True)
+
+
+def read(path):
+    """ジャーナルを読み込む
+
+    Returns:
+        (meta, records, data_end) records は [(番号, コード, 電圧, 時刻), ...]、
+        data_end は最後の完全なレコードの末尾位置
+    Raises:
+        ValueError: ジャーナルファイルではない
+    """
+    with open(path, 'rb') as f:
+        if f.readline() != MAGIC:
+            raise ValueError(f"ジャーナルファイルではありません: {path}")
+        meta = json.loads(f.readline().decode('utf-8'))
+        header_size = f.tell()
+        body = f.read()
+    usable = len(body) - len(body) % RECORD.size
+    records = list(RECORD.iter_unpack(body[:usable]))
+    return meta, records, header_size + usable
+
+
+class Journal:
+    """追記用のジャーナル (create / resume で開く)"""
+
+    def __init__(self, path, f, fsync_every=20, fsync_interval=5.0):
+        self.path = path
+        self._f = f
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @classmethod
+    def create(cls, path, meta, **kwargs):
+        """新しいジャーナルを作成 (同じパスの古いジャーナルは上書き)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        f = open(path, 'wb')
+        f.write(MAGIC)
+        f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8') + b'\n')
+        journal = cls(path, f, **kwargs)
+        journal.sync()
+        return journal
+
+    @classmethod
+    def resume(cls, path, **kwargs):
+        """既存のジャーナルを開いて追記を再開
+
+        Returns:
+            (journal, meta, records) 途中で切れた末尾のレコードは切り捨てる
+        """
+        meta, records, data_end = read(path)
+        f = open(path, 'r+b')
+        f.truncate(data_end)
+        f.seek(data_end)
+        return cls(path, f, **kwargs), meta, records
+
+    def append(self, index, code, voltage, timestamp=None):
+        """1点追記 (fsync_every 点ごと、または fsync_interval 秒ごとに fsync)"""
+        self._f.write(RECORD.pack(index, int(code), voltage,
+                                  time.time() if timestamp is None else timestamp))
+        self._f.flush()
+        self._unsynced += 1
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """fsync して閉じる (ジャーナルは残す)"""
+        if self._f.closed:
+            return
+        try:
+            self.sync()
+        finally:
+            self._f.close()
+
+    def discard(self):
+        """閉じて削除 (計測完了時)"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
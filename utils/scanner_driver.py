@@ -0,0 +1,246 @@
+"""3499B スキャナーのリレー状態を持つ差分切り替え (Tk 非依存)
+
+チャンネルを切り替えるたびに cpon (スロット全 OPEN) → CLOSE を送る代わりに、閉じているリレーを
+モデルとして持ち、OPEN (前のチャンネル) → 間隔 → CLOSE (次のチャンネル) だけを送る。
+同じチャンネルが閉じたままなら何も送らない。
+
+- break-before-make: OPEN の完了を待ち、break_gap_sec 空けてから CLOSE
+- 再同期: 状態が不明なとき (接続し直し・スキャナータブでの手動操作の後) と resync_every 回の
+  切り替えごとに CLOSE? でスロットのリレー状態を読み直し、モデルを実機に合わせる
+- エラー時: cpon → CLOSE の従来方式で切り替え直す (それも失敗したら状態は不明)
+
+設定は app_settings の "scanner" (differential / break_gap_sec / resync_every / channels)。
+differential を false にすると毎回 cpon → CLOSE で切り替える。
+
+ドライバーは GPIBController・スロットごとに 1 つ (タブ間でリレー状態を共有):
+    driver = scanner_driver.get_driver(gpib_scanner, "1")
+    driver.reset()                                  # 計測開始時: cpon で全 OPEN
+    success, info = driver.switch("@103", settle=0.2)
+"""
+import threading
+import time
+import weakref
+
+from utils import settings_store, tracer
+
+DEFAULTS = {
+    'differential': True,    # False なら毎回 cpon → CLOSE
+    'break_gap_sec': 0.02,   # OPEN 完了から CLOSE までの間隔 (秒)
+    'resync_every': 50,      # この回数の切り替えごとに CLOSE? で再同期 (0 は計測開始時のみ)
+    'channels': 10,          # スロットのチャンネル数 (CH00～CH09)
+}
+COMPLETE_TIMEOUT = 5.0       # 1 コマンドの完了待ちの上限 (秒)
+
+_drivers = weakref.WeakKeyDictionary()   # GPIBController → {slot: ScannerDriver}
+_drivers_lock = threading.Lock()
+
+
+def get_driver(gpib, slot="1"):
+    """gpib・slot のドライバー (なければ作成)"""
+    with _drivers_lock:
+        slots = _drivers.setdefault(gpib, {})
+        if str(slot) not in slots:
+            slots[str(slot)] = ScannerDriver(gpib, slot)
+        return slots[str(slot)]
+
+
+def invalidate(gpib):
+    """gpib の全スロットのリレー状態を不明にする (ドライバーを通さずにリレーを操作したとき)"""
+    with _drivers_lock:
+        drivers = list(_drivers.get(gpib, {}).values())
+    for driver in drivers:
+        driver.invalidate()
+
+
+def _channel_list(addresses):
+    """["@101", "@105"] → "(@101,105)" """
+    return "(@" + ",".join(a.lstrip("@") for a in addresses) + ")"
+
+
+class ScannerDriver:
+    """3499B の 1 スロットのリレー状態モデルと差分切り替え
+
+    Args:
+        gpib: 3499B の GPIBController
+        slot: スロット番号 (チャンネルは "@{slot}00" 形式)
+    """
+
+    def __init__(self, gpib, slot="1"):
+        self.gpib = gpib
+        self.slot = str(slot)
+        self.lock = threading.RLock()
+        self.closed = None          # 閉じているチャンネルの集合 ("@103" など)、None は不明
+        self._instrument = None     # 状態を確認したときの VISA リソース (接続し直したら不明に戻す)
+        self._since_resync = 0
+        self.stats = {'switches': 0, 'unchanged': 0, 'fallbacks': 0, 'resyncs': 0, 'commands': 0}
+        self.cfg = dict(DEFAULTS)
+        self.configure()
+
+    def configure(self, settings=None):
+        """DEFAULTS に app_settings "scanner" と settings を重ねた設定"""
+        cfg = dict(DEFAULTS)
+        for source in (settings_store.app_settings().section("scanner"), settings or {}):
+            cfg.update({k: v for k, v in source.items() if k in DEFAULTS})
+        self.cfg = cfg
+
+    def addresses(self):
+        """スロットの全チャンネル ("@100"～)"""
+        return [f"@{self.slot}{n:02d}" for n in range(int(self.cfg['channels']))]
+
+    def known(self):
+        """リレー状態のモデルが有効か"""
+        return self.closed is not None and self.gpib.instrument is self._instrument
+
+    def invalidate(self):
+        with self.lock:
+            self.closed = None
+
+    def _send(self, command):
+        self.stats['commands'] += 1
+        return self.gpib.write_wait_complete(command, COMPLETE_TIMEOUT)
+
+    def _settled(self, closed):
+        self.closed = set(closed)
+        self._instrument = self.gpib.instrument
+        self._since_resync = 0
+
+    # ==================== 全 OPEN・再同期 ====================
+    def reset(self):
+        """cpon でスロット全 OPEN (状態は全 OPEN で確定)
+
+        Returns:
+            (success, message)
+        """
+        with self.lock:
+            self.configure()
+            success, message = self._send(f":system:cpon {self.slot}")
+            if success:
+                self._settled(set())
+            else:
+                self.closed = None
+            return success, message
+
+    def resync(self):
+        """CLOSE? でスロットのリレー状態を読み直してモデルを合わせる (読めなければ cpon)
+
+        Returns:
+            (success, message)
+        """
+        with self.lock:
+            self.stats['resyncs'] += 1
+            addresses = self.addresses()
+            self.stats['commands'] += 1
+            success, response = self.gpib.query(f"CLOSE? {_channel_list(addresses)}")
+            states = response.replace(" ", "").split(",") if success else []
+            if len(states) != len(addresses) or not set(states) <= {"0", "1"}:
+                success, message = self.reset()
+                return success, f"状態読み取り失敗 ({response}) → cpon: {message}"
+            actual = {a for a, s in zip(addresses, states) if s == "1"}
+            expected = self.closed if self.known() else None
+            self._settled(actual)
+            if expected is None:
+                return True, f"状態取得: CLOSE {sorted(actual) or 'なし'}"
+            if expected != actual:
+                return True, f"モデルと不一致 (モデル {sorted(expected)} / 実機 {sorted(actual)}) → 実機に合わせました"
+            return True, "一致"
+
+    # ==================== 切り替え ====================
+    def switch(self, channel_addr, settle=0.0):
+        """channel_addr だけが閉じた状態にする
+
+        settle はリレー安定待ちの最小時間 (CLOSE 送信から、完了待ちと重ねる)。
+        既に channel_addr だけが閉じていれば何も送らず、待たない。
+
+        Returns:
+            (success, {"mode": "unchanged" / "differential" / "cpon", "open": [...], "close": [...],
+                       "timing": {"open", "gap", "close", "settle"} (秒), "detail": [...]})
+        """
+        with self.lock:
+            info = {'mode': None, 'open': [], 'close': [],
+                    'timing': {'open': 0.0, 'gap': 0.0, 'close': 0.0, 'settle': 0.0}, 'detail': []}
+            self.stats['switches'] += 1
+
+            resync_every = int(self.cfg['resync_every'] or 0)
+            if not self.known() or (resync_every and self._since_resync >= resync_every):
+                success, message = self.resync()
+                info['detail'].append(f"再同期: {message}")
+
+            if self.known() and self.closed == {channel_addr}:
+                self.stats['unchanged'] += 1
+                self._since_resync += 1
+                info['mode'] = 'unchanged'
+                return True, info
+
+            if self.known() and self.cfg['differential']:
+                success, message = self._switch_differential(channel_addr, info)
+                if success:
+                    info['mode'] = 'differential'
+                    self._settle(settle, info, channel_addr)
+                    return True, info
+                self.stats['fallbacks'] += 1
+                info['detail'].append(f"差分切り替え失敗 ({message}) → cpon で切り替え")
+
+            success, message = self._switch_cpon(channel_addr, info)
+            info['mode'] = 'cpon'
+            if not success:
+                info['detail'].append(message)
+                return False, info
+            self._settle(settle, info, channel_addr)
+            return True, info
+
+    def _switch_differential(self, channel_addr, info):
+        to_open = sorted(self.closed - {channel_addr})
+        if to_open:
+            start = time.monotonic()
+            success, message = self._send(f"OPEN {_channel_list(to_open)}")
+            info['timing']['open'] = time.monotonic() - start
+            if not success:
+                self.closed = None
+                return False, f"OPEN {to_open}: {message}"
+            self.closed -= set(to_open)
+            info['open'] = to_open
+            self._gap(info)
+        if channel_addr not in self.closed:
+            success, message = self._close(channel_addr, info)
+            if not success:
+                return False, message
+        self._since_resync += 1
+        return True, "OK"
+
+    def _switch_cpon(self, channel_addr, info):
+        start = time.monotonic()
+        success, message = self.reset()
+        info['timing']['open'] = time.monotonic() - start
+        if not success:
+            return False, f"cpon: {message}"
+        info['open'] = ['all']
+        self._gap(info)
+        success, message = self._close(channel_addr, info)
+        if success:
+            self._since_resync += 1
+        return success, message
+
+    def _close(self, channel_addr, info):
+        start = time.monotonic()
+        success, message = self._send(f"CLOSE ({channel_addr})")
+        info['timing']['close'] = time.monotonic() - start
+        if not success:
+            self.closed = None
+            return False, f"CLOSE {channel_addr}: {message}"
+        self.closed.add(channel_addr)
+        info['close'] = [channel_addr]
+        return True, "OK"
+
+    def _gap(self, info):
+        gap = float(self.cfg['break_gap_sec'])
+        if gap > 0:
+            tracer.sleep(gap, "scanner.break_gap")
+            info['timing']['gap'] = gap
+
+    def _settle(self, settle, info, channel_addr):
+        # 最後のリレー操作 (CLOSE、なければ OPEN) の送信からの最小時間
+        elapsed = info['timing']['close'] if info['close'] else info['timing']['open']
+        remaining = max(0.0, settle - elapsed)
+        if remaining > 0:
+            tracer.sleep(remaining, "scanner.relay_wait", ch=channel_addr)
+        info['timing']['settle'] = remaining
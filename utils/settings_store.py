@@ -0,0 +1,319 @@
+"""設定ファイル (JSON) の共通ストア
+
+app_settings.json / graph_settings.json / config.json を起動後1回だけ読み込み、
+以降の読み出しはメモリから返す。変更は購読者へ通知し、ファイルへの保存は
+バックグラウンドスレッドでまとめて行う。
+
+- get() / section() はコピーを返す (呼び出し側で変更してもストアには影響しない)
+- set() / update() / delete() は即座にメモリへ反映し、保存を予約
+- 保存は最後の変更から DEBOUNCE_SEC 待って1回に集約 (連続変更中も MAX_DELAY_SEC で必ず保存)
+- 書き込みは一時ファイル → os.replace で原子的に置換 (書き込み途中で壊れない)
+- アプリ終了時は flush_all() で未保存分を書き出す (atexit にも登録)
+
+タブ間で同じファイルを読み書きしても、キー単位でメモリ上にマージされるため
+read-modify-write の競合で他タブの変更が消えることはない。
+
+使用例:
+    from utils import settings_store
+    store = settings_store.app_settings()
+    delay = store.get('switch_delay', 1.0)
+    store.set('switch_delay', 0.8)
+    store.update('metrics', enabled=True)
+    store.subscribe('metrics', lambda key, value: ...)
+"""
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+
+APP_SETTINGS_FILE = "app_settings.json"
+GRAPH_SETTINGS_FILE = "graph_settings.json"
+CONFIG_FILE = "config.json"
+
+DEBOUNCE_SEC = 0.5    # 最後の変更からこの時間後に保存
+MAX_DELAY_SEC = 3.0   # 連続変更中でも最初の変更からこの時間で保存
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class SettingsStore:
+    """1つの JSON 設定ファイルのメモリ上の複製と遅延保存"""
+
+    def __init__(self, path, indent=4):
+        self.path = path
+        self.indent = indent
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._data = None
+        self._subscribers = {}   # key (None は全キー) -> [fn, ...]
+        self._dirty_since = None
+        self._last_change = 0.0
+        self._writer = None
+        self._closed = False
+        self._io_lock = threading.Lock()
+        self._snapshot_gen = 0   # シリアライズした回数
+        self._written_gen = 0    # 書き込み済みの最新世代
+        self.write_count = 0     # 実際にファイルへ書き込んだ回数
+
+    # ---------- 読み込み ----------
+    def _ensure_loaded(self):
+        if self._data is not None:
+            return
+        data = {}
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+        except Exception as e:
+            print(f"設定ファイル読み込みエラー ({self.path}): {e}")
+        self._data = data if isinstance(data, dict) else {}
+
+    def get(self, key, default=None):
+        """key の値 (のコピー) を返す"""
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._data:
+                return default
+            return copy.deepcopy(self._data[key])
+
+    def section(self, key):
+        """辞書型の設定 (のコピー) を返す (未設定なら空の辞書)"""
+        value = self.get(key)
+        return value if isinstance(value, dict) else {}
+
+    def data(self):
+        """全設定のコピーを返す"""
+        with self._lock:
+            self._ensure_loaded()
+            return copy.deepcopy(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._ensure_loaded()
+            return key in self._data
+
+    # ---------- 変更 ----------
+    def set(self, key, value):
+        """key の値を置き換える (値が変わらなければ何もしない)"""
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._data and self._data[key] == value:
+                return
+            self._data[key] = copy.deepcopy(value)
+            self._mark_dirty()
+        self._notify(key, value)
+
+    def update(self, key, values=None, **fields):
+        """辞書型の設定 key に values / fields をマージする"""
+        fields = dict(values or {}, **fields)
+        with self._lock:
+            self._ensure_loaded()
+            current = self._data.get(key)
+            if not isinstance(current, dict):
+                current = {}
+            merged = dict(current, **copy.deepcopy(fields))
+            if key in self._data and merged == current:
+                return
+            self._data[key] = merged
+            self._mark_dirty()
+            value = copy.deepcopy(merged)
+        self._notify(key, value)
+
+    def set_many(self, values):
+        """複数のトップレベルキーをまとめて置き換える (保存は1回に集約)"""
+        changed = {}
+        with self._lock:
+            self._ensure_loaded()
+            for key, value in values.items():
+                if key in self._data and self._data[key] == value:
+                    continue
+                self._data[key] = copy.deepcopy(value)
+                changed[key] = value
+            if changed:
+                self._mark_dirty()
+        for key, value in changed.items():
+            self._notify(key, value)
+
+    def set_path(self, key_path, value):
+        """ネストしたキー (例: ["a", "b", "c"]) に値を設定 (途中の辞書は自動作成)"""
+        head = key_path[0]
+        if len(key_path) == 1:
+            self.set(head, value)
+            return
+        with self._lock:
+            self._ensure_loaded()
+            root = copy.deepcopy(self._data.get(head))
+            if not isinstance(root, dict):
+                root = {}
+            current = root
+            for key in key_path[1:-1]:
+                if not isinstance(current.get(key), dict):
+                    current[key] = {}
+                current = current[key]
+            current[key_path[-1]] = copy.deepcopy(value)
+            # 読み出しから書き戻しまでロックを保持する (同じ head への同時更新を失わない)
+            if head in self._data and self._data[head] == root:
+                return
+            self._data[head] = root
+            self._mark_dirty()
+            value = copy.deepcopy(root)
+        self._notify(head, value)
+
+    def delete(self, key):
+        """key を削除"""
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._data:
+                return
+            del self._data[key]
+            self._mark_dirty()
+        self._notify(key, None)
+
+    # ---------- 購読 ----------
+    def subscribe(self, key, fn):
+        """key の変更時に fn(key, value) を呼ぶ (key=None で全キー)
+
+        fn は変更を行ったスレッドで呼ばれる。Tk ウィジェットを更新する場合は
+        UI バス経由でメインスレッドに渡すこと。
+
+        Returns:
+            購読解除用の関数
+        """
+        with self._lock:
+            self._subscribers.setdefault(key, []).append(fn)
+
+        def unsubscribe():
+            with self._lock:
+                fns = self._subscribers.get(key, [])
+                if fn in fns:
+                    fns.remove(fn)
+        return unsubscribe
+
+    def _notify(self, key, value):
+        with self._lock:
+            fns = list(self._subscribers.get(key, ())) + list(self._subscribers.get(None, ()))
+        for fn in fns:
+            try:
+                fn(key, copy.deepcopy(value))
+            except Exception as e:
+                print(f"設定変更通知エラー ({key}): {e}")
+
+    # ---------- 保存 ----------
+    def _mark_dirty(self):
+        """保存を予約 (ロック保持中に呼ぶ)"""
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        self._last_change = now
+        if self._writer is None and not self._closed:
+            self._writer = threading.Thread(
+                target=self._writer_loop, name=f"settings-{os.path.basename(self.path)}",
+                daemon=True)
+            self._writer.start()
+        self._cond.notify()
+
+    def _writer_loop(self):
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if self._dirty_since is None:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    due = min(self._last_change + DEBOUNCE_SEC, self._dirty_since + MAX_DELAY_SEC)
+                    if now < due:
+                        self._cond.wait(due - now)
+                        continue
+                    break
+                if self._closed:
+                    return
+            self._write_pending()
+
+    def _write_pending(self):
+        """未保存の変更を一時ファイル経由で原子的に書き込む
+
+        シリアライズはロック内、ファイル I/O はロック外で行う
+        (保存中もメインスレッドの読み書きを待たせない)
+        """
+        with self._lock:
+            if self._dirty_since is None:
+                return
+            self._dirty_since = None
+            self._snapshot_gen += 1
+            gen = self._snapshot_gen
+            text = json.dumps(self._data, indent=self.indent, ensure_ascii=False)
+
+        with self._io_lock:
+            if gen <= self._written_gen:
+                return  # より新しい内容を書き込み済み
+            try:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                fd, tmp_path = tempfile.mkstemp(
+                    prefix=os.path.basename(self.path) + ".", suffix=".tmp", dir=directory)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                    raise
+                self._written_gen = gen
+                self.write_count += 1
+            except Exception as e:
+                print(f"設定ファイル保存エラー ({self.path}): {e}")
+
+    def flush(self):
+        """未保存の変更があれば即座に書き込む"""
+        self._write_pending()
+
+    def close(self):
+        """未保存分を書き込んで保存スレッドを停止"""
+        self._write_pending()
+        with self._lock:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def get_store(path, indent=4):
+    """path の SettingsStore を返す (同じファイルには同じインスタンス)"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SettingsStore(path, indent)
+        return store
+
+
+def app_settings():
+    """app_settings.json のストア"""
+    return get_store(APP_SETTINGS_FILE, indent=4)
+
+
+def graph_settings():
+    """graph_settings.json のストア"""
+    return get_store(GRAPH_SETTINGS_FILE, indent=4)
+
+
+def config():
+    """config.json のストア"""
+    return get_store(CONFIG_FILE, indent=2)
+
+
+def flush_all():
+    """全ストアの未保存分を書き込む (アプリ終了時に呼ぶ)"""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+atexit.register(flush_all)
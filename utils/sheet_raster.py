@@ -0,0 +1,589 @@
+"""openpyxl ワークシートの表を PNG に描画 (Excel・クリップボード不要)
+
+Excel COM の CopyPicture → クリップボード取得の代わりに、ワークシートのセル範囲を
+列幅・行高・罫線 (斜線含む)・塗りつぶし・フォント色・結合セル・表示形式に従って
+matplotlib (Agg) で直接描画する。同じ入力からは常に同じ画像になる。
+
+- 数式セルは簡易評価器で値を求めて表示 (四則演算・比較・&・ABS/MAX/MIN/SUM/AVERAGE/
+  IF/AND/OR/ROUND/DEC2HEX)。評価できない数式は空欄
+- 条件付き書式は cellIs ルール (より大きい/小さい/等しい/範囲) のフォント・塗りつぶしに対応
+- extract() で描画に必要な情報だけを pickle 可能な dict に取り出せるため、
+  描画 (render_table) は別スレッド・別プロセスで実行できる
+
+使用例:
+    from utils import sheet_raster
+    sheet_raster.render_range_png(ws, "table.png", "A1:H25")
+    table = sheet_raster.extract(ws, "A5:H58")      # ワーカー側で render_table(table, path)
+"""
+import functools
+import math
+import os
+import re
+
+# Excel 既定値
+DEFAULT_COL_WIDTH = 8.43    # 文字数
+DEFAULT_ROW_HEIGHT = 15.0   # pt
+DEFAULT_FONT_SIZE = 11.0    # pt
+DPI = 96                    # 1pt = 96/72 px (Excel の 100% 表示相当)
+PADDING_PX = 3
+FONT_FAMILY = ['MS PGothic', 'MS Gothic', 'Yu Gothic', 'Meiryo', 'IPAexGothic',
+               'Noto Sans CJK JP', 'sans-serif']
+
+# 罫線スタイル → (線幅 px, 線種)
+BORDER_STYLES = {
+    'hair': (1, (0, (1, 1))),
+    'thin': (1, '-'),
+    'dotted': (1, (0, (1, 2))),
+    'dashed': (1, (0, (3, 2))),
+    'dashDot': (1, (0, (3, 2, 1, 2))),
+    'dashDotDot': (1, (0, (3, 2, 1, 2, 1, 2))),
+    'medium': (2, '-'),
+    'mediumDashed': (2, (0, (3, 2))),
+    'mediumDashDot': (2, (0, (3, 2, 1, 2))),
+    'mediumDashDotDot': (2, (0, (3, 2, 1, 2, 1, 2))),
+    'slantDashDot': (2, (0, (3, 1, 1, 1))),
+    'thick': (3, '-'),
+    'double': (3, '-'),
+}
+
+
+# ==================== 数式評価 ====================
+class FormulaError(Exception):
+    """評価できない数式"""
+
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<num>\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+    | (?P<str>"(?:[^"]|"")*")
+    | (?P<ref>(?:(?:'[^']+'|[A-Za-z0-9_.]+)!)?\$?[A-Z]{1,3}\$?\d+(?::\$?[A-Z]{1,3}\$?\d+)?)
+    | (?P<func>[A-Z][A-Z0-9.]*)(?=\()
+    | (?P<bool>TRUE|FALSE)\b
+    | (?P<op><=|>=|<>|[-+*/^&=<>(),%])
+    )""", re.VERBOSE)
+
+_CELL_RE = re.compile(r"\$?([A-Z]{1,3})\$?(\d+)")
+
+
+def _col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + (ord(ch) - 64)
+    return n
+
+
+def _col_letter(index):
+    letters = ""
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def parse_range(cell_range):
+    """"A1:H25" → (min_row, min_col, max_row, max_col)"""
+    refs = cell_range.replace('$', '').split(':')
+    m1 = _CELL_RE.fullmatch(refs[0])
+    m2 = _CELL_RE.fullmatch(refs[-1])
+    if not m1 or not m2:
+        raise ValueError(f"セル範囲が不正です: {cell_range}")
+    r1, c1 = int(m1.group(2)), _col_index(m1.group(1))
+    r2, c2 = int(m2.group(2)), _col_index(m2.group(1))
+    return min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2)
+
+
+def _tokenize(formula):
+    tokens = []
+    pos = 0
+    text = formula.strip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise FormulaError(f"解釈できない数式: {formula}")
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        pos = m.end()
+    return tokens
+
+
+def _num(v):
+    if v is None or v == "":
+        return 0.0
+    if isinstance(v, bool):
+        return 1.0 if v else 0.0
+    if isinstance(v, (int, float)):
+        return v
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        raise FormulaError(f"数値ではありません: {v!r}")
+
+
+def _flatten(args):
+    for a in args:
+        if isinstance(a, list):
+            yield from (v for v in a if isinstance(v, (int, float)) and not isinstance(v, bool))
+        else:
+            yield _num(a)
+
+
+def _compare(op, a, b):
+    if isinstance(a, str) or isinstance(b, str):
+        a, b = str(a).upper(), str(b).upper()
+    else:
+        a, b = _num(a), _num(b)
+    return {'=': a == b, '<>': a != b, '<': a < b, '>': a > b,
+            '<=': a <= b, '>=': a >= b}[op]
+
+
+def _round(v, digits=0):
+    q = 10 ** int(_num(digits))
+    x = _num(v) * q
+    return math.floor(abs(x) + 0.5) * (1 if x >= 0 else -1) / q
+
+
+_FUNCTIONS = {
+    'ABS': lambda v: abs(_num(v)),
+    'MAX': lambda *a: max(_flatten(a), default=0),
+    'MIN': lambda *a: min(_flatten(a), default=0),
+    'SUM': lambda *a: sum(_flatten(a)),
+    'AVERAGE': lambda *a: (lambda xs: sum(xs) / len(xs))(list(_flatten(a))),
+    'IF': lambda c, t=True, f=False: t if _num(c) else f,
+    'AND': lambda *a: all(_flatten(a)),
+    'OR': lambda *a: any(_flatten(a)),
+    'ROUND': _round,
+    'DEC2HEX': lambda v, places=0: format(int(_num(v)), 'X').zfill(int(_num(places))),
+}
+
+
+class _Parser:
+    """Excel 数式の再帰下降評価 (優先順位: 比較 < & < +- < */ < ^ < 単項 - < %)"""
+
+    def __init__(self, tokens, resolver):
+        self.tokens = tokens
+        self.pos = 0
+        self.resolve = resolver
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        tok = self.peek()
+        if tok[0] is None or (value is not None and tok[1] != value):
+            raise FormulaError(f"数式の構文エラー (期待: {value})")
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        value = self.comparison()
+        if self.pos != len(self.tokens):
+            raise FormulaError("数式の構文エラー")
+        return value
+
+    def comparison(self):
+        left = self.concat()
+        while self.peek()[1] in ('=', '<>', '<', '>', '<=', '>='):
+            op = self.take()[1]
+            left = _compare(op, left, self.concat())
+        return left
+
+    def concat(self):
+        left = self.additive()
+        while self.peek()[1] == '&':
+            self.take()
+            right = self.additive()
+            left = f"{_display_general(left)}{_display_general(right)}"
+        return left
+
+    def additive(self):
+        left = self.term()
+        while self.peek()[1] in ('+', '-'):
+            op = self.take()[1]
+            right = self.term()
+            left = _num(left) + _num(right) if op == '+' else _num(left) - _num(right)
+        return left
+
+    def term(self):
+        left = self.power()
+        while self.peek()[1] in ('*', '/'):
+            op = self.take()[1]
+            right = _num(self.power())
+            if op == '*':
+                left = _num(left) * right
+            else:
+                if right == 0:
+                    raise FormulaError("#DIV/0!")
+                left = _num(left) / right
+        return left
+
+    def power(self):
+        left = self.unary()
+        while self.peek()[1] == '^':
+            self.take()
+            left = _num(left) ** _num(self.unary())
+        return left
+
+    def unary(self):
+        if self.peek()[1] in ('-', '+'):
+            op = self.take()[1]
+            value = _num(self.unary())
+            return -value if op == '-' else value
+        value = self.primary()
+        while self.peek()[1] == '%':
+            self.take()
+            value = _num(value) / 100.0
+        return value
+
+    def primary(self):
+        kind, text = self.take()
+        if kind == 'num':
+            return float(text) if ('.' in text or 'e' in text.lower()) else int(text)
+        if kind == 'str':
+            return text[1:-1].replace('""', '"')
+        if kind == 'bool':
+            return text == 'TRUE'
+        if kind == 'ref':
+            return self.resolve(text.split('!')[-1])
+        if kind == 'func':
+            fn = _FUNCTIONS.get(text)
+            if fn is None:
+                raise FormulaError(f"未対応の関数: {text}")
+            self.take('(')
+            args = []
+            if self.peek()[1] != ')':
+                args.append(self.comparison())
+                while self.peek()[1] == ',':
+                    self.take()
+                    args.append(self.comparison())
+            self.take(')')
+            return fn(*args)
+        if text == '(':
+            value = self.comparison()
+            self.take(')')
+            return value
+        raise FormulaError(f"数式の構文エラー: {text}")
+
+
+class FormulaEvaluator:
+    """ワークシート内の数式セルを評価 (結果はキャッシュ、循環参照はエラー)"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._cache = {}
+        self._busy = set()
+
+    def value(self, row, col):
+        """セル (row, col) の値 (数式なら評価結果、評価できなければ FormulaError)"""
+        key = (row, col)
+        if key in self._cache:
+            return self._cache[key]
+        raw = self.ws.cell(row=row, column=col).value
+        if not (isinstance(raw, str) and raw.startswith('=')):
+            return raw
+        if key in self._busy:
+            raise FormulaError("循環参照")
+        self._busy.add(key)
+        try:
+            result = _Parser(_tokenize(raw[1:]), self._resolve).parse()
+        finally:
+            self._busy.discard(key)
+        self._cache[key] = result
+        return result
+
+    def _resolve(self, ref):
+        if ':' in ref:
+            r1, c1, r2, c2 = parse_range(ref)
+            return [self.value(r, c) for r in range(r1, r2 + 1) for c in range(c1, c2 + 1)]
+        m = _CELL_RE.fullmatch(ref)
+        value = self.value(int(m.group(2)), _col_index(m.group(1)))
+        return "" if value is None else value
+
+
+# ==================== 表示形式 ====================
+def _display_general(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return f"{value:.10g}"
+    return str(value)
+
+
+def format_value(value, number_format='General'):
+    """セル値を表示形式 (0 / 0.000 / 0.0% / #,##0.00 など基本形のみ) で文字列化"""
+    if value is None or isinstance(value, (str, bool)):
+        return _display_general(value)
+    fmt = (number_format or 'General').split(';')[0]
+    fmt = re.sub(r'_.|\\.|"[^"]*"|\[[^\]]*\]', '', fmt).strip()
+    if fmt in ('', 'General', '@'):
+        return _display_general(value)
+    m = re.search(r'[0#](?:[0#,]*)(?:\.([0#]+))?', fmt)
+    if not m:
+        return _display_general(value)
+    decimals = len(m.group(1) or '')
+    percent = '%' in fmt
+    v = value * 100 if percent else value
+    text = f"{v:,.{decimals}f}" if ',' in m.group(0) else f"{v:.{decimals}f}"
+    if text.startswith('-') and float(text.replace(',', '')) == 0:
+        text = text[1:]   # Excel は -0.000 を 0.000 と表示
+    return text + ('%' if percent else '')
+
+
+# ==================== 抽出 ====================
+def _rgb(color, default=None):
+    """openpyxl の Color → '#RRGGBB' (テーマ色・インデックス色は default)"""
+    try:
+        rgb = color.rgb if color is not None else None
+    except Exception:
+        return default
+    if isinstance(rgb, str) and len(rgb) >= 6 and color.type == 'rgb':
+        return '#' + rgb[-6:]
+    return default
+
+
+def _side(side):
+    if side is None or not side.style:
+        return None
+    width, dash = BORDER_STYLES.get(side.style, (1, '-'))
+    return (width, dash, _rgb(side.color, '#000000'))
+
+
+def _col_widths(ws, c1, c2):
+    """列幅 [px] (Excel の文字数単位 → px: 幅×7+5)"""
+    default = ws.sheet_format.defaultColWidth or DEFAULT_COL_WIDTH
+    widths = {c: default for c in range(c1, c2 + 1)}
+    for dim in ws.column_dimensions.values():
+        if dim.width is None or dim.min is None:
+            continue
+        for c in range(max(dim.min, c1), min(dim.max or dim.min, c2) + 1):
+            widths[c] = 0 if dim.hidden else dim.width
+    return [int(round(widths[c] * 7 + 5)) if widths[c] else 0 for c in range(c1, c2 + 1)]
+
+
+def _row_heights(ws, r1, r2):
+    """行高 [px] (pt × 96/72)"""
+    default = ws.sheet_format.defaultRowHeight or DEFAULT_ROW_HEIGHT
+    heights = []
+    for r in range(r1, r2 + 1):
+        dim = ws.row_dimensions[r] if r in ws.row_dimensions else None
+        if dim is not None and dim.hidden:
+            heights.append(0)
+        else:
+            pt = dim.height if dim is not None and dim.height else default
+            heights.append(int(round(pt * DPI / 72.0)))
+    return heights
+
+
+def _conditional_rules(ws):
+    """[(min_row, min_col, max_row, max_col, rule), ...] (cellIs のみ)"""
+    rules = []
+    for cf in ws.conditional_formatting:
+        for rule in cf.rules:
+            if rule.type != 'cellIs' or rule.dxf is None:
+                continue
+            for rng in cf.sqref.ranges:
+                rules.append((rng.min_row, rng.min_col, rng.max_row, rng.max_col, rule))
+    return rules
+
+
+def _rule_matches(rule, value, evaluator):
+    if value is None or value == "":
+        return False
+    operands = []
+    for f in rule.formula or []:
+        operands.append(_Parser(_tokenize(f), evaluator._resolve).parse())
+    op = rule.operator
+    if op in ('between', 'notBetween'):
+        lo, hi = sorted((_num(operands[0]), _num(operands[1])))
+        inside = lo <= _num(value) <= hi
+        return inside if op == 'between' else not inside
+    cmp = {'greaterThan': '>', 'lessThan': '<', 'greaterThanOrEqual': '>=',
+           'lessThanOrEqual': '<=', 'equal': '=', 'notEqual': '<>'}.get(op)
+    return cmp is not None and _compare(cmp, value, operands[0])
+
+
+def extract(ws, cell_range=None):
+    """ワークシートのセル範囲から描画用の表データを取り出す
+
+    Returns:
+        {"cols": [px], "rows": [px], "cells": [{...}, ...]} (pickle 可能)
+    """
+    if cell_range is None:
+        cell_range = f"A1:{_col_letter(ws.max_column)}{ws.max_row}"
+    r1, c1, r2, c2 = parse_range(cell_range)
+    evaluator = FormulaEvaluator(ws)
+    cond_rules = _conditional_rules(ws)
+
+    # 結合セル: 左上セル → (行数, 列数)、それ以外は描画しない
+    anchors, hidden = {}, set()
+    for mr in ws.merged_cells.ranges:
+        if mr.max_row < r1 or mr.min_row > r2 or mr.max_col < c1 or mr.min_col > c2:
+            continue
+        anchors[(mr.min_row, mr.min_col)] = (mr.max_row, mr.max_col)
+        for r in range(mr.min_row, mr.max_row + 1):
+            for c in range(mr.min_col, mr.max_col + 1):
+                if (r, c) != (mr.min_row, mr.min_col):
+                    hidden.add((r, c))
+
+    cells = []
+    for r in range(r1, r2 + 1):
+        for c in range(c1, c2 + 1):
+            if (r, c) in hidden:
+                continue
+            end_r, end_c = anchors.get((r, c), (r, c))
+            end_r, end_c = min(end_r, r2), min(end_c, c2)
+            cell = ws.cell(row=r, column=c)
+            try:
+                value = evaluator.value(r, c)
+            except (FormulaError, ArithmeticError, TypeError, ValueError, IndexError):
+                value = None
+
+            font = cell.font
+            color = _rgb(font.color, '#000000') if font is not None else '#000000'
+            size = (font.sz if font is not None and font.sz else DEFAULT_FONT_SIZE)
+            bold = bool(font is not None and font.b)
+            fill = None
+            if cell.fill is not None and cell.fill.fill_type == 'solid':
+                fill = _rgb(cell.fill.fgColor)
+            for (mr1, mc1, mr2, mc2, rule) in cond_rules:
+                if mr1 <= r <= mr2 and mc1 <= c <= mc2:
+                    try:
+                        matched = _rule_matches(rule, value, evaluator)
+                    except (FormulaError, ArithmeticError, TypeError, ValueError):
+                        matched = False
+                    if matched:
+                        dxf = rule.dxf
+                        if dxf.font is not None:
+                            color = _rgb(dxf.font.color, color)
+                            size = dxf.font.sz or size
+                            bold = bold if dxf.font.b is None else bool(dxf.font.b)
+                        if dxf.fill is not None and dxf.fill.fill_type in (None, 'solid'):
+                            fill = _rgb(dxf.fill.bgColor, None) or _rgb(dxf.fill.fgColor, fill)
+                        if rule.stopIfTrue:
+                            break
+
+            al = cell.alignment
+            halign = al.horizontal if al is not None and al.horizontal else 'general'
+            if halign == 'general':
+                halign = 'right' if isinstance(value, (int, float)) and not isinstance(value, bool) else (
+                    'center' if isinstance(value, bool) else 'left')
+            elif halign in ('centerContinuous', 'distributed', 'justify', 'fill'):
+                halign = 'center'
+            valign = al.vertical if al is not None and al.vertical else 'bottom'
+
+            # 結合セルの外周罫線は各辺のセルの罫線を使う
+            def border_of(rr, cc, attr):
+                return _side(getattr(ws.cell(row=rr, column=cc).border, attr))
+            border = cell.border
+            cells.append({
+                'r': r - r1, 'c': c - c1, 'rs': end_r - r + 1, 'cs': end_c - c + 1,
+                'text': format_value(value, cell.number_format),
+                'halign': halign, 'valign': valign,
+                'size': float(size), 'bold': bold, 'color': color, 'fill': fill,
+                'top': [border_of(r, cc, 'top') for cc in range(c, end_c + 1)],
+                'bottom': [border_of(end_r, cc, 'bottom') for cc in range(c, end_c + 1)],
+                'left': [border_of(rr, c, 'left') for rr in range(r, end_r + 1)],
+                'right': [border_of(rr, end_c, 'right') for rr in range(r, end_r + 1)],
+                'diag_down': _side(border.diagonal) if border is not None and border.diagonalDown else None,
+                'diag_up': _side(border.diagonal) if border is not None and border.diagonalUp else None,
+            })
+    return {'cols': _col_widths(ws, c1, c2), 'rows': _row_heights(ws, r1, r2), 'cells': cells}
+
+
+# ==================== 描画 ====================
+def _with_font(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from matplotlib import rc_context
+        with rc_context({'font.family': FONT_FAMILY, 'axes.unicode_minus': False}):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@_with_font
+def render_table(table, path, margin=2):
+    """extract() の表データを PNG 保存して path を返す"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.patches import Rectangle
+
+    xs = [margin]
+    for w in table['cols']:
+        xs.append(xs[-1] + w)
+    ys = [margin]
+    for h in table['rows']:
+        ys.append(ys[-1] + h)
+    width, height = xs[-1] + margin, ys[-1] + margin
+
+    fig = Figure(figsize=(width / DPI, height / DPI), dpi=DPI, facecolor='white')
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_xlim(0, width)
+    ax.set_ylim(height, 0)   # 上→下 に px 座標
+    ax.axis('off')
+
+    cells = table['cells']
+    # 1. 塗りつぶし
+    for cell in cells:
+        if cell['fill']:
+            x0, x1 = xs[cell['c']], xs[cell['c'] + cell['cs']]
+            y0, y1 = ys[cell['r']], ys[cell['r'] + cell['rs']]
+            ax.add_patch(Rectangle((x0, y0), x1 - x0, y1 - y0, facecolor=cell['fill'],
+                                   edgecolor='none', linewidth=0))
+
+    # 2. 文字列 (改行はそのまま複数行で表示)
+    for cell in cells:
+        if not cell['text']:
+            continue
+        x0, x1 = xs[cell['c']], xs[cell['c'] + cell['cs']]
+        y0, y1 = ys[cell['r']], ys[cell['r'] + cell['rs']]
+        ha = cell['halign'] if cell['halign'] in ('left', 'right', 'center') else 'left'
+        tx = {'left': x0 + PADDING_PX, 'right': x1 - PADDING_PX, 'center': (x0 + x1) / 2}[ha]
+        va = {'top': 'top', 'center': 'center', 'bottom': 'bottom'}.get(cell['valign'], 'center')
+        ty = {'top': y0 + 1, 'center': (y0 + y1) / 2, 'bottom': y1 - 2}[va]
+        ax.text(tx, ty, cell['text'], ha=ha, va=va, multialignment=ha,
+                fontsize=cell['size'], fontweight='bold' if cell['bold'] else 'normal',
+                color=cell['color'], linespacing=1.15, clip_on=True)
+
+    # 3. 罫線 (太い線を後から描いて上書き)
+    segments = []
+    for cell in cells:
+        c, r = cell['c'], cell['r']
+        for i, side in enumerate(cell['top']):
+            if side:
+                segments.append((side, (xs[c + i], xs[c + i + 1]), (ys[r], ys[r])))
+        for i, side in enumerate(cell['bottom']):
+            if side:
+                y = ys[r + cell['rs']]
+                segments.append((side, (xs[c + i], xs[c + i + 1]), (y, y)))
+        for i, side in enumerate(cell['left']):
+            if side:
+                segments.append((side, (xs[c], xs[c]), (ys[r + i], ys[r + i + 1])))
+        for i, side in enumerate(cell['right']):
+            if side:
+                x = xs[c + cell['cs']]
+                segments.append((side, (x, x), (ys[r + i], ys[r + i + 1])))
+        x0, x1 = xs[c], xs[c + cell['cs']]
+        y0, y1 = ys[r], ys[r + cell['rs']]
+        if cell['diag_down']:
+            segments.append((cell['diag_down'], (x0, x1), (y0, y1)))
+        if cell['diag_up']:
+            segments.append((cell['diag_up'], (x0, x1), (y1, y0)))
+    for (width_px, dash, color), sx, sy in sorted(segments, key=lambda s: s[0][0]):
+        ax.plot(sx, sy, color=color, linewidth=width_px * 72.0 / DPI,
+                linestyle=dash, solid_capstyle='projecting', antialiased=False)
+
+    tmp = path + '.part'
+    fig.savefig(tmp, format='png', dpi=DPI, facecolor='white')
+    os.replace(tmp, path)
+    return path
+
+
+def render_range_png(ws, path, cell_range=None):
+    """ワークシートのセル範囲を PNG 保存して path を返す"""
+    return render_table(extract(ws, cell_range), path)
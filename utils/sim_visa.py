@@ -0,0 +1,612 @@
+"""GPIB 機器のシミュレーター (実機なしで 3458A・3499B を使う機能を動かす・試験するため)
+
+app_settings.json の "simulation" で有効にすると、GPIBController.initialize() が
+SimResourceManager を使う。実機の VISA があればそのリソースも一覧に並ぶ。
+
+    "simulation": {"enabled": true, "dmm_signal": "glitch"}
+
+- SimResourceManager: pyvisa.ResourceManager 互換 (list_resources / open_resource)
+- Sim3458A: HP 3458A (pyvisa の Resource 互換: write / read / read_raw / read_bytes / query / clear)
+  TARM / TRIG / NRDGS (AUTO / TIMER)・TIMER・MEM FIFO・MFORMAT / OFORMAT (ASCII / SINT / DINT)・
+  MATH STAT・RMATH・ISCALE?・MCOUNT?・RMEM・ERRSTR? など、アプリが使うコマンドをモデル化。
+  読み取りは実時間で進み (積分時間ぶん待つ)、値は信号モデル signal(t) から作る。
+- Sim3499B: HP 3499B スキャナー (cpon・CLOSE / OPEN / CLOSE? (@...)・*OPC / *OPC? ・*ESE / *SRE / *ESR?)
+  リレーの動作時間ぶん完了 (*OPC) が遅れる。リレーの動作回数を actuations に数える。
+- どちらもシリアルポール (read_stb) と SRQ イベント (enable_event / wait_on_event) に対応
+  (3458A は RQS のマスク、3499B は *SRE のマスクで SRQ を出す)
+- 信号モデル: DCSignal (直流 + 白色雑音)、GlitchSignal (交互に切り替わる DAC 出力の
+  ステップ + 減衰振動のグリッチ)
+
+使用例 (試験):
+    dmm = Sim3458A(SIM_3458A, signal=GlitchSignal(), seed=0)
+    gpib = GPIBController(); gpib.instrument = dmm; gpib.connected = True
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+SIM_3458A = "SIM::3458A::INSTR"
+SIM_3499B = "SIM::3499B::INSTR"
+LINE_FREQ = 50
+
+FUNC_CODES = {"DCV": 1, "ACV": 2, "ACDCV": 3, "OHM": 4, "OHMF": 5, "DCI": 6, "ACI": 7,
+              "ACDCI": 8, "FREQ": 9, "PER": 10, "DSAC": 11, "DSDC": 12, "SSAC": 13, "SSDC": 14}
+FORMAT_BITS = {"SINT": 16, "DINT": 32}
+MEMORY_BYTES = 20480     # 標準メモリ (SINT 10240 点 / DINT 5120 点)
+
+
+STB_RQS = 0x40
+
+
+class SimTimeout(Exception):
+    """シミュレーターの読み取りタイムアウト (VISA の VI_ERROR_TMO 相当)"""
+
+
+# ==================== 信号モデル ====================
+class DCSignal:
+    """直流 + 白色雑音"""
+
+    def __init__(self, level=1.0, noise=2e-6, seed=None):
+        self.level = level
+        self.noise = noise
+        self._rng = np.random.default_rng(seed)
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=np.float64)
+        return self.level + self._rng.normal(0.0, self.noise, t.shape)
+
+
+class GlitchSignal:
+    """half_period ごとに 2 つのコードを交互に出力する DAC (DataGen の alt s sab)
+
+    切り替えのたびに step の段差と、減衰振動 (振幅 amplitude・時定数 tau・周波数 ring_hz) の
+    グリッチを重ねる。グリッチの向きは切り替えの向きで反転する。
+    """
+
+    def __init__(self, level=0.0, step=2e-3, half_period=0.005, amplitude=0.05,
+                 tau=40e-6, ring_hz=12e3, noise=50e-6, seed=None):
+        self.level = level
+        self.step = step
+        self.half_period = half_period
+        self.amplitude = amplitude
+        self.tau = tau
+        self.ring_hz = ring_hz
+        self.noise = noise
+        self.t0 = time.monotonic()
+        self._rng = np.random.default_rng(seed)
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=np.float64) - self.t0
+        k = np.floor(t / self.half_period)
+        phase = t - k * self.half_period
+        state = (k.astype(np.int64) % 2)
+        sign = np.where(state == 1, 1.0, -1.0)
+        glitch = (self.amplitude * np.exp(-phase / self.tau)
+                  * np.sin(2.0 * np.pi * self.ring_hz * phase))
+        return (self.level + state * self.step + sign * glitch
+                + self._rng.normal(0.0, self.noise, t.shape))
+
+
+SIGNALS = {"dc": DCSignal, "glitch": GlitchSignal}
+
+
+def make_signal(name, seed=None):
+    return SIGNALS.get(name, DCSignal)(seed=seed)
+
+
+# ==================== 共通 (pyvisa の Resource 互換) ====================
+class _SimInstrument:
+    """出力バッファ・読み取り・シリアルポール・SRQ イベントの共通部分
+
+    サブクラスは _execute(command)・_status_byte(now)・_srq_time(now) を実装する。
+    """
+
+    def __init__(self, resource_name, termination='\n'):
+        self.resource_name = resource_name
+        self.timeout = 5000
+        self.write_termination = termination
+        self.read_termination = termination
+        self.send_end = True
+        self.commands = []          # 受信したコマンドの履歴 (試験用)
+        self._lock = threading.Lock()
+        self._out = deque()         # 出力バッファ [(出力可能になる時刻, str または bytes)]
+        self._events_enabled = False
+
+    def _refill(self):
+        """出力バッファが空のときに呼ばれる (連続トリガーの読み取りを作るなど)"""
+
+    def _status_byte(self, now):
+        """RQS (bit 6) を除いたステータスバイト"""
+        return 0
+
+    def _srq_time(self, now):
+        """SRQ を出す (出している) 時刻 (予定がなければ None)"""
+        return None
+
+    # ---------- pyvisa 互換 ----------
+    def write(self, command):
+        with self._lock:
+            for part in command.split(";"):
+                if part.strip():
+                    self._execute(part.strip())
+
+    def _next_output(self):
+        """次の出力 (出力可能時刻まで待つ、なければタイムアウト)"""
+        deadline = time.monotonic() + self.timeout / 1000.0
+        with self._lock:
+            if not self._out:
+                self._refill()
+            item = self._out.popleft() if self._out else None
+        if item is None:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            raise SimTimeout("VI_ERROR_TMO (シミュレーター: 出力なし)")
+        ready, data = item
+        wait = ready - time.monotonic()
+        if wait > 0:
+            if ready > deadline:
+                time.sleep(max(0.0, deadline - time.monotonic()))
+                with self._lock:
+                    self._out.appendleft(item)
+                raise SimTimeout("VI_ERROR_TMO (シミュレーター: 読み取り待ち)")
+            time.sleep(wait)
+        return data
+
+    def read(self):
+        data = self._next_output()
+        if isinstance(data, bytes):
+            return data.decode('latin-1')
+        return data + self.read_termination
+
+    def read_raw(self):
+        data = self._next_output()
+        return data if isinstance(data, bytes) else (data + self.read_termination).encode()
+
+    def read_bytes(self, count):
+        chunks, size = [], 0
+        while size < count:
+            data = self.read_raw()
+            chunks.append(data)
+            size += len(data)
+        data = b"".join(chunks)
+        if len(data) > count:
+            with self._lock:
+                self._out.appendleft((0.0, data[count:]))
+        return data[:count]
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def clear(self):
+        with self._lock:
+            self._out.clear()
+
+    def control_ren(self, mode):
+        pass
+
+    def close(self):
+        pass
+
+    # ---------- シリアルポール・SRQ イベント ----------
+    def _output_ready(self, now):
+        return bool(self._out) and self._out[0][0] <= now
+
+    def read_stb(self):
+        with self._lock:
+            now = time.monotonic()
+            stb = self._status_byte(now)
+            srq = self._srq_time(now)
+        if srq is not None and srq <= now:
+            stb |= STB_RQS
+        return stb
+
+    def enable_event(self, event_type, mechanism, context=None):
+        self._events_enabled = True
+
+    def disable_event(self, event_type, mechanism):
+        self._events_enabled = False
+
+    def discard_events(self, event_type, mechanism):
+        pass
+
+    def wait_on_event(self, event_type, timeout):
+        """SRQ を timeout (ms) まで待つ (来なければ SimTimeout)"""
+        if not self._events_enabled:
+            raise RuntimeError("SRQ イベントが有効になっていません")
+        now = time.monotonic()
+        deadline = now + timeout / 1000.0
+        with self._lock:
+            srq = self._srq_time(now)
+        if srq is not None and srq <= deadline:
+            time.sleep(max(0.0, srq - now))
+            return
+        time.sleep(max(0.0, deadline - now))
+        raise SimTimeout("VI_ERROR_TMO (シミュレーター: SRQ なし)")
+
+
+# ==================== 3458A ====================
+def _number(text, default=None):
+    text = text.strip().upper()
+    if text in ("", "DEF"):
+        return default
+    if text == "MIN":
+        return 0.0
+    if text == "MAX":
+        return 1e9
+    return float(text)
+
+
+class Sim3458A(_SimInstrument):
+    """HP 3458A のシミュレーター (pyvisa の Resource 互換)"""
+
+    def __init__(self, resource_name=SIM_3458A, signal=None, seed=None):
+        super().__init__(resource_name)
+        self.signal = signal or DCSignal(seed=seed)
+        self.rqs = 8                # SRQ のマスク (電源投入時は Power-on SRQ のみ)
+        self._preset()
+
+    # ---------- 状態 ----------
+    def _preset(self):
+        self.func = "DCV"
+        self.range = 10.0
+        self.nplc = 10.0
+        self.aper = None
+        self.azero = True
+        self.tarm = "AUTO"
+        self.trig = "SYN"
+        self.nrdgs = 1
+        self.sample_event = "AUTO"
+        self.timer = 1.0
+        self.mem = "OFF"
+        self.mformat = "SREAL"
+        self.oformat = "ASCII"
+        self.end = "ALWAYS"
+        self.math = "OFF"
+        self._stat = {"MEAN": 0.0, "SDEV": 0.0, "NSAMP": 0.0}
+        self._math_ready = 0.0      # 統計レジスタが確定する時刻
+        self.errors = deque()
+        self._memory_t = np.empty(0)
+        self._memory_v = np.empty(0)
+        self._next_auto = 0.0
+        self._out.clear()
+
+    def integration_time(self):
+        """1 読み取りの時間 (秒)"""
+        if self.func in ("DSDC", "DSAC", "SSDC", "SSAC"):
+            return max(self.timer, 1e-5)
+        base = self.aper if self.aper is not None else self.nplc / LINE_FREQ
+        return max(base, 5e-7) * (2 if self.azero else 1) + 2e-5
+
+    def iscale(self):
+        bits = FORMAT_BITS.get(self.mformat)
+        if bits is None:
+            return 1.0
+        return self.range * 1.2 / (2 ** (bits - 1) - 1)
+
+    def _quantize(self, values, fmt):
+        bits = FORMAT_BITS.get(fmt)
+        if bits is None:
+            return values
+        scale = self.iscale()
+        limit = 2 ** (bits - 1) - 1
+        return np.clip(np.round(values / scale), -limit, limit) * scale
+
+    def _continuous(self):
+        return self.tarm == "AUTO" and self.trig == "AUTO"
+
+    # ---------- 計測 ----------
+    def _burst(self, now):
+        """1 回のトリガーで NRDGS 点を取得 (時刻は未来を含む)"""
+        interval = self.timer if self.sample_event == "TIMER" else self.integration_time()
+        times = now + self.integration_time() + interval * np.arange(self.nrdgs)
+        values = self.signal(times)
+        if self.math == "STAT":
+            self._accumulate(values)
+            self._math_ready = float(times[-1])
+        if self.mem != "OFF":
+            fmt = self.mformat
+            values = self._quantize(values, fmt)
+            cap = MEMORY_BYTES // (FORMAT_BITS.get(fmt, 32) // 8)
+            self._memory_t = np.concatenate((self._memory_t, times))[-cap:]
+            self._memory_v = np.concatenate((self._memory_v, values))[-cap:]
+        else:
+            for t, v in zip(times.tolist(), values.tolist()):
+                self._out.append((t, self._format([v])))
+
+    def _accumulate(self, values):
+        """MATH STAT の統計レジスタに追加 (SDEV は n-1 で割る)"""
+        n0, mean0, sdev0 = self._stat["NSAMP"], self._stat["MEAN"], self._stat["SDEV"]
+        m2 = sdev0 * sdev0 * max(n0 - 1, 0)
+        n = n0 + len(values)
+        mean = mean0 + float(np.sum(values - mean0)) / n
+        m2 += float(np.sum((values - mean0) * (values - mean)))
+        self._stat = {"MEAN": mean, "SDEV": float(np.sqrt(m2 / (n - 1))) if n > 1 else 0.0, "NSAMP": float(n)}
+
+    def _format(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.oformat in FORMAT_BITS:
+            dtype = '>i2' if self.oformat == "SINT" else '>i4'
+            scale = self.iscale()
+            return np.round(values / scale).astype(dtype).tobytes()
+        if self.oformat == "DREAL":
+            return values.astype('>f8').tobytes()
+        if self.oformat == "SREAL":
+            return values.astype('>f4').tobytes()
+        return ",".join(f"{v:+.9E}" for v in values.tolist())
+
+    def _stored(self, now):
+        return int(np.searchsorted(self._memory_t, now, side='right'))
+
+    # ---------- コマンド ----------
+    def _execute(self, command):
+        now = time.monotonic()
+        words = command.replace(",", " ").split()
+        head = words[0].upper()
+        args = words[1:]
+        self.commands.append(command)
+
+        if head in ("RESET", "PRESET"):
+            self._preset()
+        elif head == "END":
+            self.end = args[0].upper() if args else "ON"
+        elif head in FUNC_CODES or head == "FUNC":
+            if head == "FUNC":
+                name = args[0].upper() if args else "DCV"
+                name = {str(v): k for k, v in FUNC_CODES.items()}.get(name, name)
+                args = args[1:]
+            else:
+                name = head
+            self.func = name
+            if args:
+                self.range = abs(_number(args[0], self.range))
+        elif head == "RANGE":
+            self.range = abs(_number(args[0], self.range)) if args else self.range
+        elif head == "NPLC":
+            self.nplc = _number(args[0], 10.0) if args else 10.0
+            self.aper = None
+        elif head == "APER":
+            self.aper = _number(args[0], None) if args else None
+        elif head == "AZERO":
+            self.azero = (args[0].upper() in ("ON", "1")) if args else True
+        elif head == "TIMER":
+            self.timer = _number(args[0], 1.0) if args else 1.0
+        elif head == "NRDGS":
+            self.nrdgs = int(_number(args[0], 1)) if args else 1
+            self.sample_event = args[1].upper() if len(args) > 1 else "AUTO"
+        elif head == "MEM":
+            self.mem = args[0].upper() if args else "FIFO"
+            if self.mem != "CONT":
+                self._memory_t = np.empty(0)
+                self._memory_v = np.empty(0)
+        elif head == "MFORMAT":
+            self.mformat = args[0].upper() if args else "SREAL"
+        elif head == "OFORMAT":
+            self.oformat = args[0].upper() if args else "ASCII"
+        elif head == "MATH":
+            self.math = args[0].upper() if args else "OFF"
+            self._stat = {"MEAN": 0.0, "SDEV": 0.0, "NSAMP": 0.0}
+        elif head == "RMATH":
+            register = args[0].upper() if args else "MEAN"
+            ready = max(now, self._math_ready)
+            self._out.append((ready, self._format([self._stat.get(register, 0.0)])))
+        elif head in ("DISP", "ARANGE", "DELAY", "TBUFF", "LFREQ"):
+            pass
+        elif head == "RQS":
+            self.rqs = int(_number(args[0], 0)) if args else 0
+        elif head == "CSB":
+            self.errors.clear()
+        elif head in ("TARM", "TRIG"):
+            event = args[0].upper() if args else "SGL"
+            if event == "SGL":
+                self._burst(now)
+                event = "HOLD"
+            if head == "TARM":
+                self.tarm = event
+            else:
+                self.trig = event
+            self._next_auto = now
+        elif head == "RMEM":
+            first = int(_number(args[0], 1)) if args else 1
+            count = int(_number(args[1], 1)) if len(args) > 1 else 1
+            values = self._memory_v[first - 1:first - 1 + count]
+            # 取り込み中の点は取り込み完了まで待って出力 (実機も RMEM はトリガー完了後に実行)
+            ready = float(self._memory_t[first - 2 + len(values)]) if len(values) else now
+            self._out.append((max(now, ready), self._format(values)))
+        elif head.endswith("?"):
+            self._out.append((now, self._query(head[:-1])))
+        else:
+            self.errors.append("1,UNDEFINED COMMAND")
+
+    def _query(self, head):
+        if head == "ID":
+            return "HP3458A"
+        if head == "ERRSTR":
+            return self.errors.popleft() if self.errors else '0,"NO ERROR"'
+        if head == "FUNC":
+            return f"{FUNC_CODES.get(self.func, 1)},{self.range:+.6E}"
+        if head == "RANGE":
+            return f"{self.range:+.6E}"
+        if head == "NPLC":
+            return f"{self.nplc:+.6E}"
+        if head == "ISCALE":
+            return f"{self.iscale():+.9E}"
+        if head == "MCOUNT":
+            return str(self._stored(time.monotonic()))
+        if head == "TIMER":
+            return f"{self.timer:+.6E}"
+        self.errors.append("1,UNDEFINED COMMAND")
+        return ""
+
+    def _refill(self):
+        # TRIG AUTO の連続測定: 読み取りのたびに次の 1 点を積分時間後に出力
+        if self._continuous() and self.mem == "OFF":
+            t = max(time.monotonic(), self._next_auto) + self.integration_time()
+            self._next_auto = t
+            self._out.append((t, self._format(self.signal(np.array([t])))))
+
+    # ---------- ステータスバイト (bit 7: Data Available / bit 5: Error / bit 4: Ready) ----------
+    def _status_byte(self, now):
+        stb = 0x10
+        if self.errors:
+            stb |= 0x20
+        if self._output_ready(now):
+            stb |= 0x80
+        return stb
+
+    def _srq_time(self, now):
+        if (self.rqs & 0x20) and self.errors:
+            return now
+        if (self.rqs & 0x80) and self._out:
+            return self._out[0][0]
+        return None
+
+
+# ==================== 3499B ====================
+RELAY_TIME = 0.012      # リレー 1 回の動作時間 (秒)
+CPON_TIME = 0.015       # cpon (スロット全 OPEN) の時間 (秒)
+
+
+def _channels(text):
+    """"(@101,103:105)" → [101, 103, 104, 105]"""
+    body = text.strip().lstrip("(").rstrip(")").lstrip("@")
+    channels = []
+    for part in body.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            first, last = (int(v) for v in part.split(":"))
+            channels.extend(range(first, last + 1))
+        else:
+            channels.append(int(part))
+    return channels
+
+
+class Sim3499B(_SimInstrument):
+    """HP 3499B スキャナーのシミュレーター (SCPI モード、pyvisa の Resource 互換)
+
+    リレーの状態 (closed)・動作回数 (actuations) を持ち、コマンドはリレーの動作時間ぶん
+    完了が遅れる (*OPC? の応答・*OPC の ESR bit 0 がその時刻になる)。
+    """
+
+    def __init__(self, resource_name=SIM_3499B):
+        super().__init__(resource_name, termination='\r\n')
+        self.closed = set()
+        self.actuations = 0
+        self.errors = deque()
+        self.esr = 0
+        self.ese = 0
+        self.sre = 0
+        self._busy_until = 0.0
+        self._opc_time = None       # *OPC で ESR bit 0 が立つ時刻
+
+    def _operate(self, now, seconds):
+        self._busy_until = max(now, self._busy_until) + seconds
+
+    def _update_esr(self, now):
+        if self._opc_time is not None and self._opc_time <= now:
+            self.esr |= 0x01
+            self._opc_time = None
+
+    def _execute(self, command):
+        now = time.monotonic()
+        self.commands.append(command)
+        words = command.split(None, 1)
+        head = words[0].upper().lstrip(":")
+        arg = words[1] if len(words) > 1 else ""
+
+        if head in ("SYSTEM:CPON", "SYST:CPON", "*RST"):
+            slot = arg.strip().upper()
+            before = len(self.closed)
+            if head == "*RST" or slot in ("", "ALL"):
+                self.closed.clear()
+            else:
+                self.closed = {ch for ch in self.closed if ch // 100 != int(slot)}
+            self.actuations += before - len(self.closed)
+            self._operate(now, CPON_TIME)
+        elif head in ("CLOSE", "CLOS", "ROUTE:CLOSE", "ROUT:CLOS"):
+            channels = set(_channels(arg))
+            self.actuations += len(channels - self.closed)
+            self.closed |= channels
+            self._operate(now, RELAY_TIME)
+        elif head in ("OPEN", "ROUTE:OPEN", "ROUT:OPEN"):
+            channels = set(_channels(arg))
+            self.actuations += len(channels & self.closed)
+            self.closed -= channels
+            self._operate(now, RELAY_TIME)
+        elif head in ("CLOSE?", "CLOS?", "ROUTE:CLOSE?", "ROUT:CLOS?"):
+            states = ",".join("1" if ch in self.closed else "0" for ch in _channels(arg))
+            self._out.append((max(now, self._busy_until), states))
+        elif head == "*OPC":
+            self._opc_time = max(now, self._busy_until)
+        elif head == "*OPC?":
+            self._out.append((max(now, self._busy_until), "1"))
+        elif head == "*ESE":
+            self.ese = int(_number(arg, 0))
+        elif head == "*SRE":
+            self.sre = int(_number(arg, 0))
+        elif head == "*ESR?":
+            self._update_esr(now)
+            self._out.append((now, str(self.esr)))
+            self.esr = 0
+        elif head == "*CLS":
+            self.esr = 0
+            self._opc_time = None
+            self.errors.clear()
+        elif head == "*IDN?":
+            self._out.append((now, "HEWLETT-PACKARD,3499B,0,SIM"))
+        elif head in ("SYST:ERR?", "SYSTEM:ERROR?"):
+            self._out.append((now, self.errors.popleft() if self.errors else '+0,"No error"'))
+        else:
+            self.errors.append('-113,"Undefined header"')
+
+    # ---------- ステータスバイト (bit 5: ESB / bit 4: MAV) ----------
+    def _status_byte(self, now):
+        self._update_esr(now)
+        stb = 0
+        if self.esr & self.ese:
+            stb |= 0x20
+        if self._output_ready(now):
+            stb |= 0x10
+        return stb
+
+    def _srq_time(self, now):
+        times = []
+        if self.sre & 0x20:
+            self._update_esr(now)
+            if self.esr & self.ese:
+                times.append(now)
+            elif self._opc_time is not None and self.ese & 0x01:
+                times.append(self._opc_time)
+        if (self.sre & 0x10) and self._out:
+            times.append(self._out[0][0])
+        return min(times) if times else None
+
+
+# ==================== リソースマネージャー ====================
+class SimResourceManager:
+    """pyvisa.ResourceManager 互換 (SIM:: のリソースはシミュレーター、それ以外は実機)
+
+    Args:
+        real: 実機の pyvisa.ResourceManager (なければ None)
+        dmm_signal: Sim3458A の信号モデル ("dc" / "glitch")
+    """
+
+    def __init__(self, real=None, dmm_signal="dc"):
+        self.real = real
+        self.dmm_signal = dmm_signal
+
+    def list_resources(self):
+        resources = list(self.real.list_resources()) if self.real is not None else []
+        return tuple(resources + [SIM_3458A, SIM_3499B])
+
+    def open_resource(self, resource_name):
+        if resource_name.upper().startswith("SIM::3458A"):
+            return Sim3458A(resource_name, signal=make_signal(self.dmm_signal))
+        if resource_name.upper().startswith("SIM::3499B"):
+            return Sim3499B(resource_name)
+        if self.real is None:
+            raise ValueError(f"リソースが見つかりません: {resource_name}")
+        return self.real.open_resource(resource_name)
@@ -0,0 +1,82 @@
+"""フレームレートで描画する軽量ストリップチャート (tk.Canvas)
+
+matplotlib を使わず、1 本のポリラインの座標を置き換えるだけで描画する。
+点数がキャンバス幅を超える場合は 1 ピクセル列ごとの最小・最大に間引く
+(ピークを落とさない min/max デシメーション)。
+
+使用例:
+    chart = StripChart(frame, height=160)
+    chart.pack(fill=tk.X)
+    chart.plot(times, values, unit="V")   # UI バスの定期処理 (メインスレッド) から呼ぶ
+"""
+import tkinter as tk
+
+import numpy as np
+
+PAD_LEFT = 90
+PAD_RIGHT = 10
+PAD_Y = 12
+
+
+def decimate(values, columns):
+    """values を columns 列の (min, max) に間引いたインデックス順の配列 (点数 ≤ 2*columns)"""
+    n = len(values)
+    if n <= columns * 2:
+        return np.arange(n, dtype=np.float64), values
+    edges = np.linspace(0, n, columns + 1).astype(np.int64)[:-1]
+    lo = np.minimum.reduceat(values, edges)
+    hi = np.maximum.reduceat(values, edges)
+    x = np.repeat(edges.astype(np.float64), 2)
+    y = np.empty(columns * 2, dtype=np.float64)
+    y[0::2] = lo
+    y[1::2] = hi
+    return x, y
+
+
+class StripChart(tk.Canvas):
+    """時系列の最新区間を表示するストリップチャート"""
+
+    def __init__(self, parent, height=160, line_color="blue", **kwargs):
+        kwargs.setdefault("background", "white")
+        kwargs.setdefault("highlightthickness", 0)
+        super().__init__(parent, height=height, **kwargs)
+        self._line = self.create_line(0, 0, 0, 0, fill=line_color, width=1)
+        self._frame = self.create_rectangle(0, 0, 0, 0, outline="gray")
+        self._top = self.create_text(PAD_LEFT - 4, PAD_Y, anchor=tk.E, font=("", 8))
+        self._bottom = self.create_text(PAD_LEFT - 4, 0, anchor=tk.E, font=("", 8))
+        self._span = self.create_text(0, 0, anchor=tk.SE, font=("", 8), fill="gray")
+
+    def clear(self):
+        self.coords(self._line, 0, 0, 0, 0)
+        for item in (self._top, self._bottom, self._span):
+            self.itemconfigure(item, text="")
+
+    def plot(self, times, values, unit=""):
+        """times / values (np.ndarray) を描画"""
+        width, height = self.winfo_width(), self.winfo_height()
+        plot_w = width - PAD_LEFT - PAD_RIGHT
+        plot_h = height - 2 * PAD_Y
+        if plot_w < 10 or plot_h < 10:
+            return
+        self.coords(self._frame, PAD_LEFT, PAD_Y, width - PAD_RIGHT, height - PAD_Y)
+        self.coords(self._bottom, PAD_LEFT - 4, height - PAD_Y)
+        self.coords(self._span, width - PAD_RIGHT - 2, height - PAD_Y - 2)
+        if len(values) < 2:
+            self.clear()
+            return
+
+        x, y = decimate(values, plot_w)
+        lo, hi = float(values.min()), float(values.max())
+        if hi <= lo:
+            # 一定値は中央に表示
+            lo, hi = lo - 0.5, hi + 0.5
+        px = PAD_LEFT + x * (plot_w / max(1.0, len(values) - 1))
+        py = PAD_Y + (hi - y) * (plot_h / (hi - lo))
+        coords = np.empty(len(px) * 2, dtype=np.float64)
+        coords[0::2] = px
+        coords[1::2] = py
+        self.coords(self._line, *coords.tolist())
+
+        self.itemconfigure(self._top, text=f"{hi:.8g} {unit}")
+        self.itemconfigure(self._bottom, text=f"{lo:.8g} {unit}")
+        self.itemconfigure(self._span, text=f"{len(values)} 点 / {times[-1] - times[0]:.1f} s")
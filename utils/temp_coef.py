@@ -0,0 +1,334 @@
+"""温度係数 (温特) の計算と温度係数表 XLSX の書き込み (Tk 非依存)
+
+GraphTab の「区間平均・温度係数」と再解析 CLI (reanalyze.py) で共通に使う。
+区間平均は LSBGraphPlotter.extract_section_averages() の結果
+(温特パターン: 23℃ → 28℃ → 18℃ → 23℃ → 23℃戻し、各温度 FFFFF → 00000 → 80000)。
+
+温度係数 [ppm/℃] = ΔV / フルスケール(23℃の FFFFF - 00000) × 1e6 / ΔT
+    28→23: ΔV = V(28℃) - V(23℃), ΔT = +5
+    23→18: ΔV = V(18℃) - V(23℃), ΔT = -5
+"""
+import copy
+import functools
+
+DEFAULT_SPEC = 1.9   # スペック (ppm/℃)
+CODES = ('FFFFF', '80000', '00000')
+
+
+@functools.lru_cache(maxsize=None)
+def table_styles():
+    """温度係数表の書式 (初回のみ生成し全シート・全セルで共有)"""
+    from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+
+    thin = Side(style='thin')
+    return {
+        'thin_side': thin,
+        'thick_side': Side(style='medium'),
+        'thin_border': Border(left=thin, right=thin, top=thin, bottom=thin),
+        # 斜線ボーダー（左上から右下）
+        'diagonal_border': Border(left=thin, right=thin, top=thin, bottom=thin,
+                                  diagonal=thin, diagonalDown=True),
+        'header_font': Font(bold=True, size=9),
+        'header_fill': PatternFill(start_color='D0D0D0', end_color='D0D0D0', fill_type='solid'),
+        'ng_fill': PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid'),
+        'center_align': Alignment(horizontal='center', vertical='center', wrap_text=True),
+        'right_align': Alignment(horizontal='right', vertical='center'),
+    }
+
+
+def organize_sections_by_code(sections):
+    """区間データをコードと温度で整理"""
+    # 温特パターン: FFFFF→00000→80000 を繰り返し
+    # 温度順: 23℃(1), 28℃, 18℃, 23℃(2), 23℃戻し
+    temp_mapping = {
+        0: 23,   # 23℃(1) - 基準値として使用
+        1: 28,   # 28℃
+        2: 18,   # 18℃
+        3: 23,   # 23℃(2)
+        4: 23,   # 23℃戻し - 参考値
+    }
+
+    code_data = {}  # {code: {temp: {'voltage': v, 'temp_set': idx}}}
+    codes_per_temp = 3
+
+    for i, section in enumerate(sections):
+        temp_set_idx = i // codes_per_temp
+        code = section['code']
+
+        if temp_set_idx not in temp_mapping:
+            continue
+
+        temp = temp_mapping[temp_set_idx]
+
+        if code not in code_data:
+            code_data[code] = {}
+
+        # 23℃は最初の値（temp_set_idx=0）を基準として使用
+        # 28℃、18℃はそれぞれ1回のみ
+        if temp == 23:
+            # 23℃(1)のデータを基準として使用（temp_set_idx=0）
+            if temp_set_idx == 0:
+                code_data[code][temp] = {
+                    'voltage': section['avg_voltage'],
+                    'temp_set': temp_set_idx
+                }
+        else:
+            code_data[code][temp] = {
+                'voltage': section['avg_voltage'],
+                'temp_set': temp_set_idx
+            }
+
+    return code_data
+
+
+def unit_label(serial, pole):
+    """ユニットNo. セルの表記 (DFH重複防止: serialが既にDFHで始まる場合はそのまま使用)"""
+    if serial.upper().startswith('DFH'):
+        return f"1PB397MK2\n{serial}\n{pole}"
+    return f"1PB397MK2\nDFH_{serial}\n{pole}"
+
+
+def coefficients(code_data, spec_value=DEFAULT_SPEC):
+    """コードごとの ΔV・温度係数・判定
+
+    Returns:
+        {code: {"dv_28", "tc_28", "jdg_28", "dv_18", "tc_18", "jdg_18"}}
+        (計算できない項目は None、判定は "OK" / "NG" / "")
+    """
+    # 23℃のフルスケール電圧範囲
+    fffff_23 = code_data.get('FFFFF', {}).get(23, {}).get('voltage')
+    zero_23 = code_data.get('00000', {}).get(23, {}).get('voltage')
+    full_scale_23 = (fffff_23 - zero_23) if (fffff_23 is not None and zero_23 is not None) else None
+
+    def _judge(tc):
+        if tc is None:
+            return ""
+        return "OK" if abs(tc) <= spec_value else "NG"
+
+    result = {}
+    for code, temps_data in code_data.items():
+        tc_28 = dv_28 = tc_18 = dv_18 = None
+        if 28 in temps_data and 23 in temps_data:
+            dv_28 = temps_data[28]['voltage'] - temps_data[23]['voltage']
+            if full_scale_23:
+                tc_28 = (dv_28 / full_scale_23) * 1e6 / 5.0
+
+        if 23 in temps_data and 18 in temps_data:
+            dv_18 = temps_data[18]['voltage'] - temps_data[23]['voltage']
+            if full_scale_23:
+                tc_18 = (dv_18 / full_scale_23) * 1e6 / (-5.0)
+
+        result[code] = {'dv_28': dv_28, 'tc_28': tc_28, 'jdg_28': _judge(tc_28),
+                        'dv_18': dv_18, 'tc_18': tc_18, 'jdg_18': _judge(tc_18)}
+    return result
+
+
+def summary(sections, spec_value=DEFAULT_SPEC):
+    """1極分の判定 (全コード・両温度区間の |温度係数| 最大)
+
+    Returns:
+        {"judge": "OK" / "NG" / "" (計算できる区間なし), "tc_worst": 符号付き最大 or None}
+    """
+    worst = None
+    for c in coefficients(organize_sections_by_code(sections or []), spec_value).values():
+        for tc in (c['tc_28'], c['tc_18']):
+            if tc is not None and (worst is None or abs(tc) > abs(worst)):
+                worst = tc
+    if worst is None:
+        return {'judge': '', 'tc_worst': None}
+    return {'judge': 'OK' if abs(worst) <= spec_value else 'NG', 'tc_worst': worst}
+
+
+def write_sheet(ws, pos_sections, neg_sections, serial, spec_value=DEFAULT_SPEC):
+    """温度係数表をワークシートに書き込み
+
+    Returns:
+        (最終行, 最終列)
+    """
+    from openpyxl.styles import Border
+    from openpyxl.utils import get_column_letter
+
+    # スタイル (共有オブジェクト)
+    styles = table_styles()
+    thin_border = styles['thin_border']
+    diagonal_border = styles['diagonal_border']
+    header_fill = styles['header_fill']
+    ng_fill = styles['ng_fill']
+    center_align = styles['center_align']
+    right_align = styles['right_align']
+
+    # ヘッダー
+    headers = ['ユニットNo.', '入力コード', '温度\n(℃)', '測定電圧\n(V)', 'ΔT\n(℃)',
+               'ΔV\n(V)', '温度係数\n(ppm/℃)', 'スペック\n(ppm/℃)', '判定']
+    col_widths = [14, 10, 6, 12, 6, 12, 11, 10, 6]
+
+    for col, (header, width) in enumerate(zip(headers, col_widths), 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.font = styles['header_font']
+        cell.fill = header_fill
+        cell.border = thin_border
+        cell.alignment = center_align
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+    # データ行
+    row_idx = 2
+    total_data_rows = 0
+
+    for sections, pole in [(pos_sections, "POS"), (neg_sections, "NEG")]:
+        if not sections:
+            continue
+
+        code_data = organize_sections_by_code(sections)
+        coefs = coefficients(code_data, spec_value)
+        unit_name = unit_label(serial, pole)
+        unit_start_row = row_idx
+
+        for code in CODES:
+            if code not in code_data:
+                continue
+
+            temps_data = code_data[code]
+            code_start_row = row_idx
+            c = coefs[code]
+            dv_28, tc_28, jdg_28 = c['dv_28'], c['tc_28'], c['jdg_28']
+            dv_18, tc_18, jdg_18 = c['dv_18'], c['tc_18'], c['jdg_18']
+
+            # 6行作成（各温度2行）
+            for temp_idx, temp in enumerate([28, 23, 18]):
+                voltage = temps_data.get(temp, {}).get('voltage')
+                temp_start_row = row_idx
+
+                for sub_row in range(2):
+                    # 温度セル（2行結合、最初のみ）
+                    if sub_row == 0:
+                        ws.cell(row=row_idx, column=3, value=temp).alignment = center_align
+                        ws.cell(row=row_idx, column=3).border = thin_border
+
+                    # 測定電圧（2行結合、最初のみ）
+                    if sub_row == 0 and voltage is not None:
+                        cell = ws.cell(row=row_idx, column=4, value=voltage)
+                        cell.alignment = right_align
+                        cell.number_format = '0.000000'
+                        cell.border = thin_border
+
+                    # ΔT, ΔV, 温度係数, 判定
+                    if temp_idx == 0 and sub_row == 1:  # 28→23
+                        c = ws.cell(row=row_idx, column=5, value=5.0)
+                        c.alignment = center_align
+                        c.number_format = '0.0'
+                        if dv_28 is not None:
+                            c = ws.cell(row=row_idx, column=6, value=dv_28)
+                            c.alignment = right_align
+                            c.number_format = '0.000000'
+                        if tc_28 is not None:
+                            c = ws.cell(row=row_idx, column=7, value=tc_28)
+                            c.alignment = center_align
+                            c.number_format = '0.0'
+                            if jdg_28 == "NG":
+                                c.fill = ng_fill
+                        c = ws.cell(row=row_idx, column=9, value=jdg_28)
+                        c.alignment = center_align
+                        if jdg_28 == "NG":
+                            c.fill = ng_fill
+                    elif temp_idx == 1 and sub_row == 1:  # 23→18
+                        c = ws.cell(row=row_idx, column=5, value=-5.0)
+                        c.alignment = center_align
+                        c.number_format = '0.0'
+                        if dv_18 is not None:
+                            c = ws.cell(row=row_idx, column=6, value=dv_18)
+                            c.alignment = right_align
+                            c.number_format = '0.000000'
+                        if tc_18 is not None:
+                            c = ws.cell(row=row_idx, column=7, value=tc_18)
+                            c.alignment = center_align
+                            c.number_format = '0.0'
+                            if jdg_18 == "NG":
+                                c.fill = ng_fill
+                        c = ws.cell(row=row_idx, column=9, value=jdg_18)
+                        c.alignment = center_align
+                        if jdg_18 == "NG":
+                            c.fill = ng_fill
+                    else:
+                        # 空セルに斜線（左上から右下への斜線）
+                        for col in [5, 6, 7, 9]:
+                            cell = ws.cell(row=row_idx, column=col)
+                            cell.border = diagonal_border
+
+                    # 全セルにボーダー適用（斜線セル以外）
+                    diagonal_cols = [5, 6, 7, 9] if not (temp_idx == 0 and sub_row == 1) and not (temp_idx == 1 and sub_row == 1) else []
+                    for col in range(1, 10):
+                        if col not in diagonal_cols:
+                            ws.cell(row=row_idx, column=col).border = thin_border
+
+                    row_idx += 1
+                    total_data_rows += 1
+
+                # 温度・電圧セルの結合
+                if temp_start_row < row_idx - 1:
+                    ws.merge_cells(start_row=temp_start_row, start_column=3,
+                                  end_row=row_idx - 1, end_column=3)
+                    ws.merge_cells(start_row=temp_start_row, start_column=4,
+                                  end_row=row_idx - 1, end_column=4)
+
+            # 入力コードセル結合（6行）
+            ws.cell(row=code_start_row, column=2, value=f"{code} H").alignment = center_align
+            if code_start_row < row_idx - 1:
+                ws.merge_cells(start_row=code_start_row, start_column=2,
+                              end_row=row_idx - 1, end_column=2)
+
+            # ΔT/ΔV/温度係数/判定の結合（28→23: row 2-3, 23→18: row 4-5）
+            for merge_row, cols in [
+                (code_start_row + 1, [5, 6, 7, 9]),  # 28→23
+                (code_start_row + 3, [5, 6, 7, 9])   # 23→18
+            ]:
+                for col in cols:
+                    ws.merge_cells(start_row=merge_row, start_column=col,
+                                  end_row=merge_row + 1, end_column=col)
+
+        # ユニットNo.セル結合（18行）
+        ws.cell(row=unit_start_row, column=1, value=unit_name).alignment = center_align
+        if unit_start_row < row_idx - 1:
+            ws.merge_cells(start_row=unit_start_row, start_column=1,
+                          end_row=row_idx - 1, end_column=1)
+
+    # スペックセル結合（全データ行）
+    if total_data_rows > 0:
+        c = ws.cell(row=2, column=8, value=spec_value)
+        c.alignment = center_align
+        c.number_format = '0.0'
+        ws.merge_cells(start_row=2, start_column=8, end_row=row_idx - 1, end_column=8)
+
+    # 行の高さ設定
+    ws.row_dimensions[1].height = 28  # ヘッダー行
+    for r in range(2, row_idx):
+        ws.row_dimensions[r].height = 15
+
+    # 大外枠を太字に設定
+    last_row = row_idx - 1
+    last_col = 9
+    thick_side = styles['thick_side']
+    thin_side = styles['thin_side']
+    # (既存ボーダー, 外枠の辺) → Border (同じ組み合わせは共有)
+    # cell.border はハッシュできないプロキシのためコピーをキーにする
+    frame_borders = {}
+
+    for row in range(1, last_row + 1):
+        for col in range(1, last_col + 1):
+            cell = ws.cell(row=row, column=col)
+            # 既存ボーダーを取得（斜線を保持）
+            existing = cell.border
+            key = (copy.copy(existing), col == 1, col == last_col, row == 1, row == last_row)
+            border = frame_borders.get(key)
+            if border is None:
+                border = frame_borders[key] = Border(
+                    left=thick_side if col == 1 else (existing.left or thin_side),
+                    right=thick_side if col == last_col else (existing.right or thin_side),
+                    top=thick_side if row == 1 else (existing.top or thin_side),
+                    bottom=thick_side if row == last_row else (existing.bottom or thin_side),
+                    diagonal=existing.diagonal,
+                    diagonalDown=existing.diagonalDown,
+                    diagonalUp=existing.diagonalUp
+                )
+            cell.border = border
+
+    return row_idx - 1, 9  # 最終行、最終列
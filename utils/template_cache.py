@@ -0,0 +1,105 @@
+"""XLSX テンプレートのメモリキャッシュと1パス保存
+
+template/ の XLSX はプロセスごとに1回だけ読み込んでバイト列で保持し、
+ワークブックはそのバイト列から複製する (計測のたびにテンプレートファイルを開かない)。
+ファイルの更新日時・サイズが変わった場合は読み直す。
+
+保存はワークブックをメモリ上でシリアライズし、チャート XML などのパーツを
+書き換えながら一時ファイル (.part) へ1回だけ書いてから置換する
+(保存した XLSX を開き直して書き換える2回目の書き込みをしない)。
+
+使用例:
+    from utils import template_cache
+    wb = template_cache.load_workbook(template_path)
+    ...
+    warnings = template_cache.save_workbook(
+        wb, filepath, {'xl/charts/chart1.xml': rewrite})
+"""
+import io
+import os
+import threading
+import zipfile
+
+import openpyxl
+
+_cache = {}   # {絶対パス: (mtime_ns, size, bytes)}
+_lock = threading.Lock()
+
+
+def template_bytes(path):
+    """テンプレートファイルの内容 (キャッシュ済みならファイルを読まない)"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    with _lock:
+        entry = _cache.get(path)
+        if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+            return entry[2]
+    with open(path, 'rb') as f:
+        data = f.read()
+    with _lock:
+        _cache[path] = (st.st_mtime_ns, st.st_size, data)
+    return data
+
+
+def load_workbook(path, **kwargs):
+    """テンプレートからワークブックを複製 (kwargs は openpyxl.load_workbook に渡す)"""
+    return openpyxl.load_workbook(io.BytesIO(template_bytes(path)), **kwargs)
+
+
+def clear():
+    """キャッシュを破棄"""
+    with _lock:
+        _cache.clear()
+
+
+def save_workbook(wb, filepath, rewrites=None):
+    """ワークブックを保存 (パーツの書き換えはシリアライズと同じパスで適用)
+
+    Args:
+        rewrites: {パーツ名: 書き換え関数 (str -> str)} または
+                  [(パーツ名の判定関数, 書き換え関数), ...]
+                  書き換え関数は str の代わりに str のイテレーターを返してもよい
+                  (断片ごとに書き出す。書き換えの連鎖はできない)
+    Returns:
+        警告メッセージのリスト (書き換えに失敗したパーツは元のまま保存する)
+    """
+    if isinstance(rewrites, dict):
+        rewrites = [(lambda name, target=name: name == target, fn)
+                    for name, fn in rewrites.items()]
+    warnings = []
+    part = filepath + '.part'
+    try:
+        if not rewrites:
+            wb.save(part)
+        else:
+            buf = io.BytesIO()
+            wb.save(buf)
+            buf.seek(0)
+            with zipfile.ZipFile(buf, 'r') as zin, \
+                    zipfile.ZipFile(part, 'w', zipfile.ZIP_DEFLATED) as zout:
+                for item in zin.infolist():
+                    raw = zin.read(item.filename)
+                    chunks = None
+                    for match, rewrite in rewrites:
+                        if match(item.filename):
+                            try:
+                                result = rewrite(raw.decode('utf-8'))
+                                if isinstance(result, str):
+                                    raw = result.encode('utf-8')
+                                else:
+                                    chunks = result
+                            except Exception as e:
+                                warnings.append(f"{item.filename} 更新エラー: {e}")
+                    if chunks is None:
+                        zout.writestr(item, raw)
+                    else:
+                        # 断片ごとに書き出し (大きなワークシートを1つの文字列にしない)
+                        with zout.open(item.filename, 'w') as f:
+                            for chunk in chunks:
+                                f.write(chunk.encode('utf-8'))
+        os.replace(part, filepath)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return warnings
@@ -0,0 +1,282 @@
+"""ホットパス計測用の軽量トレーサー
+
+GPIB/シリアル I/O・セトリング待ち・Excel出力・Tk 更新ディスパッチなどの
+所要時間を span / instant イベントとしてリングバッファに記録する。
+
+- 無効時は span() が共有の no-op オブジェクトを返すだけなので、ほぼコストゼロ
+- イベントは collections.deque(maxlen) に append するのみ (ロック不要)
+- export_chrome_trace() で chrome://tracing / Perfetto 形式の JSON を出力
+- latency_summary() で操作名ごとのレイテンシ統計・ヒストグラムを集計
+
+使用例:
+    from utils import tracer
+    with tracer.span("gpib.query", "gpib", cmd="TRIG SGL"):
+        ...
+    tracer.instant("cycle.start", "measure", dataset=3)
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_CAPACITY = 200000
+
+# ヒストグラムのバケット境界 [us] (10us〜100s、最後のバケットは +Inf)
+HISTOGRAM_BOUNDS_US = (
+    10, 100, 1000, 5000, 10000, 50000, 100000, 500000,
+    1000000, 5000000, 10000000, 100000000,
+)
+
+_enabled = False
+_events = deque(maxlen=DEFAULT_CAPACITY)
+_pid = os.getpid()
+_thread_names = {}
+
+
+def enable(capacity: int = None):
+    """トレース記録を開始する (capacity 指定時はバッファを作り直す)"""
+    global _enabled, _events
+    if capacity and capacity != _events.maxlen:
+        _events = deque(_events, maxlen=int(capacity))
+    _enabled = True
+
+
+def disable():
+    """トレース記録を停止する (記録済みイベントは保持)"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def clear():
+    """記録済みイベントを破棄"""
+    _events.clear()
+    _thread_names.clear()
+
+
+def event_count() -> int:
+    return len(_events)
+
+
+def capacity() -> int:
+    return _events.maxlen
+
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000.0
+
+
+def _tid() -> int:
+    tid = threading.get_ident()
+    if tid not in _thread_names:
+        _thread_names[tid] = threading.current_thread().name
+    return tid
+
+
+class _NullSpan:
+    """トレース無効時に返す no-op span"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """with ブロックの開始〜終了を 1 つの complete イベント (ph=X) として記録"""
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = _now_us()
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        _events.append(("X", self.name, self.cat, self.start, end - self.start,
+                        _tid(), self.args))
+        return False
+
+    def set(self, **attrs):
+        """span に属性を追加 (応答値・エラー内容など)"""
+        self.args.update(attrs)
+
+
+def span(name: str, cat: str = "app", **attrs):
+    """所要時間を計測する span を返す (with 文で使用)"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, attrs)
+
+
+def instant(name: str, cat: str = "app", **attrs):
+    """瞬間イベント (ph=i) を記録"""
+    if not _enabled:
+        return
+    _events.append(("i", name, cat, _now_us(), 0.0, _tid(), attrs))
+
+
+def complete(name: str, cat: str, start: float, duration: float, **attrs):
+    """計測済みの区間を complete イベントとして記録
+
+    Args:
+        start: 開始時刻 (time.perf_counter() の値) [s]
+        duration: 所要時間 [s]
+    """
+    if not _enabled:
+        return
+    _events.append(("X", name, cat, start * 1e6, duration * 1e6, _tid(), attrs))
+
+
+def sleep(seconds: float, name: str = "sleep", cat: str = "wait", **attrs):
+    """time.sleep を span 付きで実行 (セトリング待ちなどの可視化用)"""
+    if not _enabled:
+        time.sleep(seconds)
+        return
+    with _Span(name, cat, dict(attrs, sec=seconds)):
+        time.sleep(seconds)
+
+
+def traced(name: str, cat: str = "app"):
+    """関数全体を span で囲むデコレータ"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, cat, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> list:
+    """記録済みイベントのコピーを返す (記録中でも安全)"""
+    while True:
+        try:
+            return list(_events)
+        except RuntimeError:
+            # 他スレッドの append と競合した場合は取り直す
+            continue
+
+
+def export_chrome_trace(path: str):
+    """Chrome trace event 形式 (JSON) でファイル出力
+
+    Returns:
+        (成功フラグ, メッセージ)
+    """
+    events = snapshot()
+    trace_events = []
+    for tid, tname in list(_thread_names.items()):
+        trace_events.append({
+            "name": "thread_name", "ph": "M", "pid": _pid, "tid": tid,
+            "args": {"name": tname},
+        })
+    for ph, name, cat, ts, dur, tid, args in events:
+        ev = {"name": name, "cat": cat, "ph": ph, "ts": round(ts, 3),
+              "pid": _pid, "tid": tid}
+        if ph == "X":
+            ev["dur"] = round(dur, 3)
+        else:
+            ev["s"] = "t"
+        if args:
+            ev["args"] = {k: (v if isinstance(v, (int, float, bool)) or v is None
+                              else str(v)) for k, v in args.items()}
+        trace_events.append(ev)
+
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"},
+                      f, ensure_ascii=False)
+        return True, f"{len(events)} イベントを出力しました: {path}"
+    except Exception as e:
+        return False, f"トレース出力失敗: {e}"
+
+
+def _percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def latency_summary() -> dict:
+    """span 名ごとのレイテンシ統計を集計
+
+    Returns:
+        {name: {"cat", "count", "total_ms", "mean_ms", "p50_ms", "p90_ms",
+                "p99_ms", "max_ms", "errors", "histogram"}}
+        histogram は HISTOGRAM_BOUNDS_US の各上限 (最後は +Inf) ごとの件数
+    """
+    groups = {}
+    for ph, name, cat, _ts, dur, _tid_, args in snapshot():
+        if ph != "X":
+            continue
+        g = groups.setdefault(name, {"cat": cat, "durs": [], "errors": 0})
+        g["durs"].append(dur)
+        if "error" in args:
+            g["errors"] += 1
+
+    summary = {}
+    for name, g in groups.items():
+        durs = sorted(g["durs"])
+        hist = [0] * (len(HISTOGRAM_BOUNDS_US) + 1)
+        for d in durs:
+            idx = len(HISTOGRAM_BOUNDS_US)
+            for i, bound in enumerate(HISTOGRAM_BOUNDS_US):
+                if d <= bound:
+                    idx = i
+                    break
+            hist[idx] += 1
+        total = sum(durs)
+        summary[name] = {
+            "cat": g["cat"],
+            "count": len(durs),
+            "total_ms": total / 1000.0,
+            "mean_ms": total / len(durs) / 1000.0,
+            "p50_ms": _percentile(durs, 50) / 1000.0,
+            "p90_ms": _percentile(durs, 90) / 1000.0,
+            "p99_ms": _percentile(durs, 99) / 1000.0,
+            "max_ms": durs[-1] / 1000.0,
+            "errors": g["errors"],
+            "histogram": hist,
+        }
+    return summary
+
+
+def format_latency_summary() -> str:
+    """latency_summary() をテキスト表に整形 (合計時間の降順)"""
+    summary = latency_summary()
+    if not summary:
+        return "トレースイベントがありません"
+    lines = [f"{'name':<28}{'count':>8}{'total[ms]':>12}{'mean':>10}"
+             f"{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}{'err':>5}"]
+    for name, s in sorted(summary.items(), key=lambda kv: -kv[1]["total_ms"]):
+        lines.append(
+            f"{name:<28}{s['count']:>8}{s['total_ms']:>12.1f}{s['mean_ms']:>10.3f}"
+            f"{s['p50_ms']:>10.3f}{s['p90_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+            f"{s['max_ms']:>10.3f}{s['errors']:>5}")
+    return "\n".join(lines)
@@ -0,0 +1,296 @@
+"""UI 更新をフレーム単位でまとめて反映する UI バス
+
+ワーカースレッドからの UI 更新と各タブの定期処理を、ルートウィンドウ上の
+1つの after() タイマー (約60fps) でまとめて処理する。
+
+- 状態メッセージ (progress / voltage / target など):
+  キーごとに最新値のみ保持し、1フレームに1回だけ反映 (途中の値は破棄)
+- 追記メッセージ (log / ツリー行など):
+  溜まった分をリストで1回のハンドラ呼び出しに渡す (1回あたり max_batch 件まで)
+- イベント (done / pole 完了など): 到着順に1件ずつ処理
+- 定期処理 (時間表示・パターン情報など): every() で登録し同じタイマーで実行
+- 1フレームの処理時間を計測 (tracer の ui.frame / metrics の ontoku_ui_frame_*)。
+  予算 (FRAME_BUDGET_MS) を超えた分のイベント・定期処理は次フレームへ回す
+
+使用例:
+    self._ui = ui_bus.channel(self,
+                              states={'progress': self._on_progress},
+                              appends={'log': self._on_logs},
+                              events={'done': self._on_done})
+    self._ui.put(('progress', (3, 10)))      # どのスレッドからでも可
+    ui_bus.get_bus(self).every(self, 100, self.update_time_display)
+"""
+import threading
+import time
+import tkinter as tk
+from collections import deque
+
+from . import metrics, tracer
+
+FRAME_MS = 16            # ティック間隔 (約60fps)
+FRAME_BUDGET_MS = 8.0    # 1フレームで処理する時間の目安
+DEFAULT_MAX_BATCH = 500  # 追記メッセージを1回のハンドラに渡す最大件数
+
+_bus = None
+
+
+def _alive(widget):
+    """ウィジェットが破棄されていなければ True"""
+    try:
+        return bool(widget.winfo_exists())
+    except tk.TclError:
+        return False
+
+
+class Channel:
+    """タブ (ウィジェット) 単位の更新チャネル
+
+    put((msg_type, data)) は queue.Queue.put と同じ形で呼べる。
+    states / appends に登録していない msg_type はイベントとして扱う。
+    """
+
+    def __init__(self, bus, owner, states=None, appends=None, events=None,
+                 max_batch=DEFAULT_MAX_BATCH, name=None):
+        self.bus = bus
+        self.owner = owner
+        self.name = name or owner.winfo_name()
+        self.max_batch = max_batch
+        self._state_handlers = dict(states or {})
+        self._append_handlers = dict(appends or {})
+        self._event_handlers = dict(events or {})
+        self._lock = threading.Lock()
+        self._states = {}
+        self._appends = {}
+        self._events = deque()
+
+    # ---------- 送信側 (任意のスレッド) ----------
+    def put(self, item):
+        """(msg_type, data) を投入"""
+        msg_type, data = item
+        self.publish(msg_type, data)
+
+    def publish(self, msg_type, data=None):
+        """msg_type の種別に応じて最新値保持 / 追記 / イベントとして投入"""
+        coalesced = False
+        with self._lock:
+            if msg_type in self._state_handlers:
+                coalesced = msg_type in self._states
+                self._states[msg_type] = data
+            elif msg_type in self._append_handlers:
+                self._appends.setdefault(msg_type, []).append(data)
+            else:
+                self._events.append((msg_type, data))
+        if coalesced:
+            metrics.UI_COALESCED.inc(channel=self.name)
+
+    def pending(self):
+        """未処理メッセージ数"""
+        with self._lock:
+            return (len(self._states) + len(self._events)
+                    + sum(len(v) for v in self._appends.values()))
+
+    def discard(self):
+        """未処理メッセージをすべて破棄"""
+        with self._lock:
+            self._states.clear()
+            self._appends.clear()
+            self._events.clear()
+
+    # ---------- 受信側 (メインスレッド) ----------
+    def _take_batch(self):
+        """(状態, 追記, 追記の積み残し有無) を取り出す"""
+        with self._lock:
+            states, self._states = self._states, {}
+            appends = {}
+            backlog = False
+            for key, items in self._appends.items():
+                if not items:
+                    continue
+                appends[key] = items[:self.max_batch]
+                del items[:self.max_batch]
+                backlog = backlog or bool(items)
+            return states, appends, backlog
+
+    def _pop_event(self):
+        with self._lock:
+            return self._events.popleft() if self._events else None
+
+    def _dispatch_batch(self):
+        """状態・追記を反映 (追記の積み残しがあれば True)"""
+        states, appends, backlog = self._take_batch()
+        count = 0
+        for key, items in appends.items():
+            self.bus._call(self._append_handlers[key], items)
+            count += len(items)
+        for key, value in states.items():
+            self.bus._call(self._state_handlers[key], value)
+            count += 1
+        return count, backlog
+
+    def _dispatch_event(self):
+        """イベントを1件処理 (なければ False)"""
+        item = self._pop_event()
+        if item is None:
+            return False
+        msg_type, data = item
+        handler = self._event_handlers.get(msg_type)
+        if handler is not None:
+            self.bus._call(handler, data)
+        return True
+
+
+class Periodic:
+    """every() で登録した定期処理のハンドル"""
+    __slots__ = ("owner", "interval", "fn", "next_due", "cancelled")
+
+    def __init__(self, owner, interval_ms, fn, delay_ms):
+        self.owner = owner
+        self.interval = interval_ms / 1000.0
+        self.fn = fn
+        self.next_due = time.perf_counter() + delay_ms / 1000.0
+        self.cancelled = False
+
+    def cancel(self):
+        """定期処理を停止"""
+        self.cancelled = True
+
+
+class UIBus:
+    """ルートウィンドウ上の1つのタイマーで全チャネル・定期処理を処理する"""
+
+    def __init__(self, root, frame_ms=FRAME_MS, budget_ms=FRAME_BUDGET_MS):
+        self.root = root
+        self.frame_ms = frame_ms
+        self.budget = budget_ms / 1000.0
+        self._lock = threading.Lock()
+        self._channels = []
+        self._posts = deque()   # (owner, fn, args)
+        self._periodics = []
+        self._after_id = None
+        self.stats = {"frames": 0, "busy_frames": 0, "overruns": 0,
+                      "last_ms": 0.0, "max_ms": 0.0}
+        self._schedule()
+
+    # ---------- 登録 ----------
+    def channel(self, owner, **kwargs):
+        """owner 用の Channel を作成 (owner 破棄時に自動で登録解除)"""
+        ch = Channel(self, owner, **kwargs)
+        with self._lock:
+            self._channels.append(ch)
+        return ch
+
+    def post(self, owner, fn, *args):
+        """次フレームで fn(*args) を実行 (どのスレッドからでも可)"""
+        with self._lock:
+            self._posts.append((owner, fn, args))
+
+    def every(self, owner, interval_ms, fn, delay_ms=None):
+        """interval_ms ごとに fn() を実行 (owner 破棄時または cancel() で停止)
+
+        Args:
+            delay_ms: 初回実行までの時間 (既定は interval_ms)
+        """
+        handle = Periodic(owner, interval_ms, fn,
+                          interval_ms if delay_ms is None else delay_ms)
+        with self._lock:
+            self._periodics.append(handle)
+        return handle
+
+    # ---------- ティック ----------
+    def _schedule(self):
+        try:
+            self._after_id = self.root.after(self.frame_ms, self._tick)
+        except tk.TclError:
+            self._after_id = None  # ルート破棄済み
+
+    def _call(self, fn, *args):
+        try:
+            fn(*args)
+        except tk.TclError:
+            pass  # 破棄済みウィジェットへの更新は無視
+        except Exception as e:
+            print(f"[UIBus] ハンドラエラー ({getattr(fn, '__qualname__', fn)}): {e}")
+
+    def _tick(self):
+        # ハンドラ内でモーダルダイアログが開いても他タブの更新が止まらないよう先に予約
+        self._schedule()
+        start = time.perf_counter()
+        deadline = start + self.budget
+        handled = 0
+
+        with self._lock:
+            self._channels = [ch for ch in self._channels if _alive(ch.owner)]
+            channels = list(self._channels)
+
+        # 1. 状態・追記 (最新値のみ / 一括なので予算外で毎フレーム反映)
+        ready = []
+        for ch in channels:
+            count, backlog = ch._dispatch_batch()
+            handled += count
+            if not backlog:
+                # 追記の積み残しがあるチャネルはイベントを次フレームへ (到着順を保つ)
+                ready.append(ch)
+
+        # 2. post() されたコールバック
+        while True:
+            with self._lock:
+                item = self._posts.popleft() if self._posts else None
+            if item is None:
+                break
+            owner, fn, args = item
+            if owner is None or _alive(owner):
+                self._call(fn, *args)
+                handled += 1
+            if time.perf_counter() >= deadline:
+                break
+
+        # 3. イベント (チャネル間は順番に1件ずつ)
+        while ready and time.perf_counter() < deadline:
+            ready = [ch for ch in ready if ch._dispatch_event()]
+            handled += len(ready)
+
+        # 4. 定期処理 (予算超過時は次フレームへ。ただし1周期以上遅れたものは実行)
+        now = time.perf_counter()
+        with self._lock:
+            self._periodics = [p for p in self._periodics
+                               if not p.cancelled and _alive(p.owner)]
+            periodics = list(self._periodics)
+        for p in periodics:
+            if now < p.next_due:
+                continue
+            if time.perf_counter() >= deadline and now - p.next_due < p.interval:
+                continue
+            p.next_due = max(p.next_due + p.interval, now)
+            self._call(p.fn)
+            handled += 1
+
+        self._record_frame(start, handled)
+
+    def _record_frame(self, start, handled):
+        elapsed = time.perf_counter() - start
+        stats = self.stats
+        stats["frames"] += 1
+        if not handled:
+            return
+        stats["busy_frames"] += 1
+        stats["last_ms"] = elapsed * 1000.0
+        stats["max_ms"] = max(stats["max_ms"], stats["last_ms"])
+        metrics.UI_FRAME_SECONDS.observe(elapsed)
+        if elapsed > self.budget:
+            stats["overruns"] += 1
+            metrics.UI_FRAME_OVERRUNS.inc()
+        tracer.complete("ui.frame", "ui", start, elapsed, handled=handled)
+
+
+def get_bus(widget=None):
+    """アプリ共通の UIBus を返す (初回はメインスレッドから呼ぶこと)"""
+    global _bus
+    if _bus is None:
+        root = widget._root() if widget is not None else tk._default_root
+        _bus = UIBus(root)
+    return _bus
+
+
+def channel(owner, **kwargs):
+    """owner 用の Channel を作成 (get_bus(owner).channel の短縮形)"""
+    return get_bus(owner).channel(owner, **kwargs)
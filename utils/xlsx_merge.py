@@ -0,0 +1,454 @@
+"""XLSX ファイル間のシート移動 (zip パッケージ操作、Excel 不要)
+
+Linearity の POS/NEG 統合用。NEG 側ワークブックのシートを、図形 (drawing)・グラフ (chart)
+などの関連パーツとリレーションごと POS 側パッケージへコピーする。
+openpyxl で読み直さずに XML パーツを直接書き換えるため、グラフの書式はそのまま残り、
+1秒未満で終わる。Tk・Excel に依存しないのでワーカープロセスからも実行できる。
+
+- パーツ名が重複する場合は連番を振り直す (sheet1.xml → sheet2.xml など)
+- セルのスタイル番号 (s=) と条件付き書式 (dxfId) は書式テーブルを統合して付け替え、
+  共有文字列 (t="s") は文字列テーブルを統合して付け替える
+- シート名が重複する場合は " (2)" などを付け、グラフ内のシート参照も書き換える
+- コピーしたシートの選択状態 (tabSelected) は解除 (グループ選択で開かないように)
+- 名前の定義 (definedNames) はコピーしない
+
+使用例:
+    from utils import xlsx_merge
+    xlsx_merge.merge_sheets("xxx.xlsx", "xxx_tmp.xlsx")              # 全シート
+    xlsx_merge.merge_pos_neg("xxx.xlsx", "xxx_tmp.xlsx", sheets=[0])  # 1枚目のみ + NEG 削除
+"""
+import os
+import posixpath
+import re
+import time
+import zipfile
+
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+SHARED_STRINGS_TYPE = REL_NS + "/sharedStrings"
+SHARED_STRINGS_CT = ("application/vnd.openxmlformats-officedocument."
+                     "spreadsheetml.sharedStrings+xml")
+WORKSHEET_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+
+_ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+_REL_RE = re.compile(r'<Relationship\b[^>]*/>')
+_PART_NUM_RE = re.compile(r'^(.*?)(\d*)(\.[^.]+)$')
+
+
+def _attrs(tag):
+    return dict(_ATTR_RE.findall(tag))
+
+
+def _xml_escape_attr(text):
+    return (text.replace('&', '&amp;').replace('"', '&quot;')
+            .replace('<', '&lt;').replace('>', '&gt;'))
+
+
+def _xml_unescape(text):
+    return (text.replace('&quot;', '"').replace('&apos;', "'").replace('&lt;', '<')
+            .replace('&gt;', '>').replace('&amp;', '&'))
+
+
+class _Package:
+    """zip 内のパーツを dict で保持 (名前は先頭 / なし)"""
+
+    def __init__(self, path):
+        with zipfile.ZipFile(path, 'r') as zf:
+            self.names = zf.namelist()
+            self.parts = {name: zf.read(name) for name in self.names}
+
+    def text(self, name):
+        return self.parts[name].decode('utf-8')
+
+    def set_text(self, name, text):
+        if name not in self.parts:
+            self.names.append(name)
+        self.parts[name] = text.encode('utf-8')
+
+    def set_bytes(self, name, data):
+        if name not in self.parts:
+            self.names.append(name)
+        self.parts[name] = data
+
+    @staticmethod
+    def rels_name(part):
+        folder, base = posixpath.split(part)
+        return posixpath.join(folder, '_rels', base + '.rels')
+
+    def rels(self, part):
+        """[(属性 dict, 解決済みパーツ名 or None), ...]"""
+        name = self.rels_name(part)
+        if name not in self.parts:
+            return []
+        result = []
+        for tag in _REL_RE.findall(self.text(name)):
+            attrs = {k: _xml_unescape(v) for k, v in _attrs(tag).items()}
+            target = None
+            if attrs.get('TargetMode') != 'External':
+                target = self.resolve(part, attrs['Target'])
+            result.append((attrs, target))
+        return result
+
+    @staticmethod
+    def resolve(part, target):
+        if target.startswith('/'):
+            return posixpath.normpath(target[1:])
+        return posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+
+    def save(self, path):
+        """一時ファイルに書いてから置換"""
+        tmp = path + '.part'
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for name in self.names:
+                zf.writestr(name, self.parts[name])
+        os.replace(tmp, path)
+
+
+# ==================== 書式テーブル ====================
+def _container(xml, container):
+    """(match, [子要素の XML 文字列]) コンテナがなければ (None, [])"""
+    m = re.search(rf'<{container}\b[^>]*?(?:/>|>(.*?)</{container}>)', xml, re.DOTALL)
+    if m is None:
+        return None, []
+    return m, _children(m.group(1) or '')
+
+
+def _children(inner):
+    """直下の子要素を分割 (同名要素の入れ子がない前提: 書式テーブル用)"""
+    items, pos = [], 0
+    while True:
+        m = re.compile(r'<([\w:]+)\b').search(inner, pos)
+        if m is None:
+            return items
+        tag = m.group(1)
+        end = re.compile(rf'<{tag}\b[^>]*?(?:/>|>.*?</{tag}>)', re.DOTALL).match(inner, m.start())
+        items.append(end.group(0))
+        pos = end.end()
+
+
+# styleSheet 内の要素順 (存在しないコンテナを追加するときの挿入位置)
+_STYLE_ORDER = ('numFmts', 'fonts', 'fills', 'borders', 'cellStyleXfs', 'cellXfs',
+                'cellStyles', 'dxfs', 'tableStyles', 'colors', 'extLst')
+
+
+def _set_container(xml, container, items):
+    """コンテナの子要素と count を置き換え (なければスキーマ順の位置に追加)"""
+    body = f'<{container} count="{len(items)}">{"".join(items)}</{container}>'
+    m, _ = _container(xml, container)
+    if m is not None:
+        return xml[:m.start()] + body + xml[m.end():]
+    for later in _STYLE_ORDER[_STYLE_ORDER.index(container) + 1:]:
+        lm = re.search(rf'<{later}\b', xml)
+        if lm is not None:
+            return xml[:lm.start()] + body + xml[lm.start():]
+    end = xml.rindex('</styleSheet>')
+    return xml[:end] + body + xml[end:]
+
+
+def _merge_items(dst_items, src_items):
+    """src の各要素の dst 内インデックス (同一 XML は再利用、なければ追加)"""
+    index = {item: i for i, item in enumerate(dst_items)}
+    mapping = []
+    for item in src_items:
+        if item not in index:
+            index[item] = len(dst_items)
+            dst_items.append(item)
+        mapping.append(index[item])
+    return mapping
+
+
+def _sub_attr(tag, name, fn):
+    """タグ内の属性 name="数値" を fn(数値) に置換"""
+    return re.sub(rf'(\s{name}=")(\d+)(")',
+                  lambda m: f'{m.group(1)}{fn(int(m.group(2)))}{m.group(3)}', tag)
+
+
+def _merge_styles(dst_xml, src_xml):
+    """書式テーブルを統合
+
+    Returns:
+        (統合後の dst styles.xml, cellXfs の対応表, dxfs の対応表)
+    """
+    # 表示形式 (164 以降はユーザー定義: formatCode で対応付け)
+    _, dst_fmts = _container(dst_xml, 'numFmts')
+    _, src_fmts = _container(src_xml, 'numFmts')
+    by_code = {_attrs(f).get('formatCode'): int(_attrs(f)['numFmtId']) for f in dst_fmts}
+    next_id = max([163] + list(by_code.values())) + 1
+    fmt_map = {}
+    for f in src_fmts:
+        a = _attrs(f)
+        code = a.get('formatCode')
+        if code not in by_code:
+            by_code[code] = next_id
+            dst_fmts.append(f'<numFmt numFmtId="{next_id}" formatCode="{code}"/>')
+            next_id += 1
+        fmt_map[int(a['numFmtId'])] = by_code[code]
+
+    maps = {}
+    for container, tag_map in (('fonts', 'fontId'), ('fills', 'fillId'), ('borders', 'borderId')):
+        _, dst_items = _container(dst_xml, container)
+        _, src_items = _container(src_xml, container)
+        maps[tag_map] = (_merge_items(dst_items, src_items), dst_items, container)
+
+    def remap_xf(xf):
+        xf = _sub_attr(xf, 'numFmtId', lambda i: fmt_map.get(i, i))
+        for attr, (mapping, _, _) in maps.items():
+            xf = _sub_attr(xf, attr, lambda i, mp=mapping: mp[i] if i < len(mp) else i)
+        return xf
+
+    _, dst_xfs = _container(dst_xml, 'cellXfs')
+    _, src_xfs = _container(src_xml, 'cellXfs')
+    xf_map = _merge_items(dst_xfs, [remap_xf(xf) for xf in src_xfs])
+
+    _, dst_dxfs = _container(dst_xml, 'dxfs')
+    _, src_dxfs = _container(src_xml, 'dxfs')
+    dxf_map = _merge_items(dst_dxfs, src_dxfs)
+
+    xml = dst_xml
+    if dst_fmts:
+        xml = _set_container(xml, 'numFmts', dst_fmts)
+    for _, items, container in maps.values():
+        xml = _set_container(xml, container, items)
+    xml = _set_container(xml, 'cellXfs', dst_xfs)
+    if dst_dxfs:
+        xml = _set_container(xml, 'dxfs', dst_dxfs)
+    return xml, xf_map, dxf_map
+
+
+# ==================== 共有文字列 ====================
+def _shared_strings_part(pkg):
+    for attrs, target in pkg.rels('xl/workbook.xml'):
+        if attrs.get('Type') == SHARED_STRINGS_TYPE:
+            return target
+    return None
+
+
+def _shared_strings(pkg):
+    part = _shared_strings_part(pkg)
+    if part is None or part not in pkg.parts:
+        return part, []
+    return part, re.findall(r'<si\b.*?</si>|<si\s*/>', pkg.text(part), re.DOTALL)
+
+
+def _remap_sheet(xml, xf_map, dxf_map, sst_map):
+    """ワークシート XML のスタイル番号・dxfId・共有文字列番号を付け替え"""
+    def xf(i):
+        return xf_map[i] if i < len(xf_map) else i
+
+    def cell(m):
+        tag = _sub_attr(m.group(1), 's', xf)
+        body = m.group(2)
+        if sst_map is not None and re.search(r'\st="s"', tag):
+            body = re.sub(r'<v>(\d+)</v>', lambda v: f'<v>{sst_map[int(v.group(1))]}</v>', body)
+        return tag + body
+
+    xml = re.sub(r'(<c\b[^>]*?)(/>|>.*?</c>)', cell, xml, flags=re.DOTALL)
+    xml = re.sub(r'<row\b[^>]*>', lambda m: _sub_attr(m.group(0), 's', xf), xml)
+    xml = re.sub(r'<col\b[^>]*>', lambda m: _sub_attr(m.group(0), 'style', xf), xml)
+    xml = _sub_attr(xml, 'dxfId', lambda i: dxf_map[i] if i < len(dxf_map) else i)
+    return re.sub(r'\stabSelected="1"', '', xml)
+
+
+# ==================== シート移動 ====================
+def _sheets(pkg):
+    """[(sheet タグの属性 dict, パーツ名, リレーション Type), ...] (ワークブックの順)"""
+    rels = {a['Id']: (a, t) for a, t in pkg.rels('xl/workbook.xml')}
+    result = []
+    for tag in re.findall(r'<sheet\b[^>]*/>', pkg.text('xl/workbook.xml')):
+        attrs = _attrs(tag)
+        rel, target = rels[attrs['r:id']]
+        result.append((attrs, target, rel['Type']))
+    return result
+
+
+def _closure(pkg, part):
+    """part とそこからリレーションで辿れる全パーツ (ワークブック単位の共有パーツは除く)"""
+    found, stack = [], [part]
+    while stack:
+        name = stack.pop()
+        if name in found or name not in pkg.parts:
+            continue
+        found.append(name)
+        stack.extend(t for _, t in pkg.rels(name) if t is not None)
+    return found
+
+
+def _free_name(taken, name):
+    """taken と重複しないパーツ名 (末尾の番号を振り直す)"""
+    if name not in taken:
+        return name
+    head, _, ext = _PART_NUM_RE.match(name).groups()
+    n = 1
+    while f"{head}{n}{ext}" in taken:
+        n += 1
+    return f"{head}{n}{ext}"
+
+
+def _content_types(pkg):
+    xml = pkg.text('[Content_Types].xml')
+    overrides = {_attrs(t)['PartName'].lstrip('/'): _attrs(t)['ContentType']
+                 for t in re.findall(r'<Override\b[^>]*/>', xml)}
+    defaults = {_attrs(t)['Extension'].lower(): t for t in re.findall(r'<Default\b[^>]*/>', xml)}
+    return xml, overrides, defaults
+
+
+def _replace_sheet_refs(xml, old, new):
+    """グラフ XML 内のシート参照 ('old'!/old!) を 'new'! に置換"""
+    new_ref = "'" + new.replace("'", "''") + "'!"
+    xml = xml.replace("'" + old.replace("'", "''") + "'!", new_ref)
+    return re.sub(rf'(?<![\w\'\]]){re.escape(old)}!', lambda _: new_ref, xml)
+
+
+def merge_sheets(dst_path, src_path, sheets=None, out_path=None):
+    """src_path のシートを dst_path のワークブック末尾へコピー
+
+    Args:
+        sheets: コピーするシート (src 内の 0 始まりインデックスのリスト、None なら全シート)
+        out_path: 保存先 (None なら dst_path を上書き)
+    Returns:
+        追加したシート名のリスト
+    """
+    dst = _Package(dst_path)
+    src = _Package(src_path)
+
+    src_sheets = _sheets(src)
+    if sheets is not None:
+        src_sheets = [src_sheets[i] for i in sheets]
+    dst_sheets = _sheets(dst)
+    taken_names = {a['name'] for a, _, _ in dst_sheets}
+
+    # 書式・共有文字列の統合 (ワークシートがある場合のみ)
+    styles_xml = dst.text('xl/styles.xml')
+    styles_xml, xf_map, dxf_map = _merge_styles(styles_xml, src.text('xl/styles.xml'))
+    dst.set_text('xl/styles.xml', styles_xml)
+
+    src_sst_part, src_sst = _shared_strings(src)
+    dst_sst_part, dst_sst = _shared_strings(dst)
+    sst_map = _merge_items(dst_sst, src_sst) if src_sst else None
+
+    ct_xml, _, dst_defaults = _content_types(dst)
+    _, src_overrides, src_defaults = _content_types(src)
+    new_overrides = []
+    for ext, tag in src_defaults.items():
+        if ext not in dst_defaults:
+            ct_xml = ct_xml.replace('</Types>', tag + '</Types>')
+
+    wb_xml = dst.text('xl/workbook.xml')
+    wb_rels_name = dst.rels_name('xl/workbook.xml')
+    wb_rels_xml = dst.text(wb_rels_name)
+    rel_ids = [int(i) for i in re.findall(r'Id="rId(\d+)"', wb_rels_xml)]
+    next_rid = max(rel_ids + [0]) + 1
+    next_sheet_id = max([int(a['sheetId']) for a, _, _ in dst_sheets] + [0]) + 1
+
+    # シート名 (重複時は連番)。グラフは別シートを参照するため先に全シート分決める
+    sheet_names = {}
+    for attrs, _, _ in src_sheets:
+        name = _xml_unescape(attrs['name'])
+        new_name, n = name, 2
+        while new_name in taken_names:
+            new_name = f"{name[:31 - len(f' ({n})')]} ({n})"
+            n += 1
+        taken_names.add(new_name)
+        if new_name != name:
+            sheet_names[name] = new_name
+
+    added = []
+    for attrs, sheet_part, rel_type in src_sheets:
+        name = _xml_unescape(attrs['name'])
+        new_name = sheet_names.get(name, name)
+
+        # パーツをコピー (名前の振り直し → 中身の書き換え)
+        parts = _closure(src, sheet_part)
+        renamed = {}
+        for part in parts:
+            renamed[part] = _free_name(set(dst.parts) | set(renamed.values()), part)
+        for part in parts:
+            data = src.parts[part]
+            if src_overrides.get(part) == WORKSHEET_CT:
+                data = _remap_sheet(data.decode('utf-8'), xf_map, dxf_map,
+                                    sst_map).encode('utf-8')
+            elif sheet_names and part.startswith('xl/charts/'):
+                xml = data.decode('utf-8')
+                for old_name, renamed_name in sheet_names.items():
+                    xml = _replace_sheet_refs(xml, old_name, renamed_name)
+                data = xml.encode('utf-8')
+            dst.set_bytes(renamed[part], data)
+            if part in src_overrides:
+                new_overrides.append((renamed[part], src_overrides[part]))
+
+            rels_name = src.rels_name(part)
+            if rels_name in src.parts:
+                def retarget(m):
+                    tag = m.group(0)
+                    a = _attrs(tag)
+                    if a.get('TargetMode') == 'External':
+                        return tag
+                    target = src.resolve(part, _xml_unescape(a['Target']))
+                    new_target = '/' + renamed.get(target, target)
+                    return tag.replace(f'Target="{a["Target"]}"',
+                                       f'Target="{_xml_escape_attr(new_target)}"')
+                dst.set_text(dst.rels_name(renamed[part]),
+                             _REL_RE.sub(retarget, src.text(rels_name)))
+
+        # ワークブックへ登録
+        rid = f"rId{next_rid}"
+        next_rid += 1
+        wb_rels_xml = wb_rels_xml.replace(
+            '</Relationships>',
+            f'<Relationship Type="{rel_type}" Target="/{renamed[sheet_part]}" Id="{rid}"/>'
+            '</Relationships>')
+        state = attrs.get('state', 'visible')
+        wb_xml = re.sub(
+            r'(</sheets>)',
+            lambda m: (f'<sheet xmlns:r="{REL_NS}" name="{_xml_escape_attr(new_name)}" '
+                       f'sheetId="{next_sheet_id}" state="{state}" r:id="{rid}"/>' + m.group(1)),
+            wb_xml, count=1)
+        next_sheet_id += 1
+        added.append(new_name)
+
+    # 共有文字列
+    if sst_map is not None:
+        if dst_sst_part is None:
+            dst_sst_part = 'xl/sharedStrings.xml'
+            wb_rels_xml = wb_rels_xml.replace(
+                '</Relationships>',
+                f'<Relationship Type="{SHARED_STRINGS_TYPE}" Target="/{dst_sst_part}" '
+                f'Id="rId{next_rid}"/></Relationships>')
+            new_overrides.append((dst_sst_part, SHARED_STRINGS_CT))
+        root = (dst.text(dst_sst_part) if dst_sst_part in dst.parts else
+                '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"></sst>')
+        head = re.match(r'(.*?<sst\b[^>]*?)/?>', root, re.DOTALL).group(1)
+        head = re.sub(r'\s(?:count|uniqueCount)="\d+"', '', head)
+        dst.set_text(dst_sst_part,
+                     f'{head} count="{len(dst_sst)}" uniqueCount="{len(dst_sst)}">'
+                     f'{"".join(dst_sst)}</sst>')
+
+    for part, content_type in new_overrides:
+        ct_xml = ct_xml.replace(
+            '</Types>', f'<Override PartName="/{part}" ContentType="{content_type}"/></Types>')
+    dst.set_text('[Content_Types].xml', ct_xml)
+    dst.set_text('xl/workbook.xml', wb_xml)
+    dst.set_text(wb_rels_name, wb_rels_xml)
+    dst.save(out_path or dst_path)
+    return added
+
+
+def merge_pos_neg(pos_path, neg_path, sheets=None, retries=10):
+    """NEG のシートを POS ファイルへ統合して NEG ファイルを削除 (出力パイプライン用)
+
+    NEG ファイルが他のプロセスに開かれている間は 1秒間隔で最大 retries 回削除をリトライ。
+    Returns:
+        {"xlsx": pos_path, "sheets": 追加したシート名, "removed": NEG を削除できたか}
+    """
+    added = merge_sheets(pos_path, neg_path, sheets=sheets)
+    removed = False
+    for _ in range(retries + 1):
+        try:
+            os.remove(neg_path)
+            removed = True
+            break
+        except FileNotFoundError:
+            removed = True
+            break
+        except OSError:
+            time.sleep(1.0)
+    return {'xlsx': pos_path, 'sheets': added, 'removed': removed}
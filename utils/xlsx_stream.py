@@ -0,0 +1,97 @@
+"""ワークシートのデータ行をストリーミング出力 (大量点数の XLSX 用)
+
+openpyxl のオブジェクトモデルで数千～数万行のセルを作らずに、保存時のシリアライズで
+ワークシート XML の <sheetData> へ行 XML を直接書き出す。テンプレートのグラフ・書式・
+ヘッダー行はそのまま残す (template_cache.save_workbook の書き換え関数として使う)。
+
+- セルの書式は「見本行」から取る: 最初のデータ行などを openpyxl で通常どおり書き込んでおき、
+  シリアライズ後の XML から列ごとのスタイル番号 (s=) を読み取って全行に適用する
+- 値の型: int/float → 数値、"=" で始まる文字列 → 数式、その他の文字列 → インライン文字列、
+  None → セルなし
+- 行 XML はジェネレーターで逐次出力するため、メモリ・時間は行数に比例する
+
+使用例:
+    def rewrite(sheet_xml):
+        styles = xlsx_stream.row_styles(sheet_xml, first_row)
+        rows = ((first_row + i, [('A', a), ('B', f'=A{first_row + i}*2')], styles)
+                for i, a in enumerate(values))
+        return xlsx_stream.replace_rows(sheet_xml, first_row, first_row + len(values) - 1, rows)
+    template_cache.save_workbook(wb, path, {xlsx_stream.sheet_part(wb, ws): rewrite})
+"""
+import math
+import re
+from xml.sax.saxutils import escape
+
+_ROW_RE = re.compile(r'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.DOTALL)
+
+
+def sheet_part(wb, ws):
+    """openpyxl が保存するワークシートのパーツ名 (ワークシートの並び順で sheetN.xml)"""
+    return f"xl/worksheets/sheet{wb.worksheets.index(ws) + 1}.xml"
+
+
+def row_styles(sheet_xml, row):
+    """見本行の列ごとのスタイル番号 {列記号: s} (書式なしのセルは含めない)"""
+    for m in _ROW_RE.finditer(sheet_xml):
+        if int(m.group(1)) != row:
+            continue
+        styles = {}
+        for tag in re.findall(r'<c\b[^>]*>', m.group(0)):
+            col = re.search(r'\sr="([A-Z]+)\d+"', tag)
+            s = re.search(r'\ss="(\d+)"', tag)
+            if col and s:
+                styles[col.group(1)] = s.group(1)
+        return styles
+    return {}
+
+
+def cell_xml(ref, value, style=None):
+    """セル1個の XML (value が None なら書式のみのセル、書式もなければ空文字列)"""
+    s = f' s="{style}"' if style else ''
+    if value is None:
+        return f'<c r="{ref}"{s}/>' if s else ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if not math.isfinite(value):   # NaN/inf は XML の数値にできないため空セル
+            return f'<c r="{ref}"{s}/>' if s else ''
+        return f'<c r="{ref}"{s}><v>{value!r}</v></c>'
+    value = str(value)
+    if value.startswith('='):
+        return f'<c r="{ref}"{s}><f>{escape(value[1:])}</f><v></v></c>'
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+
+
+def row_xml(row, cells, styles=None):
+    """行1つの XML (cells は列順の [(列記号, 値), ...])"""
+    styles = styles or {}
+    body = ''.join(cell_xml(f"{col}{row}", value, styles.get(col)) for col, value in cells)
+    return f'<row r="{row}">{body}</row>'
+
+
+def replace_rows(sheet_xml, first_row, last_row, rows, chunk_rows=1000):
+    """first_row 以降の行を rows で置き換えた XML を断片ごとに返すジェネレーター
+
+    Args:
+        last_row: 出力後の最終行 (使用範囲 <dimension> の更新用)
+        rows: [(行番号, [(列記号, 値), ...], {列記号: スタイル番号}), ...] (行番号の昇順、
+              イテレーターでよい)
+        chunk_rows: 1つの断片にまとめる行数
+    """
+    start = sheet_xml.index('<sheetData')
+    end = sheet_xml.index('</sheetData>')
+    body_start = sheet_xml.index('>', start) + 1
+    head_rows = ''.join(m.group(0) for m in _ROW_RE.finditer(sheet_xml, body_start, end)
+                        if int(m.group(1)) < first_row)
+    head = re.sub(r'(<dimension ref="[A-Z]+\d+:[A-Z]+)\d+"',
+                  lambda m: f'{m.group(1)}{max(last_row, first_row - 1)}"',
+                  sheet_xml[:start], count=1)
+    yield head + sheet_xml[start:body_start] + head_rows
+
+    chunk = []
+    for r, cells, styles in rows:
+        chunk.append(row_xml(r, cells, styles))
+        if len(chunk) >= chunk_rows:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk) + sheet_xml[end:]
@@ -1,6 +1,6 @@
 # version.py
-__version__ = "1.69"
-__build_date__ = "2026-04-15"
+__version__ = "1.94"
+__build_date__ = "2026-10-19"
 
 def get_version_string():
     return f"DEF Command Set App v{__version__} (Build: {__build_date__})"
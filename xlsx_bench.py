@@ -0,0 +1,110 @@
+"""Linearity XLSX 出力ベンチマークスクリプト
+
+utils/linearity_xlsx.py の write_lbc_random / write_linear を合成データで実行し、
+点数ごとの保存時間と Python のピークメモリ (tracemalloc) を出力方式別に表示する。
+
+出力方式:
+    cells   openpyxl のセルで全行を書き込み (従来方式)
+    stream  データ行を XML で直接出力 (utils/xlsx_stream.py)
+    values  stream + LBC Random の参照式を計算済みの値で出力
+
+使い方:
+    python xlsx_bench.py                      # 1k / 8k / 64k 点
+    python xlsx_bench.py -n 1000 8188 -r 3 --modes stream values
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+MODES = {
+    'cells': {'stream': False, 'values_only': False},
+    'stream': {'stream': True, 'values_only': False},
+    'values': {'stream': True, 'values_only': True},
+}
+
+
+def lbc_random_record(n, out_dir):
+    """LBC Random (16bit) の合成レコード"""
+    codes = sorted(random.sample(range(-32768, 32768), min(n, 65536)))
+    codes += [codes[-1]] * (n - len(codes))
+    return {
+        'template_path': os.path.join(HERE, 'template', 'linearity_lbc_random.xlsx'),
+        'filepath': os.path.join(out_dir, f'lbc_random_{n}.xlsx'),
+        'serial_no': 'BENCH', 'pole': 'POS',
+        'title': f"BENCH POS LBC リニアリティ({n}点)",
+        'rows': [(c, c * 6.18 / 32768 + random.gauss(0, 1e-5), i + 1)
+                 for i, c in enumerate(codes)],
+        'gain': 1.0, 'offset': 0.0, 'max_error': 0.5, 'ng_detail': [],
+        'pattern_file': None,
+    }
+
+
+def linear_record(n, out_dir):
+    """Position (20bit) の合成レコード (約1%を NG 行にする)"""
+    vgain = 20.0 / ((1 << 20) - 1)
+    rows = []
+    for i, s_val in enumerate(sorted(random.randrange(-524288, 524288) for _ in range(n))):
+        m_val = s_val * vgain + random.gauss(0, 2e-6)
+        err = random.gauss(0, 0.3)
+        rows.append((i + 1, s_val, s_val * vgain, m_val, m_val / vgain, m_val / vgain - err,
+                     err, random.random() < 0.01))
+    return {
+        'template_path': os.path.join(HERE, 'template', 'linearity_linear.xlsx'),
+        'filepath': os.path.join(out_dir, f'linear_{n}.xlsx'),
+        'serial_no': 'BENCH', 'pole': 'POS', 'bits': 20, 'mode': 'random',
+        'title': f"BENCH POS Position ({n}点random)",
+        'rows': rows, 'offset_val': 1 << 19,
+        'gain': 1.0, 'offset': 0.0, 'gain_ng': False, 'offset_ng': False,
+        'pattern_file': None,
+    }
+
+
+def measure(writer, record, runs):
+    """writer(record) を runs 回実行して (時間の中央値 [s], ピークメモリ [MB], ファイルサイズ [KB])"""
+    times, peaks = [], []
+    for _ in range(runs):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        writer(dict(record))
+        times.append(time.perf_counter() - t0)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1e6)
+        tracemalloc.stop()
+    return statistics.median(times), max(peaks), os.path.getsize(record['filepath']) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Linearity XLSX 出力ベンチマーク")
+    parser.add_argument("-n", "--points", type=int, nargs="+", default=[1000, 8000, 64000],
+                        help="点数")
+    parser.add_argument("-r", "--runs", type=int, default=1, help="各条件の実行回数")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES),
+                        help="出力方式")
+    args = parser.parse_args()
+
+    from utils import linearity_xlsx
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as out_dir:
+        for kind, writer, make in (('LBC Random', linearity_xlsx.write_lbc_random, lbc_random_record),
+                                   ('Position', linearity_xlsx.write_linear, linear_record)):
+            print(f"{kind}")
+            print(f"  {'点数':>8} {'方式':<8} {'時間[s]':>9} {'ピーク[MB]':>11} {'サイズ[KB]':>11}")
+            for n in args.points:
+                record = make(n, out_dir)
+                for mode in args.modes:
+                    if mode == 'values' and writer is linearity_xlsx.write_linear:
+                        continue   # Position は元から値のみ
+                    elapsed, peak, size = measure(writer, {**record, **MODES[mode]}, args.runs)
+                    print(f"  {n:>8} {mode:<8} {elapsed:>9.3f} {peak:>11.1f} {size:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()